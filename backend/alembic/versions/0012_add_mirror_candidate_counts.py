@@ -0,0 +1,35 @@
+"""add_mirror_candidate_counts
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17T00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "mirror_logs",
+        sa.Column("candidates_requested", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    op.add_column(
+        "mirror_logs",
+        sa.Column("candidates_wasted", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("mirror_logs", "candidates_wasted")
+    op.drop_column("mirror_logs", "candidates_requested")
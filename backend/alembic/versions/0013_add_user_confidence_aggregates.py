@@ -0,0 +1,64 @@
+"""add_user_confidence_aggregates
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17T00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_FLOAT_COLUMNS = (
+    "message_weight",
+    "message_slang_weight",
+    "message_length_sum",
+    "message_length_sq_sum",
+    "trait_confidence_sum",
+    "trait_recency_sum",
+    "insight_weight",
+    "insight_confidence_sum",
+    "insight_recent_weight",
+    "insight_recent_confidence_sum",
+    "reflection_weight",
+    "reflection_sentiment_weight",
+    "external_weight",
+    "external_confidence_weight_sum",
+)
+
+
+def upgrade() -> None:
+    # Rows are built lazily from the source tables on first read, so no backfill here.
+    op.create_table(
+        "user_confidence_aggregates",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("decayed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("rebuilt_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("trait_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        *[
+            sa.Column(name, sa.Float(), server_default=sa.text("0"), nullable=False)
+            for name in _FLOAT_COLUMNS
+        ],
+        sa.Column(
+            "external_recent_tokens",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'[]'::jsonb"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_confidence_aggregates")
@@ -0,0 +1,44 @@
+"""resize_message_embeddings
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-17T00:00:00.000000
+
+messages.embedding was declared as vector(1536), but embeddings come from
+mistral-embed, which returns 1024 dimensions. Nothing has written the column
+through the app, and vectors from another model cannot be compared with
+mistral-embed ones, so existing values are dropped. The embedding backfill
+(scripts/backend/backfill_message_embeddings.py) repopulates them.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0014"
+down_revision: Union[str, None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _resize(dimensions: int) -> None:
+    op.drop_index("idx_messages_embedding_ivfflat", table_name="messages")
+    op.execute(f"ALTER TABLE messages ALTER COLUMN embedding TYPE vector({dimensions}) USING NULL")
+    op.create_index(
+        "idx_messages_embedding_ivfflat",
+        "messages",
+        ["embedding"],
+        postgresql_using="ivfflat",
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+        postgresql_with={"lists": 100},
+    )
+
+
+def upgrade() -> None:
+    _resize(1024)
+
+
+def downgrade() -> None:
+    _resize(1536)
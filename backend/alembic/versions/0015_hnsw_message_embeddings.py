@@ -0,0 +1,74 @@
+"""hnsw_message_embeddings
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-17T00:00:00.000000
+
+Replaces the ivfflat index on messages.embedding with HNSW. ivfflat with a
+fixed lists = 100 and the default probes = 1 loses recall as the table grows,
+and because it is trained on the rows present at build time it degrades as
+new users' messages land in stale lists. HNSW needs no training. Its recall
+and latency trade-off is set per query through hnsw.ef_search, which
+retrieve_memories sets from MEMORY_HNSW_EF_SEARCH.
+
+The match_messages function that retrieve_memories calls was never created
+by a migration, so it is defined here against the 1024-dimension column.
+
+The index is built CONCURRENTLY so messages stay writable during the build.
+Requires pgvector >= 0.5.0.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0015"
+down_revision: Union[str, None] = "0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+MATCH_MESSAGES = """
+create or replace function match_messages(
+    query_embedding vector(1024),
+    match_threshold double precision,
+    match_count integer,
+    p_user_id uuid
+)
+returns table (id uuid, content text, similarity double precision)
+language sql stable
+as $$
+    select m.id, m.content, 1 - (m.embedding <=> query_embedding) as similarity
+    from messages m
+    where m.user_id = p_user_id
+      and m.embedding is not null
+      and 1 - (m.embedding <=> query_embedding) > match_threshold
+    order by m.embedding <=> query_embedding
+    limit match_count
+$$
+"""
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("drop index concurrently if exists idx_messages_embedding_ivfflat")
+        op.execute(
+            "create index concurrently if not exists idx_messages_embedding_hnsw "
+            "on messages using hnsw (embedding vector_cosine_ops) "
+            f"with (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+        )
+    op.execute(MATCH_MESSAGES)
+
+
+def downgrade() -> None:
+    op.execute("drop function if exists match_messages(vector, double precision, integer, uuid)")
+    with op.get_context().autocommit_block():
+        op.execute("drop index concurrently if exists idx_messages_embedding_hnsw")
+        op.execute(
+            "create index concurrently if not exists idx_messages_embedding_ivfflat "
+            "on messages using ivfflat (embedding vector_cosine_ops) with (lists = 100)"
+        )
@@ -0,0 +1,70 @@
+"""halfvec_message_embeddings
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-17T00:00:00.000000
+
+Stores messages.embedding as halfvec(1024) (2 bytes per dimension) instead
+of vector(1024) (4 bytes). mistral-embed vectors are unit length with small
+components, so rounding them to float16 leaves cosine rankings effectively
+unchanged. scripts/backend/bench_vector_recall.py --storage both measures
+table size, index size and recall@k for the two types.
+
+The HNSW index is rebuilt with halfvec_cosine_ops, and match_messages is
+redefined for the new column type. Requires pgvector >= 0.7.0.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0016"
+down_revision: Union[str, None] = "0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSIONS = 1024
+
+
+def _match_messages(column_type: str) -> str:
+    return f"""
+create or replace function match_messages(
+    query_embedding {column_type},
+    match_threshold double precision,
+    match_count integer,
+    p_user_id uuid
+)
+returns table (id uuid, content text, similarity double precision)
+language sql stable
+as $$
+    select m.id, m.content, 1 - (m.embedding <=> query_embedding) as similarity
+    from messages m
+    where m.user_id = p_user_id
+      and m.embedding is not null
+      and 1 - (m.embedding <=> query_embedding) > match_threshold
+    order by m.embedding <=> query_embedding
+    limit match_count
+$$
+"""
+
+
+def _convert(from_type: str, to_type: str, opclass: str) -> None:
+    column_type = f"{to_type}({DIMENSIONS})"
+    op.execute(f"drop function if exists match_messages({from_type}, double precision, integer, uuid)")
+    op.execute("drop index if exists idx_messages_embedding_hnsw")
+    op.execute(f"alter table messages alter column embedding type {column_type} using embedding::{column_type}")
+    op.execute(
+        "create index idx_messages_embedding_hnsw on messages "
+        f"using hnsw (embedding {opclass}) with (m = 16, ef_construction = 64)"
+    )
+    op.execute(_match_messages(column_type))
+
+
+def upgrade() -> None:
+    _convert("vector", "halfvec", "halfvec_cosine_ops")
+
+
+def downgrade() -> None:
+    _convert("halfvec", "vector", "vector_cosine_ops")
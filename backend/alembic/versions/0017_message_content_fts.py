@@ -0,0 +1,62 @@
+"""message_content_fts
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-17T00:00:00.000000
+
+Adds a GIN full-text index on messages.content for the lexical half of
+reflection memory retrieval (see memory_retrieval_service). The index
+expression must match the query exactly: to_tsvector('english', content).
+
+match_messages now returns only the user's own messages. Assistant replies
+are not memories of what the user said, and the in-process memory index
+applies the same filter.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0017"
+down_revision: Union[str, None] = "0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _match_messages(role_filter: str) -> str:
+    return f"""
+create or replace function match_messages(
+    query_embedding halfvec(1024),
+    match_threshold double precision,
+    match_count integer,
+    p_user_id uuid
+)
+returns table (id uuid, content text, similarity double precision)
+language sql stable
+as $$
+    select m.id, m.content, 1 - (m.embedding <=> query_embedding) as similarity
+    from messages m
+    where m.user_id = p_user_id{role_filter}
+      and m.embedding is not null
+      and 1 - (m.embedding <=> query_embedding) > match_threshold
+    order by m.embedding <=> query_embedding
+    limit match_count
+$$
+"""
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "create index concurrently if not exists idx_messages_content_fts "
+            "on messages using gin (to_tsvector('english', content))"
+        )
+    op.execute(_match_messages("\n      and m.role = 'user'"))
+
+
+def downgrade() -> None:
+    op.execute(_match_messages(""))
+    with op.get_context().autocommit_block():
+        op.execute("drop index concurrently if exists idx_messages_content_fts")
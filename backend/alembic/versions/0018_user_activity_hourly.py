@@ -0,0 +1,71 @@
+"""user_activity_hourly
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-17T00:00:00.000000
+
+Hourly per-user rollups of user messages (counts, token sums and sum/count
+pairs for emotional intensity, reflection depth and response delay). The
+analytics endpoints read these instead of grouping the raw messages table.
+The app keeps them current on message insert; the table is backfilled here
+and can be rebuilt with scripts/backend/rebuild_activity_rollups.py.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0018"
+down_revision: Union[str, None] = "0017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_activity_hourly",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("hour", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("message_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("token_sum", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("emotional_intensity_sum", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("emotional_intensity_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("reflection_depth_sum", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("reflection_depth_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("response_delay_sum", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("response_delay_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "hour"),
+    )
+    op.execute(
+        """
+        insert into user_activity_hourly (
+            user_id, hour, message_count, token_sum,
+            emotional_intensity_sum, emotional_intensity_count,
+            reflection_depth_sum, reflection_depth_count,
+            response_delay_sum, response_delay_count
+        )
+        select
+            user_id,
+            date_trunc('hour', created_at, 'UTC'),
+            count(*),
+            coalesce(sum(token_count), 0),
+            coalesce(sum(emotional_intensity), 0),
+            count(emotional_intensity),
+            coalesce(sum(reflection_depth), 0),
+            count(reflection_depth),
+            coalesce(sum(response_delay_ms), 0),
+            count(response_delay_ms)
+        from messages
+        where role = 'user'
+        group by user_id, date_trunc('hour', created_at, 'UTC')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_activity_hourly")
@@ -0,0 +1,45 @@
+"""user_activity_heatmap
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-17T00:00:00.000000
+
+Adds user_settings.timezone and a per-user ring of local day x hour message
+counts behind the activity heatmap. Rings are built from messages on each
+user's first heatmap read, so nothing is backfilled here.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0019"
+down_revision: Union[str, None] = "0018"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_settings",
+        sa.Column("timezone", sa.String(length=64), server_default=sa.text("'UTC'"), nullable=False),
+    )
+    op.create_table(
+        "user_activity_heatmap",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("timezone", sa.String(length=64), server_default=sa.text("'UTC'"), nullable=False),
+        sa.Column("last_day", sa.Date(), nullable=True),
+        sa.Column("counts", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_activity_heatmap")
+    op.drop_column("user_settings", "timezone")
@@ -0,0 +1,91 @@
+"""user_data_versions
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-17T00:00:00.000000
+
+A per-user data version counter behind the ETags of the polled read
+endpoints (see data_version_service). Statement-level triggers bump it in the
+writing transaction for every table those endpoints read, so every writer
+(API, workers, scripts) is covered and a version is visible exactly when its
+data is. messages has no UPDATE trigger: the only updates are embedding
+backfills, which no polled payload shows.
+
+The table has no foreign key to users. Cascaded deletes of an account's rows
+fire the triggers after the user row is gone; the join on users skips them
+instead of failing the delete.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0020"
+down_revision: Union[str, None] = "0019"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = {
+    "messages": ("insert", "delete"),
+    "user_persona_metrics": ("insert", "update", "delete"),
+    "persona_snapshots": ("insert", "update", "delete"),
+    "user_settings": ("insert", "update", "delete"),
+    "schedule_context": ("insert", "update", "delete"),
+    "behavioral_insights": ("insert", "update", "delete"),
+    "reflection_logs": ("insert", "update", "delete"),
+    "mirror_logs": ("insert", "update", "delete"),
+}
+
+
+def _trigger_name(table: str, event: str) -> str:
+    return f"trg_{table}_{event}_data_version"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_data_versions",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("version", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        """
+create or replace function bump_user_data_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into user_data_versions (user_id, version, updated_at)
+    select distinct changed.user_id, 1, now()
+    from changed
+    join users on users.id = changed.user_id
+    on conflict (user_id) do update
+        set version = user_data_versions.version + 1,
+            updated_at = excluded.updated_at;
+    return null;
+end;
+$$
+"""
+    )
+    for table, events in VERSIONED_TABLES.items():
+        for event in events:
+            transition = "old table" if event == "delete" else "new table"
+            op.execute(
+                f"create trigger {_trigger_name(table, event)} "
+                f"after {event} on {table} "
+                f"referencing {transition} as changed "
+                f"for each statement execute function bump_user_data_version()"
+            )
+
+
+def downgrade() -> None:
+    for table, events in VERSIONED_TABLES.items():
+        for event in events:
+            op.execute(f"drop trigger if exists {_trigger_name(table, event)} on {table}")
+    op.execute("drop function if exists bump_user_data_version()")
+    op.drop_table("user_data_versions")
@@ -0,0 +1,42 @@
+"""message_embedding_attempts
+
+Revision ID: 0021
+Revises: 0020
+Create Date: 2026-10-17T00:00:00.000000
+
+The embedding worker no longer holds row locks while it calls the provider.
+messages.embedding_attempts counts the times a message came back without a
+vector or was rejected, so it stops being re-sent every pass once it reaches
+EMBEDDING_MAX_ROW_ATTEMPTS. The partial index serves the worker's keyset
+scan over messages that still lack a vector.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0021"
+down_revision: Union[str, None] = "0020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "messages",
+        sa.Column("embedding_attempts", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "create index concurrently if not exists idx_messages_pending_embedding "
+            "on messages (created_at, id) where embedding is null"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("drop index concurrently if exists idx_messages_pending_embedding")
+    op.drop_column("messages", "embedding_attempts")
@@ -4,7 +4,7 @@ from typing import Dict, List, Optional
 
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy import Float, Integer, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,7 +16,14 @@ from app.db.models import (
     PersonaSnapshot,
     ScheduleContext,
 )
+from app.repository.persona_repository import PersonaRepository
+from app.services.activity_heatmap_service import load_activity_heatmap
+from app.services.activity_rollup_service import (
+    activity_series_query,
+    average_reflection_depth,
+)
 from app.services.confidence_interval_service import build_confidence_explainability
+from app.services.data_version_service import not_modified_response, time_bucket
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -218,14 +225,8 @@ async def _build_timeline_events(
 
     # Source 2: Persona trait shift from snapshots (conversation-derived traits).
     if include_source("persona"):
-        snapshots_stmt = (
-            select(PersonaSnapshot)
-            .where(PersonaSnapshot.user_id == user_id)
-            .order_by(PersonaSnapshot.created_at.desc())
-            .limit(6)
-        )
-        snapshots_result = await db.execute(snapshots_stmt)
-        snapshots = snapshots_result.scalars().all()
+        # One snapshot per day, newest first, from the same series retention keeps.
+        snapshots = list(reversed(await PersonaRepository.get_snapshot_series(db, user_id, bucket="day", limit=6)))
 
         if len(snapshots) >= 2:
             latest = snapshots[0]
@@ -277,25 +278,9 @@ async def _build_timeline_events(
 
         if schedule:
             first_half_end = start_date + (end_date - start_date) / 2
-            first_half_stmt = select(func.avg(Message.reflection_depth)).where(
-                Message.user_id == user_id,
-                Message.role == "user",
-                Message.created_at >= start_date,
-                Message.created_at < first_half_end,
-                Message.reflection_depth.is_not(None),
-            )
-            second_half_stmt = select(func.avg(Message.reflection_depth)).where(
-                Message.user_id == user_id,
-                Message.role == "user",
-                Message.created_at >= first_half_end,
-                Message.created_at <= end_date,
-                Message.reflection_depth.is_not(None),
-            )
-
-            first_half_result = await db.execute(first_half_stmt)
-            second_half_result = await db.execute(second_half_stmt)
-            first_depth = first_half_result.scalar_one_or_none()
-            second_depth = second_half_result.scalar_one_or_none()
+            # Each rollup hour falls in exactly one half.
+            first_depth = await average_reflection_depth(db, user_id, start_date, first_half_end)
+            second_depth = await average_reflection_depth(db, user_id, first_half_end)
 
             if schedule.stress_level >= 0.7 and first_depth is not None and second_depth is not None:
                 delta = float(second_depth) - float(first_depth)
@@ -430,25 +415,7 @@ async def get_behavioral_metrics(
         start_date = now - timedelta(days=7)
         trunc_period = "day"
         
-    date_trunc_expr = func.date_trunc(trunc_period, Message.created_at)
-
-    filters = [
-        Message.user_id == user_id,
-        Message.role == "user",
-    ]
-    if start_date is not None:
-        filters.append(Message.created_at >= start_date)
-
-    stmt = select(
-        date_trunc_expr.label("period"),
-        func.count(Message.id).label("message_count"),
-        func.sum(Message.token_count).label("total_tokens"),
-        func.avg(Message.emotional_intensity).label("avg_emotional_intensity"),
-        func.avg(Message.reflection_depth).label("avg_reflection_depth"),
-        func.avg(Message.response_delay_ms).label("avg_delay_ms"),
-    ).where(
-        *filters
-    ).group_by(date_trunc_expr).order_by(date_trunc_expr)
+    stmt = activity_series_query(user_id, trunc_period, start_date)
 
     result = await db.execute(stmt)
     rows = result.all()
@@ -528,41 +495,14 @@ async def get_activity_heatmap(
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Fetch message frequency by hour of the day and day of week.
+    Fetch message frequency by hour of the day and day of week, in the user's timezone.
     Returns array where index 0 is Sunday, index 6 is Saturday.
     """
-    start_date = _utc_now() - timedelta(days=days)
-
-    from sqlalchemy import extract
-    
-    # Extract Dow (0-6) and Hour (0-23)
-    stmt = select(
-        extract('dow', Message.created_at).label('day_of_week'),
-        extract('hour', Message.created_at).label('hour_of_day'),
-        func.count(Message.id).label('message_count')
-    ).where(
-        Message.user_id == user_id,
-        Message.role == "user",
-        Message.created_at >= start_date
-    ).group_by(
-        extract('dow', Message.created_at),
-        extract('hour', Message.created_at)
-    )
-
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    # Initialize empty 7x24 grid (Sunday=0 to Saturday=6)
-    heatmap = [[0 for _ in range(24)] for _ in range(7)]
-    
-    for row in rows:
-        day = int(row.day_of_week)
-        hour = int(row.hour_of_day)
-        count = row.message_count
-        heatmap[day][hour] = count
+    tz, heatmap = await load_activity_heatmap(db, user_id, days)
 
     return {
         "range_days": days,
+        "timezone": tz,
         "heatmap": heatmap
     }
 
@@ -570,6 +510,8 @@ async def get_activity_heatmap(
 @router.get("/timeline/{user_id}")
 async def get_timeline_patterns(
     user_id: UUID,
+    request: Request,
+    response: Response,
     range: str = Query("7d", description="Timeframe range: 7d, 30d, 90d"),
     sources: Optional[List[str]] = Query(
         None,
@@ -590,6 +532,20 @@ async def get_timeline_patterns(
         valid_sources = {"insight", "persona", "schedule", "mirror"}
         allowed_sources = {source for source in sources if source in valid_sources}
 
+    # Windows and relative labels move with the clock, so the ETag also expires per time bucket.
+    not_modified = await not_modified_response(
+        request,
+        response,
+        db,
+        user_id,
+        "analytics.timeline",
+        normalized_range,
+        sorted(allowed_sources) if allowed_sources is not None else "all",
+        time_bucket(),
+    )
+    if not_modified is not None:
+        return not_modified
+
     try:
         raw_events = await _build_timeline_events(
             db=db,
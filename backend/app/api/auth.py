@@ -71,6 +71,9 @@ async def delete_all_user_data(
         PersonaSnapshot, ScheduleContext
     )
     from app.services.mirror_engine import invalidate_snapshot_cache
+    from app.services.memory_index import memory_index
+    from app.services.memory_service import drift_monitor
+    from app.services.work_queue import work_queue
     
     try:
         user_uuid = UUID(request.user_id)
@@ -97,11 +100,14 @@ async def delete_all_user_data(
         
         # 2. Clear from vector cache or anything else?
         invalidate_snapshot_cache(user_uuid)
+        memory_index.invalidate(user_uuid)
+        drift_monitor.forget(user_uuid)
         
         # 3. Delete the user
         await db.execute(delete(User).where(User.id == user_uuid))
         
         await db.commit()
+        await work_queue.purge_owner(str(user_uuid))
         return {"status": "user_deleted"}
     except Exception as e:
         await db.rollback()
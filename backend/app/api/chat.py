@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, model_validator
+from starlette.background import BackgroundTask
+import asyncio
+import json
 import random
-import os
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 import logging
 from datetime import datetime
 import re
@@ -13,7 +17,7 @@ from uuid import UUID
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, get_db
 from app.db import crud
 from app.db.models import UserSettings
 from app.schemas.db import ConversationListItem, ConversationListOut, MessageOut
@@ -22,6 +26,22 @@ from app.services.twin_assistant_service import (
     classify_assistant_task,
 )
 from app.services.twin_policy import resolve_twin_settings
+from app.services import llm_gateway
+from app.services.work_queue import work_queue
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.prompt_compiler import prompt_compiler
+from app.services.message_features import (
+    EMOTIONAL_MARKERS,
+    PROFILE_KEYWORD_MAPS,
+    MessageFeatures,
+    ensure_features,
+    extract_message_features,
+)
+from app.services.history_service import (
+    get_conversation_history_window,
+    history_cache,
+    record_history_turn,
+)
 
 # Load environment variables
 load_dotenv(dotenv_path=Path(__file__).resolve().parents[2] / ".env")
@@ -65,27 +85,6 @@ class ChatResponse(BaseModel):
     style_strength: Optional[float] = None
     reaction_source: Optional[str] = None
 
-def init_mistral_client() -> None:
-    global MISTRAL_AVAILABLE, mistral_client
-    try:
-        from mistralai import Mistral
-        api_key = os.getenv("MISTRAL_API_KEY")
-        if not api_key:
-            raise ValueError("MISTRAL_API_KEY not found in environment")
-
-        mistral_client = Mistral(api_key=api_key)
-        MISTRAL_AVAILABLE = True
-        logger.info(f"✅ Mistral client initialized with key: {api_key[:8]}...{api_key[-4:]}")
-    except Exception as e:
-        MISTRAL_AVAILABLE = False
-        mistral_client = None
-        logger.warning(f"⚠️ Mistral not available: {e}")
-
-
-MISTRAL_AVAILABLE = False
-mistral_client = None
-init_mistral_client()
-
 # Reflection mode responses - adaptive pattern recognition
 REFLECTION_TEMPLATES = [
     "You keep circling back to {text}. That usually means there's something unresolved underneath. What's the real question here?",
@@ -403,12 +402,16 @@ MIRROR_BANNED_PHRASES = [
     "what if you tried",
     "the thing is",
 ]
+MIRROR_BANNED_PHRASE_MATCHER = KeywordMatcher({"banned": MIRROR_BANNED_PHRASES})
 
 MODEL_PARAMS = {
     "reflection": {"temperature": 0.6, "max_tokens": 280},  # Increased for structured pattern synthesis
     "mirror": {"temperature": 0.85, "max_tokens": 150},  # Higher temp for unhinged chaos
 }
 
+# Titles are cosmetic; never let them hold a turn for the full LLM timeout.
+TITLE_TIMEOUT_SECONDS = 4.0
+
 EXPLICIT_TASK_COMMAND_PATTERNS = [
     r"^(can you|could you|please|help me|i need you to|i want you to)\b",
     r"^(draft|write|compose|rewrite|rephrase|edit|summarize|summarise|brainstorm|plan|outline|create|generate)\b",
@@ -416,23 +419,6 @@ EXPLICIT_TASK_COMMAND_PATTERNS = [
 ]
 
 MIRROR_FALLBACK_REPLY = "Got it. Give me a little more context and I will respond in your tone."
-TASK_FOLLOWUP_MARKERS = [
-    "help me write",
-    "write in my tone",
-    "in my tone",
-    "make it sound",
-    "make this better",
-    "polish this",
-    "tighten this",
-    "continue this",
-    "finish this",
-    "make it shorter",
-    "make it longer",
-    "version 2",
-    "another option",
-    "try again",
-    "redo this",
-]
 CONTEXTUAL_TASK_TYPES = {
     "email_draft",
     "message_draft",
@@ -445,7 +431,6 @@ CONTEXTUAL_TASK_TYPES = {
 # In-memory storage (swap with database for persistence).
 PERSONALITY_PROFILES: Dict[str, Dict[str, object]] = {}
 COMMUNICATION_PROFILES: Dict[str, Dict[str, object]] = {}
-CONVERSATION_HISTORY: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
 EMOTIONAL_STATE_HISTORY: Dict[str, List[str]] = {}  # Track recent emotional states per user
 
 def get_personality_profile(user_id: str) -> Dict[str, object]:
@@ -473,14 +458,6 @@ def get_communication_profile(user_id: str) -> Dict[str, object]:
         "updated_at": None,
     })
 
-def split_sentences(text: str) -> List[str]:
-    raw = re.split(r"[.!?]+", text)
-    return [segment.strip() for segment in raw if segment.strip()]
-
-def extract_words(text: str) -> List[str]:
-    return re.findall(r"\b\w+\b", text.lower())
-
-
 def normalize_interaction_mode(mode: Optional[str]) -> Optional[str]:
     """Normalize deprecated aliases so runtime only uses reflection/mirror modes."""
     if mode is None:
@@ -509,22 +486,27 @@ def detect_explicit_task_command(message: str) -> Optional[str]:
     return task_type
 
 
-def resolve_mirror_task_type(message: str, history: Optional[List[Dict[str, str]]] = None) -> Optional[str]:
+def resolve_mirror_task_type(
+    message: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    features: Optional[MessageFeatures] = None,
+) -> Optional[str]:
     """Resolve mirror task type using explicit commands first, then contextual follow-up cues."""
     text = (message or "").strip()
     if not text:
         return None
 
-    text_lower = text.lower()
+    features = ensure_features(text, features)
+    text_lower = features.lower
     explicit_task = detect_explicit_task_command(text_lower)
-    followup_hint = any(marker in text_lower for marker in TASK_FOLLOWUP_MARKERS)
+    followup_hint = features.has("task.followup")
     imperative_hint = bool(
         re.search(
             r"^(help me|can you|could you|please|write|draft|compose|rewrite|rephrase|summarize|summarise|plan|outline|brainstorm|polish|tighten|continue|finish|redo|try again)\b",
             text_lower,
         )
     )
-    style_hint = any(token in text_lower for token in ["in my tone", "my tone", "my voice", "sound like me", "write like me"])
+    style_hint = features.has("task.style")
     should_probe_history = followup_hint or imperative_hint or style_hint
 
     if explicit_task and not (followup_hint or style_hint):
@@ -579,35 +561,25 @@ def resolve_mirror_task_type(message: str, history: Optional[List[Dict[str, str]
 # Manual style selection is DISABLED - only auto-detection is used.
 # ============================================================================
 
-EMOTIONAL_MARKERS = {
-    "insecure": ["i don't know", "maybe", "not sure", "probably wrong", "doubt", "uncertain", "hesitant", "scared", "nervous", "idk", "unsure", "confused", "lost"],
-    "stressed": ["stressed", "overwhelmed", "anxious", "worried", "pressure", "struggling", "can't handle", "too much", "exhausted", "tired", "drowning", "burnout"],
-    "angry": ["pissed", "angry", "furious", "mad", "hate", "fuck", "bullshit", "ridiculous", "unacceptable", "done with", "fed up", "irritated"],
-    "playful": ["lol", "lmao", "haha", "😂", "💀", "bruh", "nah", "fr fr", "lowkey", "highkey", "vibes", "bet", "tbh"],
-    "sarcastic": ["sure", "yeah right", "oh great", "wonderful", "fantastic", "obviously", "totally", "yeah okay", "perfect", "lovely"],
-    "happy": ["happy", "excited", "great", "awesome", "amazing", "love", "perfect", "excellent", "wonderful", "fantastic", "pumped", "thrilled"],
-}
-
-def detect_emotional_tone(text: str, profile: Dict[str, object]) -> str:
+def detect_emotional_tone(
+    text: str,
+    profile: Dict[str, object],
+    features: Optional[MessageFeatures] = None,
+) -> str:
     """
     Detect the dominant emotional tone from user's message.
     Returns: insecure, stressed, angry, playful, sarcastic, happy, or neutral
     """
-    lower = text.lower()
+    features = ensure_features(text, features)
     
     # Count emotional markers
-    emotion_scores = {emotion: 0 for emotion in EMOTIONAL_MARKERS.keys()}
-    
-    for emotion, markers in EMOTIONAL_MARKERS.items():
-        for marker in markers:
-            if marker in lower:
-                emotion_scores[emotion] += 1
+    emotion_scores = {emotion: features.count(f"emotion.{emotion}") for emotion in EMOTIONAL_MARKERS.keys()}
     
     # Linguistic analysis for additional signals
-    has_caps = bool(re.search(r"[A-Z]{2,}", text))
-    multiple_punct = bool(re.search(r"[!?]{2,}", text))
-    has_question = "?" in text
-    word_count = len(text.split())
+    has_caps = features.has_caps_run
+    multiple_punct = features.has_multi_punct
+    has_question = features.question_count > 0
+    word_count = len(features.whitespace_tokens)
     
     # Boost scores based on linguistic patterns
     if has_caps and multiple_punct:
@@ -616,12 +588,11 @@ def detect_emotional_tone(text: str, profile: Dict[str, object]) -> str:
     if has_question and word_count < 10:
         emotion_scores["insecure"] += 1
     
-    if multiple_punct and any(marker in lower for marker in ["lol", "lmao", "haha"]):
+    if multiple_punct and features.has("emotion.laughter"):
         emotion_scores["playful"] += 2
     
     # Check for contradictory tone (sarcasm indicator)
-    positive_words = ["great", "wonderful", "perfect", "amazing"]
-    if any(word in lower for word in positive_words) and (multiple_punct or "..." in text):
+    if features.has("emotion.positive") and (multiple_punct or features.ellipsis_count > 0):
         emotion_scores["sarcastic"] += 2
     
     # Find dominant emotion
@@ -662,7 +633,12 @@ def map_emotion_to_mirror_style(emotion: str, intensity: float = 0.5) -> str:
     
     return emotion_to_style.get(emotion, "calm")
 
-def get_adaptive_mirror_style(user_id: str, user_text: str, profile: Dict[str, object]) -> tuple[str, str]:
+def get_adaptive_mirror_style(
+    user_id: str,
+    user_text: str,
+    profile: Dict[str, object],
+    features: Optional[MessageFeatures] = None,
+) -> tuple[str, str]:
     """
     Determine mirror archetype adaptively based on emotional detection.
     Returns: (selected_style, detected_emotion)
@@ -671,7 +647,7 @@ def get_adaptive_mirror_style(user_id: str, user_text: str, profile: Dict[str, o
     Maintains consistency unless emotional shift is significant.
     """
     # Detect current emotion
-    detected_emotion = detect_emotional_tone(user_text, profile)
+    detected_emotion = detect_emotional_tone(user_text, profile, features)
     suggested_style = map_emotion_to_mirror_style(detected_emotion)
     
     # Get emotional history for this user
@@ -695,62 +671,71 @@ def get_adaptive_mirror_style(user_id: str, user_text: str, profile: Dict[str, o
     
     return (suggested_style, detected_emotion)
 
-def build_reflection_system_prompt(profile: Dict[str, object], schedule_context=None) -> str:
+def _schedule_context_block(workload: Optional[str], high_stress: bool, exams: bool, deadlines: bool) -> str:
+    context_instructions = []
+    if exams:
+        context_instructions.append("- Subtly acknowledge their exam period (e.g. 'How’s your preparation going?', 'Which subject are you focusing on mostly?')")
+    if deadlines:
+        context_instructions.append("- Subtly acknowledge their deadlines (e.g. 'How close is your deadline?', 'What kind of project are you working on?')")
+    
+    if workload == "high":
+        context_instructions.append("- Keep responses slightly shorter and more actionable. Offer practical support rather than deep philosophical depth.")
+    elif workload == "low":
+        context_instructions.append("- Be more open-ended and highly reflective in your exploration.")
+
+    if high_stress:
+        context_instructions.append("- Provide higher emotional support. Reduce deep cognitive load slightly unless they prompt it.")
+
+    if not context_instructions:
+        return ""
+    return (
+        "User's Current Life Context (Soft Factors):\n" + "\n".join(context_instructions)
+        + "\n\nCRITICAL CONTEXT RULE:\n- DO NOT explicitly say 'based on your settings' or 'because of your exams'.\n"
+        "- Just blend this context naturally into the conversation."
+    )
+
+
+def build_reflection_system_prompt(profile: Dict[str, object], schedule_context=None, memory_block: str = "") -> str:
     summary = summarize_personality_profile(profile)
-    base_prompt = f"{REFLECTION_SYSTEM_PROMPT_BASE}\n\nPersonality profile (use as context, do not label sections):\n{summary}"
+    parts = [f"Personality profile (use as context, do not label sections):\n{summary}"]
 
     if schedule_context:
-        workload = schedule_context.workload_level
-        stress = schedule_context.stress_level
-        exams = schedule_context.is_exam_period
-        deadlines = schedule_context.has_deadlines
-        
-        context_instructions = []
-        if exams:
-            context_instructions.append("- Subtly acknowledge their exam period (e.g. 'How’s your preparation going?', 'Which subject are you focusing on mostly?')")
-        if deadlines:
-            context_instructions.append("- Subtly acknowledge their deadlines (e.g. 'How close is your deadline?', 'What kind of project are you working on?')")
-        
-        if workload == "high":
-            context_instructions.append("- Keep responses slightly shorter and more actionable. Offer practical support rather than deep philosophical depth.")
-        elif workload == "low":
-            context_instructions.append("- Be more open-ended and highly reflective in your exploration.")
-
-        if stress > 0.7:
-            context_instructions.append("- Provide higher emotional support. Reduce deep cognitive load slightly unless they prompt it.")
+        schedule_key = (
+            schedule_context.workload_level,
+            schedule_context.stress_level > 0.7,
+            bool(schedule_context.is_exam_period),
+            bool(schedule_context.has_deadlines),
+        )
+        parts.append((schedule_key, lambda: _schedule_context_block(*schedule_key)))
 
-        if context_instructions:
-            base_prompt += "\n\nUser's Current Life Context (Soft Factors):\n" + "\n".join(context_instructions)
-            base_prompt += "\n\nCRITICAL CONTEXT RULE:\n- DO NOT explicitly say 'based on your settings' or 'because of your exams'.\n- Just blend this context naturally into the conversation."
+    if memory_block:
+        parts.append(memory_block)
 
-    return base_prompt
+    return prompt_compiler.compile("reflection", REFLECTION_SYSTEM_PROMPT_BASE, parts).text
 
 def build_mirror_system_prompt(profile: Dict[str, object], style: str = "dominant") -> str:
     """Build mirror system prompt with specific archetype style"""
     summary = summarize_communication_profile(profile)
     
     # Get style rules, default to dominant if invalid
-    style_config = MIRROR_STYLES.get(style, MIRROR_STYLES["dominant"])
-    style_name = style_config["name"]
-    style_rules = style_config["rules"]
-    
-    return f"""{MIRROR_SYSTEM_PROMPT_BASE}
-
-User Profile:
-{summary}
+    style_key = style if style in MIRROR_STYLES else "dominant"
 
-Mirror Archetype: {style_name}
+    def _archetype_block() -> str:
+        style_config = MIRROR_STYLES[style_key]
+        return f"""Mirror Archetype: {style_config["name"]}
 
 Archetype Rules:
-{style_rules}
+{style_config["rules"]}
 
 Adaptation Rule:
 If the user's emotional state shifts significantly, subtly adapt intensity while preserving the core archetype behavior.
 """
 
-def get_user_history(user_id: str, mode: str) -> List[Dict[str, str]]:
-    user_bucket = CONVERSATION_HISTORY.setdefault(user_id, {})
-    return user_bucket.setdefault(mode, [])
+    return prompt_compiler.compile(
+        "chat_mirror",
+        MIRROR_SYSTEM_PROMPT_BASE,
+        [f"User Profile:\n{summary}", (style_key, _archetype_block)],
+    ).text
 
 def summarize_personality_profile(profile: Dict[str, object]) -> str:
     themes = ", ".join([item for item, _ in profile["themes"].most_common(3)])
@@ -779,50 +764,17 @@ def summarize_communication_profile(profile: Dict[str, object]) -> str:
         f"common_phrases: {common_phrases or 'none'}"
     )
 
-def update_personality_profile(profile: Dict[str, object], user_text: str, reply: str) -> None:
-    theme_keywords = {
-        "identity": ["who i am", "identity", "self"],
-        "purpose": ["purpose", "meaning", "why"],
-        "control": ["control", "power", "decide"],
-        "relationships": ["relationship", "people", "family", "friend"],
-        "work": ["work", "career", "job"],
-        "growth": ["change", "growth", "improve"],
-    }
-    trait_keywords = {
-        "introspective": ["reflect", "introspect", "think a lot"],
-        "driven": ["ambition", "driven", "goal"],
-        "anxious": ["anxious", "worried", "overthink"],
-        "independent": ["independent", "alone", "self-reliant"],
-        "structured": ["plan", "schedule", "routine"],
-        "adaptive": ["flexible", "adapt", "pivot"],
-    }
-    value_keywords = {
-        "authenticity": ["authentic", "real", "honest"],
-        "stability": ["stable", "security", "certainty"],
-        "freedom": ["freedom", "autonomy", "choice"],
-        "connection": ["connection", "belong", "community"],
-        "achievement": ["achievement", "success", "win"],
-    }
-    stressor_keywords = {
-        "uncertainty": ["uncertain", "unknown", "unclear"],
-        "conflict": ["conflict", "argument", "tension"],
-        "pressure": ["pressure", "overwhelmed", "stress"],
-        "rejection": ["rejection", "excluded", "ignored"],
-    }
-
-    lower_text = user_text.lower()
-    for theme, keywords in theme_keywords.items():
-        if any(kw in lower_text for kw in keywords):
-            profile["themes"][theme] += 1
-    for trait, keywords in trait_keywords.items():
-        if any(kw in lower_text for kw in keywords):
-            profile["traits"][trait] += 1
-    for value, keywords in value_keywords.items():
-        if any(kw in lower_text for kw in keywords):
-            profile["values"][value] += 1
-    for stressor, keywords in stressor_keywords.items():
-        if any(kw in lower_text for kw in keywords):
-            profile["stressors"][stressor] += 1
+def update_personality_profile(
+    profile: Dict[str, object],
+    user_text: str,
+    reply: str,
+    features: Optional[MessageFeatures] = None,
+) -> None:
+    features = ensure_features(user_text, features)
+    for profile_field, keyword_map in PROFILE_KEYWORD_MAPS.items():
+        for name in keyword_map:
+            if features.has(f"persona.{profile_field}.{name}"):
+                profile[profile_field][name] += 1
 
     insight = extract_insight_sentence(reply)
     if insight:
@@ -831,35 +783,37 @@ def update_personality_profile(profile: Dict[str, object], user_text: str, reply
 
     profile["updated_at"] = datetime.utcnow().isoformat() + "Z"
 
-def update_communication_profile(profile: Dict[str, object], user_text: str) -> None:
-    sentences = split_sentences(user_text)
-    words = extract_words(user_text)
-    sentence_count = max(len(sentences), 1)
+def update_communication_profile(
+    profile: Dict[str, object],
+    user_text: str,
+    features: Optional[MessageFeatures] = None,
+) -> None:
+    features = ensure_features(user_text, features)
+    words = features.words
+    sentence_count = max(features.sentence_count, 1)
     word_count = max(len(words), 1)
-    lower_text = user_text.lower()
 
     avg_sentence_length = word_count / sentence_count
-    question_frequency = user_text.count("?") / sentence_count
+    question_frequency = features.question_count / sentence_count
 
-    intensity_markers = sum(1 for ch in user_text if ch == "!")
-    intensity_words = sum(1 for word in words if word in {"very", "really", "super", "extremely"})
+    intensity_markers = features.exclamation_count
+    intensity_words = features.count_words({"very", "really", "super", "extremely"})
     emotional_intensity = min(1.0, (intensity_markers + intensity_words) / 5.0)
 
-    hedge_phrases = ["maybe", "perhaps", "sorta", "kind of", "i think"]
     directive_words = {"need", "must", "should", "tell", "do", "fix"}
-    hedge_count = sum(1 for phrase in hedge_phrases if phrase in lower_text)
-    directive_count = sum(1 for word in words if word in directive_words)
+    hedge_count = features.count("profile.hedge")
+    directive_count = features.count_words(directive_words)
     directness = min(1.0, max(0.0, (directive_count - hedge_count + 1) / 5.0))
 
     logical_markers = {"because", "therefore", "since", "so", "thus", "however", "although", "while", "whereas"}
-    logical_depth = min(1.0, sum(1 for word in words if word in logical_markers) / 5.0)
+    logical_depth = min(1.0, features.count_words(logical_markers) / 5.0)
 
     tone = "neutral"
-    if any(token in user_text.lower() for token in ["lol", "gonna", "kinda", "nah", "yeah"]):
+    if features.has("profile.tone_casual"):
         tone = "casual"
-    if any(token in user_text.lower() for token in ["therefore", "furthermore", "however", "thus"]):
+    if features.has("profile.tone_formal"):
         tone = "formal"
-    if intensity_markers >= 2 or any(word.isupper() and len(word) > 3 for word in user_text.split()):
+    if intensity_markers >= 2 or any(word.isupper() and len(word) > 3 for word in features.whitespace_tokens):
         tone = "intense"
 
     sample_count = profile["sample_count"]
@@ -872,8 +826,7 @@ def update_communication_profile(profile: Dict[str, object], user_text: str) ->
     profile["tone_counts"][tone] += 1
     profile["tone"] = profile["tone_counts"].most_common(1)[0][0]
 
-    bigrams = [f"{words[i]} {words[i + 1]}" for i in range(len(words) - 1)]
-    for phrase in bigrams:
+    for phrase in features.bigrams:
         profile["phrase_counts"][phrase] += 1
     profile["common_phrases"] = [item for item, _ in profile["phrase_counts"].most_common(5)]
 
@@ -881,14 +834,13 @@ def update_communication_profile(profile: Dict[str, object], user_text: str) ->
     profile["updated_at"] = datetime.utcnow().isoformat() + "Z"
 
 
-def derive_fallback_traits(user_text: str) -> List[Dict[str, float]]:
+def derive_fallback_traits(user_text: str, features: Optional[MessageFeatures] = None) -> List[Dict[str, float]]:
     """
     Deterministic fallback trait extraction used when LLM extraction is unavailable
     or returns no nudges. Keeps signal strengths conservative.
     """
-    words = extract_words(user_text)
-    lower_text = user_text.lower()
-    word_count = len(words)
+    features = ensure_features(user_text, features)
+    word_count = features.word_count
 
     fallback_traits: List[Dict[str, float]] = []
 
@@ -917,8 +869,8 @@ def derive_fallback_traits(user_text: str) -> List[Dict[str, float]]:
         "frustrated",
         "angry",
     }
-    emotion_hits = sum(1 for word in words if word in emotional_keywords)
-    exclamations = user_text.count("!")
+    emotion_hits = features.count_words(emotional_keywords)
+    exclamations = features.exclamation_count
     express_signal = max(0.0, min(1.0, 0.25 + (emotion_hits * 0.15) + (exclamations * 0.08)))
     if emotion_hits > 0 or exclamations > 0:
         fallback_traits.append(
@@ -930,10 +882,9 @@ def derive_fallback_traits(user_text: str) -> List[Dict[str, float]]:
         )
 
     # decision_framing: hedging lowers score, decisive phrasing raises score
-    hedge_phrases = ["maybe", "perhaps", "i think", "kind of", "sort of", "not sure"]
     decisive_words = {"definitely", "certain", "will", "must", "clear", "decided"}
-    hedge_hits = sum(1 for phrase in hedge_phrases if phrase in lower_text)
-    decisive_hits = sum(1 for word in words if word in decisive_words)
+    hedge_hits = features.count("traits.hedge")
+    decisive_hits = features.count_words(decisive_words)
     decision_signal = max(0.0, min(1.0, 0.5 + (decisive_hits * 0.12) - (hedge_hits * 0.14)))
     if hedge_hits > 0 or decisive_hits > 0:
         fallback_traits.append(
@@ -955,7 +906,7 @@ def derive_fallback_traits(user_text: str) -> List[Dict[str, float]]:
         "thinking",
         "understand",
     }
-    depth_hits = sum(1 for word in words if word in depth_markers)
+    depth_hits = features.count_words(depth_markers)
     depth_signal = max(0.0, min(1.0, 0.2 + (depth_hits * 0.14)))
     if depth_hits > 0:
         fallback_traits.append(
@@ -1109,8 +1060,7 @@ def validate_mirror_response(text: str, user_text: str, profile: Dict[str, objec
     return text
 
 def violates_mirror_rules(text: str) -> bool:
-    lowered = text.lower()
-    return any(phrase in lowered for phrase in MIRROR_BANNED_PHRASES)
+    return MIRROR_BANNED_PHRASE_MATCHER.search(text)
 
 def is_echo_reply(reply: str, user_text: str) -> bool:
     def normalize(value: str) -> str:
@@ -1261,21 +1211,18 @@ def local_mirror_reply(user_text: str, profile: Dict[str, object]) -> str:
 async def generate_llm_response(system_prompt: str, model_params: Dict[str, object], history: List[Dict[str, str]]) -> Optional[str]:
     """Generate response using Mistral AI"""
     
-    if MISTRAL_AVAILABLE and os.getenv("MISTRAL_API_KEY"):
+    if llm_gateway.is_available():
         try:
             logger.info("🤖 Using Mistral AI for response generation")
             
             messages = [{"role": "system", "content": system_prompt}]
             messages.extend(history)
             
-            response = mistral_client.chat.complete(
-                model="mistral-small-latest",
-                messages=messages,
+            reply = await llm_gateway.chat_complete(
+                messages,
                 max_tokens=model_params["max_tokens"],
                 temperature=model_params["temperature"],
             )
-            
-            reply = response.choices[0].message.content.strip()
             logger.info(f"✅ Mistral response received: {reply[:50]}...")
             return reply
             
@@ -1288,7 +1235,7 @@ async def generate_llm_response(system_prompt: str, model_params: Dict[str, obje
 
 async def generate_conversation_title(user_message: str) -> str:
     """Generate a 3-5 word summary title for a conversation"""
-    if MISTRAL_AVAILABLE and os.getenv("MISTRAL_API_KEY"):
+    if llm_gateway.is_available():
         try:
             logger.info("📝 Generating conversation title with AI")
             
@@ -1298,14 +1245,12 @@ async def generate_conversation_title(user_message: str) -> str:
                 {"role": "user", "content": f"Create a 3-5 word title for this message: {user_message}"}
             ]
             
-            response = mistral_client.chat.complete(
-                model="mistral-small-latest",
-                messages=messages,
+            title = await llm_gateway.chat_complete(
+                messages,
                 max_tokens=20,
                 temperature=0.7,
+                timeout_s=TITLE_TIMEOUT_SECONDS,
             )
-            
-            title = response.choices[0].message.content.strip()
             # Remove quotes if present
             title = title.strip('"\'')
             logger.info(f"✅ Generated title: {title}")
@@ -1317,14 +1262,115 @@ async def generate_conversation_title(user_message: str) -> str:
     # Fallback: use first 40 characters
     return user_message[:40] + ("..." if len(user_message) > 40 else "")
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> ChatResponse:
-    """
-    Process chat message and return AI response.
-    Creates new conversation if conversation_id is None.
-    Stores all messages in database.
-    Falls back to templates if LLM is not available.
-    """
+@dataclass
+class ChatTurn:
+    """Mutable state for one /chat turn, shared by the blocking and streaming endpoints."""
+
+    request: ChatRequest
+    effective_mode: str
+    user_id: UUID
+    conversation_id: UUID
+    conversation_title: Optional[str]
+    message_text: str
+    history: List[Dict[str, str]]
+    personality_profile: Dict[str, object]
+    reply: Optional[str] = None
+    active_mirror_style: Optional[str] = None
+    detected_emotion: Optional[str] = None
+    twin_policy: Optional[Dict[str, Any]] = None
+    assistant_task_type: Optional[str] = None
+    mirror_runtime_active: bool = False
+    confidence_interval: Optional[Dict[str, float]] = None
+    style_strength: Optional[float] = None
+    reaction_source: Optional[str] = None
+    reaction_match_score: float = 0.0
+    inference_duration_ms: int = 0
+    realism_score: float = 0.0
+    retries_used: int = 0
+    fallback_triggered: bool = False
+    candidates_requested: int = 0
+    candidates_wasted: int = 0
+    confidence_lower: float = 0.0
+    confidence_upper: float = 0.0
+    confidence_tier: str = "very_low"
+    source_weights: Dict[str, Any] = field(default_factory=dict)
+    user_message_id: Optional[UUID] = None
+    assistant_message_id: Optional[UUID] = None
+    # Computed once in start_chat_turn; consumers recompute if the text differs.
+    features: Optional[MessageFeatures] = field(default=None, repr=False)
+
+    _JOB_FIELDS = (
+        "effective_mode",
+        "conversation_title",
+        "message_text",
+        "reply",
+        "reaction_source",
+        "reaction_match_score",
+        "inference_duration_ms",
+        "realism_score",
+        "retries_used",
+        "fallback_triggered",
+        "candidates_requested",
+        "candidates_wasted",
+        "confidence_lower",
+        "confidence_upper",
+        "confidence_tier",
+        "style_strength",
+        "source_weights",
+    )
+    # User text stays out of the work queue journal; replayed jobs reload it by message id.
+    _PRIVATE_JOB_FIELDS = ("request", "conversation_title", "message_text", "reply")
+
+    def to_job_payload(self) -> Dict[str, Any]:
+        """JSON-safe snapshot of what the background follow-up jobs need."""
+        payload = {name: getattr(self, name) for name in self._JOB_FIELDS}
+        payload["request"] = self.request.model_dump()
+        payload["user_id"] = str(self.user_id)
+        payload["conversation_id"] = str(self.conversation_id)
+        payload["user_message_id"] = str(self.user_message_id) if self.user_message_id else None
+        payload["assistant_message_id"] = str(self.assistant_message_id) if self.assistant_message_id else None
+        return payload
+
+    @classmethod
+    def journal_payload(cls, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """The part of a job payload written to disk: ids and telemetry, no text."""
+        return {name: value for name, value in payload.items() if name not in cls._PRIVATE_JOB_FIELDS}
+
+    @classmethod
+    def from_job_payload(cls, payload: Dict[str, Any]) -> "ChatTurn":
+        user_message_id = payload.get("user_message_id")
+        assistant_message_id = payload.get("assistant_message_id")
+        return cls(
+            request=ChatRequest(**payload["request"]),
+            user_id=UUID(payload["user_id"]),
+            conversation_id=UUID(payload["conversation_id"]),
+            user_message_id=UUID(user_message_id) if user_message_id else None,
+            assistant_message_id=UUID(assistant_message_id) if assistant_message_id else None,
+            history=[],
+            personality_profile={},
+            **{name: payload.get(name) for name in cls._JOB_FIELDS if name in payload},
+        )
+
+    def to_response(self) -> ChatResponse:
+        return ChatResponse(
+            conversation_id=str(self.conversation_id),
+            title=self.conversation_title,
+            reply=self.reply or "",
+            mirror_active=self.mirror_runtime_active,
+            confidence_level=(self.confidence_tier if self.effective_mode == "mirror" else "medium"),
+            mode=self.effective_mode,
+            assistant_task_type=self.assistant_task_type,
+            active_mirror_style=self.active_mirror_style,
+            detected_emotion=self.detected_emotion,
+            twin_policy=self.twin_policy,
+            confidence_interval=self.confidence_interval,
+            style_strength=self.style_strength,
+            reaction_source=self.reaction_source,
+        )
+
+
+async def start_chat_turn(request: ChatRequest, db: AsyncSession) -> ChatTurn:
+    """Validate the request, resolve the conversation and record the user turn in history."""
     effective_mode = normalize_interaction_mode(request.mode)
     logger.info(
         "💬 /chat payload received: user_id=%s conversation_id=%s requested_mode=%s effective_mode=%s message_len=%s",
@@ -1350,12 +1396,19 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
     message_text = request.message or ""
     conversation_title = None
 
+    if effective_mode == "reflection":
+        from app.services.memory_retrieval_service import REFLECTION_MEMORY_ENABLED, prefetch_query_embedding
+
+        # Memory retrieval needs this message's embedding; start it while the conversation loads.
+        if REFLECTION_MEMORY_ENABLED and message_text.strip():
+            prefetch_query_embedding(message_text)
+
     # Handle conversation creation or retrieval
     if conversation_id_uuid is None:
         # Generate title for new conversation
         conversation_title = await generate_conversation_title(message_text)
         logger.info(f"📝 Creating new conversation with title: {conversation_title}")
-        
+
         # Create new conversation
         metadata_payload = {}
         if request.external_input_text:
@@ -1369,6 +1422,7 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
             metadata=metadata_payload,
         )
         conversation_id_uuid = conversation.id
+        history_cache.prime(conversation_id_uuid, [])
         logger.info(f"✅ Created conversation {conversation_id_uuid} with mode: {effective_mode}")
     else:
         # Get existing conversation
@@ -1379,7 +1433,7 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
         )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        
+
         # Validate that conversation mode matches request mode
         if conversation.mode == "assistant" and effective_mode == "mirror":
             logger.info("🔁 Upgrading existing assistant conversation to mirror mode")
@@ -1387,198 +1441,217 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
             await db.flush()
         elif conversation.mode != effective_mode:
             raise HTTPException(
-                status_code=400, 
+                status_code=400,
                 detail=f"Conversation mode '{conversation.mode}' does not match request mode '{effective_mode}'"
             )
-        
+
         conversation_title = conversation.title
         logger.info(f"✅ Using existing conversation {conversation_id_uuid} with mode: {conversation.mode}")
 
-    # Get conversation history from in-memory storage (for AI context)
-    history = get_user_history(request.user_id, effective_mode)
+    # Recent turns of this conversation (for AI context)
+    history = await get_conversation_history_window(db, conversation_id_uuid, user_id_uuid)
     history.append({"role": "user", "content": message_text})
 
     # Update profiles (keep for backward compatibility)
     personality_profile = get_personality_profile(request.user_id)
     communication_profile = get_communication_profile(request.user_id)
-    update_communication_profile(communication_profile, message_text)
-
-    # Track active mirror style and detected emotion
-    active_mirror_style = None
-    detected_emotion = None
-    reply = None
-    twin_policy = None
-    assistant_task_type = None
-    mirror_runtime_active = effective_mode == "mirror"
-    confidence_interval = None
-    style_strength = None
-    reaction_source = None
-    reaction_match_score = 0.0
+    features = extract_message_features(message_text)
+    update_communication_profile(communication_profile, message_text, features)
+
+    return ChatTurn(
+        request=request,
+        effective_mode=effective_mode,
+        user_id=user_id_uuid,
+        conversation_id=conversation_id_uuid,
+        conversation_title=conversation_title,
+        message_text=message_text,
+        history=history,
+        personality_profile=personality_profile,
+        mirror_runtime_active=(effective_mode == "mirror"),
+        features=features,
+    )
 
-    if effective_mode == "reflection":
-        # FETCH SCHEDULE CONTEXT
-        try:
-            from app.db.models import ScheduleContext
-            sched_result = await db.execute(select(ScheduleContext).where(ScheduleContext.user_id == user_id_uuid))
-            schedule_context = sched_result.scalar_one_or_none()
-        except Exception as e:
-            logger.error(f"⚠️ Failed to fetch schedule context: {e}")
-            schedule_context = None
 
-        # REFLECTION MODE: Generate response and update persona
-        system_prompt = build_reflection_system_prompt(personality_profile, schedule_context)
-        model_params = MODEL_PARAMS["reflection"]
-        
-        # Generate AI response
-        reply = await generate_llm_response(system_prompt, model_params, history)
-        if reply and is_echo_reply(reply, message_text):
-            logger.warning("⚠️ LLM reply echoed user input; falling back to templates")
-            reply = None
-        
-        # Fall back to templates if LLM not available
-        if not reply:
-            logger.info("📝 Using template response (LLM not available)")
-            sanitized = re.sub(r"[?]+", "", message_text).strip()
-            template = random.choice(REFLECTION_TEMPLATES)
-            reply = template.format(text=sanitized)
-        
-        reply = validate_reflection_response(reply, personality_profile, request.message)
-        update_personality_profile(personality_profile, message_text, reply)
-        
-        # PERSONA SERVICE INTEGRATION: Extract and update traits
-        logger.info(f"🔄 Updating persona from reflection message")
-        try:
-            from app.services.trait_extraction_service import extract_traits
-            from app.services.persona_update_service import update_traits
-            from app.services.snapshot_service import generate_persona_snapshot
-            from app.services.mirror_engine import invalidate_snapshot_cache
-            from app.db.models import BehavioralInsight
-            
-            # Extract traits from user message
-            extracted_traits = await extract_traits(message_text)
-            if not extracted_traits:
-                extracted_traits = derive_fallback_traits(message_text)
-                logger.info(f"🔁 Using fallback trait extraction: {len(extracted_traits)} traits")
-            else:
-                logger.info(f"🔍 Extracted {len(extracted_traits)} traits")
+async def build_reflection_turn_prompt(turn: ChatTurn, db: AsyncSession) -> str:
+    """Fetch schedule context and related memories, then build the reflection system prompt."""
+    from app.services.memory_retrieval_service import retrieve_turn_memories
+    from app.services.turn_context_service import load_turn_context
+
+    # Schedule context on the request session; memories on their own sessions, within budget.
+    turn_context, memories = await asyncio.gather(
+        load_turn_context(db, turn.user_id, "reflection"),
+        retrieve_turn_memories(
+            turn.user_id,
+            turn.conversation_id,
+            turn.message_text,
+            exclude=[entry["content"] for entry in turn.history[:-1] if entry.get("role") == "user"],
+        ),
+    )
+    schedule_context = turn_context.schedule_context if turn_context is not None else None
 
-            # Persist one deterministic behavioral insight for Reflections tab.
-            if extracted_traits:
-                insight_payload = build_behavioral_insight_payload(message_text, extracted_traits)
-                db.add(
-                    BehavioralInsight(
-                        user_id=user_id_uuid,
-                        conversation_id=conversation_id_uuid,
-                        insight_text=insight_payload["text"],
-                        tags=insight_payload["tags"],
-                        confidence=insight_payload["confidence"],
-                    )
-                )
-                await db.flush()
-            
-            # Update trait metrics in database
-            await update_traits(db, user_id_uuid, extracted_traits)
-            
-            # Generate new snapshot
-            await generate_persona_snapshot(db, user_id_uuid)
-            
-            # Invalidate cache since we have updated snapshot
-            invalidate_snapshot_cache(user_id_uuid)
-            
-            logger.info(f"✅ Persona updated and snapshot regenerated")
-        except Exception as e:
-            logger.error(f"⚠️ Failed to update persona: {e}")
-            # Continue - persona update failure shouldn't break chat
-    
+    return build_reflection_system_prompt(turn.personality_profile, schedule_context, memories.prompt_block())
+
+
+def finalize_reflection_reply(turn: ChatTurn, reply: Optional[str]) -> str:
+    """Apply echo checks, template fallback and reflection validation to a raw reply."""
+    message_text = turn.message_text
+    if reply and is_echo_reply(reply, message_text):
+        logger.warning("⚠️ LLM reply echoed user input; falling back to templates")
+        reply = None
+
+    # Fall back to templates if LLM not available
+    if not reply:
+        logger.info("📝 Using template response (LLM not available)")
+        sanitized = re.sub(r"[?]+", "", message_text).strip()
+        template = random.choice(REFLECTION_TEMPLATES)
+        reply = template.format(text=sanitized)
+
+    reply = validate_reflection_response(reply, turn.personality_profile, turn.request.message)
+    update_personality_profile(turn.personality_profile, message_text, reply, turn.features)
+    turn.reply = reply
+    return reply
+
+
+async def generate_reflection_reply(turn: ChatTurn, db: AsyncSession) -> str:
+    # REFLECTION MODE: Generate response and update persona
+    system_prompt = await build_reflection_turn_prompt(turn, db)
+    model_params = MODEL_PARAMS["reflection"]
+
+    # Generate AI response
+    reply = await generate_llm_response(system_prompt, model_params, turn.history)
+    return finalize_reflection_reply(turn, reply)
+
+
+def _apply_mirror_fallback(turn: ChatTurn) -> None:
+    if turn.assistant_task_type:
+        turn.reply = build_assistant_fallback_reply(turn.message_text, turn.assistant_task_type)
     else:
-        # MIRROR MODE: Always keep full assistant capability while preserving mirror style.
-        explicit_task_type = resolve_mirror_task_type(message_text, history)
-        inferred_task_type = classify_assistant_task(message_text.lower())
-        assistant_task_type = explicit_task_type or inferred_task_type
-
-        # Detect emotional tone and resolve adaptive mirror archetype for this turn.
-        active_mirror_style, detected_emotion = get_adaptive_mirror_style(
-            request.user_id,
+        turn.reply = MIRROR_FALLBACK_REPLY
+
+
+async def generate_mirror_reply(turn: ChatTurn, db: AsyncSession) -> str:
+    # MIRROR MODE: Always keep full assistant capability while preserving mirror style.
+    message_text = turn.message_text
+    explicit_task_type = resolve_mirror_task_type(message_text, turn.history, turn.features)
+    inferred_task_type = classify_assistant_task(message_text.lower())
+    turn.assistant_task_type = explicit_task_type or inferred_task_type
+
+    # Detect emotional tone and resolve adaptive mirror archetype for this turn.
+    turn.active_mirror_style, turn.detected_emotion = get_adaptive_mirror_style(
+        turn.request.user_id,
+        message_text,
+        turn.personality_profile,
+        turn.features,
+    )
+
+    logger.info(
+        "🪞 Using mirror_engine service | task=%s | style=%s | emotion=%s",
+        turn.assistant_task_type or "none",
+        turn.active_mirror_style,
+        turn.detected_emotion,
+    )
+
+    from app.services.mirror_engine import generate_mirror_response
+    from app.services.turn_context_service import load_turn_context
+
+    # Settings, snapshot, confidence evidence and style signals in one round trip.
+    turn_context = await load_turn_context(db, turn.user_id, "mirror", message_text, turn.features)
+    if turn_context is not None:
+        settings_record = turn_context.settings
+    else:
+        settings_result = await db.execute(select(UserSettings).where(UserSettings.user_id == turn.user_id))
+        settings_record = settings_result.scalar_one_or_none()
+    turn.twin_policy = resolve_twin_settings(settings_record)
+
+    try:
+        # Mirror engine handles: snapshot retrieval, message style analysis,
+        # persona-based prompt building, variation buffer, and latency cap.
+        reply, metadata = await generate_mirror_response(
+            db,
+            turn.user_id,
             message_text,
-            personality_profile,
+            recent_history=turn.history,
+            twin_policy=turn.twin_policy,
+            task_type=turn.assistant_task_type,
+            detected_emotion=turn.detected_emotion,
+            active_mirror_style=turn.active_mirror_style,
+            conversation_id=turn.conversation_id,
+            message_features=turn.features,
+            turn_context=turn_context,
+        )
+        turn.reply = reply
+
+        # Unpack observability metrics
+        turn.inference_duration_ms = metadata.get("inference_duration_ms", 0)
+        turn.realism_score = metadata.get("realism_score", 0.0)
+        turn.retries_used = metadata.get("retries_used", 0)
+        turn.fallback_triggered = metadata.get("fallback_triggered", False)
+        turn.candidates_requested = int(metadata.get("candidates_requested", 0))
+        turn.candidates_wasted = int(metadata.get("candidates_wasted", 0))
+        turn.confidence_lower = float(metadata.get("confidence_lower", 0.0))
+        turn.confidence_upper = float(metadata.get("confidence_upper", 0.0))
+        turn.confidence_tier = str(metadata.get("confidence_tier", "very_low"))
+        turn.style_strength = float(metadata.get("style_enforcement_strength", 0.0))
+        turn.reaction_match_score = float(metadata.get("reaction_match_score", 0.0))
+        turn.source_weights = metadata.get("source_weights", {})
+        turn.reaction_source = str(metadata.get("stimulus_tag", "general"))
+        turn.confidence_interval = {
+            "lower": turn.confidence_lower,
+            "upper": turn.confidence_upper,
+        }
+        turn.mirror_runtime_active = not bool(
+            turn.fallback_triggered and metadata.get("policy_mode") in {"disabled", "persona_mirroring_disabled"}
         )
 
+        preview = (reply or "")[:50]
         logger.info(
-            "🪞 Using mirror_engine service | task=%s | style=%s | emotion=%s",
-            assistant_task_type or "none",
-            active_mirror_style,
-            detected_emotion,
+            "✅ Mirror engine response: %s... | Realism: %s | Time: %sms",
+            preview,
+            turn.realism_score,
+            turn.inference_duration_ms,
         )
+    except Exception as e:
+        logger.exception("⚠️ Mirror generation failed")
+        await db.rollback()
+        _apply_mirror_fallback(turn)
+        turn.inference_duration_ms = 0
+        turn.realism_score = 0.0
+        turn.retries_used = 0
+        turn.fallback_triggered = True
+        turn.mirror_runtime_active = False
+        turn.confidence_lower = 0.0
+        turn.confidence_upper = 0.0
+        turn.confidence_tier = "very_low"
+        turn.style_strength = 0.0
+        turn.reaction_match_score = 0.0
+        turn.source_weights = {}
+        turn.reaction_source = "general"
+        turn.confidence_interval = {"lower": 0.0, "upper": 0.0}
+
+    if turn.reply is None:
+        _apply_mirror_fallback(turn)
+        turn.fallback_triggered = True
+
+    return turn.reply
+
+
+async def learn_from_turn(turn: ChatTurn, db: AsyncSession) -> None:
+    """
+    Post-reply persona learning, run from the background work queue.
 
-        from app.services.mirror_engine import generate_mirror_response
-        from app.services.memory_service import check_and_recalibrate_drift
-
-        settings_result = await db.execute(select(UserSettings).where(UserSettings.user_id == user_id_uuid))
-        settings_record = settings_result.scalar_one_or_none()
-        twin_policy = resolve_twin_settings(settings_record)
-
-        try:
-            # Mirror engine handles: snapshot retrieval, message style analysis,
-            # persona-based prompt building, variation buffer, and latency cap.
-            reply, metadata = await generate_mirror_response(
-                db,
-                user_id_uuid,
-                message_text,
-                recent_history=history,
-                twin_policy=twin_policy,
-                task_type=assistant_task_type,
-                detected_emotion=detected_emotion,
-                active_mirror_style=active_mirror_style,
-                conversation_id=conversation_id_uuid,
-            )
+    Raises only while nothing has been committed yet (trait extraction or the
+    trait update itself), so a queue retry never applies the same nudges twice.
+    """
+    from app.services.trait_extraction_service import extract_traits
+    from app.services.persona_update_service import update_traits
+    from app.services.snapshot_service import generate_persona_snapshot
 
-            # Unpack observability metrics
-            inference_duration_ms = metadata.get("inference_duration_ms", 0)
-            realism_score = metadata.get("realism_score", 0.0)
-            retries_used = metadata.get("retries_used", 0)
-            fallback_triggered = metadata.get("fallback_triggered", False)
-            confidence_lower = float(metadata.get("confidence_lower", 0.0))
-            confidence_upper = float(metadata.get("confidence_upper", 0.0))
-            confidence_tier = str(metadata.get("confidence_tier", "very_low"))
-            style_strength = float(metadata.get("style_enforcement_strength", 0.0))
-            reaction_match_score = float(metadata.get("reaction_match_score", 0.0))
-            source_weights = metadata.get("source_weights", {})
-            reaction_source = str(metadata.get("stimulus_tag", "general"))
-            confidence_interval = {
-                "lower": confidence_lower,
-                "upper": confidence_upper,
-            }
-            mirror_runtime_active = not bool(
-                fallback_triggered and metadata.get("policy_mode") in {"disabled", "persona_mirroring_disabled"}
-            )
+    message_text = turn.message_text
+    user_id_uuid = turn.user_id
+    conversation_id_uuid = turn.conversation_id
 
-            preview = (reply or "")[:50]
-            logger.info(
-                "✅ Mirror engine response: %s... | Realism: %s | Time: %sms",
-                preview,
-                realism_score,
-                inference_duration_ms,
-            )
-        except Exception as e:
-            logger.exception("⚠️ Mirror generation failed")
-            await db.rollback()
-            if assistant_task_type:
-                reply = build_assistant_fallback_reply(message_text, assistant_task_type)
-            else:
-                reply = MIRROR_FALLBACK_REPLY
-            inference_duration_ms = 0
-            realism_score = 0.0
-            retries_used = 0
-            fallback_triggered = True
-            mirror_runtime_active = False
-            confidence_lower = 0.0
-            confidence_upper = 0.0
-            confidence_tier = "very_low"
-            style_strength = 0.0
-            reaction_match_score = 0.0
-            source_weights = {}
-            reaction_source = "general"
-            confidence_interval = {"lower": 0.0, "upper": 0.0}
+    if turn.effective_mode == "mirror":
+        from app.services.memory_service import check_and_recalibrate_drift
 
         # Never overwrite a valid mirror reply due to recalibration failures.
         try:
@@ -1586,58 +1659,77 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
         except Exception:
             logger.exception("⚠️ Drift recalibration failed; keeping generated mirror reply")
             await db.rollback()
-            
-        if reply is None:
-            if assistant_task_type:
-                reply = build_assistant_fallback_reply(message_text, assistant_task_type)
-            else:
-                reply = MIRROR_FALLBACK_REPLY
-            fallback_triggered = True
 
-        # PERSONA SERVICE INTEGRATION: Mirror messages should also grow confidence.
-        logger.info("🔄 Updating persona from mirror message")
-        try:
-            from app.services.trait_extraction_service import extract_traits
-            from app.services.persona_update_service import update_traits
-            from app.services.snapshot_service import generate_persona_snapshot
-            from app.services.mirror_engine import invalidate_snapshot_cache
-
-            extracted_traits = await extract_traits(message_text)
-            if not extracted_traits:
-                extracted_traits = derive_fallback_traits(message_text)
-                logger.info(f"🔁 Using fallback trait extraction (mirror): {len(extracted_traits)} traits")
-            else:
-                logger.info(f"🔍 Extracted {len(extracted_traits)} traits (mirror)")
+    # PERSONA SERVICE INTEGRATION: Extract and update traits
+    logger.info(f"🔄 Updating persona from {turn.effective_mode} message")
+    extracted_traits = await extract_traits(message_text)
+    if not extracted_traits:
+        extracted_traits = derive_fallback_traits(message_text, turn.features)
+        logger.info(f"🔁 Using fallback trait extraction ({turn.effective_mode}): {len(extracted_traits)} traits")
+    else:
+        logger.info(f"🔍 Extracted {len(extracted_traits)} traits ({turn.effective_mode})")
 
-            if extracted_traits:
-                await update_traits(db, user_id_uuid, extracted_traits)
-                await generate_persona_snapshot(db, user_id_uuid)
-                invalidate_snapshot_cache(user_id_uuid)
-                logger.info("✅ Persona updated from mirror message and snapshot regenerated")
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to update persona from mirror message: {e}")
-            await db.rollback()
+    if extracted_traits:
+        try:
+            if turn.effective_mode == "reflection":
+                from app.db.models import BehavioralInsight
+                from app.services.confidence_aggregate_service import record_behavioral_insight
 
-        if request.external_input_text:
-            from app.db.models import ExternalInput
-            try:
+                # Persist one deterministic behavioral insight for Reflections tab.
+                insight_payload = build_behavioral_insight_payload(message_text, extracted_traits)
                 db.add(
-                    ExternalInput(
+                    BehavioralInsight(
                         user_id=user_id_uuid,
                         conversation_id=conversation_id_uuid,
-                        source=request.external_input_source or "pasted_prompt",
-                        content=request.external_input_text,
-                        extracted_markers={},
-                        confidence_weight=0.1,
+                        insight_text=insight_payload["text"],
+                        tags=insight_payload["tags"],
+                        confidence=insight_payload["confidence"],
                     )
                 )
                 await db.flush()
-            except Exception as ext_err:
-                # External input persistence is optional and should not break chat flow.
-                logger.warning("⚠️ Skipping external input persistence: %s", ext_err)
-                await db.rollback()
+                await record_behavioral_insight(db, user_id_uuid, insight_payload["confidence"])
 
-    history.append({"role": "assistant", "content": reply})
+            # Update trait metrics in database
+            await update_traits(db, user_id_uuid, extracted_traits)
+        except Exception:
+            await db.rollback()
+            raise
+
+        try:
+            # Bumps the snapshot version only when a new snapshot is actually written
+            await generate_persona_snapshot(db, user_id_uuid)
+            logger.info(f"✅ Persona updated and snapshot regenerated ({turn.effective_mode})")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to regenerate persona snapshot: {e}")
+            await db.rollback()
+
+    if turn.effective_mode == "mirror" and turn.request.external_input_text:
+        from app.db.models import ExternalInput
+        from app.services.confidence_aggregate_service import record_external_input
+        try:
+            db.add(
+                ExternalInput(
+                    user_id=user_id_uuid,
+                    conversation_id=conversation_id_uuid,
+                    source=turn.request.external_input_source or "pasted_prompt",
+                    content=turn.request.external_input_text,
+                    extracted_markers={},
+                    confidence_weight=0.1,
+                )
+            )
+            await record_external_input(db, user_id_uuid, turn.request.external_input_text, 0.1)
+            await db.commit()
+        except Exception as ext_err:
+            # External input persistence is optional and should not break chat flow.
+            logger.warning("⚠️ Skipping external input persistence: %s", ext_err)
+            await db.rollback()
+
+
+async def store_turn_messages(turn: ChatTurn, db: AsyncSession) -> None:
+    """Store the user and assistant messages for a finished turn."""
+    message_text = turn.message_text
+    user_id_uuid = turn.user_id
+    conversation_id_uuid = turn.conversation_id
 
     # Store user message in database
     logger.info(f"💾 Storing user message for conversation {conversation_id_uuid}")
@@ -1651,21 +1743,12 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
             embedding=None,
             token_count=None,
         )
+        turn.user_message_id = user_message.id
         logger.info(f"✅ Stored user message {user_message.id}")
     except Exception as e:
         logger.error(f"❌ Failed to store user message: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to store user message: {str(e)}")
 
-    try:
-        from app.services.behavioral_memory_service import update_linguistic_fingerprint
-
-        await update_linguistic_fingerprint(db, user_id_uuid, message_text)
-        await db.commit()
-    except Exception as fingerprint_err:
-        # Behavioral memory persistence is optional and should not break main chat flow.
-        logger.warning("⚠️ Skipping linguistic fingerprint update: %s", fingerprint_err)
-        await db.rollback()
-
     # Store AI response in database
     logger.info(f"💾 Storing assistant message for conversation {conversation_id_uuid}")
     try:
@@ -1674,67 +1757,246 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> Chat
             user_id=user_id_uuid,
             conversation_id=conversation_id_uuid,
             role="assistant",
-            content=reply,
+            content=turn.reply,
             embedding=None,
             token_count=None,
         )
+        turn.assistant_message_id = assistant_message.id
         logger.info(f"✅ Stored assistant message {assistant_message.id}")
+        record_history_turn(conversation_id_uuid, "user", message_text)
+        record_history_turn(conversation_id_uuid, "assistant", turn.reply)
     except Exception as e:
         logger.error(f"❌ Failed to store assistant message: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to store assistant message: {str(e)}")
 
-    # Log mirror telemetry in a best-effort manner so missing optional schema never breaks chat.
-    if effective_mode == "mirror":
+    logger.info(f"✅ Generated response and stored 2 messages for conversation {conversation_id_uuid}")
+
+
+async def update_turn_fingerprint(turn: ChatTurn, db: AsyncSession) -> None:
+    from app.services.behavioral_memory_service import update_linguistic_fingerprint
+
+    try:
+        await update_linguistic_fingerprint(db, turn.user_id, turn.message_text, turn.features)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+async def record_mirror_telemetry(turn: ChatTurn, db: AsyncSession) -> None:
+    from app.db.models import MirrorLog
+    from app.services.behavioral_memory_service import upsert_reaction_pattern
+
+    try:
+        await upsert_reaction_pattern(
+            db=db,
+            user_id=turn.user_id,
+            stimulus_tag=turn.reaction_source or "general",
+            response_template=turn.reply,
+            reaction_match_score=turn.reaction_match_score,
+        )
+
+        mirror_log = MirrorLog(
+            user_id=turn.user_id,
+            conversation_id=turn.conversation_id,
+            message_id=turn.assistant_message_id,
+            inference_duration_ms=turn.inference_duration_ms,
+            realism_score=turn.realism_score,
+            retries_used=turn.retries_used,
+            fallback_triggered=turn.fallback_triggered,
+            candidates_requested=turn.candidates_requested,
+            candidates_wasted=turn.candidates_wasted,
+            confidence_lower=turn.confidence_lower,
+            confidence_upper=turn.confidence_upper,
+            confidence_tier=turn.confidence_tier,
+            style_enforcement_strength=turn.style_strength,
+            reaction_match_score=turn.reaction_match_score,
+            source_weights=turn.source_weights,
+        )
+        db.add(mirror_log)
+        await db.commit()
+        logger.info("📊 Saved Mirror Observability Log")
+    except Exception:
+        await db.rollback()
+        raise
+
+
+async def load_replayed_turn_payload(payload: Dict[str, Any], db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Reload the texts of a job replayed from the journal; None if the messages were deleted.
+
+    External input pasted with the turn is not stored with the messages and is not replayed.
+    """
+    from app.db.models import Message
+
+    message_ids = [payload.get("user_message_id"), payload.get("assistant_message_id")]
+    if not all(message_ids):
+        return None
+    result = await db.execute(
+        select(Message.id, Message.content).where(
+            Message.id.in_([UUID(message_id) for message_id in message_ids]),
+            Message.user_id == UUID(payload["user_id"]),
+        )
+    )
+    contents = {str(row.id): row.content for row in result.all()}
+    if not all(message_id in contents for message_id in message_ids):
+        return None
+    user_message_id, assistant_message_id = message_ids
+    return {
+        **payload,
+        "conversation_title": None,
+        "message_text": contents[user_message_id],
+        "reply": contents[assistant_message_id],
+        "request": {
+            "user_id": payload["user_id"],
+            "conversation_id": payload["conversation_id"],
+            "message": contents[user_message_id],
+            "mode": payload.get("effective_mode") or "reflection",
+        },
+    }
+
+
+def _turn_job(step: Callable[[ChatTurn, AsyncSession], Awaitable[None]]):
+    async def _run(payload: Dict[str, Any]) -> None:
+        async with AsyncSessionLocal() as db:
+            if "message_text" not in payload:
+                payload = await load_replayed_turn_payload(payload, db)
+                if payload is None:
+                    logger.info("⏭️ Skipping replayed chat job: its messages no longer exist")
+                    return
+            await step(ChatTurn.from_job_payload(payload), db)
+
+    return _run
+
+
+work_queue.register("chat.persona_learning", _turn_job(learn_from_turn), journal_payload=ChatTurn.journal_payload)
+work_queue.register(
+    "chat.linguistic_fingerprint", _turn_job(update_turn_fingerprint), journal_payload=ChatTurn.journal_payload
+)
+work_queue.register("chat.mirror_telemetry", _turn_job(record_mirror_telemetry), journal_payload=ChatTurn.journal_payload)
+
+
+async def enqueue_turn_followups(turn: ChatTurn) -> None:
+    """Hand persona learning and behavioral memory for a stored turn to the work queue."""
+    payload = turn.to_job_payload()
+    jobs = ["chat.persona_learning", "chat.linguistic_fingerprint"]
+    if turn.effective_mode == "mirror":
+        jobs.append("chat.mirror_telemetry")
+    for name in jobs:
         try:
-            from app.db.models import MirrorLog
-            from app.services.behavioral_memory_service import upsert_reaction_pattern
-
-            await upsert_reaction_pattern(
-                db=db,
-                user_id=user_id_uuid,
-                stimulus_tag=reaction_source or "general",
-                response_template=reply,
-                reaction_match_score=reaction_match_score,
-            )
+            # Keyed per job and user so read-modify-write updates for one user never overlap.
+            await work_queue.enqueue(name, payload, key=f"{name}:{turn.user_id}", owner=str(turn.user_id))
+        except Exception as e:
+            logger.warning("⚠️ Failed to enqueue %s: %s", name, e)
 
-            mirror_log = MirrorLog(
-                user_id=user_id_uuid,
-                conversation_id=conversation_id_uuid,
-                message_id=assistant_message.id,
-                inference_duration_ms=inference_duration_ms,
-                realism_score=realism_score,
-                retries_used=retries_used,
-                fallback_triggered=fallback_triggered,
-                confidence_lower=confidence_lower,
-                confidence_upper=confidence_upper,
-                confidence_tier=confidence_tier,
-                style_enforcement_strength=style_strength,
-                reaction_match_score=reaction_match_score,
-                source_weights=source_weights,
-            )
-            db.add(mirror_log)
-            await db.commit()
-            logger.info("📊 Saved Mirror Observability Log")
-        except Exception as telemetry_err:
-            logger.warning("⚠️ Skipping mirror telemetry persistence: %s", telemetry_err)
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> ChatResponse:
+    """
+    Process chat message and return AI response.
+    Creates new conversation if conversation_id is None.
+    Stores all messages in database.
+    Falls back to templates if LLM is not available.
+    Persona learning runs on the background work queue after the reply is stored.
+    """
+    turn = await start_chat_turn(request, db)
+
+    if turn.effective_mode == "reflection":
+        await generate_reflection_reply(turn, db)
+    else:
+        await generate_mirror_reply(turn, db)
+
+    await store_turn_messages(turn, db)
+    await enqueue_turn_followups(turn)
+
+    return turn.to_response()
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_reflection_tokens(turn: ChatTurn, db: AsyncSession) -> AsyncIterator[str]:
+    """Stream reflection tokens live, then emit a replacement if validation rewrote the reply."""
+    system_prompt = await build_reflection_turn_prompt(turn, db)
+    model_params = MODEL_PARAMS["reflection"]
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(turn.history)
+
+    chunks: List[str] = []
+    if llm_gateway.is_available():
+        try:
+            async for delta in llm_gateway.chat_stream(
+                messages,
+                max_tokens=model_params["max_tokens"],
+                temperature=model_params["temperature"],
+            ):
+                chunks.append(delta)
+                yield _sse_event("token", {"text": delta})
+        except Exception as e:
+            logger.error(f"❌ Mistral stream error: {e}")
+
+    streamed = "".join(chunks).strip()
+    final_reply = finalize_reflection_reply(turn, streamed or None)
+    if final_reply != streamed:
+        # Validation or fallback changed the text; the client replaces what it rendered.
+        yield _sse_event("replace", {"text": final_reply})
+
+
+async def _finish_streamed_turn(turn: ChatTurn) -> None:
+    """Persist a streamed turn after the stream closes and queue its persona learning."""
+    async with AsyncSessionLocal() as db:
+        try:
+            await store_turn_messages(turn, db)
+        except Exception:
+            logger.exception("❌ Failed to persist streamed chat turn %s", turn.conversation_id)
             await db.rollback()
+            return
+    await enqueue_turn_followups(turn)
 
-    logger.info(f"✅ Generated response and stored 2 messages for conversation {conversation_id_uuid}")
-    
-    return ChatResponse(
-        conversation_id=str(conversation_id_uuid),
-        title=conversation_title,
-        reply=reply,
-        mirror_active=mirror_runtime_active,
-        confidence_level=(confidence_tier if effective_mode == "mirror" else "medium"),
-        mode=effective_mode,
-        assistant_task_type=assistant_task_type,
-        active_mirror_style=active_mirror_style,
-        detected_emotion=detected_emotion,
-        twin_policy=twin_policy,
-        confidence_interval=confidence_interval,
-        style_strength=style_strength,
-        reaction_source=reaction_source,
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, db: AsyncSession = Depends(get_db)) -> StreamingResponse:
+    """
+    Server-sent-events variant of /chat.
+
+    Emits `token` events as reply text becomes available, an optional `replace`
+    event when validation rewrote the streamed text, and a final `done` event
+    carrying the ChatResponse payload. Persona learning and persistence run
+    after the stream closes. Mirror replies are scored and style-enforced as a
+    whole, so they are emitted once finalized rather than token-by-token.
+    """
+    turn = await start_chat_turn(request, db)
+    # The conversation row must be visible to the post-stream session.
+    await db.commit()
+
+    async def event_source() -> AsyncIterator[str]:
+        try:
+            yield _sse_event("start", {
+                "conversation_id": str(turn.conversation_id),
+                "title": turn.conversation_title,
+                "mode": turn.effective_mode,
+            })
+            async with AsyncSessionLocal() as turn_db:
+                if turn.effective_mode == "reflection":
+                    async for event in _stream_reflection_tokens(turn, turn_db):
+                        yield event
+                else:
+                    reply = await generate_mirror_reply(turn, turn_db)
+                    yield _sse_event("token", {"text": reply})
+            yield _sse_event("done", turn.to_response().model_dump())
+        except Exception as e:
+            logger.exception("❌ Streaming chat turn failed")
+            yield _sse_event("error", {"detail": str(e)})
+
+    async def after_stream() -> None:
+        if turn.reply:
+            await _finish_streamed_turn(turn)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(after_stream),
     )
 
 
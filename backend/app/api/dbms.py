@@ -1,10 +1,11 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 from app.db import crud
 from app.db.database import get_db
+from app.services.data_version_service import not_modified_response
 from app.schemas.db import (
     ConversationCreate,
     ConversationHistoryOut,
@@ -84,6 +85,8 @@ async def update_personality_profile(
 @router.get("/mirror-telemetry/{user_id}")
 async def get_mirror_telemetry(
     user_id: str,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """Fetch observability metrics for the mirror engine.
@@ -99,6 +102,10 @@ async def get_mirror_telemetry(
     except ValueError as exc:
         raise HTTPException(status_code=400, detail="Invalid user_id format") from exc
 
+    not_modified = await not_modified_response(request, response, db, user_uuid, "db.mirror_telemetry")
+    if not_modified is not None:
+        return not_modified
+
     row = None
     extended_mode = False
 
@@ -113,6 +120,8 @@ async def get_mirror_telemetry(
             func.avg(MirrorLog.confidence_upper).label("avg_confidence_upper"),
             func.avg(MirrorLog.style_enforcement_strength).label("avg_style_strength"),
             func.avg(MirrorLog.reaction_match_score).label("avg_reaction_match"),
+            func.sum(MirrorLog.candidates_requested).label("total_candidates_requested"),
+            func.sum(MirrorLog.candidates_wasted).label("total_candidates_wasted"),
         ).where(MirrorLog.user_id == user_uuid)
 
         result = await db.execute(stmt)
@@ -146,6 +155,9 @@ async def get_mirror_telemetry(
             "avg_confidence_upper": 0.0,
             "avg_style_strength": 0.0,
             "avg_reaction_match": 0.0,
+            "total_candidates_requested": 0,
+            "total_candidates_wasted": 0,
+            "candidate_waste_rate": 0.0,
             "tier_distribution": {},
         }
 
@@ -166,6 +178,9 @@ async def get_mirror_telemetry(
             logger.warning("⚠️ Tier distribution query failed: %s", tier_err)
             await db.rollback()
             tier_distribution = {}
+
+    candidates_requested = int(getattr(row, "total_candidates_requested", 0) or 0)
+    candidates_wasted = int(getattr(row, "total_candidates_wasted", 0) or 0)
         
     return {
         "total_generations": row.total_generations,
@@ -177,5 +192,8 @@ async def get_mirror_telemetry(
         "avg_confidence_upper": round(float(getattr(row, "avg_confidence_upper", 0) or 0), 3),
         "avg_style_strength": round(float(getattr(row, "avg_style_strength", 0) or 0), 3),
         "avg_reaction_match": round(float(getattr(row, "avg_reaction_match", 0) or 0), 3),
+        "total_candidates_requested": candidates_requested,
+        "total_candidates_wasted": candidates_wasted,
+        "candidate_waste_rate": round(candidates_wasted / candidates_requested, 3) if candidates_requested else 0.0,
         "tier_distribution": tier_distribution,
     }
@@ -13,7 +13,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.db.models import UserSettings
 from app.services.mirror_engine import generate_mirror_response
-from app.services.mirror_engine import invalidate_snapshot_cache
 from app.services.persona_update_service import update_traits
 from app.services.snapshot_service import generate_persona_snapshot
 from app.services.trait_extraction_service import extract_traits
@@ -165,7 +164,6 @@ async def mirror_chat(
         if extracted_traits:
             await update_traits(db, user_id, extracted_traits)
             await generate_persona_snapshot(db, user_id)
-            invalidate_snapshot_cache(user_id)
             await db.commit()
             logger.info("✅ Persona updated from /mirror/chat message")
     except Exception as update_err:
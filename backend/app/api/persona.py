@@ -3,16 +3,17 @@
 import logging
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
 from app.services.trait_extraction_service import extract_traits, extract_bootstrap_traits
-from app.services.persona_update_service import update_traits
+from app.services.persona_update_service import bootstrap_traits, update_traits
 from app.services.snapshot_service import generate_persona_snapshot
 from app.services.mirror_engine import invalidate_snapshot_cache
-from app.repository.persona_repository import PersonaRepository
+from app.services.memory_service import drift_monitor
+from app.services.data_version_service import not_modified_response
 
 logger = logging.getLogger(__name__)
 
@@ -40,10 +41,12 @@ async def reset_persona(
     await db.execute(delete(UserPersonaMetric).where(UserPersonaMetric.user_id == user_uuid))
     await db.execute(delete(BehavioralInsight).where(BehavioralInsight.user_id == user_uuid))
     await db.commit()
+    drift_monitor.forget(user_uuid)
+    # Drop the cached snapshot first so the fresh one is not compared against it
+    invalidate_snapshot_cache(user_uuid)
     
     # Initialize fresh
     await generate_persona_snapshot(db, user_uuid)
-    invalidate_snapshot_cache(user_uuid)
     
     return {"status": "persona_reset_success"}
 
@@ -88,23 +91,10 @@ async def bootstrap_persona(
     # (e.g., 0.45) so it stands as an "assist" requiring actual app usage to validate.
     assist_confidence = 0.45
 
-    await PersonaRepository.initialize_missing_traits(db, user_id)
-    
-    from app.constants import TRAIT_LIST
-    for trait_name in TRAIT_LIST:
-        target_score = extracted_scores.get(trait_name, 0.5)
-        
-        metric = await PersonaRepository.get_metric(db, user_id, trait_name)
-        if metric:
-            await PersonaRepository.update_metric(
-                db, metric, target_score, assist_confidence, target_score
-            )
-    
-    await db.commit()
+    await bootstrap_traits(db, user_id, extracted_scores, assist_confidence)
 
     # Generate snapshot
     snapshot = await generate_persona_snapshot(db, user_id)
-    invalidate_snapshot_cache(user_id)
 
     # Return response in same format as reflection for ease
     traits = snapshot.persona_vector.get("behavioral_profile", {})
@@ -147,9 +137,6 @@ async def process_reflection(
     # Step 3: Generate snapshot
     snapshot = await generate_persona_snapshot(db, user_id)
     
-    # Invalidate cache since we have a new snapshot
-    invalidate_snapshot_cache(user_id)
-    
     logger.info(f"✅ Reflection processing complete for user {user_id}")
     
     # Extract traits from the snapshot's persona vector
@@ -165,6 +152,8 @@ async def process_reflection(
 @router.get("/profile/{user_id}")
 async def get_user_profile(
     user_id: str,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """Get the latest personality profile for a user."""
@@ -172,6 +161,10 @@ async def get_user_profile(
         user_uuid = UUID(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format")
+
+    not_modified = await not_modified_response(request, response, db, user_uuid, "persona.profile")
+    if not_modified is not None:
+        return not_modified
     
     from app.repository.persona_repository import PersonaRepository
     from app.db.models import ScheduleContext
@@ -219,6 +212,8 @@ async def get_user_profile(
 @router.get("/metrics/{user_id}")
 async def get_user_metrics(
     user_id: str,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """Get all trait metrics for a user."""
@@ -226,6 +221,10 @@ async def get_user_metrics(
         user_uuid = UUID(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format")
+
+    not_modified = await not_modified_response(request, response, db, user_uuid, "persona.metrics")
+    if not_modified is not None:
+        return not_modified
     
     from app.repository.persona_repository import PersonaRepository
     
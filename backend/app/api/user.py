@@ -2,7 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field, model_validator
 from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,12 +20,22 @@ from app.db.models import (
     ScheduleContext,
     UserSettings,
 )
+from app.services.activity_heatmap_service import DEFAULT_TIMEZONE, reset_activity_heatmaps, validate_timezone
+from app.services.activity_rollup_service import reset_activity_rollups
+from app.services.confidence_aggregate_service import reset_confidence_aggregates
+from app.services.data_version_service import not_modified_response, time_bucket
+from app.services.history_service import history_cache
+from app.services.memory_index import memory_index
+from app.services.memory_retrieval_service import turn_memory_cache
+from app.services.memory_service import drift_monitor
+from app.services.mirror_engine import invalidate_snapshot_cache
 from app.services.persona_report_service import build_persona_report_pdf
 from app.services.twin_policy import (
     DEFAULT_TWIN_SETTINGS,
     resolve_twin_settings,
     validate_twin_autonomy_mode,
 )
+from app.services.work_queue import work_queue
 
 router = APIRouter(prefix="/user", tags=["User"])
 
@@ -50,11 +60,14 @@ class UserSettingsUpdateRequest(BaseModel):
     twin_autonomy_mode: Optional[str] = None
     twin_mirror_intensity: Optional[float] = Field(default=None, ge=0.0, le=1.0)
     twin_require_approval: Optional[bool] = None
+    timezone: Optional[str] = None
 
     @model_validator(mode="after")
     def validate_mode(self):
         if self.twin_autonomy_mode is not None:
             self.twin_autonomy_mode = validate_twin_autonomy_mode(self.twin_autonomy_mode)
+        if self.timezone is not None:
+            self.timezone = validate_timezone(self.timezone)
         return self
 
 
@@ -95,6 +108,7 @@ async def get_user_settings(
         await db.refresh(settings_record)
 
     effective_settings = resolve_twin_settings(settings_record)
+    effective_settings["timezone"] = settings_record.timezone or DEFAULT_TIMEZONE
 
     return {
         "user_id": str(settings_record.user_id),
@@ -144,6 +158,7 @@ async def update_user_settings(
                 if request.twin_require_approval is not None
                 else DEFAULT_TWIN_SETTINGS["twin_require_approval"]
             ),
+            timezone=request.timezone or DEFAULT_TIMEZONE,
         )
         db.add(settings_record)
     else:
@@ -158,11 +173,14 @@ async def update_user_settings(
             settings_record.twin_mirror_intensity = request.twin_mirror_intensity
         if request.twin_require_approval is not None:
             settings_record.twin_require_approval = request.twin_require_approval
+        if request.timezone is not None:
+            settings_record.timezone = request.timezone
 
     await db.commit()
     await db.refresh(settings_record)
 
     effective_settings = resolve_twin_settings(settings_record)
+    effective_settings["timezone"] = settings_record.timezone or DEFAULT_TIMEZONE
 
     return {
         "status": "success",
@@ -200,6 +218,8 @@ async def export_persona_report(
 
 @router.get("/system-state")
 async def get_system_state(
+    request: Request,
+    response: Response,
     user_id: str = Query(..., description="User UUID"),
     db: AsyncSession = Depends(get_db),
 ):
@@ -209,6 +229,11 @@ async def get_system_state(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format")
 
+    # learning_active depends on the clock as well as on the data.
+    not_modified = await not_modified_response(request, response, db, user_uuid, "user.system_state", time_bucket())
+    if not_modified is not None:
+        return not_modified
+
     # Last inference timestamp from trait metric updates.
     last_inference_stmt = select(func.max(UserPersonaMetric.last_updated)).where(
         UserPersonaMetric.user_id == user_uuid
@@ -269,6 +294,10 @@ async def clear_user_data(request: UserRequest, db: AsyncSession = Depends(get_d
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid user_id format")
 
+        conversation_ids = (
+            await db.execute(select(Conversation.id).where(Conversation.user_id == user_uuid))
+        ).scalars().all()
+
         # delete messages
         await db.execute(delete(Message).where(Message.user_id == user_uuid))
         
@@ -295,8 +324,20 @@ async def clear_user_data(request: UserRequest, db: AsyncSession = Depends(get_d
 
         # delete user settings
         await db.execute(delete(UserSettings).where(UserSettings.user_id == user_uuid))
+
+        # drop confidence aggregates, activity rollups and heatmap counters built from the deleted rows
+        await reset_confidence_aggregates(db, user_uuid)
+        await reset_activity_rollups(db, user_uuid)
+        await reset_activity_heatmaps(db, user_uuid)
         
         await db.commit()
+        memory_index.invalidate(user_uuid)
+        drift_monitor.forget(user_uuid)
+        invalidate_snapshot_cache(user_uuid)
+        for conversation_id in conversation_ids:
+            history_cache.invalidate(conversation_id)
+        turn_memory_cache.forget_conversations(conversation_ids)
+        await work_queue.purge_owner(str(user_uuid))
         return {"status": "success", "message": "All user data cleared."}
     except Exception as e:
         await db.rollback()
@@ -314,6 +355,7 @@ async def delete_user_account(request: UserRequest, db: AsyncSession = Depends(g
         # Delete user - ON DELETE CASCADE will handle the rest automatically
         await db.execute(delete(User).where(User.id == user_uuid))
         await db.commit()
+        await work_queue.purge_owner(str(user_uuid))
         return {"status": "success", "message": "User account and all data completely deleted."}
     except Exception as e:
         await db.rollback()
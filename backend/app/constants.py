@@ -3,6 +3,9 @@
 # Feature Flags
 ENABLE_MIRROR_MODE = True
 
+# Output size of the embedding model (mistral-embed); must match messages.embedding.
+EMBEDDING_DIMENSIONS = 1024
+
 # Mirror mode trait controls
 MIRROR_CORE_TRAITS = [
     "communication_style",
@@ -6,6 +6,10 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import models
+from app.services.activity_heatmap_service import record_heatmap_message
+from app.services.activity_rollup_service import record_message_activity
+from app.services.confidence_aggregate_service import record_user_message
+from app.services.embedding_worker import embedding_worker
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +73,10 @@ async def create_message(
         token_count=token_count,
     )
     db.add(message)
+    if role == "user":
+        await record_user_message(db, user_id, content)
+        await record_message_activity(db, user_id, token_count=token_count)
+        await record_heatmap_message(db, user_id)
     try:
         logger.info(f"💾 Committing message insert: role={role}, conversation_id={conversation_id}")
         await db.commit()
@@ -79,6 +87,8 @@ async def create_message(
         raise
     await db.refresh(message)
     logger.info(f"Message created successfully: id={message.id}")
+    if embedding is None:
+        embedding_worker.notify()
     return message
 
 
@@ -1,6 +1,7 @@
 import os
 
 from dotenv import load_dotenv
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 
@@ -18,6 +19,15 @@ engine = create_async_engine(
     max_overflow=10,
 )
 
+if engine.dialect.driver == "asyncpg":
+    from app.db.vector_type import register_vector_codecs
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_vector_codecs(dbapi_connection, _connection_record):
+        """Bind pgvector types in binary on every pooled connection."""
+        dbapi_connection.run_async(register_vector_codecs)
+
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     expire_on_commit=False,
@@ -1,10 +1,13 @@
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -14,9 +17,10 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy.orm import relationship
-from pgvector.sqlalchemy import Vector
 
+from app.constants import EMBEDDING_DIMENSIONS
 from app.db.database import Base
+from app.db.vector_type import BinaryHalfVec
 
 
 class User(Base):
@@ -66,7 +70,8 @@ class Message(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     role = Column(String(32), nullable=False, index=True)
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(1536))
+    embedding = Column(BinaryHalfVec(EMBEDDING_DIMENSIONS))
+    embedding_attempts = Column(Integer, nullable=False, server_default=text("0"))
     token_count = Column(Integer)
     emotional_intensity = Column(Float)
     reflection_depth = Column(Float)
@@ -188,6 +193,7 @@ class UserSettings(Base):
     twin_autonomy_mode = Column(String(32), nullable=False, server_default=text("'draft_only'"))
     twin_mirror_intensity = Column(Float, nullable=False, server_default=text("0.8"))
     twin_require_approval = Column(Boolean, nullable=False, server_default=text("true"))
+    timezone = Column(String(64), nullable=False, server_default=text("'UTC'"))
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     user = relationship("User", back_populates="user_settings")
@@ -204,6 +210,8 @@ class MirrorLog(Base):
     realism_score = Column(Numeric(4, 3), nullable=False)
     retries_used = Column(Integer, nullable=False, server_default=text("0"))
     fallback_triggered = Column(Boolean, nullable=False, server_default=text("false"))
+    candidates_requested = Column(Integer, nullable=False, server_default=text("0"))
+    candidates_wasted = Column(Integer, nullable=False, server_default=text("0"))
     confidence_lower = Column(Float)
     confidence_upper = Column(Float)
     confidence_tier = Column(String(32))
@@ -276,3 +284,84 @@ class ExternalInput(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     user = relationship("User", back_populates="external_inputs")
+
+
+class UserConfidenceAggregate(Base):
+    """Running, time-decayed evidence totals behind the mirror confidence interval.
+
+    Decayed columns are stored as of `decayed_at`; readers and writers scale them
+    by exp(-age_days / tau) for the tau of their source before use.
+    """
+
+    __tablename__ = "user_confidence_aggregates"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    decayed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    rebuilt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    message_weight = Column(Float, nullable=False, server_default=text("0"))
+    message_slang_weight = Column(Float, nullable=False, server_default=text("0"))
+    message_length_sum = Column(Float, nullable=False, server_default=text("0"))
+    message_length_sq_sum = Column(Float, nullable=False, server_default=text("0"))
+    trait_count = Column(Integer, nullable=False, server_default=text("0"))
+    trait_confidence_sum = Column(Float, nullable=False, server_default=text("0"))
+    trait_recency_sum = Column(Float, nullable=False, server_default=text("0"))
+    insight_weight = Column(Float, nullable=False, server_default=text("0"))
+    insight_confidence_sum = Column(Float, nullable=False, server_default=text("0"))
+    insight_recent_weight = Column(Float, nullable=False, server_default=text("0"))
+    insight_recent_confidence_sum = Column(Float, nullable=False, server_default=text("0"))
+    reflection_weight = Column(Float, nullable=False, server_default=text("0"))
+    reflection_sentiment_weight = Column(Float, nullable=False, server_default=text("0"))
+    external_weight = Column(Float, nullable=False, server_default=text("0"))
+    external_confidence_weight_sum = Column(Float, nullable=False, server_default=text("0"))
+    external_recent_tokens = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+
+
+class UserActivityHourly(Base):
+    """Per-user, per-hour totals over the user's own messages, for analytics.
+
+    Averages are stored as sum + count pairs so buckets can be merged into
+    days or weeks; the counts skip messages where the column is NULL.
+    """
+
+    __tablename__ = "user_activity_hourly"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    message_count = Column(Integer, nullable=False, server_default=text("0"))
+    token_sum = Column(Integer, nullable=False, server_default=text("0"))
+    emotional_intensity_sum = Column(Float, nullable=False, server_default=text("0"))
+    emotional_intensity_count = Column(Integer, nullable=False, server_default=text("0"))
+    reflection_depth_sum = Column(Float, nullable=False, server_default=text("0"))
+    reflection_depth_count = Column(Integer, nullable=False, server_default=text("0"))
+    response_delay_sum = Column(Float, nullable=False, server_default=text("0"))
+    response_delay_count = Column(Integer, nullable=False, server_default=text("0"))
+
+
+class UserActivityHeatmap(Base):
+    """Per-user ring of local-day x hour-of-day message counts behind the heatmap.
+
+    `counts` is HEATMAP_RING_DAYS x 24 little-endian int32s; the row for a
+    local date lives at date.toordinal() % HEATMAP_RING_DAYS and `last_day`
+    is the newest date in the ring. Counts are bucketed in `timezone`.
+    """
+
+    __tablename__ = "user_activity_heatmap"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    timezone = Column(String(64), nullable=False, server_default=text("'UTC'"))
+    last_day = Column(Date, nullable=True)
+    counts = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class UserDataVersion(Base):
+    """Per-user counter bumped by database triggers on every write the polled read endpoints depend on.
+
+    No foreign key to users, so cascaded deletes never fail on it (migration 0020).
+    """
+
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
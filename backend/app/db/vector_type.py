@@ -0,0 +1,63 @@
+"""Binary pgvector parameter binding for the asyncpg driver.
+
+pgvector's SQLAlchemy types bind every vector as a text literal such as
+"[0.0123,-0.0456,...]". For a 1024-dim embedding that is about 20 KB of
+Python string formatting on our side and float parsing on the server, on
+every query and every embedding write. Under asyncpg we register pgvector's
+binary codecs on each new connection, so a halfvec is sent as 4 + 2*dim bytes
+(2 KB), and `BinaryHalfVec` hands the driver a HalfVector instead of a
+string. HalfVector packs lists with struct and NumPy arrays with a single
+astype, with no per-element Python loop. Other drivers keep the text format.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Optional
+
+from pgvector import HalfVector
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import Dialect
+
+logger = logging.getLogger(__name__)
+
+
+def to_halfvec(value: Any) -> Optional[HalfVector]:
+    if value is None or isinstance(value, HalfVector):
+        return value
+    if not isinstance(value, list) and not hasattr(value, "ndim"):
+        value = list(value)
+    return HalfVector(value)
+
+
+class BinaryHalfVec(HALFVEC):
+    """HALFVEC that binds and reads halfvec in binary form under asyncpg."""
+
+    cache_ok = True
+
+    def bind_processor(self, dialect: Dialect) -> Any:
+        if dialect.driver != "asyncpg":
+            return super().bind_processor(dialect)
+        return to_halfvec
+
+    def result_processor(self, dialect: Dialect, coltype: Any) -> Any:
+        if dialect.driver != "asyncpg":
+            return super().result_processor(dialect, coltype)
+
+        def process(value: Any) -> Any:
+            if isinstance(value, HalfVector):
+                return value.to_list()
+            return HalfVector._from_db(value)
+
+        return process
+
+
+async def register_vector_codecs(connection: Any) -> None:
+    """Install pgvector's binary asyncpg codecs on a raw connection."""
+    from pgvector.asyncpg import register_vector
+
+    try:
+        await register_vector(connection)
+    except ValueError as e:
+        # The vector extension is not installed yet (e.g. before migrations).
+        logger.warning(f"⚠️ pgvector codecs not registered: {e}")
@@ -9,6 +9,17 @@ from app.api.schedule import router as schedule_router
 from app.api.user import router as user_router
 from app.api.analytics import router as analytics_router
 from app.api.transcribe import router as transcribe_router
+from app.services.llm_gateway import close_gateway, get_gateway_stats
+from app.services.work_queue import get_queue_stats, work_queue
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_worker import embedding_worker
+from app.services.memory_index import memory_index
+from app.services.memory_service import drift_monitor
+from app.services.memory_retrieval_service import turn_memory_cache
+from app.services.data_version_service import conditional_get_stats
+from app.services.history_service import history_cache
+from app.services.prompt_compiler import prompt_compiler
+from app.services.snapshot_cache import snapshot_cache
 from dotenv import load_dotenv
 from pathlib import Path
 import os
@@ -43,6 +54,23 @@ app.include_router(user_router)
 app.include_router(analytics_router, prefix="/analytics", tags=["analytics"])
 app.include_router(transcribe_router)
 
+
+@app.on_event("startup")
+async def start_work_queue():
+    """Start background workers and replay unfinished persona-learning jobs."""
+    await work_queue.start()
+    await embedding_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    """Drain background work, then release pooled LLM connections."""
+    await work_queue.stop()
+    await embedding_worker.stop()
+    embedding_cache.close()
+    await close_gateway()
+
+
 @app.get("/")
 def health():
     """Root endpoint with API information"""
@@ -70,5 +98,16 @@ def health_check():
     return {
         "status": "healthy", 
         "service": "reflectra-backend",
-        "llm_configured": bool(os.getenv("MISTRAL_API_KEY"))
+        "llm_configured": bool(os.getenv("MISTRAL_API_KEY")),
+        "llm_gateway": get_gateway_stats(),
+        "work_queue": get_queue_stats(),
+        "history_cache": history_cache.stats(),
+        "snapshot_cache": snapshot_cache.stats(),
+        "prompt_compiler": prompt_compiler.stats(),
+        "embedding_worker": embedding_worker.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "memory_index": memory_index.stats(),
+        "memory_retrieval": turn_memory_cache.stats(),
+        "drift_monitor": drift_monitor.stats(),
+        "conditional_get": conditional_get_stats.stats(),
     }
@@ -5,8 +5,9 @@ from datetime import datetime
 from typing import Dict, List, Optional
 from uuid import UUID
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import Row, select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.dialects.postgresql import insert
 
 from app.db.models import UserPersonaMetric, PersonaSnapshot
@@ -35,7 +36,12 @@ class PersonaRepository:
         db: AsyncSession, user_id: UUID
     ) -> List[UserPersonaMetric]:
         """Get all trait metrics for a user."""
-        stmt = select(UserPersonaMetric).where(UserPersonaMetric.user_id == user_id)
+        # Metrics are also written with Core upserts, so refresh any loaded instances.
+        stmt = (
+            select(UserPersonaMetric)
+            .where(UserPersonaMetric.user_id == user_id)
+            .execution_options(populate_existing=True)
+        )
         result = await db.execute(stmt)
         return list(result.scalars().all())
 
@@ -77,6 +83,61 @@ class PersonaRepository:
         await db.flush()
         return metric
 
+    @staticmethod
+    async def get_metric_values(
+        db: AsyncSession, user_id: UUID, lock: bool = False
+    ) -> List[Row]:
+        """(trait_name, score, confidence, evidence_count) rows; `lock` holds them until commit."""
+        stmt = select(
+            UserPersonaMetric.trait_name,
+            UserPersonaMetric.score,
+            UserPersonaMetric.confidence,
+            UserPersonaMetric.evidence_count,
+        ).where(UserPersonaMetric.user_id == user_id)
+        if lock:
+            stmt = stmt.with_for_update()
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def upsert_metrics(
+        db: AsyncSession,
+        user_id: UUID,
+        values: List[Dict],
+        increment_evidence: bool = False,
+    ) -> List[Row]:
+        """Insert or overwrite many trait metrics in one statement.
+
+        Each dict carries trait_name, score, confidence, evidence_count and
+        last_signal. With `increment_evidence`, an existing row's evidence_count
+        is incremented instead of overwritten. Returns (trait_name, confidence,
+        evidence_count) for every written row.
+        """
+        if not values:
+            return []
+        stmt = insert(UserPersonaMetric).values(
+            [{**value, "user_id": user_id, "last_updated": func.now()} for value in values]
+        )
+        evidence_count = (
+            UserPersonaMetric.evidence_count + 1 if increment_evidence else stmt.excluded.evidence_count
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_trait",
+            set_={
+                "score": stmt.excluded.score,
+                "confidence": stmt.excluded.confidence,
+                "evidence_count": evidence_count,
+                "last_signal": stmt.excluded.last_signal,
+                "last_updated": stmt.excluded.last_updated,
+            },
+        ).returning(
+            UserPersonaMetric.trait_name,
+            UserPersonaMetric.confidence,
+            UserPersonaMetric.evidence_count,
+        )
+        result = await db.execute(stmt)
+        return list(result.all())
+
     @staticmethod
     async def initialize_missing_traits(
         db: AsyncSession, user_id: UUID
@@ -173,3 +234,33 @@ class PersonaRepository:
         )
         result = await db.execute(stmt)
         return list(result.scalars().all())
+
+    @staticmethod
+    async def get_snapshot_series(
+        db: AsyncSession, user_id: UUID, bucket: str = "day", limit: int = 12
+    ) -> List[PersonaSnapshot]:
+        """The last snapshot of each of the most recent `limit` buckets, oldest first.
+
+        This matches what retention keeps, so charts look the same before and
+        after old snapshots are downsampled.
+        """
+        period = func.date_trunc(bucket, PersonaSnapshot.created_at)
+        ranked = (
+            select(
+                PersonaSnapshot,
+                func.row_number()
+                .over(partition_by=period, order_by=PersonaSnapshot.created_at.desc())
+                .label("rank"),
+            )
+            .where(PersonaSnapshot.user_id == user_id)
+            .subquery()
+        )
+        snapshot = aliased(PersonaSnapshot, ranked)
+        stmt = (
+            select(snapshot)
+            .where(ranked.c.rank == 1)
+            .order_by(snapshot.created_at.desc())
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return list(reversed(result.scalars().all()))
@@ -0,0 +1,253 @@
+"""Per-user activity heatmap counters in the user's own timezone.
+
+The heatmap used to be grouped from UTC rollups for every `days` window, so a
+user in UTC-8 saw their evening messages in the early morning of the next
+day. Each user now has one `user_activity_heatmap` row: a ring of
+HEATMAP_RING_DAYS local days x 24 hours of message counts, stored as a small
+int32 blob.
+
+- `record_heatmap_message` adds each new user message to its local day and
+  hour inside the writer's transaction, rolling the ring forward as days pass.
+- `load_activity_heatmap` answers any window of up to HEATMAP_RING_DAYS by
+  folding the matching day rows into a 7x24 grid with NumPy. Longer windows
+  fall back to the hourly rollups.
+- A missing row, a blob of the wrong size, or a row bucketed in a timezone the
+  user no longer has is rebuilt from the user's recent messages on the next
+  read. Dropping rows (`reset_activity_heatmaps`) therefore forces a rebuild.
+
+Writers and rebuilds meet on the ring row. A writer that finds no row claims
+an empty placeholder (read as "needs rebuild"), and a rebuild claims the same
+placeholder and locks the row before it recounts. Whichever inserts second
+waits on the unique index for the first to commit, so every message is either
+visible to the recount or added to the rebuilt ring afterwards.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from sqlalchemy import Date, cast, delete, extract, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message, UserActivityHeatmap, UserSettings
+
+logger = logging.getLogger(__name__)
+
+HEATMAP_RING_DAYS = max(7, int(os.getenv("HEATMAP_RING_DAYS", "90")))
+DEFAULT_TIMEZONE = "UTC"
+
+_DTYPE = np.dtype("<i4")
+
+
+def validate_timezone(name: Optional[str]) -> str:
+    """Normalize an IANA timezone name, raising ValueError if it is unknown."""
+    if not name or not name.strip():
+        return DEFAULT_TIMEZONE
+    try:
+        return ZoneInfo(name.strip()).key
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def resolve_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(validate_timezone(name))
+    except ValueError:
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+@dataclass
+class HeatmapRing:
+    """Local day x hour message counts for the last `len(counts)` days up to `last_day`."""
+
+    counts: Any  # int32 array, ring_days x 24
+    last_day: Optional[date] = None
+
+    @classmethod
+    def empty(cls, ring_days: int = HEATMAP_RING_DAYS) -> "HeatmapRing":
+        return cls(counts=np.zeros((ring_days, 24), dtype=_DTYPE))
+
+    @classmethod
+    def from_blob(
+        cls, blob: Optional[bytes], last_day: Optional[date], ring_days: int = HEATMAP_RING_DAYS
+    ) -> Optional["HeatmapRing"]:
+        """The stored ring, or None when it was written with a different HEATMAP_RING_DAYS."""
+        if blob is None or len(blob) != ring_days * 24 * _DTYPE.itemsize:
+            return None
+        return cls(counts=np.frombuffer(blob, dtype=_DTYPE).reshape(ring_days, 24).copy(), last_day=last_day)
+
+    def to_blob(self) -> bytes:
+        return self.counts.astype(_DTYPE, copy=False).tobytes()
+
+    @property
+    def ring_days(self) -> int:
+        return len(self.counts)
+
+    def add(self, day: date, hour: int, count: int = 1) -> bool:
+        """Count messages at a local day/hour; False if the day has already left the ring."""
+        if self.last_day is not None and day <= self.last_day - timedelta(days=self.ring_days):
+            return False
+        if self.last_day is None or day > self.last_day:
+            self._advance(day)
+        self.counts[day.toordinal() % self.ring_days, hour] += count
+        return True
+
+    def _advance(self, day: date) -> None:
+        # Clear the slots of the days between the old newest day and `day`,
+        # which still hold counts from one ring length earlier.
+        if self.last_day is None:
+            self.counts[:] = 0
+        else:
+            gap = min((day - self.last_day).days, self.ring_days)
+            ordinals = np.arange(day.toordinal() - gap + 1, day.toordinal() + 1)
+            self.counts[ordinals % self.ring_days] = 0
+        self.last_day = day
+
+    def window(self, days: int, today: date) -> Any:
+        """7x24 totals (Sunday = row 0) for the `days` local days ending with `today`."""
+        grid = np.zeros((7, 24), dtype=np.int64)
+        if self.last_day is None or days <= 0:
+            return grid
+        ordinals = today.toordinal() - np.arange(min(days, self.ring_days))
+        last = self.last_day.toordinal()
+        ordinals = ordinals[(ordinals <= last) & (ordinals > last - self.ring_days)]
+        # date.toordinal() is 1 for Monday 0001-01-01, so ordinal % 7 is 0 on Sundays.
+        np.add.at(grid, ordinals % 7, self.counts[ordinals % self.ring_days])
+        return grid
+
+
+async def user_timezone(db: AsyncSession, user_id: UUID) -> str:
+    result = await db.execute(select(UserSettings.timezone).where(UserSettings.user_id == user_id))
+    return result.scalar_one_or_none() or DEFAULT_TIMEZONE
+
+
+def _lock_ring_stmt(user_id: UUID):
+    return (
+        select(UserActivityHeatmap.timezone, UserActivityHeatmap.last_day, UserActivityHeatmap.counts)
+        .where(UserActivityHeatmap.user_id == user_id)
+        .with_for_update()
+    )
+
+
+def _claim_ring_stmt(user_id: UUID):
+    """Insert an empty placeholder ring unless the user has a row; returns the id only if inserted."""
+    return (
+        insert(UserActivityHeatmap)
+        .values(user_id=user_id, counts=b"")
+        .on_conflict_do_nothing(index_elements=[UserActivityHeatmap.user_id])
+        .returning(UserActivityHeatmap.user_id)
+    )
+
+
+async def record_heatmap_message(db: AsyncSession, user_id: UUID, at: Optional[datetime] = None) -> None:
+    """Add one user message to the user's heatmap ring, in the caller's transaction.
+
+    Users without a ring get a placeholder, and their ring is built from
+    messages on first read. Failures roll back only a savepoint, so the
+    message write never depends on the heatmap.
+    """
+    at = at or datetime.now(timezone.utc)
+    try:
+        async with db.begin_nested():
+            row = (await db.execute(_lock_ring_stmt(user_id))).one_or_none()
+            if row is None:
+                # Blocks while a rebuild's insert is uncommitted; the rebuilt ring is then locked below.
+                if (await db.execute(_claim_ring_stmt(user_id))).scalar_one_or_none() is not None:
+                    return
+                row = (await db.execute(_lock_ring_stmt(user_id))).one_or_none()
+                if row is None:
+                    return
+            ring = HeatmapRing.from_blob(row.counts, row.last_day)
+            if ring is None:
+                return
+            local = at.astimezone(resolve_zone(row.timezone))
+            if ring.add(local.date(), local.hour):
+                await db.execute(
+                    update(UserActivityHeatmap)
+                    .where(UserActivityHeatmap.user_id == user_id)
+                    .values(counts=ring.to_blob(), last_day=ring.last_day, updated_at=func.now())
+                )
+    except Exception as e:
+        logger.warning("⚠️ Skipping heatmap update for user %s: %s", user_id, e)
+
+
+async def rebuild_activity_heatmap(db: AsyncSession, user_id: UUID, tz: str) -> HeatmapRing:
+    """Recount the ring from the user's messages of the last HEATMAP_RING_DAYS local days and store it.
+
+    The ring row is claimed and locked before counting, so messages written
+    meanwhile are either counted here or added to the stored ring afterwards.
+    """
+    await db.execute(_claim_ring_stmt(user_id))
+    await db.execute(_lock_ring_stmt(user_id))
+    zone = resolve_zone(tz)
+    today = datetime.now(zone).date()
+    first_day = today - timedelta(days=HEATMAP_RING_DAYS - 1)
+    local = func.timezone(zone.key, Message.created_at)
+    local_day = cast(local, Date)
+    local_hour = extract("hour", local)
+    stmt = (
+        select(local_day, local_hour, func.count(Message.id))
+        .where(
+            Message.user_id == user_id,
+            Message.role == "user",
+            Message.created_at >= datetime.combine(first_day, time(), zone),
+        )
+        .group_by(local_day, local_hour)
+    )
+    ring = HeatmapRing.empty()
+    ring.last_day = today
+    for day, hour, count in (await db.execute(stmt)).all():
+        if day <= today:
+            ring.add(day, int(hour), int(count))
+
+    await db.execute(
+        update(UserActivityHeatmap)
+        .where(UserActivityHeatmap.user_id == user_id)
+        .values(timezone=zone.key, last_day=ring.last_day, counts=ring.to_blob(), updated_at=func.now())
+    )
+    await db.commit()
+    logger.info(f"🗓️ Rebuilt activity heatmap for user {user_id} in {zone.key}")
+    return ring
+
+
+async def reset_activity_heatmaps(db: AsyncSession, user_id: Optional[UUID] = None) -> None:
+    """Drop heatmap rings (one user, or everyone) so the next read rebuilds them."""
+    stmt = delete(UserActivityHeatmap)
+    if user_id is not None:
+        stmt = stmt.where(UserActivityHeatmap.user_id == user_id)
+    await db.execute(stmt)
+
+
+async def load_activity_heatmap(db: AsyncSession, user_id: UUID, days: int) -> Tuple[str, List[List[int]]]:
+    """(timezone, 7x24 message counts) for the user's last `days` local days."""
+    tz = await user_timezone(db, user_id)
+    zone = resolve_zone(tz)
+
+    if days > HEATMAP_RING_DAYS:
+        from app.services.activity_rollup_service import activity_heatmap_query
+
+        grid = np.zeros((7, 24), dtype=np.int64)
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        for row in (await db.execute(activity_heatmap_query(user_id, start, zone.key))).all():
+            grid[int(row.day_of_week), int(row.hour_of_day)] = row.message_count
+        return zone.key, grid.tolist()
+
+    row = (
+        await db.execute(
+            select(UserActivityHeatmap.timezone, UserActivityHeatmap.last_day, UserActivityHeatmap.counts).where(
+                UserActivityHeatmap.user_id == user_id
+            )
+        )
+    ).one_or_none()
+    ring = HeatmapRing.from_blob(row.counts, row.last_day) if row is not None and row.timezone == zone.key else None
+    if ring is None:
+        ring = await rebuild_activity_heatmap(db, user_id, zone.key)
+    return zone.key, ring.window(days, datetime.now(zone).date()).tolist()
@@ -0,0 +1,186 @@
+"""Hourly per-user message rollups behind the analytics endpoints.
+
+The dashboard used to group the user's raw messages on every load (and
+`view=all` grouped their whole history). `user_activity_hourly` holds one row
+per user per active UTC hour instead. `record_message_activity` folds each new
+user message into its hour inside the writer's transaction, and readers merge
+hours into the buckets they need. A read touches at most one row per active
+hour in its window, however many messages those hours contain.
+
+Averages are kept as sum + count pairs, so merged buckets average over the
+same non-NULL values that AVG() over the raw rows would. Writes that bypass
+`crud.create_message` (deletes, backfills, later updates to a message's
+feature columns) are picked up by `rebuild_activity_rollups`, which
+scripts/backend/rebuild_activity_rollups.py runs.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, extract, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message, UserActivityHourly
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TIMEZONE = "UTC"
+
+# Rollup column -> (aggregate over raw messages) used by rebuilds.
+_SUM_COLUMNS = {
+    "token_sum": Message.token_count,
+    "emotional_intensity_sum": Message.emotional_intensity,
+    "reflection_depth_sum": Message.reflection_depth,
+    "response_delay_sum": Message.response_delay_ms,
+}
+_COUNT_COLUMNS = {
+    "emotional_intensity_count": Message.emotional_intensity,
+    "reflection_depth_count": Message.reflection_depth,
+    "response_delay_count": Message.response_delay_ms,
+}
+
+
+def hour_bucket(column: Any) -> Any:
+    return func.date_trunc("hour", column, ROLLUP_TIMEZONE)
+
+
+async def record_message_activity(
+    db: AsyncSession,
+    user_id: UUID,
+    token_count: Optional[int] = None,
+    emotional_intensity: Optional[float] = None,
+    reflection_depth: Optional[float] = None,
+    response_delay_ms: Optional[int] = None,
+) -> None:
+    """Add one user message to the current hour's rollup, in the caller's transaction.
+
+    The hour is taken from now(), which is the transaction start time, the same
+    value the message's created_at default gets. Failures roll back only a
+    savepoint, so the message write never depends on the rollup.
+    """
+    values = {
+        "message_count": 1,
+        "token_sum": token_count or 0,
+        "emotional_intensity_sum": emotional_intensity or 0.0,
+        "emotional_intensity_count": int(emotional_intensity is not None),
+        "reflection_depth_sum": reflection_depth or 0.0,
+        "reflection_depth_count": int(reflection_depth is not None),
+        "response_delay_sum": float(response_delay_ms or 0),
+        "response_delay_count": int(response_delay_ms is not None),
+    }
+    stmt = insert(UserActivityHourly).values(user_id=user_id, hour=hour_bucket(func.now()), **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserActivityHourly.user_id, UserActivityHourly.hour],
+        set_={name: getattr(UserActivityHourly, name) + getattr(stmt.excluded, name) for name in values},
+    )
+    try:
+        async with db.begin_nested():
+            await db.execute(stmt)
+    except Exception as e:
+        logger.warning("⚠️ Skipping activity rollup update for user %s: %s", user_id, e)
+
+
+async def reset_activity_rollups(db: AsyncSession, user_id: UUID) -> None:
+    """Drop the user's rollups after their messages are bulk deleted."""
+    await db.execute(delete(UserActivityHourly).where(UserActivityHourly.user_id == user_id))
+
+
+async def rebuild_activity_rollups(db: AsyncSession, user_id: Optional[UUID] = None) -> int:
+    """Recompute rollups from the messages table (one user, or everyone); returns rows written."""
+    hour = hour_bucket(Message.created_at)
+    source = select(
+        Message.user_id,
+        hour,
+        func.count(Message.id),
+        *(func.coalesce(func.sum(column), 0) for column in _SUM_COLUMNS.values()),
+        *(func.count(column) for column in _COUNT_COLUMNS.values()),
+    ).where(Message.role == "user")
+    clear = delete(UserActivityHourly)
+    if user_id is not None:
+        source = source.where(Message.user_id == user_id)
+        clear = clear.where(UserActivityHourly.user_id == user_id)
+    source = source.group_by(Message.user_id, hour)
+
+    await db.execute(clear)
+    result = await db.execute(
+        insert(UserActivityHourly).from_select(
+            ["user_id", "hour", "message_count", *_SUM_COLUMNS, *_COUNT_COLUMNS], source
+        )
+    )
+    await db.commit()
+    written = result.rowcount or 0
+    logger.info(f"🧮 Rebuilt {written} activity rollup hours{f' for user {user_id}' if user_id else ''}")
+    return written
+
+
+def _average(total: Any, count: Any) -> Any:
+    # float8 / bigint in Postgres; NULL when the bucket has no non-NULL values.
+    return func.sum(total).op("/")(func.nullif(func.sum(count), 0))
+
+
+def _window(
+    user_id: UUID, start: Optional[datetime], end: Optional[datetime] = None, whole_first_hour: bool = True
+) -> List[Any]:
+    """Rollup rows for [start, end). By default the hour containing start counts in full."""
+    filters = [UserActivityHourly.user_id == user_id]
+    if start is not None:
+        filters.append(UserActivityHourly.hour >= (hour_bucket(start) if whole_first_hour else start))
+    if end is not None:
+        filters.append(UserActivityHourly.hour < end)
+    return filters
+
+
+def activity_series_query(user_id: UUID, trunc_period: str, start: Optional[datetime] = None):
+    """Per-period totals and averages, merged from hourly rollups ("hour", "day", ...)."""
+    period = func.date_trunc(trunc_period, UserActivityHourly.hour, ROLLUP_TIMEZONE)
+    return (
+        select(
+            period.label("period"),
+            func.sum(UserActivityHourly.message_count).label("message_count"),
+            func.sum(UserActivityHourly.token_sum).label("total_tokens"),
+            _average(UserActivityHourly.emotional_intensity_sum, UserActivityHourly.emotional_intensity_count)
+            .label("avg_emotional_intensity"),
+            _average(UserActivityHourly.reflection_depth_sum, UserActivityHourly.reflection_depth_count)
+            .label("avg_reflection_depth"),
+            _average(UserActivityHourly.response_delay_sum, UserActivityHourly.response_delay_count)
+            .label("avg_delay_ms"),
+        )
+        .where(*_window(user_id, start))
+        .group_by(period)
+        .order_by(period)
+    )
+
+
+def activity_heatmap_query(user_id: UUID, start: datetime, tz: str = ROLLUP_TIMEZONE):
+    """Message counts by (day of week, hour of day) in `tz`.
+
+    Rollup hours are UTC hours, so zones with a sub-hour offset are placed by
+    the local time at which each UTC hour starts.
+    """
+    local_hour = func.timezone(tz, UserActivityHourly.hour)
+    day_of_week = extract("dow", local_hour)
+    hour_of_day = extract("hour", local_hour)
+    return (
+        select(
+            day_of_week.label("day_of_week"),
+            hour_of_day.label("hour_of_day"),
+            func.sum(UserActivityHourly.message_count).label("message_count"),
+        )
+        .where(*_window(user_id, start))
+        .group_by(day_of_week, hour_of_day)
+    )
+
+
+async def average_reflection_depth(
+    db: AsyncSession, user_id: UUID, start: datetime, end: Optional[datetime] = None
+) -> Optional[float]:
+    stmt = select(
+        _average(UserActivityHourly.reflection_depth_sum, UserActivityHourly.reflection_depth_count)
+    ).where(*_window(user_id, start, end, whole_first_hour=False))
+    value = (await db.execute(stmt)).scalar_one_or_none()
+    return float(value) if value is not None else None
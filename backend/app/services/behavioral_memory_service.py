@@ -2,47 +2,48 @@
 
 from __future__ import annotations
 
-import re
 from collections import Counter
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, Optional
 from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import LinguisticFingerprint, ReactionPattern
+from app.services.message_features import MessageFeatures, ensure_features
 
 KNOWN_ABBREVIATIONS = ("idk", "tbh", "ngl", "imo", "imho", "fr", "brb", "btw")
 
 
-def _tokenize(text: str) -> List[str]:
-    return re.findall(r"[a-zA-Z']+", (text or "").lower())
-
-
-async def update_linguistic_fingerprint(db: AsyncSession, user_id: UUID, user_text: str) -> None:
+async def update_linguistic_fingerprint(
+    db: AsyncSession,
+    user_id: UUID,
+    user_text: str,
+    features: Optional[MessageFeatures] = None,
+) -> None:
     text = (user_text or "").strip()
     if not text:
         return
+    features = ensure_features(text, features)
 
     stmt = select(LinguisticFingerprint).where(LinguisticFingerprint.user_id == user_id)
     result = await db.execute(stmt)
     record = result.scalar_one_or_none()
 
-    tokens = _tokenize(text)
+    tokens = features.alpha_tokens
     if not tokens:
         return
 
     abbrev_counter = Counter(token for token in tokens if token in KNOWN_ABBREVIATIONS)
-    bigrams = [f"{tokens[i]} {tokens[i + 1]}" for i in range(len(tokens) - 1)]
-    phrases = Counter(bigrams).most_common(6)
+    phrases = Counter(features.alpha_bigrams).most_common(6)
 
-    sentence_count = max(len([s for s in re.split(r"[.!?]+", text) if s.strip()]), 1)
-    fragment_ratio = 1.0 if sentence_count == 0 else min(1.0, sum(1 for s in re.split(r"[.!?]+", text) if 0 < len(s.split()) <= 4) / sentence_count)
+    sentence_count = max(features.sentence_count, 1)
+    fragment_ratio = min(1.0, sum(1 for s in features.sentences if 0 < len(s.split()) <= 4) / sentence_count)
     punctuation_cadence = {
-        "exclamation": text.count("!"),
-        "question": text.count("?"),
-        "ellipsis": text.count("..."),
+        "exclamation": features.exclamation_count,
+        "question": features.question_count,
+        "ellipsis": features.ellipsis_count,
     }
 
     if record is None:
@@ -0,0 +1,386 @@
+"""Incrementally maintained evidence aggregates for the mirror confidence interval.
+
+`compute_confidence_interval` used to scan recent messages, traits, behavioral
+insights, reflection logs and external inputs on every mirror turn. This module
+keeps one `user_confidence_aggregates` row per user instead. It holds running
+counts, sums and sums of squares, each weighted by exp(-age_days / tau), so a
+read is a single primary-key lookup.
+
+Writers fold each new record into the row inside their own transaction, using
+a single atomic UPDATE that first decays the stored totals to now(). Rows are
+rebuilt from the source tables when missing or older than
+CONFIDENCE_AGGREGATE_REBUILD_HOURS. The rebuild also picks up writes that
+bypass the hooks, such as deletes, reflection logs and backfill scripts.
+
+The exponential weights replace the old hard windows. The time constants
+match the old window lengths, so for a steady stream of evidence the decayed
+counts settle at the same values the windowed counts had.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, literal, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import UserConfidenceAggregate, UserPersonaMetric
+from app.services.keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_TAU_DAYS = 45.0
+TRAIT_RECENCY_TAU_DAYS = 30.0
+INSIGHT_TAU_DAYS = 30.0
+INSIGHT_RECENT_TAU_DAYS = 7.0
+REFLECTION_TAU_DAYS = 45.0
+EXTERNAL_TAU_DAYS = 60.0
+# Rebuilds ignore records older than this many time constants (weight < 0.25%).
+REBUILD_HORIZON_TAUS = 6
+
+EXTERNAL_RECENT_INPUTS = 12
+EXTERNAL_TOKENS_PER_INPUT = 512
+CONFIDENCE_AGGREGATE_REBUILD_HOURS = float(os.getenv("CONFIDENCE_AGGREGATE_REBUILD_HOURS", "168"))
+
+CONVERSATION_SLANG_MARKERS = ("idk", "tbh", "ngl", "bro", "not gonna lie", "kinda", "man")
+_SLANG_MATCHER = KeywordMatcher({"slang": CONVERSATION_SLANG_MARKERS})
+
+# Decayed column -> time constant in days. Every other numeric column is a plain total.
+DECAY_TAU_DAYS: Dict[str, float] = {
+    "message_weight": CONVERSATION_TAU_DAYS,
+    "message_slang_weight": CONVERSATION_TAU_DAYS,
+    "message_length_sum": CONVERSATION_TAU_DAYS,
+    "message_length_sq_sum": CONVERSATION_TAU_DAYS,
+    "trait_recency_sum": TRAIT_RECENCY_TAU_DAYS,
+    "insight_weight": INSIGHT_TAU_DAYS,
+    "insight_confidence_sum": INSIGHT_TAU_DAYS,
+    "insight_recent_weight": INSIGHT_RECENT_TAU_DAYS,
+    "insight_recent_confidence_sum": INSIGHT_RECENT_TAU_DAYS,
+    "reflection_weight": REFLECTION_TAU_DAYS,
+    "reflection_sentiment_weight": REFLECTION_TAU_DAYS,
+    "external_weight": EXTERNAL_TAU_DAYS,
+    "external_confidence_weight_sum": EXTERNAL_TAU_DAYS,
+}
+
+
+@dataclass
+class ConfidenceAggregates:
+    """A user's aggregates with every decayed total brought forward to `as_of`."""
+
+    as_of: datetime
+    message_weight: float = 0.0
+    message_slang_weight: float = 0.0
+    message_length_sum: float = 0.0
+    message_length_sq_sum: float = 0.0
+    trait_count: int = 0
+    trait_confidence_sum: float = 0.0
+    trait_recency_sum: float = 0.0
+    insight_weight: float = 0.0
+    insight_confidence_sum: float = 0.0
+    insight_recent_weight: float = 0.0
+    insight_recent_confidence_sum: float = 0.0
+    reflection_weight: float = 0.0
+    reflection_sentiment_weight: float = 0.0
+    external_weight: float = 0.0
+    external_confidence_weight_sum: float = 0.0
+    external_recent_tokens: List[List[str]] = field(default_factory=list)
+
+    @classmethod
+    def from_values(cls, values: Any, decayed_at: Optional[datetime], now: Optional[datetime] = None) -> "ConfidenceAggregates":
+        """Build from a row or mapping whose decayed totals are as of `decayed_at`."""
+        now = now or datetime.now(timezone.utc)
+        age_days = 0.0
+        if decayed_at is not None:
+            age_days = max((now - _ensure_utc(decayed_at)).total_seconds() / 86400.0, 0.0)
+
+        def _get(name: str, default: Any) -> Any:
+            value = values.get(name) if isinstance(values, dict) else getattr(values, name, None)
+            return default if value is None else value
+
+        kwargs: Dict[str, Any] = {"as_of": now}
+        for item in fields(cls):
+            if item.name == "as_of":
+                continue
+            if item.name == "external_recent_tokens":
+                kwargs[item.name] = list(_get(item.name, []))
+            elif item.name == "trait_count":
+                kwargs[item.name] = int(_get(item.name, 0))
+            else:
+                value = float(_get(item.name, 0.0))
+                tau = DECAY_TAU_DAYS.get(item.name)
+                kwargs[item.name] = value * math.exp(-age_days / tau) if tau else value
+        return cls(**kwargs)
+
+
+def message_length(content: Optional[str]) -> int:
+    return len((content or "").lower().split())
+
+
+def has_conversation_slang(content: Optional[str]) -> bool:
+    return _SLANG_MATCHER.search(content or "")
+
+
+def external_tokens(content: Optional[str]) -> List[str]:
+    return sorted(set((content or "").lower().split()))[:EXTERNAL_TOKENS_PER_INPUT]
+
+
+async def load_confidence_aggregates(db: AsyncSession, user_id: UUID) -> ConfidenceAggregates:
+    """Read the user's aggregates with one primary-key lookup, rebuilding if missing or stale."""
+    row = await db.get(UserConfidenceAggregate, user_id, populate_existing=True)
+    return await aggregates_from_row(db, user_id, row)
+
+
+async def aggregates_from_row(
+    db: AsyncSession,
+    user_id: UUID,
+    row: Optional[UserConfidenceAggregate],
+) -> ConfidenceAggregates:
+    """Aggregates from an already loaded row, rebuilding if it is missing or stale."""
+    now = datetime.now(timezone.utc)
+    if row is None or (now - _ensure_utc(row.rebuilt_at)) > timedelta(hours=CONFIDENCE_AGGREGATE_REBUILD_HOURS):
+        return await rebuild_confidence_aggregates(db, user_id)
+    return ConfidenceAggregates.from_values(row, row.decayed_at, now)
+
+
+_REBUILD_SQL = text(
+    rf"""
+    SELECT m.*, t.*, i.*, r.*, e.*
+    FROM (
+        SELECT
+            coalesce(sum(w), 0) AS message_weight,
+            coalesce(sum(CASE WHEN slang THEN w ELSE 0 END), 0) AS message_slang_weight,
+            coalesce(sum(w * len), 0) AS message_length_sum,
+            coalesce(sum(w * len * len), 0) AS message_length_sq_sum
+        FROM (
+            SELECT
+                exp(-greatest(extract(epoch FROM now() - created_at), 0) / 86400.0 / {CONVERSATION_TAU_DAYS}) AS w,
+                lower(content) LIKE ANY(:slang_patterns) AS slang,
+                coalesce(array_length(regexp_split_to_array(nullif(regexp_replace(content, '^\s+|\s+$', '', 'g'), ''), '\s+'), 1), 0) AS len
+            FROM messages
+            WHERE user_id = :user_id
+              AND role = 'user'
+              AND created_at >= now() - make_interval(days => :message_horizon)
+        ) msg
+    ) m
+    CROSS JOIN (
+        SELECT
+            count(*) AS trait_count,
+            coalesce(sum(coalesce(confidence, 0)), 0) AS trait_confidence_sum,
+            coalesce(sum(
+                exp(-floor(greatest(extract(epoch FROM now() - last_updated), 0) / 86400.0) / {TRAIT_RECENCY_TAU_DAYS})
+            ), 0) AS trait_recency_sum
+        FROM user_persona_metrics
+        WHERE user_id = :user_id
+    ) t
+    CROSS JOIN (
+        SELECT
+            coalesce(sum(exp(-age / {INSIGHT_TAU_DAYS})), 0) AS insight_weight,
+            coalesce(sum(exp(-age / {INSIGHT_TAU_DAYS}) * conf), 0) AS insight_confidence_sum,
+            coalesce(sum(exp(-age / {INSIGHT_RECENT_TAU_DAYS})), 0) AS insight_recent_weight,
+            coalesce(sum(exp(-age / {INSIGHT_RECENT_TAU_DAYS}) * conf), 0) AS insight_recent_confidence_sum
+        FROM (
+            SELECT
+                greatest(extract(epoch FROM now() - created_at), 0) / 86400.0 AS age,
+                coalesce(confidence, 0.6) AS conf
+            FROM behavioral_insights
+            WHERE user_id = :user_id
+              AND created_at >= now() - make_interval(days => :insight_horizon)
+        ) ins
+    ) i
+    CROSS JOIN (
+        SELECT
+            coalesce(sum(w), 0) AS reflection_weight,
+            coalesce(sum(CASE WHEN sentiment IS NOT NULL THEN w ELSE 0 END), 0) AS reflection_sentiment_weight
+        FROM (
+            SELECT
+                exp(-greatest(extract(epoch FROM now() - created_at), 0) / 86400.0 / {REFLECTION_TAU_DAYS}) AS w,
+                sentiment
+            FROM reflection_logs
+            WHERE user_id = :user_id
+              AND created_at >= now() - make_interval(days => :reflection_horizon)
+        ) ref
+    ) r
+    CROSS JOIN (
+        SELECT
+            coalesce(sum(w), 0) AS external_weight,
+            coalesce(sum(w * coalesce(confidence_weight, 0.1)), 0) AS external_confidence_weight_sum
+        FROM (
+            SELECT
+                exp(-greatest(extract(epoch FROM now() - created_at), 0) / 86400.0 / {EXTERNAL_TAU_DAYS}) AS w,
+                confidence_weight
+            FROM external_inputs
+            WHERE user_id = :user_id
+              AND created_at >= now() - make_interval(days => :external_horizon)
+        ) ext
+    ) e
+    """
+)
+
+
+async def rebuild_confidence_aggregates(db: AsyncSession, user_id: UUID) -> ConfidenceAggregates:
+    """Recompute the user's aggregates from the source tables and store them."""
+    now = datetime.now(timezone.utc)
+    params = {
+        "user_id": user_id,
+        "slang_patterns": [f"%{marker}%" for marker in CONVERSATION_SLANG_MARKERS],
+        "message_horizon": int(CONVERSATION_TAU_DAYS * REBUILD_HORIZON_TAUS),
+        "insight_horizon": int(INSIGHT_TAU_DAYS * REBUILD_HORIZON_TAUS),
+        "reflection_horizon": int(REFLECTION_TAU_DAYS * REBUILD_HORIZON_TAUS),
+        "external_horizon": int(EXTERNAL_TAU_DAYS * REBUILD_HORIZON_TAUS),
+    }
+    totals = dict((await db.execute(_REBUILD_SQL, params)).mappings().one())
+
+    from app.db.models import ExternalInput
+
+    recent_inputs = await db.execute(
+        select(ExternalInput.content)
+        .where(
+            ExternalInput.user_id == user_id,
+            ExternalInput.created_at >= now - timedelta(days=EXTERNAL_TAU_DAYS),
+        )
+        .order_by(ExternalInput.created_at.desc())
+        .limit(EXTERNAL_RECENT_INPUTS)
+    )
+    totals["external_recent_tokens"] = [external_tokens(content) for (content,) in recent_inputs.all()]
+    aggregates = ConfidenceAggregates.from_values(totals, decayed_at=None, now=now)
+
+    values = {name: getattr(aggregates, name) for name in totals}
+    stmt = insert(UserConfidenceAggregate).values(
+        user_id=user_id,
+        decayed_at=func.now(),
+        rebuilt_at=func.now(),
+        **values,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserConfidenceAggregate.user_id],
+        set_={"decayed_at": func.now(), "rebuilt_at": func.now(), **values},
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+        logger.info(f"🧮 Rebuilt confidence aggregates for user {user_id}")
+    except Exception as e:
+        logger.warning("⚠️ Could not store rebuilt confidence aggregates: %s", e)
+        await db.rollback()
+    return aggregates
+
+
+def _decayed(column_name: str) -> Any:
+    column = getattr(UserConfidenceAggregate, column_name)
+    age_days = func.greatest(func.extract("epoch", func.now() - UserConfidenceAggregate.decayed_at), 0) / 86400.0
+    return column * func.exp(-age_days / DECAY_TAU_DAYS[column_name])
+
+
+async def _apply_update(db: AsyncSession, user_id: UUID, increments: Dict[str, float], **values: Any) -> None:
+    """Decay every total to now() and add increments, atomically, in the caller's transaction.
+
+    Users without a row are skipped; their first read rebuilds from the source
+    tables, which already contain the record being added. Failures roll back
+    only a savepoint, so the caller's write never depends on the aggregates.
+    """
+    assignments: Dict[str, Any] = {name: _decayed(name) for name in DECAY_TAU_DAYS}
+    for name, amount in increments.items():
+        base = assignments.get(name, getattr(UserConfidenceAggregate, name))
+        assignments[name] = base + amount
+    assignments.update(values)
+    assignments["decayed_at"] = func.now()
+
+    try:
+        async with db.begin_nested():
+            await db.execute(
+                update(UserConfidenceAggregate)
+                .where(UserConfidenceAggregate.user_id == user_id)
+                .values(**assignments)
+                .execution_options(synchronize_session=False)
+            )
+    except Exception as e:
+        logger.warning("⚠️ Skipping confidence aggregate update for user %s: %s", user_id, e)
+
+
+async def record_user_message(db: AsyncSession, user_id: UUID, content: Optional[str]) -> None:
+    length = message_length(content)
+    await _apply_update(
+        db,
+        user_id,
+        {
+            "message_weight": 1.0,
+            "message_slang_weight": 1.0 if has_conversation_slang(content) else 0.0,
+            "message_length_sum": float(length),
+            "message_length_sq_sum": float(length * length),
+        },
+    )
+
+
+async def record_behavioral_insight(db: AsyncSession, user_id: UUID, confidence: Optional[float]) -> None:
+    value = float(confidence if confidence is not None else 0.6)
+    await _apply_update(
+        db,
+        user_id,
+        {
+            "insight_weight": 1.0,
+            "insight_confidence_sum": value,
+            "insight_recent_weight": 1.0,
+            "insight_recent_confidence_sum": value,
+        },
+    )
+
+
+async def record_external_input(
+    db: AsyncSession,
+    user_id: UUID,
+    content: Optional[str],
+    confidence_weight: Optional[float],
+) -> None:
+    newest = literal([external_tokens(content)], JSONB)
+    recent = newest.op("||")(UserConfidenceAggregate.external_recent_tokens)
+    await _apply_update(
+        db,
+        user_id,
+        {
+            "external_weight": 1.0,
+            "external_confidence_weight_sum": float(confidence_weight if confidence_weight is not None else 0.1),
+        },
+        external_recent_tokens=func.jsonb_path_query_array(
+            recent, literal_column(f"'$[0 to {EXTERNAL_RECENT_INPUTS - 1}]'::jsonpath")
+        ),
+    )
+
+
+async def refresh_trait_aggregates(db: AsyncSession, user_id: UUID) -> None:
+    """Recompute the trait totals after persona metrics changed (a user has a few dozen traits)."""
+    age_days = func.floor(
+        func.greatest(func.extract("epoch", func.now() - UserPersonaMetric.last_updated), 0) / 86400.0
+    )
+
+    def _total(expression: Any) -> Any:
+        return select(expression).where(UserPersonaMetric.user_id == user_id).scalar_subquery()
+
+    count_q = _total(func.count(UserPersonaMetric.id))
+    confidence_q = _total(func.coalesce(func.sum(func.coalesce(UserPersonaMetric.confidence, 0.0)), 0.0))
+    recency_q = _total(func.coalesce(func.sum(func.exp(-age_days / TRAIT_RECENCY_TAU_DAYS)), 0.0))
+    await _apply_update(
+        db,
+        user_id,
+        {},
+        trait_count=count_q,
+        trait_confidence_sum=confidence_q,
+        trait_recency_sum=recency_q,
+    )
+
+
+async def reset_confidence_aggregates(db: AsyncSession, user_id: UUID) -> None:
+    """Drop the user's row after bulk deletes or backfills; the next read rebuilds it."""
+    await db.execute(delete(UserConfidenceAggregate).where(UserConfidenceAggregate.user_id == user_id))
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
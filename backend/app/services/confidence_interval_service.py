@@ -5,15 +5,14 @@ from __future__ import annotations
 import math
 import statistics
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from uuid import UUID
 
-from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import BehavioralInsight, ExternalInput, Message, ReflectionLog, UserPersonaMetric
+from app.services.confidence_aggregate_service import ConfidenceAggregates, load_confidence_aggregates
 
 SOURCE_WEIGHTS: Dict[str, float] = {
     "conversations": 0.40,
@@ -23,6 +22,10 @@ SOURCE_WEIGHTS: Dict[str, float] = {
     "external_inputs": 0.10,
 }
 
+# Decayed evidence below this weight counts as "nothing in the window":
+# one record exactly one time constant old weighs exp(-1).
+_PRESENCE_WEIGHT = math.exp(-1.0)
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,15 +50,28 @@ async def compute_confidence_interval(
     db: AsyncSession,
     user_id: UUID,
     message_text: str,
+    aggregates: Optional[ConfidenceAggregates] = None,
 ) -> ConfidenceIntervalResult:
-    """Fuse all mandatory sources into a confidence interval and generation controls."""
-    timeline_score, timeline_details = await _score_timeline_with_details(db, user_id)
+    """Fuse all mandatory sources into a confidence interval and generation controls.
+
+    All five sources are scored from the user's incrementally maintained
+    aggregates, so this costs one row lookup instead of a scan per source.
+    """
+    if aggregates is None:
+        try:
+            aggregates = await load_confidence_aggregates(db, user_id)
+        except Exception as exc:
+            logger.warning("⚠️ Confidence aggregates unavailable, using conservative scores: %s", exc)
+            await db.rollback()
+            aggregates = ConfidenceAggregates(as_of=datetime.now(timezone.utc))
+
+    timeline_score, timeline_details = _score_timeline_with_details(aggregates)
     source_scores = {
-        "conversations": await _score_conversations(db, user_id),
-        "traits": await _score_traits(db, user_id),
+        "conversations": _score_conversations(aggregates),
+        "traits": _score_traits(aggregates),
         "timeline_reflections": timeline_score,
-        "reflection_summaries": await _score_reflections(db, user_id),
-        "external_inputs": await _score_external_inputs(db, user_id, message_text),
+        "reflection_summaries": _score_reflections(aggregates),
+        "external_inputs": _score_external_inputs(aggregates, message_text),
     }
 
     center = 0.0
@@ -122,86 +138,36 @@ async def build_confidence_explainability(
     }
 
 
-async def _score_conversations(db: AsyncSession, user_id: UUID) -> float:
-    now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(days=45)
-
-    stmt = (
-        select(Message.content, Message.created_at)
-        .where(
-            Message.user_id == user_id,
-            Message.role == "user",
-            Message.created_at >= cutoff,
-        )
-        .order_by(Message.created_at.desc())
-        .limit(120)
-    )
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    if not rows:
+def _score_conversations(aggregates: ConfidenceAggregates) -> float:
+    count = aggregates.message_weight
+    if count < _PRESENCE_WEIGHT:
         return 0.05
 
-    count_score = _clamp(len(rows) / 120.0, 0.0, 1.0)
-
-    slang_markers = ["idk", "tbh", "ngl", "bro", "not gonna lie", "kinda", "man"]
-    hits = 0
-    lengths: List[int] = []
-
-    for content, created_at in rows:
-        text = (content or "").lower()
-        if any(marker in text for marker in slang_markers):
-            hits += 1
-        lengths.append(len(text.split()))
+    count_score = _clamp(count / 120.0, 0.0, 1.0)
+    slang_consistency = _clamp(aggregates.message_slang_weight / count, 0.0, 1.0)
 
-    slang_consistency = hits / max(len(rows), 1)
     length_stability = 1.0
-    if len(lengths) > 1:
-        mean_len = sum(lengths) / len(lengths)
-        variance = statistics.pvariance(lengths)
+    if count > 1.0:
+        mean_len = aggregates.message_length_sum / count
+        variance = max((aggregates.message_length_sq_sum / count) - (mean_len * mean_len), 0.0)
         cv = math.sqrt(variance) / max(mean_len, 1.0)
         length_stability = _clamp(1.0 - cv, 0.0, 1.0)
 
     return _clamp((0.50 * count_score) + (0.30 * slang_consistency) + (0.20 * length_stability), 0.0, 1.0)
 
 
-async def _score_traits(db: AsyncSession, user_id: UUID) -> float:
-    stmt = select(UserPersonaMetric.confidence, UserPersonaMetric.last_updated).where(UserPersonaMetric.user_id == user_id)
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    if not rows:
+def _score_traits(aggregates: ConfidenceAggregates) -> float:
+    if aggregates.trait_count <= 0:
         return 0.05
 
-    avg_conf = statistics.mean(float(row[0] or 0.0) for row in rows)
-    now = datetime.now(timezone.utc)
-    recency_weights: List[float] = []
-    for _, updated_at in rows:
-        if updated_at is None:
-            recency_weights.append(0.5)
-            continue
-        age_days = max((now - _ensure_utc(updated_at)).days, 0)
-        recency_weights.append(math.exp(-age_days / 30.0))
-
-    recency = statistics.mean(recency_weights) if recency_weights else 0.5
+    avg_conf = aggregates.trait_confidence_sum / aggregates.trait_count
+    recency = aggregates.trait_recency_sum / aggregates.trait_count
     return _clamp((0.75 * avg_conf) + (0.25 * recency), 0.0, 1.0)
 
 
-async def _score_timeline_with_details(db: AsyncSession, user_id: UUID) -> tuple[float, Dict[str, float | bool]]:
-    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
-    stmt = (
-        select(BehavioralInsight.confidence, BehavioralInsight.created_at)
-        .where(
-            BehavioralInsight.user_id == user_id,
-            BehavioralInsight.created_at >= cutoff,
-        )
-        .order_by(BehavioralInsight.created_at.desc())
-        .limit(80)
-    )
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    if not rows:
+def _score_timeline_with_details(aggregates: ConfidenceAggregates) -> tuple[float, Dict[str, float | bool]]:
+    total_weight = aggregates.insight_weight
+    if total_weight < _PRESENCE_WEIGHT:
         return 0.05, {
             "applied": False,
             "recent_avg": 0.0,
@@ -209,94 +175,61 @@ async def _score_timeline_with_details(db: AsyncSession, user_id: UUID) -> tuple
             "override_strength": 0.0,
         }
 
-    conf_avg = statistics.mean(float(row[0] or 0.6) for row in rows)
-    density = _clamp(len(rows) / 80.0, 0.0, 1.0)
-
-    now = datetime.now(timezone.utc)
-    recent_bucket: List[float] = []
-    older_bucket: List[float] = []
-    for confidence, created_at in rows:
-        value = float(confidence or 0.6)
-        if created_at is None:
-            older_bucket.append(value)
-            continue
-        age_days = max((now - _ensure_utc(created_at)).days, 0)
-        if age_days <= 7:
-            recent_bucket.append(value)
-        else:
-            older_bucket.append(value)
-
-    recent_avg = statistics.mean(recent_bucket) if recent_bucket else conf_avg
-    older_avg = statistics.mean(older_bucket) if older_bucket else conf_avg
+    conf_avg = aggregates.insight_confidence_sum / total_weight
+    density = _clamp(total_weight / 80.0, 0.0, 1.0)
+
+    # The 7-day decay isolates recent insights; the 30-day total minus it
+    # weights older ones (exp(-a/30) - exp(-a/7) is never negative).
+    recent_weight = aggregates.insight_recent_weight
+    older_weight = total_weight - recent_weight
+    has_recent = recent_weight >= _PRESENCE_WEIGHT
+    has_older = older_weight >= _PRESENCE_WEIGHT
+
+    recent_avg = (aggregates.insight_recent_confidence_sum / recent_weight) if has_recent else conf_avg
+    older_avg = (
+        (aggregates.insight_confidence_sum - aggregates.insight_recent_confidence_sum) / older_weight
+        if has_older
+        else conf_avg
+    )
     delta = recent_avg - older_avg
     # Recency override: recent shifts dominate when there is meaningful change.
     override_strength = _clamp(abs(delta) * 1.8, 0.0, 0.45)
-    recency_blend = _clamp(0.55 + (0.35 if recent_bucket else 0.0), 0.0, 0.9)
+    recency_blend = _clamp(0.55 + (0.35 if has_recent else 0.0), 0.0, 0.9)
     recency_weighted = (recent_avg * recency_blend) + (older_avg * (1.0 - recency_blend))
 
     base_score = _clamp((0.65 * conf_avg) + (0.35 * density), 0.0, 1.0)
     overridden = _clamp((base_score * (1.0 - override_strength)) + (recency_weighted * override_strength), 0.0, 1.0)
 
     return overridden, {
-        "applied": bool(recent_bucket and older_bucket and abs(delta) > 0.06),
+        "applied": bool(has_recent and has_older and abs(delta) > 0.06),
         "recent_avg": round(recent_avg, 4),
         "older_avg": round(older_avg, 4),
         "override_strength": round(override_strength, 4),
     }
 
 
-async def _score_reflections(db: AsyncSession, user_id: UUID) -> float:
-    cutoff = datetime.now(timezone.utc) - timedelta(days=45)
-    stmt = (
-        select(ReflectionLog.sentiment, ReflectionLog.created_at)
-        .where(
-            ReflectionLog.user_id == user_id,
-            ReflectionLog.created_at >= cutoff,
-        )
-        .order_by(ReflectionLog.created_at.desc())
-        .limit(60)
-    )
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    if not rows:
+def _score_reflections(aggregates: ConfidenceAggregates) -> float:
+    count = aggregates.reflection_weight
+    if count < _PRESENCE_WEIGHT:
         return 0.05
 
-    density = _clamp(len(rows) / 60.0, 0.0, 1.0)
-    sentiment_defined = sum(1 for sentiment, _ in rows if sentiment is not None) / max(len(rows), 1)
+    density = _clamp(count / 60.0, 0.0, 1.0)
+    sentiment_defined = _clamp(aggregates.reflection_sentiment_weight / count, 0.0, 1.0)
     return _clamp((0.60 * density) + (0.40 * sentiment_defined), 0.0, 1.0)
 
 
-async def _score_external_inputs(db: AsyncSession, user_id: UUID, message_text: str) -> float:
-    cutoff = datetime.now(timezone.utc) - timedelta(days=60)
-    stmt = (
-        select(ExternalInput.content, ExternalInput.created_at, ExternalInput.confidence_weight)
-        .where(
-            ExternalInput.user_id == user_id,
-            ExternalInput.created_at >= cutoff,
-        )
-        .order_by(ExternalInput.created_at.desc())
-        .limit(40)
-    )
-    try:
-        result = await db.execute(stmt)
-        rows = result.all()
-    except Exception as exc:
-        # External input memory is optional; return conservative score if table is unavailable.
-        logger.warning("Skipping external input scoring: %s", exc)
-        await db.rollback()
+def _score_external_inputs(aggregates: ConfidenceAggregates, message_text: str) -> float:
+    count = aggregates.external_weight
+    if count < _PRESENCE_WEIGHT:
         return 0.05
 
-    if not rows:
-        return 0.05
-
-    density = _clamp(len(rows) / 40.0, 0.0, 1.0)
-    avg_weight = statistics.mean(float(weight or 0.1) for _, _, weight in rows)
+    density = _clamp(count / 40.0, 0.0, 1.0)
+    avg_weight = aggregates.external_confidence_weight_sum / count
 
     msg_tokens = set((message_text or "").lower().split())
     overlap_scores: List[float] = []
-    for content, _, _ in rows[:12]:
-        ext_tokens = set((content or "").lower().split())
+    for tokens in aggregates.external_recent_tokens:
+        ext_tokens = set(tokens)
         if not ext_tokens:
             continue
         overlap_scores.append(len(msg_tokens & ext_tokens) / len(ext_tokens))
@@ -350,16 +283,5 @@ def controls_for_tier(tier: str) -> Dict[str, float | bool]:
     }
 
 
-async def _score_timeline(db: AsyncSession, user_id: UUID) -> float:
-    score, _ = await _score_timeline_with_details(db, user_id)
-    return score
-
-
-def _ensure_utc(dt: datetime) -> datetime:
-    if dt.tzinfo is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc)
-
-
 def _clamp(value: float, low: float = 0.0, high: float = 1.0) -> float:
     return max(low, min(high, float(value)))
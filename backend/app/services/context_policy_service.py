@@ -6,6 +6,7 @@ import re
 from dataclasses import dataclass
 from typing import Optional
 
+from app.services.message_features import MessageFeatures, ensure_features
 
 PROFESSIONAL_TASK_TYPES = {
     "email_draft",
@@ -26,11 +27,16 @@ class ContextPolicyDecision:
     allow_imperfect_grammar: bool
 
 
-def classify_response_context(message: str, task_type: Optional[str] = None) -> str:
+def classify_response_context(
+    message: str,
+    task_type: Optional[str] = None,
+    features: Optional[MessageFeatures] = None,
+) -> str:
     if task_type in PROFESSIONAL_TASK_TYPES:
         return "professional"
 
-    text = (message or "").strip().lower()
+    features = ensure_features((message or "").strip(), features)
+    text = features.lower.strip()
     if not text:
         return "casual"
 
@@ -50,8 +56,7 @@ def classify_response_context(message: str, task_type: Optional[str] = None) ->
     if any(re.search(pattern, text) for pattern in professional_patterns):
         return "professional"
 
-    casual_markers = ["bro", "idk", "tbh", "ngl", "lol", "nah", "fr"]
-    if any(marker in text for marker in casual_markers):
+    if features.has("context.casual"):
         return "casual"
 
     return "casual"
@@ -0,0 +1,137 @@
+"""ETags and conditional GETs for the frontend's polled read endpoints.
+
+The dashboard polls the persona profile and metrics, the system state card,
+the analytics timeline and mirror telemetry, and each poll used to rebuild
+its whole payload. Every user now has a data version (`user_data_versions`)
+that database triggers bump whenever a table these endpoints read is written
+(migration 0020). The ETag of a response is derived from that version, the
+endpoint and its parameters. When the client sends it back in If-None-Match
+and nothing has been written since, the endpoint answers 304 after one
+primary-key lookup instead of recomputing.
+
+Payloads that also depend on the clock (relative dates, "learning active")
+add `time_bucket()` to their ETag parameters, so they are recomputed at least
+every DATA_VERSION_TIME_BUCKET_SECONDS even without writes.
+
+If the version cannot be read (e.g. the migration has not run), the endpoint
+responds normally without an ETag.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import UserDataVersion
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_TIME_BUCKET_SECONDS = max(1, int(os.getenv("DATA_VERSION_TIME_BUCKET_SECONDS", "300")))
+# Browsers may store the response but must revalidate it with If-None-Match before reuse.
+CACHE_CONTROL = "private, no-cache"
+
+
+async def get_data_version(db: AsyncSession, user_id: UUID) -> int:
+    result = await db.execute(select(UserDataVersion.version).where(UserDataVersion.user_id == user_id))
+    return int(result.scalar_one_or_none() or 0)
+
+
+def time_bucket(now: Optional[float] = None) -> int:
+    return int((time.time() if now is None else now) // DATA_VERSION_TIME_BUCKET_SECONDS)
+
+
+def make_etag(scope: str, user_id: UUID, version: int, *parts: Any) -> str:
+    """Weak ETag for a payload built from `version` of the user's data with the given parameters."""
+    key = "|".join([scope, str(user_id), *(str(part) for part in parts)])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class ConditionalGetStats:
+    """Per-endpoint counts of requests, revalidations and 304s."""
+
+    def __init__(self):
+        self._scopes: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "revalidations": 0, "not_modified": 0, "errors": 0}
+        )
+
+    def record(self, scope: str, revalidation: bool = False, not_modified: bool = False, error: bool = False) -> None:
+        counts = self._scopes[scope]
+        counts["requests"] += 1
+        counts["revalidations"] += int(revalidation)
+        counts["not_modified"] += int(not_modified)
+        counts["errors"] += int(error)
+
+    def clear(self) -> None:
+        self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = sum(counts["requests"] for counts in self._scopes.values())
+        not_modified = sum(counts["not_modified"] for counts in self._scopes.values())
+        return {
+            "requests": requests,
+            "not_modified": not_modified,
+            "hit_rate": round(not_modified / requests, 3) if requests else 0.0,
+            "endpoints": {
+                scope: {
+                    **counts,
+                    "hit_rate": round(counts["not_modified"] / counts["requests"], 3) if counts["requests"] else 0.0,
+                }
+                for scope, counts in self._scopes.items()
+            },
+        }
+
+
+conditional_get_stats = ConditionalGetStats()
+
+
+async def not_modified_response(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user_id: UUID,
+    scope: str,
+    *parts: Any,
+) -> Optional[Response]:
+    """A 304 response if the client's copy is current; otherwise None, with the ETag set on `response`."""
+    if_none_match = request.headers.get("if-none-match")
+    try:
+        version = await get_data_version(db, user_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Data version lookup failed for user {user_id}, serving without ETag: {e}")
+        await db.rollback()
+        conditional_get_stats.record(scope, revalidation=bool(if_none_match), error=True)
+        return None
+
+    etag = make_etag(scope, user_id, version, *parts)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        conditional_get_stats.record(scope, revalidation=True, not_modified=True)
+        return Response(status_code=304, headers=headers)
+
+    conditional_get_stats.record(scope, revalidation=bool(if_none_match))
+    response.headers.update(headers)
+    return None
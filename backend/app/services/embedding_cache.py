@@ -0,0 +1,248 @@
+"""Content-addressed cache for message embeddings.
+
+Short messages ("ok", "idk", "thanks") come up all the time, and embedding
+each one again would be wasted provider calls. Vectors are keyed by a SHA-256
+of the normalized text (whitespace collapsed, case-folded) together with the
+model name and dimension count. There are two tiers:
+
+- an in-process LRU, bounded by EMBEDDING_CACHE_ENTRIES;
+- a fixed-size, memory-mapped file of float32 slots, bounded by
+  EMBEDDING_CACHE_DISK_MB. It survives restarts and is shared by every worker
+  process on the host through the page cache.
+
+The file is a small header followed by an open-addressed table. Each slot
+holds the key digest, a CRC32 and the vector. Writers take an exclusive flock
+while they write. Readers take no lock and treat a CRC mismatch (a slot
+caught mid-write) as a miss. When a key's probe window is full, its home slot
+is overwritten. If the file cannot be opened, the cache keeps working from
+memory alone.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts run without cross-process locking
+    fcntl = None
+
+from app.constants import EMBEDDING_DIMENSIONS
+from app.services.llm_gateway import DEFAULT_EMBED_MODEL
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_ENTRIES = max(0, int(os.getenv("EMBEDDING_CACHE_ENTRIES", "4096")))
+EMBEDDING_CACHE_DISK_MB = max(0.0, float(os.getenv("EMBEDDING_CACHE_DISK_MB", "64")))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    str(Path(__file__).resolve().parents[2] / "data" / "embedding_cache.bin"),
+)
+
+_MAGIC = b"EMBC"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIII")  # magic, format version, dimensions, slots
+_DIGEST_SIZE = 32
+_CRC = struct.Struct("<I")
+_EMPTY_DIGEST = bytes(_DIGEST_SIZE)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+class DiskEmbeddingStore:
+    """Fixed-capacity float32 vector table in a shared memory-mapped file."""
+
+    def __init__(self, path: str, dimensions: int, max_bytes: int, probe: int = 8):
+        self.path = Path(path)
+        self.dimensions = dimensions
+        self.probe = probe
+        self.slot_size = _DIGEST_SIZE + _CRC.size + 4 * dimensions
+        self.slots = max(1, (max_bytes - _HEADER.size) // self.slot_size)
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._open()
+
+    def _open(self) -> None:
+        size = _HEADER.size + self.slots * self.slot_size
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.dimensions, self.slots)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        try:
+            with self._locked():
+                self._file.seek(0)
+                if self._file.read(_HEADER.size) != header or os.fstat(self._file.fileno()).st_size != size:
+                    # New file, or one written for another model/size: start empty.
+                    self._file.truncate(0)
+                    self._file.truncate(size)
+                    self._file.seek(0)
+                    self._file.write(header)
+                    self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), size)
+        except Exception:
+            self._file.close()
+            self._file = None
+            raise
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _offsets(self, digest: bytes):
+        home = int.from_bytes(digest[:8], "little") % self.slots
+        for step in range(min(self.probe, self.slots)):
+            yield _HEADER.size + ((home + step) % self.slots) * self.slot_size
+
+    def get(self, digest: bytes) -> Optional[List[float]]:
+        if self._map is None:
+            return None
+        for offset in self._offsets(digest):
+            stored = self._map[offset:offset + _DIGEST_SIZE]
+            if stored == _EMPTY_DIGEST:
+                return None
+            if stored != digest:
+                continue
+            body = self._map[offset + _DIGEST_SIZE + _CRC.size:offset + self.slot_size]
+            (crc,) = _CRC.unpack_from(self._map, offset + _DIGEST_SIZE)
+            if crc != zlib.crc32(digest + body):
+                return None
+            return array("f", body).tolist()
+        return None
+
+    def put(self, digest: bytes, vector: Sequence[float]) -> bool:
+        if self._map is None or len(vector) != self.dimensions:
+            return False
+        body = array("f", vector).tobytes()
+        record = digest + _CRC.pack(zlib.crc32(digest + body)) + body
+        with self._locked():
+            target = None
+            for offset in self._offsets(digest):
+                stored = self._map[offset:offset + _DIGEST_SIZE]
+                if stored == digest or stored == _EMPTY_DIGEST:
+                    target = offset
+                    break
+            if target is None:
+                target = next(self._offsets(digest))
+            self._map[target:target + self.slot_size] = record
+        return True
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class EmbeddingCache:
+    """Memory LRU in front of the shared on-disk store, with hit-rate counters."""
+
+    def __init__(
+        self,
+        max_entries: int = EMBEDDING_CACHE_ENTRIES,
+        disk_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        disk_max_bytes: int = int(EMBEDDING_CACHE_DISK_MB * 1024 * 1024),
+        dimensions: int = EMBEDDING_DIMENSIONS,
+        model: str = DEFAULT_EMBED_MODEL,
+    ):
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.model = model
+        self._disk_path = disk_path if disk_max_bytes > 0 else None
+        self._disk_max_bytes = disk_max_bytes
+        self._disk: Optional[DiskEmbeddingStore] = None
+        self._disk_failed = False
+        self._entries: "OrderedDict[bytes, Tuple[float, ...]]" = OrderedDict()
+        self._stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def key(self, text: str) -> bytes:
+        material = f"{self.model}:{self.dimensions}\0{normalize_text(text)}"
+        return hashlib.sha256(material.encode("utf-8")).digest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        digest = self.key(text)
+        cached = self._entries.get(digest)
+        if cached is not None:
+            self._entries.move_to_end(digest)
+            self._stats["memory_hits"] += 1
+            return list(cached)
+
+        disk = self._store()
+        vector = disk.get(digest) if disk is not None else None
+        if vector is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["disk_hits"] += 1
+        self._remember(digest, vector)
+        return vector
+
+    def put(self, text: str, vector: Sequence[float]) -> None:
+        if len(vector) != self.dimensions:
+            return
+        digest = self.key(text)
+        self._remember(digest, vector)
+        disk = self._store()
+        if disk is not None:
+            try:
+                disk.put(digest, vector)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Embedding cache write failed, continuing in memory: {e}")
+        self._stats["stores"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "disk_slots": self._disk.slots if self._disk is not None else 0,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            **self._stats,
+        }
+
+    def _remember(self, digest: bytes, vector: Sequence[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[digest] = tuple(vector)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store(self) -> Optional[DiskEmbeddingStore]:
+        if self._disk is None and self._disk_path and not self._disk_failed:
+            try:
+                self._disk = DiskEmbeddingStore(self._disk_path, self.dimensions, self._disk_max_bytes)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Embedding disk cache unavailable, using memory only: {e}")
+                self._disk_failed = True
+        return self._disk
+
+
+embedding_cache = EmbeddingCache()
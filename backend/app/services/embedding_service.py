@@ -1,19 +1,117 @@
-import os
-from mistralai import Mistral
+import asyncio
 import logging
+import os
+import random
+from typing import Dict, List, Optional, Sequence
+
+from app.services import llm_gateway
+from app.services.embedding_cache import embedding_cache
 
 logger = logging.getLogger(__name__)
 
-mistral_client = None
+EMBEDDING_MAX_CHARS = max(1, int(os.getenv("EMBEDDING_MAX_CHARS", "8000")))
+EMBEDDING_MAX_ATTEMPTS = max(1, int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "5")))
+EMBEDDING_BACKOFF_BASE_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_BASE_SECONDS", "1.0"))
+EMBEDDING_BACKOFF_MAX_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_MAX_SECONDS", "60.0"))
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def prepare_text(text: str) -> str:
+    """Normalize a message for embedding and cut it to the provider-safe length."""
+    return " ".join((text or "").split())[:EMBEDDING_MAX_CHARS]
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "raw_response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "raw_response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, llm_gateway.LLMUnavailableError):
+        return False
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = _status_code(error)
+    return status is None or status in _RETRYABLE_STATUS
 
-def get_client():
-    global mistral_client
-    if mistral_client is None:
-        api_key = os.getenv("MISTRAL_API_KEY")
-        if not api_key:
-            raise ValueError("MISTRAL_API_KEY not found")
-        mistral_client = Mistral(api_key=api_key)
-    return mistral_client
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Seconds to wait before retry number `attempt` (1-based).
+
+    A Retry-After header from the provider wins; otherwise exponential backoff
+    with full jitter, capped at EMBEDDING_BACKOFF_MAX_SECONDS.
+    """
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, EMBEDDING_BACKOFF_MAX_SECONDS)
+    ceiling = min(EMBEDDING_BACKOFF_MAX_SECONDS, EMBEDDING_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+async def embed_batch(
+    texts: Sequence[str],
+    max_attempts: int = EMBEDDING_MAX_ATTEMPTS,
+) -> List[Optional[List[float]]]:
+    """Embed texts in one provider call, backing off on rate limits and transient errors.
+
+    Raises the last error once attempts run out (or immediately when the
+    gateway is not configured), so batch callers can leave rows for later.
+    """
+    if not texts:
+        return []
+    prepared = [prepare_text(text) for text in texts]
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await llm_gateway.embed_texts(prepared)
+        except Exception as e:
+            if attempt >= max_attempts or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            logger.warning(
+                f"⏳ Embedding batch of {len(prepared)} failed (status={_status_code(e)}), "
+                f"retrying in {delay:.1f}s: {e}"
+            )
+            await asyncio.sleep(delay)
+
+
+async def embed_texts_cached(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """Embed texts through the content-addressed cache; only misses reach the provider.
+
+    Repeats inside one call are embedded once. Errors from `embed_batch`
+    propagate as they do there.
+    """
+    prepared = [prepare_text(text) for text in texts]
+    vectors: List[Optional[List[float]]] = [embedding_cache.get(text) for text in prepared]
+    missing: Dict[bytes, List[int]] = {}
+    for index, (text, vector) in enumerate(zip(prepared, vectors)):
+        if vector is None:
+            missing.setdefault(embedding_cache.key(text), []).append(index)
+    if not missing:
+        return vectors
+
+    indexes = list(missing.values())
+    fresh = await embed_batch([prepared[group[0]] for group in indexes])
+    for group, vector in zip(indexes, fresh):
+        if not vector:
+            continue
+        embedding_cache.put(prepared[group[0]], vector)
+        for index in group:
+            vectors[index] = vector
+    return vectors
 
 
 async def generate_embedding(text: str):
@@ -23,19 +121,14 @@ async def generate_embedding(text: str):
     """
 
     try:
-        client = get_client()
-
-        response = client.embeddings.create(
-            model="mistral-embed",
-            inputs=[text]
-        )
+        vectors = await embed_texts_cached([text])
 
-        embedding = response.data[0].embedding
+        embedding = vectors[0] if vectors else None
         if embedding is None:
-            print("⚠️ Embedding failed (rate limit)")
+            logger.warning("⚠️ Embedding failed (rate limit)")
             return None
         return embedding
 
     except Exception as e:
         logger.error(f"Embedding generation failed: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,317 @@
+"""Background worker that fills Message.embedding in batches.
+
+Messages are stored with embedding=None so the chat path never waits on the
+embedding provider. `crud.create_message` notifies this worker. The worker
+waits a moment so that messages arriving together share a batch, then drains
+every message that still lacks a vector:
+
+- each page is read without row locks and the read transaction is closed
+  before the provider is called, so no connection sits idle in a transaction
+  (and no delete waits) while `embed_batch` retries and backs off;
+- each page is split into provider calls bounded by both input count and
+  total characters;
+- vectors are written back as one executemany UPDATE per page, guarded by
+  `embedding IS NULL` so a message embedded meanwhile by another process (or
+  the backfill script) is left alone, then appended to any loaded in-process
+  memory index.
+
+Texts already in the embedding cache skip the provider. Rate limits and
+transient provider errors are retried with backoff inside
+`embedding_service.embed_batch`. If they still fail, the page's remaining
+rows stay NULL and are picked up again on the next poll. Rows the provider
+returns no vector for, or rejects outright, have `embedding_attempts`
+incremented and are no longer selected once it reaches
+EMBEDDING_MAX_ROW_ATTEMPTS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message
+from app.services import llm_gateway
+from app.services.embedding_service import embed_texts_cached, is_retryable, prepare_text
+from app.services.memory_index import memory_index
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "32")))
+EMBEDDING_BATCH_MAX_CHARS = max(1, int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "24000")))
+EMBEDDING_PAGE_SIZE = max(1, int(os.getenv("EMBEDDING_PAGE_SIZE", "128")))
+EMBEDDING_COALESCE_SECONDS = float(os.getenv("EMBEDDING_COALESCE_SECONDS", "0.5"))
+EMBEDDING_POLL_SECONDS = float(os.getenv("EMBEDDING_POLL_SECONDS", "30"))
+EMBEDDING_MAX_ROW_ATTEMPTS = max(1, int(os.getenv("EMBEDDING_MAX_ROW_ATTEMPTS", "3")))
+
+Cursor = Tuple[datetime, UUID]
+
+
+@dataclass
+class EmbeddingPass:
+    """Outcome of one `embed_pending_messages` page."""
+
+    selected: int = 0
+    embedded: int = 0
+    skipped: int = 0
+    failed: int = 0
+    calls: int = 0
+    cursor: Optional[Cursor] = None
+    error: Optional[str] = None
+
+
+def split_batches(
+    texts: Sequence[str],
+    max_items: int = EMBEDDING_BATCH_SIZE,
+    max_chars: int = EMBEDDING_BATCH_MAX_CHARS,
+) -> List[range]:
+    """Index ranges for provider calls, each within both the item and character budget."""
+    batches: List[range] = []
+    start, chars = 0, 0
+    for index, text in enumerate(texts):
+        size = len(text)
+        if index > start and (index - start >= max_items or chars + size > max_chars):
+            batches.append(range(start, index))
+            start, chars = index, 0
+        chars += size
+    if start < len(texts):
+        batches.append(range(start, len(texts)))
+    return batches
+
+
+def pending_messages_query(limit: int, after: Optional[Cursor] = None, user_id: Optional[UUID] = None):
+    stmt = (
+        select(Message.id, Message.user_id, Message.role, Message.created_at, Message.content)
+        .where(
+            Message.embedding.is_(None),
+            Message.embedding_attempts < EMBEDDING_MAX_ROW_ATTEMPTS,
+            func.length(func.btrim(Message.content)) > 0,
+        )
+        .order_by(Message.created_at, Message.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) > tuple_(*after))
+    if user_id is not None:
+        stmt = stmt.where(Message.user_id == user_id)
+    return stmt
+
+
+_messages = Message.__table__
+
+# Only fills rows that are still empty; another writer may have embedded them since the read.
+store_embedding_stmt = (
+    update(_messages)
+    .where(_messages.c.id == bindparam("message_id"), _messages.c.embedding.is_(None))
+    .values(embedding=bindparam("vector"))
+)
+
+
+def record_failed_attempts_stmt(message_ids: Sequence[UUID]):
+    return (
+        update(_messages)
+        .where(_messages.c.id.in_(list(message_ids)), _messages.c.embedding.is_(None))
+        .values(embedding_attempts=_messages.c.embedding_attempts + 1)
+    )
+
+
+async def embed_pending_messages(
+    db: AsyncSession,
+    limit: int = EMBEDDING_PAGE_SIZE,
+    after: Optional[Cursor] = None,
+    user_id: Optional[UUID] = None,
+    dry_run: bool = False,
+) -> EmbeddingPass:
+    """Embed one page of messages that have no vector yet and commit the vectors.
+
+    Pages are keyed on (created_at, id). Passing the returned cursor back in
+    continues after the last message handled, including any the provider
+    returned no vector for. When a provider call fails with a retryable error,
+    vectors from the earlier calls are still committed. The cursor then stops
+    before the failed rows and `error` is set. Rows without a vector, and rows
+    in a call the provider rejected, count one failed attempt.
+    """
+    outcome = EmbeddingPass(cursor=after)
+    rows = (await db.execute(pending_messages_query(limit, after, user_id))).all()
+    # End the read transaction before any provider call.
+    await db.rollback()
+    outcome.selected = len(rows)
+    if not rows or dry_run:
+        if rows:
+            outcome.cursor = (rows[-1].created_at, rows[-1].id)
+        return outcome
+
+    texts = [prepare_text(row.content) for row in rows]
+    updates: List[Dict[str, Any]] = []
+    embedded_rows = []
+    failed_ids: List[UUID] = []
+    for batch in split_batches(texts, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_CHARS):
+        try:
+            vectors = await embed_texts_cached([texts[i] for i in batch])
+        except Exception as e:
+            if is_retryable(e) or isinstance(e, llm_gateway.LLMUnavailableError):
+                outcome.error = str(e) or type(e).__name__
+                break
+            logger.warning(f"⚠️ Provider rejected {len(batch)} messages for embedding: {e}")
+            failed_ids.extend(rows[i].id for i in batch)
+            outcome.failed += len(batch)
+            outcome.cursor = (rows[batch[-1]].created_at, rows[batch[-1]].id)
+            continue
+        outcome.calls += 1
+        for i, vector in zip(batch, vectors):
+            if vector:
+                updates.append({"message_id": rows[i].id, "vector": vector})
+                embedded_rows.append(rows[i])
+            else:
+                failed_ids.append(rows[i].id)
+                outcome.skipped += 1
+        outcome.cursor = (rows[batch[-1]].created_at, rows[batch[-1]].id)
+
+    if updates:
+        await db.execute(store_embedding_stmt, updates)
+    if failed_ids:
+        await db.execute(record_failed_attempts_stmt(failed_ids))
+    if updates or failed_ids:
+        await db.commit()
+    outcome.embedded = len(updates)
+
+    by_user: Dict[Any, List[Tuple[Any, str, List[float]]]] = {}
+    for row, item in zip(embedded_rows, updates):
+        if row.role != "user":
+            continue
+        by_user.setdefault(row.user_id, []).append((row.id, row.content, item["vector"]))
+    for owner, entries in by_user.items():
+        memory_index.add(owner, entries)
+    return outcome
+
+
+class EmbeddingWorker:
+    """Single background task that drains un-embedded messages on notify or poll."""
+
+    def __init__(
+        self,
+        page_size: int = EMBEDDING_PAGE_SIZE,
+        coalesce_seconds: float = EMBEDDING_COALESCE_SECONDS,
+        poll_seconds: float = EMBEDDING_POLL_SECONDS,
+        session_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.page_size = page_size
+        self.coalesce_seconds = coalesce_seconds
+        self.poll_seconds = poll_seconds
+        self._session_factory = session_factory
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, int] = {
+            "passes": 0,
+            "pages": 0,
+            "provider_calls": 0,
+            "embedded": 0,
+            "skipped": 0,
+            "failed": 0,
+            "failed_pages": 0,
+        }
+        self._last_pass_ms = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        if not llm_gateway.is_available():
+            logger.info("ℹ️ Embedding worker not started: Mistral is not configured")
+            return
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()  # pick up anything left from before the restart
+        self._task = asyncio.create_task(self._run(), name="embedding-worker")
+        logger.info("✅ Embedding worker started (page=%s, batch=%s)", self.page_size, EMBEDDING_BATCH_SIZE)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._wakeup = None
+
+    def notify(self) -> None:
+        """Signal that new messages are waiting; cheap and safe when the worker is off."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def drain(self) -> int:
+        """Embed everything currently pending; returns the number of vectors written."""
+        started = time.perf_counter()
+        cursor: Optional[Cursor] = None
+        embedded = 0
+        self._stats["passes"] += 1
+        while True:
+            async with self._session() as db:
+                outcome = await embed_pending_messages(db, limit=self.page_size, after=cursor)
+            self._stats["pages"] += 1
+            self._stats["provider_calls"] += outcome.calls
+            self._stats["embedded"] += outcome.embedded
+            self._stats["skipped"] += outcome.skipped
+            self._stats["failed"] += outcome.failed
+            embedded += outcome.embedded
+            if outcome.error:
+                self._stats["failed_pages"] += 1
+                self._last_error = outcome.error
+                logger.warning(f"⚠️ Embedding page failed, will retry on next poll: {outcome.error}")
+                break
+            if outcome.selected < self.page_size or outcome.cursor == cursor:
+                break
+            cursor = outcome.cursor
+        self._last_pass_ms = int((time.perf_counter() - started) * 1000)
+        if embedded:
+            logger.info(f"🧠 Embedded {embedded} messages in {self._last_pass_ms}ms")
+        return embedded
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "page_size": self.page_size,
+            "batch_size": EMBEDDING_BATCH_SIZE,
+            "max_row_attempts": EMBEDDING_MAX_ROW_ATTEMPTS,
+            "last_pass_ms": self._last_pass_ms,
+            "last_error": self._last_error,
+            **self._stats,
+        }
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.db.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        wakeup = self._wakeup
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.poll_seconds)
+                await asyncio.sleep(self.coalesce_seconds)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = str(e) or type(e).__name__
+                logger.warning(f"⚠️ Embedding worker pass failed: {e}")
+
+
+embedding_worker = EmbeddingWorker()
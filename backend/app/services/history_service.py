@@ -0,0 +1,128 @@
+"""Conversation-scoped chat history window backed by the messages table.
+
+The LLM only ever sees the last few turns of the current conversation. This
+module keeps those windows for recently active conversations in a bounded LRU
+so hot conversations skip the database. On a miss the window is loaded from
+`messages`, and new turns are appended write-through after they are stored.
+Memory stays flat as the user base grows, and a restarted worker (or a second
+worker) rebuilds the same window from the database.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message
+
+logger = logging.getLogger(__name__)
+
+HISTORY_WINDOW_MESSAGES = max(2, int(os.getenv("HISTORY_WINDOW_MESSAGES", "20")))
+HISTORY_CACHE_CONVERSATIONS = max(1, int(os.getenv("HISTORY_CACHE_CONVERSATIONS", "2048")))
+# Bounds staleness when another worker appends to the same conversation.
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass
+class _Window:
+    turns: Deque[Dict[str, str]]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class ConversationHistoryCache:
+    """Bounded LRU of per-conversation turn windows."""
+
+    def __init__(
+        self,
+        max_conversations: int = HISTORY_CACHE_CONVERSATIONS,
+        window: int = HISTORY_WINDOW_MESSAGES,
+        ttl_seconds: float = HISTORY_CACHE_TTL_SECONDS,
+    ):
+        self.max_conversations = max_conversations
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Window]" = OrderedDict()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    async def get(self, db: AsyncSession, conversation_id: UUID, user_id: UUID) -> List[Dict[str, str]]:
+        """Return a copy of the conversation's recent turns, oldest first."""
+        key = str(conversation_id)
+        entry = self._entries.get(key)
+        if entry is not None and (time.monotonic() - entry.loaded_at) <= self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(entry.turns)
+
+        self._stats["misses"] += 1
+        turns = await self._load(db, conversation_id, user_id)
+        self._store(key, turns)
+        return list(turns)
+
+    def append(self, conversation_id: UUID, role: str, content: str) -> None:
+        """Write-through hook for a message that was just stored.
+
+        Conversations that are not cached are left alone; their next read loads
+        the stored rows, which already include this message.
+        """
+        entry = self._entries.get(str(conversation_id))
+        if entry is None:
+            return
+        entry.turns.append({"role": role, "content": content})
+        self._entries.move_to_end(str(conversation_id))
+
+    def prime(self, conversation_id: UUID, turns: List[Dict[str, str]]) -> None:
+        """Seed a window without a query, e.g. for a conversation that was just created."""
+        self._store(str(conversation_id), turns)
+
+    def invalidate(self, conversation_id: UUID) -> None:
+        self._entries.pop(str(conversation_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "capacity": self.max_conversations, **self._stats}
+
+    async def _load(self, db: AsyncSession, conversation_id: UUID, user_id: UUID) -> List[Dict[str, str]]:
+        result = await db.execute(
+            select(Message.role, Message.content)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.user_id == user_id,
+            )
+            .order_by(Message.created_at.desc())
+            .limit(self.window)
+        )
+        rows = result.all()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def _store(self, key: str, turns: List[Dict[str, str]]) -> None:
+        self._entries[key] = _Window(turns=deque(turns, maxlen=self.window))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_conversations:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+
+history_cache = ConversationHistoryCache()
+
+
+async def get_conversation_history_window(
+    db: AsyncSession,
+    conversation_id: UUID,
+    user_id: UUID,
+) -> List[Dict[str, str]]:
+    return await history_cache.get(db, conversation_id, user_id)
+
+
+def record_history_turn(conversation_id: UUID, role: str, content: Optional[str]) -> None:
+    if content:
+        history_cache.append(conversation_id, role, content)
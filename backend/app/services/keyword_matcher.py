@@ -0,0 +1,100 @@
+"""Compiled multi-pattern keyword matcher.
+
+The chat heuristics ask "which of these markers occur in the message?" for a
+few dozen marker groups. Looping over every marker with `marker in text` costs
+one substring search per marker. `KeywordMatcher` compiles all markers into a
+single trie-shaped regex when it is built (at import for the module-level
+matchers), and one scan reports every category that has a hit.
+
+Markers are matched as plain substrings, the same as `marker in text`,
+including markers that overlap or nest. The alternation runs inside a
+zero-width lookahead, so a match can start at any position. At each position
+it returns the longest marker that starts there. Every other marker that
+starts at that position is a prefix of the longest one, and those prefixes
+are precomputed, so no hit is missed.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Set
+
+
+def _trie_pattern(markers: Iterable[str]) -> str:
+    """Regex for a character trie of markers that prefers the longest match.
+
+    Markers that share a prefix share its branch, so each position is tested
+    against the trie's depth rather than against every marker in turn.
+    """
+    trie: Dict[str, dict] = {}
+    for marker in markers:
+        node = trie
+        for char in marker:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Greedy optional suffix: try longer markers first, fall back to this one.
+            return f"(?:{body})?" if len(branches) > 1 or len(body) > 1 else f"{body}?"
+        return body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Finds which markers of each category occur in a text, in one pass."""
+
+    def __init__(self, categories: Mapping[str, Iterable[str]], case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self._categories_by_marker: Dict[str, Set[str]] = {}
+        for category, markers in categories.items():
+            for marker in markers:
+                if not marker:
+                    continue
+                key = marker if case_sensitive else marker.lower()
+                self._categories_by_marker.setdefault(key, set()).add(category)
+
+        markers_by_length = sorted(self._categories_by_marker, key=len, reverse=True)
+        self._prefixes: Dict[str, List[str]] = {
+            marker: [other for other in markers_by_length if marker.startswith(other)]
+            for marker in markers_by_length
+        }
+        self._pattern = (
+            re.compile("(?=(" + _trie_pattern(markers_by_length) + "))")
+            if markers_by_length
+            else None
+        )
+
+    def matched_markers(self, text: str) -> Set[str]:
+        """Every marker that occurs anywhere in text."""
+        if self._pattern is None or not text:
+            return set()
+        if not self.case_sensitive:
+            text = text.lower()
+        found: Set[str] = set()
+        for longest in {match.group(1) for match in self._pattern.finditer(text)}:
+            found.update(self._prefixes[longest])
+        return found
+
+    def scan(self, text: str) -> Dict[str, FrozenSet[str]]:
+        """Map each category with at least one hit to the markers found."""
+        hits: Dict[str, Set[str]] = {}
+        for marker in self.matched_markers(text):
+            for category in self._categories_by_marker[marker]:
+                hits.setdefault(category, set()).add(marker)
+        return {category: frozenset(markers) for category, markers in hits.items()}
+
+    def categories(self, text: str) -> Set[str]:
+        """Categories with at least one marker in text."""
+        return set(self.scan(text))
+
+    def search(self, text: str) -> bool:
+        """True if any marker occurs in text."""
+        if self._pattern is None or not text:
+            return False
+        return self._pattern.search(text if self.case_sensitive else text.lower()) is not None
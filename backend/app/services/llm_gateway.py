@@ -0,0 +1,315 @@
+"""Shared async gateway for all Mistral model calls.
+
+Every service talks to the provider through this module so that the process
+keeps a single pooled keep-alive HTTP client, applies per-call timeouts and
+bounds the number of in-flight model requests. Nothing here blocks the event
+loop, so one worker can serve many chat turns concurrently.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_MODEL = "mistral-small-latest"
+DEFAULT_EMBED_MODEL = "mistral-embed"
+
+LLM_MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "16")))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_KEEPALIVE_CONNECTIONS = max(1, int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "20")))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when no provider client can be used for a call."""
+
+
+_client: Any = None
+_http_client: Any = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_closing: set = set()
+_in_flight = 0
+_stats: Dict[str, int] = {
+    "calls": 0,
+    "errors": 0,
+    "timeouts": 0,
+}
+
+
+def is_available() -> bool:
+    """True when the SDK is importable and an API key is configured."""
+    if not os.getenv("MISTRAL_API_KEY"):
+        return False
+    try:
+        import mistralai  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def _build_client() -> Any:
+    import httpx
+    from mistralai import Mistral
+
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        raise LLMUnavailableError("MISTRAL_API_KEY not found in environment")
+
+    global _http_client
+    _http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max(LLM_MAX_CONCURRENCY, LLM_KEEPALIVE_CONNECTIONS),
+            max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+    )
+    client = Mistral(
+        api_key=api_key,
+        async_client=_http_client,
+        timeout_ms=int(LLM_TIMEOUT_SECONDS * 1000),
+    )
+    logger.info(
+        "✅ LLM gateway initialized (max_concurrency=%s, keepalive=%s)",
+        LLM_MAX_CONCURRENCY,
+        LLM_KEEPALIVE_CONNECTIONS,
+    )
+    return client
+
+
+def _get_client() -> Any:
+    """Return the shared client, rebuilding it if the event loop changed.
+
+    Pooled connections are bound to the loop that opened them, so a new loop
+    (tests, reloads) gets a fresh pool instead of reusing dead sockets. The
+    old pool is closed rather than left to leak its sockets.
+    """
+    global _client, _http_client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        if _http_client is not None:
+            _retire_http_client(_http_client, _client_loop)
+            _http_client = None
+        _client = _build_client()
+        _client_loop = loop
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _client
+
+
+async def _close_http_client(http_client: Any) -> None:
+    try:
+        await http_client.aclose()
+    except Exception as e:
+        logger.warning("⚠️ Failed to close LLM HTTP client: %s", e)
+
+
+def _retire_http_client(http_client: Any, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Close a client left behind by another event loop.
+
+    A loop still running (in another thread) closes its own client; otherwise
+    it is closed from the current loop.
+    """
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_close_http_client(http_client), loop)
+        return
+    task = asyncio.get_running_loop().create_task(_close_http_client(http_client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+def _timeout_for(timeout_s: Optional[float]) -> float:
+    if timeout_s is None or timeout_s <= 0:
+        return LLM_TIMEOUT_SECONDS
+    return min(float(timeout_s), LLM_TIMEOUT_SECONDS)
+
+
+async def _call(coro_factory, timeout_s: Optional[float]) -> Any:
+    global _in_flight
+    if not is_available():
+        raise LLMUnavailableError("Mistral is not configured")
+
+    client = _get_client()
+    timeout = _timeout_for(timeout_s)
+    assert _semaphore is not None
+    async with _semaphore:
+        _in_flight += 1
+        _stats["calls"] += 1
+        try:
+            return await asyncio.wait_for(coro_factory(client, int(timeout * 1000)), timeout=timeout)
+        except asyncio.TimeoutError:
+            _stats["timeouts"] += 1
+            raise
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _in_flight -= 1
+
+
+async def chat_complete_many(
+    messages: Sequence[Dict[str, str]],
+    *,
+    max_tokens: int,
+    temperature: float,
+    model: str = DEFAULT_CHAT_MODEL,
+    timeout_s: Optional[float] = None,
+    n: Optional[int] = None,
+) -> List[str]:
+    """Run one chat completion and return the stripped text of every choice."""
+
+    async def _run(client, timeout_ms: int):
+        kwargs: Dict[str, Any] = {
+            "model": model,
+            "messages": list(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "timeout_ms": timeout_ms,
+        }
+        if n is not None and n > 1:
+            kwargs["n"] = n
+        return await client.chat.complete_async(**kwargs)
+
+    response = await _call(_run, timeout_s)
+    choices = getattr(response, "choices", None) or []
+    texts: List[str] = []
+    for choice in choices:
+        content = getattr(getattr(choice, "message", None), "content", None)
+        if isinstance(content, str):
+            texts.append(content.strip())
+    return texts
+
+
+async def chat_complete(
+    messages: Sequence[Dict[str, str]],
+    *,
+    max_tokens: int,
+    temperature: float,
+    model: str = DEFAULT_CHAT_MODEL,
+    timeout_s: Optional[float] = None,
+) -> str:
+    """Run one chat completion and return the first choice's text."""
+    texts = await chat_complete_many(
+        messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        model=model,
+        timeout_s=timeout_s,
+    )
+    if not texts:
+        raise ValueError("LLM returned no choices")
+    return texts[0]
+
+
+async def chat_stream(
+    messages: Sequence[Dict[str, str]],
+    *,
+    max_tokens: int,
+    temperature: float,
+    model: str = DEFAULT_CHAT_MODEL,
+    timeout_s: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Stream a chat completion, yielding text deltas as they arrive.
+
+    The timeout bounds opening the stream and each gap between chunks; the
+    concurrency slot is held until the stream is exhausted or closed.
+    """
+    global _in_flight
+    if not is_available():
+        raise LLMUnavailableError("Mistral is not configured")
+
+    client = _get_client()
+    timeout = _timeout_for(timeout_s)
+    assert _semaphore is not None
+    async with _semaphore:
+        _in_flight += 1
+        _stats["calls"] += 1
+        try:
+            stream = await asyncio.wait_for(
+                client.chat.stream_async(
+                    model=model,
+                    messages=list(messages),
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout_ms=int(timeout * 1000),
+                ),
+                timeout=timeout,
+            )
+            async with stream:
+                iterator = stream.__aiter__()
+                while True:
+                    try:
+                        event = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    choices = getattr(getattr(event, "data", None), "choices", None) or []
+                    if not choices:
+                        continue
+                    content = getattr(getattr(choices[0], "delta", None), "content", None)
+                    if isinstance(content, str) and content:
+                        yield content
+        except asyncio.TimeoutError:
+            _stats["timeouts"] += 1
+            raise
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _in_flight -= 1
+
+
+async def embed_texts(
+    texts: Sequence[str],
+    *,
+    model: str = DEFAULT_EMBED_MODEL,
+    timeout_s: Optional[float] = None,
+) -> List[Optional[List[float]]]:
+    """Embed a batch of texts, preserving input order."""
+    if not texts:
+        return []
+
+    async def _run(client, timeout_ms: int):
+        return await client.embeddings.create_async(
+            model=model,
+            inputs=list(texts),
+            timeout_ms=timeout_ms,
+        )
+
+    response = await _call(_run, timeout_s)
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    for position, item in enumerate(getattr(response, "data", None) or []):
+        index = getattr(item, "index", None)
+        if not isinstance(index, int) or not (0 <= index < len(texts)):
+            index = position
+        if index < len(vectors):
+            vectors[index] = getattr(item, "embedding", None)
+    return vectors
+
+
+def get_gateway_stats() -> Dict[str, Any]:
+    """Counters for health checks and load debugging."""
+    return {
+        "available": is_available(),
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "in_flight": _in_flight,
+        **_stats,
+    }
+
+
+async def close_gateway() -> None:
+    """Close the pooled HTTP client (called on application shutdown)."""
+    global _client, _http_client, _client_loop, _semaphore
+    http_client = _http_client
+    _client = None
+    _http_client = None
+    _client_loop = None
+    _semaphore = None
+    if http_client is not None:
+        await _close_http_client(http_client)
+    if _closing:
+        await asyncio.gather(*list(_closing), return_exceptions=True)
@@ -0,0 +1,287 @@
+"""In-process per-user vector index for memory retrieval.
+
+Without it, every `retrieve_memories` call makes a round trip to Postgres
+and searches an ivfflat index that every user shares. A single user's history
+is small enough to keep in memory, so while a user is active their message
+embeddings live here:
+
+- loaded lazily from the embeddings of the user's own messages on their
+  first retrieval;
+- held as a unit-normalized float32 NumPy matrix and searched by brute-force
+  dot product (cosine similarity), which is exact and fast for small users;
+- above MEMORY_INDEX_HNSW_THRESHOLD vectors, also indexed with HNSW when
+  the optional `hnswlib` package is installed;
+- kept current by the embedding worker, which appends vectors as it writes
+  them, and reloaded after MEMORY_INDEX_TTL_SECONDS so writes from other
+  processes show up.
+
+Users are evicted least-recently-used once MEMORY_INDEX_MAX_VECTORS is
+exceeded. `search` returns None whenever the index cannot answer: disabled,
+NumPy missing, the user is too large, or the load failed. Callers then use
+the SQL path.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the SQL path is used instead
+    np = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+MEMORY_INDEX_ENABLED = os.getenv("MEMORY_INDEX_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+MEMORY_INDEX_MAX_VECTORS = max(1, int(os.getenv("MEMORY_INDEX_MAX_VECTORS", "100000")))
+MEMORY_INDEX_MAX_USER_VECTORS = max(1, int(os.getenv("MEMORY_INDEX_MAX_USER_VECTORS", "20000")))
+MEMORY_INDEX_HNSW_THRESHOLD = max(1, int(os.getenv("MEMORY_INDEX_HNSW_THRESHOLD", "5000")))
+MEMORY_INDEX_HNSW_EF = max(1, int(os.getenv("MEMORY_INDEX_HNSW_EF", "64")))
+MEMORY_INDEX_TTL_SECONDS = float(os.getenv("MEMORY_INDEX_TTL_SECONDS", "300"))
+
+IndexEntry = Tuple[Any, str, Sequence[float]]  # (message id, content, embedding)
+
+
+@dataclass
+class UserVectorIndex:
+    """One user's embeddings, searchable by cosine similarity."""
+
+    message_ids: List[Any] = field(default_factory=list)
+    contents: List[str] = field(default_factory=list)
+    matrix: Any = None
+    hnsw: Any = None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def build(cls, entries: Iterable[IndexEntry]) -> "UserVectorIndex":
+        index = cls()
+        index.add(list(entries))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.message_ids)
+
+    def add(self, entries: Sequence[IndexEntry]) -> int:
+        known = set(self.message_ids)
+        fresh = [entry for entry in entries if entry[0] not in known and entry[2] is not None]
+        if not fresh:
+            return 0
+
+        rows = _normalize(np.asarray([entry[2] for entry in fresh], dtype=np.float32))
+        start = len(self.message_ids)
+        self.matrix = rows if self.matrix is None else np.vstack([self.matrix, rows])
+        self.message_ids.extend(entry[0] for entry in fresh)
+        self.contents.extend(entry[1] for entry in fresh)
+
+        if self.hnsw is not None:
+            if self.hnsw.get_max_elements() < len(self.matrix):
+                self.hnsw.resize_index(max(len(self.matrix), 2 * self.hnsw.get_max_elements()))
+            self.hnsw.add_items(rows, np.arange(start, len(self.matrix)))
+        elif hnswlib is not None and len(self.matrix) >= MEMORY_INDEX_HNSW_THRESHOLD:
+            self._build_hnsw()
+        return len(fresh)
+
+    def search(self, query: Sequence[float], limit: int, min_similarity: float) -> List[Tuple[str, float]]:
+        """Top `limit` (content, similarity) pairs at or above min_similarity, best first."""
+        if self.matrix is None or not len(self.matrix) or limit <= 0:
+            return []
+        q = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        k = min(limit, len(self.matrix))
+
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(q, k=k)
+            positions = labels[0]
+            scores = 1.0 - distances[0]  # "ip" space reports 1 - dot product
+        else:
+            sims = self.matrix @ q
+            positions = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+            positions = positions[np.argsort(-sims[positions], kind="stable")]
+            scores = sims[positions]
+
+        return [
+            (self.contents[int(position)], float(score))
+            for position, score in zip(positions, scores)
+            if score >= min_similarity
+        ]
+
+    def _build_hnsw(self) -> None:
+        index = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+        index.init_index(max_elements=max(len(self.matrix), MEMORY_INDEX_HNSW_THRESHOLD) * 2, ef_construction=200, M=16)
+        index.set_ef(MEMORY_INDEX_HNSW_EF)
+        index.add_items(self.matrix, np.arange(len(self.matrix)))
+        self.hnsw = index
+
+
+def _normalize(rows: Any) -> Any:
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+class MemoryIndex:
+    """Registry of per-user indexes with lazy loading and LRU eviction."""
+
+    def __init__(
+        self,
+        enabled: bool = MEMORY_INDEX_ENABLED,
+        max_vectors: int = MEMORY_INDEX_MAX_VECTORS,
+        max_user_vectors: int = MEMORY_INDEX_MAX_USER_VECTORS,
+        ttl_seconds: float = MEMORY_INDEX_TTL_SECONDS,
+    ):
+        self.enabled = enabled and np is not None
+        self.max_vectors = max_vectors
+        self.max_user_vectors = max_user_vectors
+        self.ttl_seconds = ttl_seconds
+        self._users: "OrderedDict[UUID, UserVectorIndex]" = OrderedDict()
+        self._oversized: Dict[UUID, float] = {}
+        self._locks: Dict[UUID, asyncio.Lock] = {}
+        self._stats: Dict[str, int] = {"searches": 0, "loads": 0, "fallbacks": 0, "appended": 0, "evictions": 0}
+        self._search_ms_total = 0.0
+
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        query: Sequence[float],
+        limit: int,
+        min_similarity: float,
+    ) -> Optional[List[Tuple[str, float]]]:
+        """Local nearest neighbours for a user, or None when the SQL path should answer."""
+        if not self.enabled or query is None:
+            return None
+        try:
+            index = await self._get_or_load(db, user_id)
+            if index is None:
+                self._stats["fallbacks"] += 1
+                return None
+            started = time.perf_counter()
+            results = index.search(query, limit, min_similarity)
+            self._search_ms_total += (time.perf_counter() - started) * 1000
+            self._stats["searches"] += 1
+            return results
+        except Exception as e:
+            logger.warning(f"⚠️ Memory index search failed for user {user_id}, using SQL: {e}")
+            self._stats["fallbacks"] += 1
+            self.invalidate(user_id)
+            return None
+
+    def add(self, user_id: UUID, entries: Sequence[IndexEntry]) -> None:
+        """Append freshly embedded messages to a loaded index; unloaded users pick them up on load."""
+        index = self._users.get(user_id)
+        if index is None or not entries:
+            return
+        try:
+            self._stats["appended"] += index.add(entries)
+        except Exception as e:
+            logger.warning(f"⚠️ Memory index append failed for user {user_id}: {e}")
+            self.invalidate(user_id)
+            return
+        if len(index) > self.max_user_vectors:
+            self.invalidate(user_id)
+            self._oversized[user_id] = time.monotonic()
+        self._evict()
+
+    def invalidate(self, user_id: UUID) -> None:
+        self._users.pop(user_id, None)
+        self._oversized.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._oversized.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        searches = self._stats["searches"]
+        return {
+            "enabled": self.enabled,
+            "hnsw_available": hnswlib is not None,
+            "users": len(self._users),
+            "vectors": self._total_vectors(),
+            "capacity": self.max_vectors,
+            "avg_search_ms": round(self._search_ms_total / searches, 3) if searches else 0.0,
+            **self._stats,
+        }
+
+    async def _get_or_load(self, db: AsyncSession, user_id: UUID) -> Optional[UserVectorIndex]:
+        index = self._fresh(user_id)
+        if index is not None:
+            return index
+        oversized_at = self._oversized.get(user_id)
+        if oversized_at is not None and time.monotonic() - oversized_at < self.ttl_seconds:
+            return None
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            index = self._fresh(user_id)
+            if index is not None:
+                return index
+            index = await self._load(db, user_id)
+        self._locks.pop(user_id, None)
+        return index
+
+    def _fresh(self, user_id: UUID) -> Optional[UserVectorIndex]:
+        index = self._users.get(user_id)
+        if index is None:
+            return None
+        if time.monotonic() - index.loaded_at > self.ttl_seconds:
+            self._users.pop(user_id, None)
+            return None
+        self._users.move_to_end(user_id)
+        return index
+
+    async def _load(self, db: AsyncSession, user_id: UUID) -> Optional[UserVectorIndex]:
+        stmt = (
+            select(Message.id, Message.content, Message.embedding)
+            .where(Message.user_id == user_id, Message.role == "user", Message.embedding.is_not(None))
+            .order_by(Message.created_at)
+            .limit(self.max_user_vectors + 1)
+        )
+        try:
+            rows = (await db.execute(stmt)).all()
+        except Exception:
+            await db.rollback()
+            raise
+        if len(rows) > self.max_user_vectors:
+            logger.info(f"ℹ️ User {user_id} has more than {self.max_user_vectors} vectors; using SQL retrieval")
+            self._oversized[user_id] = time.monotonic()
+            return None
+
+        started = time.perf_counter()
+        index = await asyncio.to_thread(UserVectorIndex.build, [tuple(row) for row in rows])
+        self._users[user_id] = index
+        self._stats["loads"] += 1
+        logger.info(
+            f"🧠 Loaded memory index for user {user_id}: {len(index)} vectors"
+            f"{' (hnsw)' if index.hnsw is not None else ''} in {int((time.perf_counter() - started) * 1000)}ms"
+        )
+        self._evict()
+        return index
+
+    def _total_vectors(self) -> int:
+        return sum(len(index) for index in self._users.values())
+
+    def _evict(self) -> None:
+        total = self._total_vectors()
+        while total > self.max_vectors and len(self._users) > 1:
+            _, index = self._users.popitem(last=False)
+            total -= len(index)
+            self._stats["evictions"] += 1
+
+
+memory_index = MemoryIndex()
@@ -0,0 +1,299 @@
+"""Hybrid lexical + vector memory retrieval for reflection prompts.
+
+Before a reflection reply is generated, the user's earlier statements that
+relate to the current message are looked up in two ways at once:
+
+- lexical: Postgres full-text search over user messages, served by the
+  GIN index on to_tsvector('english', content) (migration 0017);
+- semantic: the message is embedded and matched through
+  `retrieve_memories`, i.e. the in-process index or match_messages. The
+  message is only stored after the reply, so its embedding is a fresh
+  provider call. `prefetch_query_embedding` starts it as soon as the turn is
+  validated, and it is shielded from the budget: when it finishes late it
+  still fills the embedding cache, which the embedding worker then hits for
+  the stored message.
+
+The two rankings are merged with reciprocal-rank fusion. Nothing in this
+stage is allowed to delay the reply. Each branch gets its own session and the
+whole stage gets REFLECTION_MEMORY_BUDGET_MS. A branch that has not finished
+by then is cancelled and the turn uses whatever did finish, which may be
+nothing. Complete results are cached per (conversation, message), so the
+streaming and blocking endpoints, and retries of the same turn, share one
+retrieval; results cut short by the budget are not cached.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, literal_column, select
+
+from app.db.models import Message
+
+logger = logging.getLogger(__name__)
+
+REFLECTION_MEMORY_ENABLED = os.getenv("REFLECTION_MEMORY_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+REFLECTION_MEMORY_BUDGET_MS = max(1, int(os.getenv("REFLECTION_MEMORY_BUDGET_MS", "300")))
+REFLECTION_MEMORY_LIMIT = max(1, int(os.getenv("REFLECTION_MEMORY_LIMIT", "4")))
+REFLECTION_MEMORY_CANDIDATES = max(1, int(os.getenv("REFLECTION_MEMORY_CANDIDATES", "20")))
+TURN_MEMORY_CACHE_SIZE = max(1, int(os.getenv("TURN_MEMORY_CACHE_SIZE", "512")))
+TURN_MEMORY_CACHE_TTL_SECONDS = float(os.getenv("TURN_MEMORY_CACHE_TTL_SECONDS", "600"))
+RRF_K = 60
+FTS_CONFIG = "english"
+MAX_QUERY_TERMS = 12
+MAX_MEMORY_CHARS = 220
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]{3,}")
+
+
+@dataclass(frozen=True)
+class RetrievedMemories:
+    memories: Tuple[str, ...] = ()
+    patterns: Tuple[str, ...] = ()
+    sources: Tuple[str, ...] = ()
+    elapsed_ms: int = 0
+    timed_out: bool = False
+
+    def prompt_block(self) -> str:
+        if not self.memories:
+            return ""
+        lines = [
+            "Things the user has said before that may relate (context only; do not quote or list them back):",
+            *(f"- {_clip(memory)}" for memory in self.memories),
+        ]
+        if self.patterns:
+            lines.append("Recurring patterns: " + ", ".join(self.patterns))
+        return "\n".join(lines)
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_MEMORY_CHARS else text[: MAX_MEMORY_CHARS - 1].rstrip() + "…"
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def lexical_query_terms(text: str) -> Optional[str]:
+    """An OR tsquery over the message's words, or None if it has none worth searching.
+
+    Terms are restricted to [a-z0-9], so the result is always valid to_tsquery
+    input. Stop words are dropped by the text search configuration.
+    """
+    terms = list(dict.fromkeys(_TERM_PATTERN.findall((text or "").lower())))[:MAX_QUERY_TERMS]
+    return " | ".join(terms) or None
+
+
+def build_lexical_query(user_id: UUID, terms: str, limit: int):
+    # The config is inlined, not bound, so the expression matches the GIN index
+    # under asyncpg's prepared (possibly generic) plans.
+    config = literal_column(f"'{FTS_CONFIG}'::regconfig")
+    document = func.to_tsvector(config, Message.content)
+    query = func.to_tsquery(config, terms)
+    return (
+        select(Message.content)
+        .where(Message.user_id == user_id, Message.role == "user", document.op("@@")(query))
+        .order_by(func.ts_rank_cd(document, query).desc(), Message.created_at.desc())
+        .limit(limit)
+    )
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], limit: int, k: int = RRF_K) -> List[str]:
+    """Merge ranked lists by summing 1 / (k + rank); duplicates are matched case-insensitively."""
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, str] = {}
+    for ranking in rankings:
+        for rank, text in enumerate(ranking, start=1):
+            key = _normalize(text)
+            if not key:
+                continue
+            first_seen.setdefault(key, text)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [first_seen[key] for key in ordered[:limit]]
+
+
+class TurnMemoryCache:
+    """Bounded, TTL-limited cache of retrieval results keyed by conversation turn."""
+
+    def __init__(self, max_entries: int = TURN_MEMORY_CACHE_SIZE, ttl_seconds: float = TURN_MEMORY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[Any, str], Tuple[float, RetrievedMemories]]" = OrderedDict()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "timeouts": 0, "retrievals": 0}
+        self._elapsed_ms_total = 0
+
+    @staticmethod
+    def key(conversation_id: Any, message_text: str) -> Tuple[Any, str]:
+        return conversation_id, hashlib.sha1(_normalize(message_text).encode("utf-8")).hexdigest()
+
+    def get(self, key: Tuple[Any, str]) -> Optional[RetrievedMemories]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self._entries.pop(key, None)
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry[1]
+
+    def put(self, key: Tuple[Any, str], result: RetrievedMemories) -> None:
+        """Record the retrieval; only complete results are kept, so a retry re-runs a timed-out one."""
+        self._stats["retrievals"] += 1
+        self._stats["timeouts"] += int(result.timed_out)
+        self._elapsed_ms_total += result.elapsed_ms
+        if result.timed_out:
+            return
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def forget_conversations(self, conversation_ids: Iterable[Any]) -> None:
+        """Drop cached turns of the given conversations, e.g. after their messages were deleted."""
+        doomed = set(conversation_ids)
+        for key in [key for key in self._entries if key[0] in doomed]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        retrievals = self._stats["retrievals"]
+        return {
+            "enabled": REFLECTION_MEMORY_ENABLED,
+            "budget_ms": REFLECTION_MEMORY_BUDGET_MS,
+            "entries": len(self._entries),
+            "avg_elapsed_ms": round(self._elapsed_ms_total / retrievals, 1) if retrievals else 0.0,
+            **self._stats,
+        }
+
+
+turn_memory_cache = TurnMemoryCache()
+
+# In-flight query embeddings by text; shared by the prefetch and the vector branch.
+_query_embeddings: Dict[str, "asyncio.Task[List[Optional[List[float]]]]"] = {}
+
+
+def _forget_query_embedding(message_text: str, task: asyncio.Task) -> None:
+    if _query_embeddings.get(message_text) is task:
+        del _query_embeddings[message_text]
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️ Query embedding failed: {task.exception()}")
+
+
+def prefetch_query_embedding(message_text: str) -> asyncio.Task:
+    """Start embedding a reflection message, or join the embedding already running.
+
+    The task is not cancelled with the retrieval, so a late vector still lands
+    in the embedding cache.
+    """
+    task = _query_embeddings.get(message_text)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        from app.services.embedding_service import embed_texts_cached
+
+        task = asyncio.create_task(embed_texts_cached([message_text]))
+        _query_embeddings[message_text] = task
+        task.add_done_callback(lambda done: _forget_query_embedding(message_text, done))
+    return task
+
+
+def _session():
+    from app.db.database import AsyncSessionLocal
+
+    return AsyncSessionLocal()
+
+
+async def lexical_candidates(user_id: UUID, message_text: str, limit: int) -> List[str]:
+    terms = lexical_query_terms(message_text)
+    if terms is None:
+        return []
+    async with _session() as db:
+        result = await db.execute(build_lexical_query(user_id, terms, limit))
+        return [row[0] for row in result.all()]
+
+
+async def vector_candidates(user_id: UUID, message_text: str, limit: int) -> List[str]:
+    from app.services.memory_service import retrieve_memories
+
+    vectors = await asyncio.shield(prefetch_query_embedding(message_text))
+    if not vectors or vectors[0] is None:
+        return []
+    async with _session() as db:
+        return await retrieve_memories(db, user_id, vectors[0], limit=limit)
+
+
+async def retrieve_turn_memories(
+    user_id: UUID,
+    conversation_id: Any,
+    message_text: str,
+    exclude: Iterable[str] = (),
+    budget_ms: Optional[int] = None,
+) -> RetrievedMemories:
+    """Fused memories for one reflection turn, never taking longer than the budget."""
+    if not REFLECTION_MEMORY_ENABLED or not (message_text or "").strip():
+        return RetrievedMemories()
+
+    cache_key = turn_memory_cache.key(conversation_id, message_text)
+    cached = turn_memory_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    budget = (budget_ms or REFLECTION_MEMORY_BUDGET_MS) / 1000
+    started = time.perf_counter()
+    branches = {
+        "lexical": asyncio.create_task(lexical_candidates(user_id, message_text, REFLECTION_MEMORY_CANDIDATES)),
+        "vector": asyncio.create_task(vector_candidates(user_id, message_text, REFLECTION_MEMORY_CANDIDATES)),
+    }
+    done, pending = await asyncio.wait(branches.values(), timeout=budget)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    rankings: List[List[str]] = []
+    sources: List[str] = []
+    for name, task in branches.items():
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            logger.warning(f"⚠️ {name.capitalize()} memory retrieval failed: {task.exception()}")
+            continue
+        if task.result():
+            rankings.append(task.result())
+            sources.append(name)
+
+    excluded = {_normalize(text) for text in (*exclude, message_text)}
+    rankings = [[text for text in ranking if _normalize(text) not in excluded] for ranking in rankings]
+    memories = reciprocal_rank_fusion(rankings, REFLECTION_MEMORY_LIMIT)
+
+    patterns: List[str] = []
+    if memories:
+        from app.services.pattern_detection_service import detect_patterns
+
+        patterns = await detect_patterns(memories)
+
+    result = RetrievedMemories(
+        memories=tuple(memories),
+        patterns=tuple(patterns),
+        sources=tuple(sources),
+        elapsed_ms=int((time.perf_counter() - started) * 1000),
+        timed_out=bool(pending),
+    )
+    if pending:
+        logger.info(
+            f"⏱️ Memory retrieval hit its {int(budget * 1000)}ms budget; "
+            f"using {', '.join(sources) or 'no'} results"
+        )
+    turn_memory_cache.put(cache_key, result)
+    return result
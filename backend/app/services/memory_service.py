@@ -1,32 +1,81 @@
-from sqlalchemy import text, select
+from sqlalchemy import bindparam, text, select, update
 import logging
-from typing import Dict
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
+
+import numpy as np
+
+from app.constants import EMBEDDING_DIMENSIONS
 from app.db.models import PersonaSnapshot
+from app.db.vector_type import BinaryHalfVec
+from app.services.memory_index import memory_index
+from app.services.snapshot_cache import CachedSnapshot, bump_snapshot_version, snapshot_cache
 
 logger = logging.getLogger(__name__)
 
-async def retrieve_memories(db, user_id, embedding, limit=5):
+MEMORY_MATCH_THRESHOLD = 0.75
+# Per-query pgvector search knobs for the SQL path. ef_search (HNSW) and probes
+# (ivfflat) trade latency for recall; only the one matching the live index matters.
+MEMORY_HNSW_EF_SEARCH = max(1, int(os.getenv("MEMORY_HNSW_EF_SEARCH", "80")))
+MEMORY_IVFFLAT_PROBES = max(1, int(os.getenv("MEMORY_IVFFLAT_PROBES", "10")))
+# pgvector >= 0.8 only: keep scanning the graph when the user filter drops
+# candidates ("relaxed_order" or "strict_order"). Empty leaves it unset.
+MEMORY_HNSW_ITERATIVE_SCAN = os.getenv("MEMORY_HNSW_ITERATIVE_SCAN", "").strip()
+
+DRIFT_THRESHOLD = 0.3  # Allow up to 30% drift before recalibrating
+DRIFT_ANCHOR_TTL_SECONDS = float(os.getenv("DRIFT_ANCHOR_TTL_SECONDS", "3600"))
+DRIFT_RECHECK_SECONDS = float(os.getenv("DRIFT_RECHECK_SECONDS", "300"))
+DRIFT_MONITOR_USERS = max(1, int(os.getenv("DRIFT_MONITOR_USERS", "4096")))
+
+
+def vector_search_settings(limit: int, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """Transaction-local pgvector settings for one retrieval, as a single statement."""
+    settings = {
+        "hnsw.ef_search": max(ef_search or MEMORY_HNSW_EF_SEARCH, limit),
+        "ivfflat.probes": probes or MEMORY_IVFFLAT_PROBES,
+    }
+    if MEMORY_HNSW_ITERATIVE_SCAN:
+        settings["hnsw.iterative_scan"] = MEMORY_HNSW_ITERATIVE_SCAN
+    columns = ", ".join(f"set_config(:name_{i}, :value_{i}, true)" for i in range(len(settings)))
+    params = {}
+    for i, (name, value) in enumerate(settings.items()):
+        params[f"name_{i}"] = name
+        params[f"value_{i}"] = str(value)
+    return text(f"SELECT {columns}"), params
+
+
+async def retrieve_memories(db, user_id, embedding, limit=5, ef_search=None, probes=None):
     if embedding is None:
-        print("⚠️ Skipping memory retrieval (no embedding)")
+        logger.debug("⚠️ Skipping memory retrieval (no embedding)")
         return []
 
+    local = await memory_index.search(db, user_id, embedding, limit, MEMORY_MATCH_THRESHOLD)
+    if local is not None:
+        memories = list(dict.fromkeys(content for content, _ in local))
+        logger.debug(f"🧠 Retrieved {len(memories)} memories from the in-process index")
+        return memories
+
     query = text("""
         SELECT content, similarity
         FROM match_messages(
             :query_embedding,
-            0.75,
+            :threshold,
             :limit,
             :user_id
         )
-    """)
-
-    vector_string = "[" + ",".join(map(str, embedding)) + "]"
+    """).bindparams(bindparam("query_embedding", type_=BinaryHalfVec(EMBEDDING_DIMENSIONS)))
 
+    settings, settings_params = vector_search_settings(limit, ef_search, probes)
+    await db.execute(settings, settings_params)
     result = await db.execute(
         query,
         {
-            "query_embedding": vector_string,
+            "query_embedding": embedding,
+            "threshold": MEMORY_MATCH_THRESHOLD,
             "limit": limit,
             "user_id": str(user_id)
         }
@@ -35,71 +84,166 @@ async def retrieve_memories(db, user_id, embedding, limit=5):
     rows = result.fetchall()
 
     memories = list(dict.fromkeys(row[0] for row in rows))
-    print("🧠 Retrieved memories:", memories)
+    logger.debug(f"🧠 Retrieved {len(memories)} memories from match_messages")
 
     return memories
 
 
+@dataclass
+class _AnchorEntry:
+    anchor: Optional[CachedSnapshot]
+    loaded_at: float
+
+
+class DriftMonitor:
+    """Tracks which snapshot version each user's drift was last checked at.
+
+    A drift check can only find something new once the user's snapshot has
+    changed, and every snapshot writer bumps the snapshot-cache version. So a
+    check runs when that version moves (or DRIFT_RECHECK_SECONDS have passed,
+    to pick up writes from other processes). The historical anchor is nearly
+    immutable, so it is cached per user for DRIFT_ANCHOR_TTL_SECONDS and
+    dropped explicitly when a user's persona data is deleted.
+    """
+
+    def __init__(
+        self,
+        anchor_ttl_seconds: float = DRIFT_ANCHOR_TTL_SECONDS,
+        recheck_seconds: float = DRIFT_RECHECK_SECONDS,
+        max_users: int = DRIFT_MONITOR_USERS,
+    ):
+        self.anchor_ttl_seconds = anchor_ttl_seconds
+        self.recheck_seconds = recheck_seconds
+        self.max_users = max_users
+        self._checked: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._anchors: "OrderedDict[str, _AnchorEntry]" = OrderedDict()
+        self._stats: Dict[str, int] = {
+            "checks": 0, "skipped": 0, "anchor_hits": 0, "anchor_loads": 0, "recalibrations": 0,
+        }
+
+    def needs_check(self, user_id: UUID, version: int) -> bool:
+        checked = self._checked.get(str(user_id))
+        if checked is not None and checked[0] == version and time.monotonic() - checked[1] <= self.recheck_seconds:
+            self._stats["skipped"] += 1
+            return False
+        return True
+
+    def mark_checked(self, user_id: UUID, version: int, recalibrated: bool = False) -> None:
+        self._stats["checks"] += 1
+        self._stats["recalibrations"] += int(recalibrated)
+        self._remember(self._checked, str(user_id), (version, time.monotonic()))
+
+    async def anchor(self, db, user_id: UUID) -> Optional[CachedSnapshot]:
+        key = str(user_id)
+        entry = self._anchors.get(key)
+        if entry is not None and time.monotonic() - entry.loaded_at <= self.anchor_ttl_seconds:
+            self._anchors.move_to_end(key)
+            self._stats["anchor_hits"] += 1
+            return entry.anchor
+
+        stmt = select(PersonaSnapshot).where(
+            PersonaSnapshot.user_id == user_id,
+            PersonaSnapshot.is_historical_anchor == True
+        ).order_by(PersonaSnapshot.created_at.desc()).limit(1)
+        row = (await db.execute(stmt)).scalar_one_or_none()
+        anchor = CachedSnapshot.from_model(row, version=0) if row is not None else None
+        self._stats["anchor_loads"] += 1
+        self._remember(self._anchors, key, _AnchorEntry(anchor=anchor, loaded_at=time.monotonic()))
+        return anchor
+
+    def forget(self, user_id: UUID) -> None:
+        self._checked.pop(str(user_id), None)
+        self._anchors.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        self._checked.clear()
+        self._anchors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"users": len(self._checked), "anchors": len(self._anchors), **self._stats}
+
+    def _remember(self, entries: "OrderedDict[str, Any]", key: str, value: Any) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_users:
+            entries.popitem(last=False)
+
+
+drift_monitor = DriftMonitor()
+
+
+def trait_drift(active_traits: Dict[str, Any], anchor_traits: Dict[str, Any]) -> Tuple[List[str], Any, Any]:
+    """Numeric traits present in both snapshots, as aligned (keys, active, anchor) arrays."""
+    keys = [
+        key for key, anchor_val in anchor_traits.items()
+        if isinstance(anchor_val, (int, float)) and isinstance(active_traits.get(key), (int, float))
+    ]
+    active = np.array([active_traits[key] for key in keys], dtype=np.float64)
+    anchor = np.array([anchor_traits[key] for key in keys], dtype=np.float64)
+    return keys, active, anchor
+
+
+async def _active_snapshot(db, user_id: UUID) -> Optional[CachedSnapshot]:
+    latest = await snapshot_cache.get(db, user_id)
+    if latest is None or not latest.is_historical_anchor:
+        return latest
+    # The newest snapshot is the anchor itself; compare against the newest regular one.
+    stmt = select(PersonaSnapshot).where(
+        PersonaSnapshot.user_id == user_id,
+        PersonaSnapshot.is_historical_anchor == False
+    ).order_by(PersonaSnapshot.created_at.desc()).limit(1)
+    row = (await db.execute(stmt)).scalar_one_or_none()
+    return CachedSnapshot.from_model(row, latest.version) if row is not None else None
+
+
 async def check_and_recalibrate_drift(db, user_id: UUID) -> None:
     """
     Checks for behavioral drift against the Deep Historical Anchor.
     If drift > threshold, re-anchors passing traits toward their original state.
+
+    Runs only when the user's snapshot version has changed since the last check.
+    The active snapshot comes from the snapshot cache and the anchor from the
+    drift monitor, so an unchanged user costs no queries and no commit.
     """
+    version = snapshot_cache.version(user_id)
+    if not drift_monitor.needs_check(user_id, version):
+        return
     logger.info(f"🔍 Checking drift recalibration for user {user_id}")
-    
+
     # Fetch active snapshot vs anchor
-    active_stmt = select(PersonaSnapshot).where(
-        PersonaSnapshot.user_id == user_id,
-        PersonaSnapshot.is_historical_anchor == False
-    ).order_by(PersonaSnapshot.created_at.desc()).limit(1)
-    
-    anchor_stmt = select(PersonaSnapshot).where(
-        PersonaSnapshot.user_id == user_id,
-        PersonaSnapshot.is_historical_anchor == True
-    ).order_by(PersonaSnapshot.created_at.desc()).limit(1)
-    
-    active_res = await db.execute(active_stmt)
-    anchor_res = await db.execute(anchor_stmt)
-    
-    active_snap = active_res.scalar_one_or_none()
-    anchor_snap = anchor_res.scalar_one_or_none()
-    
+    active_snap = await _active_snapshot(db, user_id)
+    anchor_snap = await drift_monitor.anchor(db, user_id)
+
     if not active_snap or not anchor_snap:
         # Cannot compare if we lack an anchor
         logger.debug(f"ℹ️ Skipping recalibration for {user_id}, missing anchor or active snapshot.")
+        drift_monitor.mark_checked(user_id, version)
         return
-        
-    active_traits = active_snap.behavioral_traits or {}
-    anchor_traits = anchor_snap.behavioral_traits or {}
 
-    if not active_traits or not anchor_traits:
+    keys, active, anchor = trait_drift(active_snap.behavioral_traits, anchor_snap.behavioral_traits)
+    if not keys:
+        drift_monitor.mark_checked(user_id, version)
         return
-        
-    drift_score = 0.0
-    drift_count = 0
-    drift_threshold = 0.3  # Allow up to 30% drift before recalibrating
-    
-    for key, anchor_val in anchor_traits.items():
-        if key in active_traits:
-            active_val = active_traits[key]
-            if isinstance(anchor_val, (int, float)) and isinstance(active_val, (int, float)):
-                drift = abs(active_val - anchor_val)
-                drift_score += drift
-                drift_count += 1
-                
-    if drift_count > 0:
-        avg_drift = drift_score / drift_count
-        if avg_drift > drift_threshold:
-            # Re-anchor
-            logger.info(f"🌊 Drift detected ({avg_drift:.2f} > {drift_threshold}). Recalibrating toward anchor...")
-            for key, anchor_val in anchor_traits.items():
-                if key in active_traits and isinstance(anchor_val, (int, float)):
-                    # Smooth 50% back towards the anchor
-                    active_traits[key] = (active_traits[key] + anchor_val) / 2
-                    
-            active_snap.behavioral_traits = active_traits
-            await db.commit()
-            
-            # We don't necessarily update `PersonaSnapshot.persona_vector` mapping
-            # for `UserPersonaMetric` yet, but behavioral_traits is re-anchored.
-            logger.info(f"✅ Deep drift recalibration complete for {user_id}")
+
+    avg_drift = float(np.abs(active - anchor).mean())
+    if avg_drift > DRIFT_THRESHOLD:
+        # Re-anchor
+        logger.info(f"🌊 Drift detected ({avg_drift:.2f} > {DRIFT_THRESHOLD}). Recalibrating toward anchor...")
+        # Smooth 50% back towards the anchor
+        recalibrated = dict(active_snap.behavioral_traits)
+        recalibrated.update(zip(keys, ((active + anchor) / 2).tolist()))
+
+        await db.execute(
+            update(PersonaSnapshot)
+            .where(PersonaSnapshot.id == active_snap.id)
+            .values(behavioral_traits=recalibrated)
+        )
+        await db.commit()
+        # Our own write is already pulled toward the anchor; no need to re-check it.
+        version = bump_snapshot_version(user_id)
+
+        # We don't necessarily update `PersonaSnapshot.persona_vector` mapping
+        # for `UserPersonaMetric` yet, but behavioral_traits is re-anchored.
+        logger.info(f"✅ Deep drift recalibration complete for {user_id}")
+
+    drift_monitor.mark_checked(user_id, version, recalibrated=avg_drift > DRIFT_THRESHOLD)
@@ -0,0 +1,199 @@
+"""Single-pass per-message feature extraction shared by the chat heuristics.
+
+Emotion detection, task routing, communication profiling, fallback traits,
+mirror style analysis, stimulus tagging, context classification and the
+linguistic fingerprint all look at the same user message. `MessageFeatures`
+tokenizes and scans it once per turn so every consumer sees identical numbers.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from app.services.keyword_matcher import KeywordMatcher
+
+_WORD_RE = re.compile(r"\b\w+\b")
+_ALPHA_TOKEN_RE = re.compile(r"[a-zA-Z']+")
+_SENTENCE_SPLIT_RE = re.compile(r"[.!?]+")
+_CAPS_RUN_RE = re.compile(r"[A-Z]{2,}")
+_MULTI_PUNCT_RE = re.compile(r"[!?]{2,}")
+
+EMOTIONAL_MARKERS = {
+    "insecure": ["i don't know", "maybe", "not sure", "probably wrong", "doubt", "uncertain", "hesitant", "scared", "nervous", "idk", "unsure", "confused", "lost"],
+    "stressed": ["stressed", "overwhelmed", "anxious", "worried", "pressure", "struggling", "can't handle", "too much", "exhausted", "tired", "drowning", "burnout"],
+    "angry": ["pissed", "angry", "furious", "mad", "hate", "fuck", "bullshit", "ridiculous", "unacceptable", "done with", "fed up", "irritated"],
+    "playful": ["lol", "lmao", "haha", "😂", "💀", "bruh", "nah", "fr fr", "lowkey", "highkey", "vibes", "bet", "tbh"],
+    "sarcastic": ["sure", "yeah right", "oh great", "wonderful", "fantastic", "obviously", "totally", "yeah okay", "perfect", "lovely"],
+    "happy": ["happy", "excited", "great", "awesome", "amazing", "love", "perfect", "excellent", "wonderful", "fantastic", "pumped", "thrilled"],
+}
+
+TASK_FOLLOWUP_MARKERS = [
+    "help me write",
+    "write in my tone",
+    "in my tone",
+    "make it sound",
+    "make this better",
+    "polish this",
+    "tighten this",
+    "continue this",
+    "finish this",
+    "make it shorter",
+    "make it longer",
+    "version 2",
+    "another option",
+    "try again",
+    "redo this",
+]
+
+# Keyword maps behind the reflection-mode personality profile, keyed by the
+# profile field they increment.
+PROFILE_KEYWORD_MAPS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "themes": {
+        "identity": ("who i am", "identity", "self"),
+        "purpose": ("purpose", "meaning", "why"),
+        "control": ("control", "power", "decide"),
+        "relationships": ("relationship", "people", "family", "friend"),
+        "work": ("work", "career", "job"),
+        "growth": ("change", "growth", "improve"),
+    },
+    "traits": {
+        "introspective": ("reflect", "introspect", "think a lot"),
+        "driven": ("ambition", "driven", "goal"),
+        "anxious": ("anxious", "worried", "overthink"),
+        "independent": ("independent", "alone", "self-reliant"),
+        "structured": ("plan", "schedule", "routine"),
+        "adaptive": ("flexible", "adapt", "pivot"),
+    },
+    "values": {
+        "authenticity": ("authentic", "real", "honest"),
+        "stability": ("stable", "security", "certainty"),
+        "freedom": ("freedom", "autonomy", "choice"),
+        "connection": ("connection", "belong", "community"),
+        "achievement": ("achievement", "success", "win"),
+    },
+    "stressors": {
+        "uncertainty": ("uncertain", "unknown", "unclear"),
+        "conflict": ("conflict", "argument", "tension"),
+        "pressure": ("pressure", "overwhelmed", "stress"),
+        "rejection": ("rejection", "excluded", "ignored"),
+    },
+}
+
+# Substring marker sets, matched against the lowercased message. Each consumer
+# refers to its set by name; all sets are matched in one scan per message.
+MARKER_SETS: Dict[str, Tuple[str, ...]] = {
+    **{f"emotion.{emotion}": tuple(markers) for emotion, markers in EMOTIONAL_MARKERS.items()},
+    "emotion.laughter": ("lol", "lmao", "haha"),
+    "emotion.positive": ("great", "wonderful", "perfect", "amazing"),
+    "profile.hedge": ("maybe", "perhaps", "sorta", "kind of", "i think"),
+    "profile.tone_casual": ("lol", "gonna", "kinda", "nah", "yeah"),
+    "profile.tone_formal": ("therefore", "furthermore", "however", "thus"),
+    "traits.hedge": ("maybe", "perhaps", "i think", "kind of", "sort of", "not sure"),
+    "task.followup": tuple(TASK_FOLLOWUP_MARKERS),
+    "task.style": ("in my tone", "my tone", "my voice", "sound like me", "write like me"),
+    "style.slang": ("gonna", "wanna", "gotta", "kinda", "sorta", "yeah", "nah", "like", "just", "really"),
+    "style.emotional": ("love", "hate", "happy", "sad", "angry", "excited", "worried", "anxious", "stressed", "amazing", "terrible", "awesome"),
+    "style.emoji": ("😊", "😂", "😢", "😠", "🥺", "💀", "🔥"),
+    "stimulus.doubt": ("idk", "not sure", "maybe", "confused", "doubt"),
+    "stimulus.disagreement": ("disagree", "wrong", "off", "doesn't make sense", "no way"),
+    "stimulus.interest": ("cool", "interesting", "nice", "love this", "excited"),
+    "stimulus.pressure": ("deadline", "exam", "urgent", "pressure", "stressed"),
+    "context.casual": ("bro", "idk", "tbh", "ngl", "lol", "nah", "fr"),
+    **{
+        f"persona.{profile_field}.{name}": keywords
+        for profile_field, keyword_map in PROFILE_KEYWORD_MAPS.items()
+        for name, keywords in keyword_map.items()
+    },
+}
+
+MARKER_MATCHER = KeywordMatcher(MARKER_SETS)
+
+
+@dataclass
+class MessageFeatures:
+    """Tokenization, punctuation and marker statistics for one message."""
+
+    text: str
+    lower: str
+    words: Tuple[str, ...]
+    alpha_tokens: Tuple[str, ...]
+    whitespace_tokens: Tuple[str, ...]
+    sentences: Tuple[str, ...]
+    word_counts: Counter
+    exclamation_count: int
+    question_count: int
+    ellipsis_count: int
+    caps_word_ratio: float
+    has_caps_run: bool
+    has_multi_punct: bool
+    _hits: Optional[Dict[str, FrozenSet[str]]] = field(default=None, repr=False)
+
+    @property
+    def word_count(self) -> int:
+        return len(self.words)
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentences)
+
+    @property
+    def bigrams(self) -> Tuple[str, ...]:
+        return tuple(f"{self.words[i]} {self.words[i + 1]}" for i in range(len(self.words) - 1))
+
+    @property
+    def alpha_bigrams(self) -> Tuple[str, ...]:
+        tokens = self.alpha_tokens
+        return tuple(f"{tokens[i]} {tokens[i + 1]}" for i in range(len(tokens) - 1))
+
+    def hits(self, category: str) -> FrozenSet[str]:
+        """Markers from MARKER_SETS[category] that occur in the message."""
+        if category not in MARKER_SETS:
+            raise KeyError(category)
+        if self._hits is None:
+            self._hits = MARKER_MATCHER.scan(self.lower)
+        return self._hits.get(category, frozenset())
+
+    def has(self, category: str) -> bool:
+        return bool(self.hits(category))
+
+    def count(self, category: str) -> int:
+        return len(self.hits(category))
+
+    def count_words(self, vocabulary: Iterable[str]) -> int:
+        """Occurrences of whole words (from `words`) that belong to vocabulary."""
+        return sum(self.word_counts.get(word, 0) for word in set(vocabulary))
+
+
+def extract_message_features(text: Optional[str]) -> MessageFeatures:
+    text = text or ""
+    lower = text.lower()
+    words = tuple(_WORD_RE.findall(lower))
+    whitespace_tokens = tuple(text.split())
+    sentences = tuple(segment.strip() for segment in _SENTENCE_SPLIT_RE.split(text) if segment.strip())
+    caps_words = sum(1 for token in whitespace_tokens if token.isupper() and len(token) > 1)
+
+    return MessageFeatures(
+        text=text,
+        lower=lower,
+        words=words,
+        alpha_tokens=tuple(_ALPHA_TOKEN_RE.findall(lower)),
+        whitespace_tokens=whitespace_tokens,
+        sentences=sentences,
+        word_counts=Counter(words),
+        exclamation_count=text.count("!"),
+        question_count=text.count("?"),
+        ellipsis_count=text.count("..."),
+        caps_word_ratio=(caps_words / len(whitespace_tokens)) if whitespace_tokens else 0.0,
+        has_caps_run=bool(_CAPS_RUN_RE.search(text)),
+        has_multi_punct=bool(_MULTI_PUNCT_RE.search(text)),
+    )
+
+
+def ensure_features(text: Optional[str], features: Optional[MessageFeatures]) -> MessageFeatures:
+    """Reuse precomputed features for this text, computing them if absent or mismatched."""
+    if features is not None and features.text == (text or ""):
+        return features
+    return extract_message_features(text)
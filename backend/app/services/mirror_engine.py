@@ -1,20 +1,21 @@
 """Mirror engine for generating personalized responses."""
 
+import asyncio
 import hashlib
 import logging
 import os
 import re
 import time
 import random
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional, Tuple, List
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, List
 from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import BehavioralInsight, LinguisticFingerprint, MirrorResponseMemory
-from app.repository.persona_repository import PersonaRepository
 from app.constants import (
     STABILITY_THRESHOLD_UNSTABLE,
     STABILITY_THRESHOLD_STABLE,
@@ -30,29 +31,28 @@ from app.services.twin_policy import resolve_twin_settings
 from app.services.confidence_interval_service import compute_confidence_interval
 from app.services.style_enforcement_service import enforce_style
 from app.services.context_policy_service import classify_response_context, apply_context_policy_gates
+from app.services import llm_gateway
+from app.services.message_features import MessageFeatures, ensure_features
+from app.services.prompt_compiler import CompiledPrompt, prompt_compiler
+from app.services.snapshot_cache import CachedSnapshot, bump_snapshot_version, snapshot_cache
+from app.services.turn_context_service import TurnContext
 
 logger = logging.getLogger(__name__)
 
-# Initialize Mistral client
-MISTRAL_AVAILABLE = False
-mistral_client = None
-
-try:
-    from mistralai import Mistral
-    api_key = os.getenv("MISTRAL_API_KEY")
-    if api_key:
-        mistral_client = Mistral(api_key=api_key)
-        MISTRAL_AVAILABLE = True
-        logger.info("✅ Mistral client initialized for mirror engine")
-except Exception as e:
-    logger.warning(f"⚠️ Mistral not available for mirror engine: {e}")
-
-# Cache for latest snapshots (user_id -> snapshot)
-_snapshot_cache: Dict[str, Dict] = {}
-
 # Variation buffer to track recent responses to avoid precise repetition
 _variation_buffer: Dict[str, List[str]] = {}
 
+# Upper bound for a single candidate request; the loop budget is checked between attempts.
+MIRROR_ATTEMPT_TIMEOUT_SECONDS = 8.0
+
+# How anti-repetition candidates are requested: "parallel" issues every
+# candidate request at once, "choices" asks for them in one multi-choice
+# completion, and "sequential" requests them one after another.
+MIRROR_CANDIDATE_MODE = os.getenv("MIRROR_CANDIDATE_MODE", "parallel").strip().lower()
+MIRROR_LOOP_BUDGET_SECONDS = float(os.getenv("MIRROR_LOOP_BUDGET_SECONDS", "1.8"))
+MIRROR_ACCEPT_SCORE = 0.8
+MIRROR_FALLBACK_SCORE = 0.45
+
 STRUCTURED_TASK_TYPES = {
     "email_draft",
     "message_draft",
@@ -173,7 +173,10 @@ async def _get_recent_behavioral_signals(db: AsyncSession, user_id: UUID, limit:
 async def _get_linguistic_fingerprint_summary(db: AsyncSession, user_id: UUID) -> str:
     stmt = select(LinguisticFingerprint).where(LinguisticFingerprint.user_id == user_id).limit(1)
     result = await db.execute(stmt)
-    fingerprint = result.scalar_one_or_none()
+    return _summarize_linguistic_fingerprint(result.scalar_one_or_none())
+
+
+def _summarize_linguistic_fingerprint(fingerprint: Optional[LinguisticFingerprint]) -> str:
     if not fingerprint:
         return "No stable linguistic fingerprint yet."
 
@@ -261,6 +264,8 @@ async def generate_mirror_response(
     detected_emotion: Optional[str] = None,
     active_mirror_style: Optional[str] = None,
     conversation_id: Optional[UUID] = None,
+    message_features: Optional[MessageFeatures] = None,
+    turn_context: Optional[TurnContext] = None,
 ) -> Tuple[str, Dict[str, Any]]:
     """
     Generate a mirror response based on user's personality profile.
@@ -269,12 +274,15 @@ async def generate_mirror_response(
         db: Database session
         user_id: User UUID
         message: User's message
+        message_features: Precomputed features for message (computed if omitted)
+        turn_context: Preloaded per-turn reads (each is queried here if omitted)
         
     Returns:
         Tuple: (Mirror response string, Metadata telemetry dict)
     """
     # Initialize basic telemetry
     resolved_task_type = task_type or "generic"
+    message_features = ensure_features(message, message_features)
 
     telemetry = {
         "inference_duration_ms": 0,
@@ -295,6 +303,9 @@ async def generate_mirror_response(
         "source_weights": {},
         "stimulus_tag": "general",
         "task_execution_mode": False,
+        "candidate_mode": MIRROR_CANDIDATE_MODE,
+        "candidates_requested": 0,
+        "candidates_wasted": 0,
     }
 
     effective_policy = resolve_twin_settings(twin_policy)
@@ -325,13 +336,13 @@ async def generate_mirror_response(
         logger.info("Silence bypass: Empty message received.")
         return "", telemetry
 
-    if not MISTRAL_AVAILABLE or not mistral_client:
+    if not llm_gateway.is_available():
         logger.warning("⚠️ LLM unavailable; using local mirror fallback")
         telemetry["fallback_triggered"] = True
         telemetry["policy_mode"] = "llm_unavailable"
 
         start_time = time.time()
-        context_mode = classify_response_context(message=message, task_type=resolved_task_type)
+        context_mode = classify_response_context(message=message, task_type=resolved_task_type, features=message_features)
         context_policy = apply_context_policy_gates(
             context_mode=context_mode,
             phrase_usage_frequency=0.45,
@@ -361,6 +372,8 @@ async def generate_mirror_response(
                 professional_context=(context_policy.context_mode == "professional"),
                 allow_slang=context_policy.allow_slang,
                 allow_imperfect_grammar=context_policy.allow_imperfect_grammar,
+                message_features=message_features,
+                reaction_candidates=turn_context.reaction_candidates if turn_context is not None else None,
             )
             final_reply = styled.text
             telemetry["reaction_match_score"] = styled.reaction_match_score
@@ -382,13 +395,21 @@ async def generate_mirror_response(
         _variation_buffer[user_str] = []
     recent_outputs = _variation_buffer[user_str]
     
-    # Get latest snapshot (with caching)
-    snapshot = await get_cached_snapshot(db, user_id)
-
-    confidence_bundle = await compute_confidence_interval(db=db, user_id=user_id, message_text=message)
+    if turn_context is not None:
+        snapshot = turn_context.snapshot
+        confidence_bundle = await compute_confidence_interval(
+            db=db,
+            user_id=user_id,
+            message_text=message,
+            aggregates=turn_context.confidence_aggregates,
+        )
+    else:
+        # Get latest snapshot (with caching)
+        snapshot = await get_cached_snapshot(db, user_id)
+        confidence_bundle = await compute_confidence_interval(db=db, user_id=user_id, message_text=message)
     task_execution_mode = _should_force_task_execution_mode(message=message, task_type=resolved_task_type)
     telemetry["task_execution_mode"] = task_execution_mode
-    context_mode = classify_response_context(message=message, task_type=resolved_task_type)
+    context_mode = classify_response_context(message=message, task_type=resolved_task_type, features=message_features)
     context_policy = apply_context_policy_gates(
         context_mode=context_mode,
         phrase_usage_frequency=confidence_bundle.phrase_usage_frequency,
@@ -409,14 +430,19 @@ async def generate_mirror_response(
     }
     telemetry["context_mode"] = context_mode
 
-    behavioral_signals = await _get_recent_behavioral_signals(db, user_id, limit=3)
-    linguistic_fingerprint = await _get_linguistic_fingerprint_summary(db, user_id)
+    if turn_context is not None:
+        behavioral_signals = list(turn_context.behavioral_signals)
+        linguistic_fingerprint = _summarize_linguistic_fingerprint(turn_context.linguistic_fingerprint)
+    else:
+        behavioral_signals = await _get_recent_behavioral_signals(db, user_id, limit=3)
+        linguistic_fingerprint = await _get_linguistic_fingerprint_summary(db, user_id)
+    reaction_candidates = turn_context.reaction_candidates if turn_context is not None else None
     
     # Extract keys and get Probabilistic Sampling Profile
     if not snapshot:
         logger.warning(f"⚠️ No snapshot found for user {user_id}, using baseline")
         start_time = time.time()
-        baseline_resp = await generate_baseline_mirror_response(message)
+        baseline_resp = await generate_baseline_mirror_response(message, message_features)
         professional_context = context_policy.context_mode == "professional"
         styled = await enforce_style(
             db=db,
@@ -431,6 +457,8 @@ async def generate_mirror_response(
             professional_context=professional_context,
             allow_slang=context_policy.allow_slang,
             allow_imperfect_grammar=context_policy.allow_imperfect_grammar,
+            message_features=message_features,
+            reaction_candidates=reaction_candidates,
         )
         telemetry["inference_duration_ms"] = int((time.time() - start_time) * 1000)
         telemetry["reaction_match_score"] = styled.reaction_match_score
@@ -438,7 +466,7 @@ async def generate_mirror_response(
         return styled.text, telemetry
     
     # Analyze current message style
-    message_style = analyze_message_style(message)
+    message_style = analyze_message_style(message, message_features)
     logger.info(f"📊 Message style: {message_style}")
     
     # Build mirror system prompt with personality baseline and live style analysis
@@ -475,7 +503,7 @@ async def generate_mirror_response(
             0.62,
         )
     
-    system_prompt = build_mirror_system_prompt(
+    compiled_prompt = compile_mirror_system_prompt(
         sampled_profile,
         snapshot.stability_index,
         message_style,
@@ -490,90 +518,95 @@ async def generate_mirror_response(
         linguistic_fingerprint=linguistic_fingerprint,
         task_execution_mode=task_execution_mode,
     )
+    system_prompt = compiled_prompt.text
+    telemetry.update(compiled_prompt.telemetry())
     
     # 3. Anti-Repetition Loop
     start_time = time.time()
-    max_time = 1.8
     max_retries = 3
     if confidence_bundle.tier == "very_low":
         max_retries = 1
     elif confidence_bundle.tier == "partial":
         max_retries = 2
-    
-    best_candidate = ""
-    best_score = -1.0
-    
-    for attempt in range(max_retries):
-        telemetry["retries_used"] = attempt
-        if time.time() - start_time > max_time:
-            logger.warning("Timeout reached during anti-repetition generation loop.")
-            break
-            
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-
-            # Inject short recent context to improve continuity and reduce random replies.
-            if recent_history:
-                trimmed = recent_history[-8:]
-                for turn in trimmed:
-                    role = turn.get("role")
-                    content = (turn.get("content") or "").strip()
-                    if role in {"user", "assistant"} and content:
-                        messages.append({"role": role, "content": content})
-
-            # Ensure latest user message is the final turn.
-            messages.append({"role": "user", "content": message})
-            
-            response = mistral_client.chat.complete(
-                model="mistral-small-latest",
-                messages=messages,
-                max_tokens=320 if is_structured_task else 260,
-                temperature=(0.5 if is_structured_task else 0.58)
-                + (0.25 * telemetry["mirror_intensity"] * context_policy.tone_strength)
-                + (0.05 * attempt),
-            )
-            
-            candidate = response.choices[0].message.content.strip()
-            if _is_low_quality_candidate(
-                candidate,
-                message,
-                recent_outputs,
-                task_type=resolved_task_type,
-                sampled_profile=sampled_profile,
-                task_execution_mode=task_execution_mode,
-            ):
-                continue
 
-            if await _is_recent_duplicate(db, user_id, candidate):
-                continue
+    messages = [{"role": "system", "content": system_prompt}]
 
-            score = score_mirror_candidate(
-                candidate,
-                sampled_profile,
-                recent_outputs,
-                source_message=message,
-                task_execution_mode=task_execution_mode,
-            )
-            
-            if score > best_score:
-                best_candidate = candidate
-                best_score = score
-                
-            # Early acceptable threshold
-            if score >= 0.8:
-                break
-                
-        except Exception as e:
-            logger.error(f"❌ Mirror response error on attempt {attempt}: {e}")
-            pass
+    # Inject short recent context to improve continuity and reduce random replies.
+    if recent_history:
+        trimmed = recent_history[-8:]
+        for turn in trimmed:
+            role = turn.get("role")
+            content = (turn.get("content") or "").strip()
+            if role in {"user", "assistant"} and content:
+                messages.append({"role": role, "content": content})
+
+    # Ensure latest user message is the final turn.
+    messages.append({"role": "user", "content": message})
+
+    max_tokens = 320 if is_structured_task else 260
+    base_temperature = (0.5 if is_structured_task else 0.58) + (
+        0.25 * telemetry["mirror_intensity"] * context_policy.tone_strength
+    )
+
+    async def generate_candidate(attempt: int) -> str:
+        return await llm_gateway.chat_complete(
+            messages,
+            max_tokens=max_tokens,
+            temperature=base_temperature + (0.05 * attempt),
+            timeout_s=MIRROR_ATTEMPT_TIMEOUT_SECONDS,
+        )
+
+    async def generate_choices(count: int) -> List[str]:
+        return await llm_gateway.chat_complete_many(
+            messages,
+            max_tokens=max_tokens,
+            temperature=base_temperature + 0.05,
+            timeout_s=MIRROR_ATTEMPT_TIMEOUT_SECONDS,
+            n=count,
+        )
+
+    async def evaluate_candidate(candidate: str) -> Optional[float]:
+        if _is_low_quality_candidate(
+            candidate,
+            message,
+            recent_outputs,
+            task_type=resolved_task_type,
+            sampled_profile=sampled_profile,
+            task_execution_mode=task_execution_mode,
+        ):
+            return None
+
+        if await _is_recent_duplicate(db, user_id, candidate):
+            return None
+
+        return score_mirror_candidate(
+            candidate,
+            sampled_profile,
+            recent_outputs,
+            source_message=message,
+            task_execution_mode=task_execution_mode,
+        )
+
+    search = await search_mirror_candidates(
+        max_retries,
+        generate_candidate,
+        evaluate_candidate,
+        mode=MIRROR_CANDIDATE_MODE,
+        generate_many=generate_choices,
+    )
+    best_candidate = search.candidate
+    best_score = search.score
+    telemetry["retries_used"] = search.retries_used
+    telemetry["candidate_mode"] = search.mode
+    telemetry["candidates_requested"] = search.requested
 
     # 4. Fallbacks
-    if best_score < 0.45 or not best_candidate:
+    if best_score < MIRROR_FALLBACK_SCORE or not best_candidate:
         logger.info(f"Falling back, best score generated was {best_score}")
         if resolved_task_type in ASSISTANT_FALLBACK_TASK_TYPES:
             final_reply = build_assistant_fallback_reply(message, resolved_task_type)
         else:
-            final_reply = await generate_baseline_mirror_response(message)
+            final_reply = await generate_baseline_mirror_response(message, message_features)
             # If the baseline also triggers low quality, we just use it anyway to avoid
             # hard-looping on "say more" which feels completely unnatural.
             if _is_low_quality_candidate(
@@ -588,6 +621,7 @@ async def generate_mirror_response(
         telemetry["fallback_triggered"] = True
     else:
         final_reply = best_candidate
+    telemetry["candidates_wasted"] = search.wasted(used=not telemetry["fallback_triggered"])
         
     professional_context = context_policy.context_mode == "professional"
     styled = await enforce_style(
@@ -603,6 +637,8 @@ async def generate_mirror_response(
         professional_context=professional_context,
         allow_slang=context_policy.allow_slang,
         allow_imperfect_grammar=context_policy.allow_imperfect_grammar,
+        message_features=message_features,
+        reaction_candidates=reaction_candidates,
     )
     final_reply = styled.text
 
@@ -612,6 +648,11 @@ async def generate_mirror_response(
     telemetry["stimulus_tag"] = styled.stimulus_tag
     
     logger.info(f"✅ Mirror response finalized: {final_reply[:50]}...")
+    logger.info(
+        f"🧩 Mirror prompt {compiled_prompt.total_bytes} bytes: "
+        f"{compiled_prompt.prefix_bytes} stable prefix (~{telemetry['prompt_prefix_tokens_est']} tokens "
+        f"x {search.requested} requests), {compiled_prompt.memoized_bytes} memoized"
+    )
     
     # Update variation buffer
     if final_reply:
@@ -633,6 +674,146 @@ async def generate_mirror_response(
     return final_reply, telemetry
 
 
+@dataclass
+class CandidateSearchResult:
+    """Outcome of one anti-repetition candidate search."""
+
+    mode: str
+    candidate: str = ""
+    score: float = -1.0
+    requested: int = 0
+    received: int = 0
+    retries_used: int = 0
+
+    def wasted(self, used: bool) -> int:
+        """Requested candidates that did not become the reply."""
+        return max(self.requested - (1 if used and self.candidate else 0), 0)
+
+    def offer(self, candidate: str, score: Optional[float]) -> bool:
+        """Keep the candidate if it beats the best so far; True once it is good enough to stop."""
+        if score is None:
+            return False
+        if score > self.score:
+            self.candidate = candidate
+            self.score = score
+        return score >= MIRROR_ACCEPT_SCORE
+
+
+async def search_mirror_candidates(
+    count: int,
+    generate: Callable[[int], Awaitable[str]],
+    evaluate: Callable[[str], Awaitable[Optional[float]]],
+    mode: str = MIRROR_CANDIDATE_MODE,
+    budget_s: float = MIRROR_LOOP_BUDGET_SECONDS,
+    generate_many: Optional[Callable[[int], Awaitable[List[str]]]] = None,
+) -> CandidateSearchResult:
+    """
+    Generate up to `count` candidates and keep the best-scoring one.
+
+    `evaluate` returns None for a rejected candidate, otherwise its score. The
+    search stops early once a candidate scores at least MIRROR_ACCEPT_SCORE.
+    """
+    if mode == "choices" and generate_many is not None and count > 1:
+        return await _search_choices(count, generate_many, evaluate)
+    if mode in {"parallel", "choices"} and count > 1:
+        return await _search_parallel(count, generate, evaluate, budget_s)
+    return await _search_sequential(count, generate, evaluate, budget_s)
+
+
+async def _search_sequential(
+    count: int,
+    generate: Callable[[int], Awaitable[str]],
+    evaluate: Callable[[str], Awaitable[Optional[float]]],
+    budget_s: float,
+) -> CandidateSearchResult:
+    result = CandidateSearchResult(mode="sequential")
+    start_time = time.time()
+    for attempt in range(count):
+        result.retries_used = attempt
+        if time.time() - start_time > budget_s:
+            logger.warning("Timeout reached during anti-repetition generation loop.")
+            break
+
+        result.requested += 1
+        try:
+            candidate = await generate(attempt)
+            result.received += 1
+            if result.offer(candidate, await evaluate(candidate)):
+                break
+        except Exception as e:
+            logger.error(f"❌ Mirror response error on attempt {attempt}: {e}")
+    return result
+
+
+async def _search_parallel(
+    count: int,
+    generate: Callable[[int], Awaitable[str]],
+    evaluate: Callable[[str], Awaitable[Optional[float]]],
+    budget_s: float,
+) -> CandidateSearchResult:
+    """
+    Request every candidate at once and score them as they arrive.
+
+    Until the budget runs out we wait for further candidates. After that we stop
+    as soon as something scores above the fallback line; with nothing usable yet
+    we keep waiting, as the sequential loop does for its first attempt. Scoring
+    stays on this task because it shares the request's database session.
+    """
+    result = CandidateSearchResult(mode="parallel", requested=count)
+    deadline = time.time() + budget_s
+    pending = {asyncio.ensure_future(generate(attempt)) for attempt in range(count)}
+    try:
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0 and result.score >= MIRROR_FALLBACK_SCORE:
+                break
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=remaining if remaining > 0 else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            accepted = False
+            for task in done:
+                try:
+                    candidate = task.result()
+                    result.received += 1
+                    accepted = result.offer(candidate, await evaluate(candidate)) or accepted
+                except Exception as e:
+                    logger.error(f"❌ Mirror response error on parallel candidate: {e}")
+            if accepted:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    result.retries_used = max(result.received - 1, 0)
+    return result
+
+
+async def _search_choices(
+    count: int,
+    generate_many: Callable[[int], Awaitable[List[str]]],
+    evaluate: Callable[[str], Awaitable[Optional[float]]],
+) -> CandidateSearchResult:
+    result = CandidateSearchResult(mode="choices", requested=count)
+    try:
+        candidates = await generate_many(count)
+    except Exception as e:
+        logger.error(f"❌ Mirror response error on multi-choice request: {e}")
+        return result
+
+    result.received = len(candidates)
+    for candidate in candidates:
+        try:
+            if result.offer(candidate, await evaluate(candidate)):
+                break
+        except Exception as e:
+            logger.error(f"❌ Mirror candidate scoring failed: {e}")
+    result.retries_used = max(result.received - 1, 0)
+    return result
+
+
 def _sample_profile(traits: Dict[str, float]) -> Dict[str, Any]:
     """Applies probabilistic sampling to the 4 core mirror traits."""
     sampled = {}
@@ -665,42 +846,17 @@ def _sample_profile(traits: Dict[str, float]) -> Dict[str, Any]:
     return sampled
 
 
-async def get_cached_snapshot(db: AsyncSession, user_id: UUID):
-    """Get snapshot from cache or database."""
-    cache_key = str(user_id)
-    
-    # Check cache first
-    if cache_key in _snapshot_cache:
-        logger.debug(f"📦 Using cached snapshot for user {user_id}")
-        # Return a simple dict-like object for cached data
-        cached = _snapshot_cache[cache_key]
-        # Fetch fresh from DB to ensure we have the model object
-        snapshot = await PersonaRepository.get_latest_snapshot(db, user_id)
-        return snapshot
-    
-    # Fetch from database
-    snapshot = await PersonaRepository.get_latest_snapshot(db, user_id)
-    
-    if snapshot:
-        # Cache it
-        _snapshot_cache[cache_key] = {
-            "persona_vector": snapshot.persona_vector,
-            "stability_index": snapshot.stability_index,
-        }
-        logger.debug(f"💾 Cached snapshot for user {user_id}")
-    
-    return snapshot
+async def get_cached_snapshot(db: AsyncSession, user_id: UUID) -> Optional[CachedSnapshot]:
+    """Latest snapshot from the process-wide cache; queries only when it changed or expired."""
+    return await snapshot_cache.get(db, user_id)
 
 
 def invalidate_snapshot_cache(user_id: UUID) -> None:
     """Invalidate cached snapshot for a user."""
-    cache_key = str(user_id)
-    if cache_key in _snapshot_cache:
-        del _snapshot_cache[cache_key]
-        logger.debug(f"🗑️ Invalidated snapshot cache for user {user_id}")
+    bump_snapshot_version(user_id)
 
 
-def analyze_message_style(message: str) -> Dict[str, Any]:
+def analyze_message_style(message: str, features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
     """
     Analyze the current message style for live mirroring.
     
@@ -712,45 +868,33 @@ def analyze_message_style(message: str) -> Dict[str, Any]:
         - caps_intensity: Ratio of caps words
         - has_questions: Whether message contains questions
     """
-    # Split into sentences
-    sentences = re.split(r'[.!?]+', message)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
+    features = ensure_features(message, features)
+
     # Calculate average sentence length
-    if sentences:
-        words_per_sentence = [len(s.split()) for s in sentences]
+    if features.sentences:
+        words_per_sentence = [len(s.split()) for s in features.sentences]
         avg_sentence_length = sum(words_per_sentence) / len(words_per_sentence)
     else:
-        avg_sentence_length = len(message.split())
+        avg_sentence_length = len(features.whitespace_tokens)
     
     # Count punctuation
-    exclamation_count = message.count('!')
-    question_count = message.count('?')
-    punctuation_intensity = exclamation_count + question_count
+    punctuation_intensity = features.exclamation_count + features.question_count
     
     # Detect slang/casual language
-    slang_markers = ['gonna', 'wanna', 'gotta', 'kinda', 'sorta', 'yeah', 'nah', 'like', 'just', 'really']
-    lower_message = message.lower()
-    has_slang = any(marker in lower_message for marker in slang_markers)
+    has_slang = features.has("style.slang")
     
     # Detect emotional markers
-    emotional_words = ['love', 'hate', 'happy', 'sad', 'angry', 'excited', 'worried', 'anxious', 'stressed', 'amazing', 'terrible', 'awesome']
-    emotional_markers = sum(1 for word in emotional_words if word in lower_message)
+    emotional_markers = features.count("style.emotional")
     
     # Emojis or emotional punctuation
-    if '!' in message or '?' in message or any(c in message for c in ['😊', '😂', '😢', '😠', '🥺', '💀', '🔥']):
+    if features.exclamation_count or features.question_count or features.has("style.emoji"):
         emotional_markers += 1
     
     # Caps intensity
-    words = message.split()
-    if words:
-        caps_words = sum(1 for word in words if word.isupper() and len(word) > 1)
-        caps_intensity = caps_words / len(words)
-    else:
-        caps_intensity = 0.0
+    caps_intensity = features.caps_word_ratio
     
     # Has questions
-    has_questions = '?' in message
+    has_questions = features.question_count > 0
     
     return {
         "avg_sentence_length": round(avg_sentence_length, 1),
@@ -804,28 +948,118 @@ def extract_key_traits(persona_vector: Dict) -> Dict[str, float]:
     return key_traits
 
 
-def build_mirror_system_prompt(
-    sampled_profile: Dict[str, float], 
-    stability_index: float,
-    message_style: Dict[str, Any],
-    twin_policy: Optional[Dict[str, Any]] = None,
-    task_type: Optional[str] = None,
-    confidence_tier: str = "moderate",
-    phrase_usage_frequency: float = 0.5,
-    tone_strength: float = 0.5,
-    detected_emotion: Optional[str] = None,
-    active_mirror_style: Optional[str] = None,
-    behavioral_signals: Optional[List[str]] = None,
-    linguistic_fingerprint: Optional[str] = None,
-    task_execution_mode: bool = False,
-) -> str:
-    """Build mirror prompt with full assistant capability in user voice."""
-    twin_policy = resolve_twin_settings(twin_policy)
-    effective_task_type = task_type or "generic"
-    active_style = active_mirror_style or "calm"
-    current_emotion = detected_emotion or "neutral"
+# Constant opening of every mirror system prompt. It must not depend on any
+# per-user or per-turn value, so providers can cache it as a prompt prefix.
+MIRROR_PROMPT_PREFIX = """SYSTEM ROLE:
+You are a Persona Mirror Assistant.
+This is not external advice and not generic assistant narration.
+
+OBJECTIVE:
+Generate a useful, correct response that feels indistinguishable from the user's own style.
+
+STRICT RULES:
+1. TASK CORRECTNESS BEFORE STYLE
+2. BEHAVIORAL ACCURACY > GENERIC AI TONE (apply the TURN STYLE RULES below)
+3. MIRROR WITHOUT LOSING CAPABILITY
+4. APPLY MOOD AND ARCHETYPE WITHOUT NAMING INTERNAL RULES
+5. RESPONSE LENGTH MATCHING
+     - If the user sends 2+ sentences, respond with at least one complete sentence.
+     - Avoid one-word outputs unless the user message itself is one word.
+6. MODE ENFORCEMENT
+    - If Task Execution Mode is active, output the requested artifact directly.
+    - In Task Execution Mode, do not produce reflective or meta commentary.
+    - In mirror-conversation mode, keep the same thought thread and natural flow.
+    - Avoid abrupt finality; land in ongoing clarity that still feels in-motion.
+7. FORBIDDEN OUTPUTS:
+- Fabricated claims that an external action was completed
+- AI self-references or policy disclosures
+- Generic fillers: "hmm", "ok", "idk", "same" as standalone replies
+- Excessive use of asterisks (*) for emphasis. Use bold/italics rarely and ONLY for truly important words. Do not bold alternate words.
+8. VALIDATION CHECK:
+Before output, verify both:
+- "Does this sound like me responding to myself in the same ongoing thought?"
+- "Would the user realistically type this?"
+
+9. TOPICAL CONTINUITY:
+- Reference at least one concrete element from the user's latest message.
+- Do not switch topics unless the user switches topics.
+
+OUTPUT STYLE:
+- Natural, direct, and human
+- Slightly imperfect when it increases realism
+- Internal and self-directed, conversational without sounding like advice
+- Allow light starters and natural phrasing when they fit the voice"""
+
+CONFIDENCE_TIER_NOTES = {
+    "very_low": "Very low confidence: keep mimicry light and include uncertainty framing.",
+    "partial": "Partial confidence: use limited slang and moderate style transfer.",
+    "moderate": "Moderate confidence: apply clear style matching with controlled variation.",
+    "high": "High confidence: full persona mode with natural imperfections.",
+}
+
+# Behavior rule per trait for (low < 0.35, middle, high > 0.68) sampled scores.
+TRAIT_BEHAVIOR_RULES = {
+    "communication_style": (
+        "• Keep response compact and direct (2-3 lines when possible).",
+        "• Use balanced length with concise support detail.",
+        "• Add detail and explanation depth (4-6 lines when useful).",
+    ),
+    "decision_framing": (
+        "• Allow uncertainty and internal conflict when it is realistic.",
+        "• Keep confidence moderate and context-sensitive.",
+        "• Use clear, confident statements; avoid hedging language.",
+    ),
+    "emotional_expressiveness": (
+        "• Use neutral, matter-of-fact tone focused on structure.",
+        "• Keep emotional tone measured and natural.",
+        "• Include emotional awareness and felt experience where relevant.",
+    ),
+    "reflection_depth": (
+        "• Prioritize simple observations over deep analysis.",
+        "• Use moderate insight with practical framing.",
+        "• Surface loops, patterns, and meta-level reasoning when relevant.",
+    ),
+}
+
+TASK_SPECIFIC_RULES = {
+    "email_draft": (
+        "- Email draft must include: Subject line, greeting, full body, and sign-off.\n"
+        "- Output only the finished draft text unless user asks for alternatives.\n"
+    ),
+    "message_draft": "- Provide a ready-to-send message draft before any optional notes.\n",
+    "planning": "- Return prioritized next steps with realistic sequencing.\n",
+}
+
+TASK_EXECUTION_RULES = (
+    "- Generate the actual output artifact now (draft/rewrite/content), not reflection.\n"
+    "- Do NOT echo the user input.\n"
+    "- Do NOT explain process or mention what you are about to do.\n"
+    "- Do NOT say phrases like 'here is a draft'.\n"
+)
+
 
-    intensity = float(twin_policy.get("twin_mirror_intensity", 0.8))
+def _trait_rule(trait: str, score: float) -> str:
+    low, middle, high = TRAIT_BEHAVIOR_RULES[trait]
+    if score < 0.35:
+        return low
+    if score > 0.68:
+        return high
+    return middle
+
+
+def _runtime_block(
+    active_style: str,
+    current_emotion: str,
+    confidence_tier: str,
+    intensity: float,
+    autonomy_mode: str,
+    require_approval: bool,
+    phrase_usage_frequency: float,
+    tone_strength: float,
+    task_type: str,
+    task_execution_mode: bool,
+) -> str:
+    """Mode, identity, policy and task instructions; depends only on its (hashable) arguments."""
     if intensity < 0.35:
         intensity_note = "Mirror lightly: preserve intent first and apply subtle style matching."
     elif intensity < 0.7:
@@ -833,7 +1067,6 @@ def build_mirror_system_prompt(
     else:
         intensity_note = "Mirror strongly: prioritize the user's authentic wording patterns and cadence."
 
-    autonomy_mode = twin_policy.get("twin_autonomy_mode", "draft_only")
     if autonomy_mode == "auto_execute":
         autonomy_note = "If asked for an action, propose the concrete output confidently but never claim external execution."
     elif autonomy_mode == "suggest":
@@ -843,9 +1076,97 @@ def build_mirror_system_prompt(
 
     approval_note = (
         "Approval required: avoid statements that imply irreversible actions are complete."
-        if twin_policy.get("twin_require_approval", True)
+        if require_approval
         else "Approval relaxed: still avoid fabricating external state changes."
     )
+    confidence_note = CONFIDENCE_TIER_NOTES.get(confidence_tier, CONFIDENCE_TIER_NOTES["moderate"])
+    archetype_note = MIRROR_ARCHETYPE_NOTES.get(active_style, MIRROR_ARCHETYPE_NOTES["calm"])
+    emotion_note = EMOTION_NOTES.get(current_emotion, EMOTION_NOTES["neutral"])
+
+    mode_line = (
+        "You are currently in Task Execution Mode: perform the task directly with light persona influence."
+        if task_execution_mode
+        else "You respond as the user talking to themselves in a natural back-and-forth flow."
+    )
+    mode_switch_line = (
+        "- TASK EXECUTION MODE ACTIVE: exit reflection-style mirroring and produce direct task output."
+        if task_execution_mode
+        else "- Mirror mode remains conversational and self-responsive."
+    )
+    task_note = TASK_PROMPT_NOTES.get(task_type, TASK_PROMPT_NOTES["generic"])
+    task_mode_rules = TASK_EXECUTION_RULES if task_execution_mode else ""
+
+    return f"""RUNTIME MODE:
+{mode_line}
+
+ADAPTIVE RUNTIME IDENTITY:
+- Active Archetype: {active_style}
+- Archetype Guidance: {archetype_note}
+- Detected Emotion: {current_emotion}
+- Emotion Guidance: {emotion_note}
+
+DIGITAL TWIN RUNTIME POLICY:
+• Mirror Intensity: {intensity:.2f}
+• Autonomy Mode: {autonomy_mode}
+• Confidence Tier: {confidence_tier}
+• Phrase Usage Frequency: {phrase_usage_frequency:.2f}
+• Tone Strength: {tone_strength:.2f}
+• {approval_note}
+• {intensity_note}
+• {autonomy_note}
+• {confidence_note}
+
+ASSISTANT MIRROR MODE:
+- Task route: {task_type}
+- Primary instruction: {task_note}
+- Always answer with full assistant capability while preserving the user's voice.
+{mode_switch_line}
+- Priority order:
+    1) Solve the user's immediate request correctly.
+    2) Keep format/output constraints exactly aligned with the prompt.
+    3) Apply persona and tone adaptation after correctness.
+- If details are missing, continue with the most plausible first-person assumption instead of asking.
+- Never claim external actions were actually executed.
+{task_mode_rules}{TASK_SPECIFIC_RULES.get(task_type, "")}""".rstrip()
+
+
+def build_mirror_system_prompt(*args: Any, **kwargs: Any) -> str:
+    """Build mirror prompt with full assistant capability in user voice.
+
+    Same arguments as `compile_mirror_system_prompt`; returns only the text.
+    """
+    return compile_mirror_system_prompt(*args, **kwargs).text
+
+
+def compile_mirror_system_prompt(
+    sampled_profile: Dict[str, float], 
+    stability_index: float,
+    message_style: Dict[str, Any],
+    twin_policy: Optional[Dict[str, Any]] = None,
+    task_type: Optional[str] = None,
+    confidence_tier: str = "moderate",
+    phrase_usage_frequency: float = 0.5,
+    tone_strength: float = 0.5,
+    detected_emotion: Optional[str] = None,
+    active_mirror_style: Optional[str] = None,
+    behavioral_signals: Optional[List[str]] = None,
+    linguistic_fingerprint: Optional[str] = None,
+    task_execution_mode: bool = False,
+) -> CompiledPrompt:
+    """Compile the mirror prompt: constant prefix, memoized runtime block, per-turn tail."""
+    twin_policy = resolve_twin_settings(twin_policy)
+    runtime_key = (
+        active_mirror_style or "calm",
+        detected_emotion or "neutral",
+        confidence_tier,
+        round(float(twin_policy.get("twin_mirror_intensity", 0.8)), 2),
+        twin_policy.get("twin_autonomy_mode", "draft_only"),
+        bool(twin_policy.get("twin_require_approval", True)),
+        round(phrase_usage_frequency, 2),
+        round(tone_strength, 2),
+        task_type or "generic",
+        bool(task_execution_mode),
+    )
 
     if stability_index < STABILITY_THRESHOLD_UNSTABLE:
         stability_note = "Baseline emerging - mirror subtly"
@@ -854,16 +1175,6 @@ def build_mirror_system_prompt(
     else:
         stability_note = "Baseline developing - balanced mirroring"
 
-    confidence_note = {
-        "very_low": "Very low confidence: keep mimicry light and include uncertainty framing.",
-        "partial": "Partial confidence: use limited slang and moderate style transfer.",
-        "moderate": "Moderate confidence: apply clear style matching with controlled variation.",
-        "high": "High confidence: full persona mode with natural imperfections.",
-    }.get(confidence_tier, "Moderate confidence: apply clear style matching with controlled variation.")
-
-    archetype_note = MIRROR_ARCHETYPE_NOTES.get(active_style, MIRROR_ARCHETYPE_NOTES["calm"])
-    emotion_note = EMOTION_NOTES.get(current_emotion, EMOTION_NOTES["neutral"])
-
     if behavioral_signals:
         signal_lines = "\n".join(f"- {signal}" for signal in behavioral_signals[:3])
     else:
@@ -884,36 +1195,12 @@ def build_mirror_system_prompt(
 
 Stability Index: {stability_index:.2f} → {stability_note}"""
 
-    trait_behavior_rules = []
-    if communication_style < 0.35:
-        trait_behavior_rules.append("• Keep response compact and direct (2-3 lines when possible).")
-    elif communication_style > 0.68:
-        trait_behavior_rules.append("• Add detail and explanation depth (4-6 lines when useful).")
-    else:
-        trait_behavior_rules.append("• Use balanced length with concise support detail.")
-
-    if decision_framing < 0.35:
-        trait_behavior_rules.append("• Allow uncertainty and internal conflict when it is realistic.")
-    elif decision_framing > 0.68:
-        trait_behavior_rules.append("• Use clear, confident statements; avoid hedging language.")
-    else:
-        trait_behavior_rules.append("• Keep confidence moderate and context-sensitive.")
-
-    if emotional_expressiveness < 0.35:
-        trait_behavior_rules.append("• Use neutral, matter-of-fact tone focused on structure.")
-    elif emotional_expressiveness > 0.68:
-        trait_behavior_rules.append("• Include emotional awareness and felt experience where relevant.")
-    else:
-        trait_behavior_rules.append("• Keep emotional tone measured and natural.")
-
-    if reflection_depth < 0.35:
-        trait_behavior_rules.append("• Prioritize simple observations over deep analysis.")
-    elif reflection_depth > 0.68:
-        trait_behavior_rules.append("• Surface loops, patterns, and meta-level reasoning when relevant.")
-    else:
-        trait_behavior_rules.append("• Use moderate insight with practical framing.")
-
-    trait_behavior_text = "\n".join(trait_behavior_rules)
+    trait_behavior_rules = [
+        _trait_rule("communication_style", communication_style),
+        _trait_rule("decision_framing", decision_framing),
+        _trait_rule("emotional_expressiveness", emotional_expressiveness),
+        _trait_rule("reflection_depth", reflection_depth),
+    ]
     
     style_description = f"""Current Message Style Analysis:
 • Sentence Length: {message_style['avg_sentence_length']} words/sentence
@@ -955,130 +1242,32 @@ Stability Index: {stability_index:.2f} → {stability_note}"""
         style_rules.append("• Keep a single line of thought, but let it flow conversationally")
         style_rules.append("• Use first-person internal framing; do not address an external 'you'")
         style_rules.append("• Light starters like 'yeah' or 'it's like' are allowed when natural")
-    
-    style_rules_text = "\n".join(style_rules)
-
-    task_note = TASK_PROMPT_NOTES.get(effective_task_type, TASK_PROMPT_NOTES["generic"])
-    task_specific_rules = ""
-    if effective_task_type == "email_draft":
-        task_specific_rules = (
-            "- Email draft must include: Subject line, greeting, full body, and sign-off.\n"
-            "- Output only the finished draft text unless user asks for alternatives.\n"
-        )
-    elif effective_task_type == "message_draft":
-        task_specific_rules = "- Provide a ready-to-send message draft before any optional notes.\n"
-    elif effective_task_type == "planning":
-        task_specific_rules = "- Return prioritized next steps with realistic sequencing.\n"
 
-    mode_switch_line = (
-        "- TASK EXECUTION MODE ACTIVE: exit reflection-style mirroring and produce direct task output."
-        if task_execution_mode
-        else "- Mirror mode remains conversational and self-responsive."
-    )
-
-    task_mode_rules = ""
-    if task_execution_mode:
-        task_mode_rules = (
-            "- Generate the actual output artifact now (draft/rewrite/content), not reflection.\n"
-            "- Do NOT echo the user input.\n"
-            "- Do NOT explain process or mention what you are about to do.\n"
-            "- Do NOT say phrases like 'here is a draft'.\n"
-        )
-
-    task_block = f"""\
-ASSISTANT MIRROR MODE:
-- Task route: {effective_task_type}
-- Primary instruction: {task_note}
-- Always answer with full assistant capability while preserving the user's voice.
-- {mode_switch_line}
-- Priority order:
-    1) Solve the user's immediate request correctly.
-    2) Keep format/output constraints exactly aligned with the prompt.
-    3) Apply persona and tone adaptation after correctness.
-- If details are missing, continue with the most plausible first-person assumption instead of asking.
-- Never claim external actions were actually executed.
-{task_mode_rules}
-{task_specific_rules}"""
-    
-    prompt = f"""SYSTEM ROLE:
-        You are a Persona Mirror Assistant.
-
-    You are a Persona Mirror Assistant.
-    {"You are currently in Task Execution Mode: perform the task directly with light persona influence." if task_execution_mode else "You respond as the user talking to themselves in a natural back-and-forth flow."}
-    This is not external advice and not generic assistant narration.
-
-INPUT SOURCES:
+    turn_block = f"""INPUT SOURCES:
 1. Persona Profile (from Reflection Mode)
 {trait_profile}
 
-    2. Adaptive Runtime Identity
-    - Active Archetype: {active_style}
-    - Archetype Guidance: {archetype_note}
-    - Detected Emotion: {current_emotion}
-    - Emotion Guidance: {emotion_note}
+2. Recent Behavioral Signals
+{signal_lines}
 
-    3. Recent Behavioral Signals
-    {signal_lines}
+3. Linguistic Fingerprint
+{fingerprint_note}
 
-    4. Linguistic Fingerprint
-    {fingerprint_note}
-
-    5. Current Message & Mood Style
+4. Current Message & Mood Style
 {style_description}
 
-    6. Digital Twin Runtime Policy
-• Mirror Intensity: {intensity:.2f}
-• Autonomy Mode: {autonomy_mode}
-• Confidence Tier: {confidence_tier}
-• Phrase Usage Frequency: {phrase_usage_frequency:.2f}
-• Tone Strength: {tone_strength:.2f}
-• {approval_note}
-• {intensity_note}
-• {autonomy_note}
-• {confidence_note}
-
-OBJECTIVE:
-Generate a useful, correct response that feels indistinguishable from the user's own style.
-
-{task_block}
-
-STRICT RULES:
-1. TASK CORRECTNESS BEFORE STYLE
-2. BEHAVIORAL ACCURACY > GENERIC AI TONE
-{trait_behavior_text}
-{style_rules_text}
-3. MIRROR WITHOUT LOSING CAPABILITY
-4. APPLY MOOD AND ARCHETYPE WITHOUT NAMING INTERNAL RULES
-5. RESPONSE LENGTH MATCHING
-     - If the user sends 2+ sentences, respond with at least one complete sentence.
-     - Avoid one-word outputs unless the user message itself is one word.
-6. MODE ENFORCEMENT
-    - If Task Execution Mode is active, output the requested artifact directly.
-    - In Task Execution Mode, do not produce reflective or meta commentary.
-    - In mirror-conversation mode, keep the same thought thread and natural flow.
-    - Avoid abrupt finality; land in ongoing clarity that still feels in-motion.
-7. FORBIDDEN OUTPUTS:
-- Fabricated claims that an external action was completed
-- AI self-references or policy disclosures
-- Generic fillers: "hmm", "ok", "idk", "same" as standalone replies
-- Excessive use of asterisks (*) for emphasis. Use bold/italics rarely and ONLY for truly important words. Do not bold alternate words.
-8. VALIDATION CHECK:
-Before output, verify both:
-- "Does this sound like me responding to myself in the same ongoing thought?"
-- "Would the user realistically type this?"
-
-9. TOPICAL CONTINUITY:
-- Reference at least one concrete element from the user's latest message.
-- Do not switch topics unless the user switches topics.
-
-OUTPUT STYLE:
-- Natural, direct, and human
-- Slightly imperfect when it increases realism
-- Internal and self-directed, conversational without sounding like advice
-- Allow light starters and natural phrasing when they fit the voice
+TURN STYLE RULES:
+{chr(10).join(trait_behavior_rules + style_rules)}
 """
-    
-    return prompt
+
+    return prompt_compiler.compile(
+        "mirror",
+        MIRROR_PROMPT_PREFIX,
+        [
+            (runtime_key, lambda: _runtime_block(*runtime_key)),
+            turn_block,
+        ],
+    )
 
 
 def format_trait_score(score: float) -> str:
@@ -1111,13 +1300,16 @@ def get_trait_level(score: float) -> str:
         return "Very High"
 
 
-async def generate_baseline_mirror_response(message: str) -> str:
+async def generate_baseline_mirror_response(
+    message: str,
+    message_features: Optional[MessageFeatures] = None,
+) -> str:
     """Generate a basic mirror response without personality data."""
-    if not MISTRAL_AVAILABLE or not mistral_client:
+    if not llm_gateway.is_available():
         return "I'm still learning your style. Keep talking to me and I'll start mirroring you more accurately."
     
     # Analyze message style even without persona
-    message_style = analyze_message_style(message)
+    message_style = analyze_message_style(message, message_features)
     
     try:
         # Build a minimal mirror prompt
@@ -1150,14 +1342,11 @@ MIRROR MODE CONTRACT:
             {"role": "user", "content": message}
         ]
         
-        response = mistral_client.chat.complete(
-            model="mistral-small-latest",
-            messages=messages,
+        candidate = await llm_gateway.chat_complete(
+            messages,
             max_tokens=200,
             temperature=0.7,
         )
-        
-        candidate = response.choices[0].message.content.strip()
         return candidate
         
     except Exception as e:
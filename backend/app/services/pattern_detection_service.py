@@ -1,5 +1,26 @@
-import re
-from collections import Counter
+"""Recurring emotion and trigger patterns in a user's memories.
+
+Each memory is scanned once by the compiled PATTERN_MATCHER. The category hits
+for all memories are collected as (memory, category) coordinates and scattered
+into a memories x categories matrix. Counting is then NumPy arithmetic on that
+matrix, optionally weighted so older memories count for less, and summed per
+user. This lets a nightly job score many users in one call as cheaply as the
+reflection path scores one turn's memories.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message
+from app.services.keyword_matcher import KeywordMatcher
 
 
 EMOTION_KEYWORDS = {
@@ -14,39 +35,149 @@ TRIGGER_KEYWORDS = {
     "relationships": ["relationship", "friend", "family"],
 }
 
+PATTERN_MATCHER = KeywordMatcher({
+    **{f"emotion.{emotion}": keywords for emotion, keywords in EMOTION_KEYWORDS.items()},
+    **{f"trigger.{trigger}": keywords for trigger, keywords in TRIGGER_KEYWORDS.items()},
+})
 
-async def detect_patterns(memories):
+# Matrix columns: emotions first, then triggers.
+PATTERN_CATEGORIES: Tuple[str, ...] = (
+    *(f"emotion.{emotion}" for emotion in EMOTION_KEYWORDS),
+    *(f"trigger.{trigger}" for trigger in TRIGGER_KEYWORDS),
+)
+_COLUMN = {category: column for column, category in enumerate(PATTERN_CATEGORIES)}
+_EMOTION_COLUMNS = slice(0, len(EMOTION_KEYWORDS))
 
-    emotion_counts = Counter()
-    trigger_counts = Counter()
+PATTERN_MIN_COUNT = 2
+BEHAVIOR_LOOP_MIN_COUNT = 3
 
-    for memory in memories:
-        text = memory.lower()
 
-        # detect emotions
-        for emotion, keywords in EMOTION_KEYWORDS.items():
-            if any(word in text for word in keywords):
-                emotion_counts[emotion] += 1
+@dataclass(frozen=True)
+class PatternCounts:
+    """Per-user (optionally decay-weighted) memory counts for every pattern category."""
 
-        # detect triggers
-        for trigger, keywords in TRIGGER_KEYWORDS.items():
-            if any(word in text for word in keywords):
-                trigger_counts[trigger] += 1
+    owners: Tuple[Hashable, ...]
+    counts: Any  # float64 array, len(owners) x len(PATTERN_CATEGORIES)
+
+    def for_owner(self, owner: Hashable) -> Dict[str, float]:
+        row = self.counts[self.owners.index(owner)]
+        return {category: float(value) for category, value in zip(PATTERN_CATEGORIES, row) if value}
+
+    def patterns(self) -> Dict[Hashable, List[str]]:
+        return {owner: _patterns_from_row(row) for owner, row in zip(self.owners, self.counts)}
+
+
+def keyword_hit_matrix(texts: Sequence[str]) -> Any:
+    """len(texts) x len(PATTERN_CATEGORIES) matrix, 1.0 where a memory hits a category.
+
+    Identical texts are scanned once.
+    """
+    scanned: Dict[str, List[int]] = {}
+    rows: List[int] = []
+    columns: List[int] = []
+    for row, text in enumerate(texts):
+        hit_columns = scanned.get(text)
+        if hit_columns is None:
+            hit_columns = scanned[text] = [_COLUMN[category] for category in PATTERN_MATCHER.categories(text or "")]
+        rows.extend([row] * len(hit_columns))
+        columns.extend(hit_columns)
+
+    matrix = np.zeros((len(texts), len(PATTERN_CATEGORIES)), dtype=np.float64)
+    matrix[np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)] = 1.0
+    return matrix
+
+
+def decay_weights(
+    timestamps: Sequence[Optional[datetime]],
+    half_life_days: Optional[float],
+    now: Optional[datetime] = None,
+) -> Any:
+    """0.5 ** (age / half_life) per memory; all ones without a half-life. Undated memories count fully."""
+    if not half_life_days:
+        return np.ones(len(timestamps), dtype=np.float64)
+    now = now or datetime.now(timezone.utc)
+    ages = np.array(
+        [0.0 if ts is None else (now - _aware(ts)).total_seconds() / 86400 for ts in timestamps],
+        dtype=np.float64,
+    )
+    return np.power(0.5, np.clip(ages, 0.0, None) / half_life_days)
 
-    patterns = []
 
-    # emotional state pattern
-    for emotion, count in emotion_counts.items():
-        if count >= 2:
-            patterns.append(f"emotional_state → {emotion}")
+def pattern_counts(
+    memories_by_owner: Mapping[Hashable, Sequence[str]],
+    timestamps_by_owner: Optional[Mapping[Hashable, Sequence[Optional[datetime]]]] = None,
+    half_life_days: Optional[float] = None,
+    now: Optional[datetime] = None,
+) -> PatternCounts:
+    """Count pattern categories for many owners with one matrix over all their memories."""
+    owners = tuple(memories_by_owner)
+    texts: List[str] = []
+    owner_rows: List[int] = []
+    timestamps: List[Optional[datetime]] = []
+    for position, owner in enumerate(owners):
+        memories = memories_by_owner[owner]
+        texts.extend(memories)
+        owner_rows.extend([position] * len(memories))
+        owner_timestamps = (timestamps_by_owner or {}).get(owner)
+        timestamps.extend(owner_timestamps if owner_timestamps is not None else [None] * len(memories))
 
-    # trigger pattern
-    for trigger, count in trigger_counts.items():
-        if count >= 2:
-            patterns.append(f"stress_trigger → {trigger}")
+    weighted = keyword_hit_matrix(texts) * decay_weights(timestamps, half_life_days, now)[:, None]
+    counts = np.zeros((len(owners), len(PATTERN_CATEGORIES)), dtype=np.float64)
+    np.add.at(counts, np.asarray(owner_rows, dtype=np.intp), weighted)
+    return PatternCounts(owners=owners, counts=counts)
+
+
+def detect_patterns_batch(
+    memories_by_owner: Mapping[Hashable, Sequence[str]],
+    timestamps_by_owner: Optional[Mapping[Hashable, Sequence[Optional[datetime]]]] = None,
+    half_life_days: Optional[float] = None,
+    now: Optional[datetime] = None,
+) -> Dict[Hashable, List[str]]:
+    return pattern_counts(memories_by_owner, timestamps_by_owner, half_life_days, now).patterns()
+
+
+async def detect_patterns(memories, timestamps=None, half_life_days=None, now=None):
+    counts = pattern_counts({None: list(memories)}, {None: timestamps} if timestamps else None, half_life_days, now)
+    return counts.patterns()[None]
+
+
+async def detect_user_patterns(
+    db: AsyncSession,
+    user_ids: Sequence[UUID],
+    since: Optional[datetime] = None,
+    half_life_days: Optional[float] = None,
+) -> Dict[UUID, List[str]]:
+    """Patterns across the user-authored messages of many users, loaded in one query."""
+    stmt = select(Message.user_id, Message.content, Message.created_at).where(
+        Message.user_id.in_(list(user_ids)), Message.role == "user"
+    )
+    if since is not None:
+        stmt = stmt.where(Message.created_at >= since)
+
+    memories: Dict[UUID, List[str]] = {user_id: [] for user_id in user_ids}
+    timestamps: Dict[UUID, List[Optional[datetime]]] = {user_id: [] for user_id in user_ids}
+    for user_id, content, created_at in (await db.execute(stmt)).all():
+        memories[user_id].append(content)
+        timestamps[user_id].append(created_at)
+    return detect_patterns_batch(memories, timestamps, half_life_days)
+
+
+def _patterns_from_row(row: Any) -> List[str]:
+    patterns = []
+
+    # emotional state pattern, then trigger pattern
+    for category, count in zip(PATTERN_CATEGORIES, row):
+        if count < PATTERN_MIN_COUNT:
+            continue
+        kind, name = category.split(".", 1)
+        patterns.append(f"emotional_state → {name}" if kind == "emotion" else f"stress_trigger → {name}")
 
     # behavior loop detection
-    if emotion_counts and sum(emotion_counts.values()) >= 3:
+    if row[_EMOTION_COLUMNS].sum() >= BEHAVIOR_LOOP_MIN_COUNT:
         patterns.append("behavior_loop → repeated emotional stress")
 
-    return patterns
\ No newline at end of file
+    return patterns
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
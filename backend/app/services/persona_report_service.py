@@ -27,6 +27,7 @@ from app.db.models import (
     User,
     UserPersonaMetric,
 )
+from app.repository.persona_repository import PersonaRepository
 
 logger = logging.getLogger(__name__)
 
@@ -244,10 +245,7 @@ async def _build_payload(db: AsyncSession, user_id: UUID) -> ReportPayload:
     )
     personality_profile = profile_result.scalar_one_or_none()
 
-    snapshots_result = await db.execute(
-        select(PersonaSnapshot).where(PersonaSnapshot.user_id == user_id).order_by(PersonaSnapshot.created_at.asc()).limit(30)
-    )
-    snapshots = snapshots_result.scalars().all()
+    snapshots = await PersonaRepository.get_snapshot_series(db, user_id, bucket="day", limit=30)
 
     metrics_result = await db.execute(
         select(UserPersonaMetric).where(UserPersonaMetric.user_id == user_id).order_by(desc(UserPersonaMetric.last_updated))
@@ -2,12 +2,14 @@
 
 import logging
 import statistics
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repository.persona_repository import PersonaRepository
+from app.services.confidence_aggregate_service import refresh_trait_aggregates
 from app.constants import (
     CONFIDENCE_INCREASE_RATE,
     CONFIDENCE_DECREASE_RATE,
@@ -19,11 +21,99 @@ from app.constants import (
     EXTREME_SCORE_MIN,
     EXTREME_SCORE_MAX,
     DRIFT_SMOOTHING_FACTOR,
+    DEFAULT_TRAIT_SCORE,
+    DEFAULT_TRAIT_CONFIDENCE,
+    TRAIT_LIST,
 )
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class TraitState:
+    """In-memory copy of one trait metric while a batch of nudges is applied."""
+
+    score: float = DEFAULT_TRAIT_SCORE
+    confidence: float = DEFAULT_TRAIT_CONFIDENCE
+    evidence_count: int = 0
+    last_signal: Optional[float] = None
+    changed: bool = False
+
+
+def nudge_trait(old_score: float, old_confidence: float, signal: float, strength: float) -> Tuple[float, float]:
+    """New (score, confidence) for one trait signal."""
+    # ============================================================
+    # GRADUAL WEIGHTED MOVING AVERAGE ALGORITHM
+    # ============================================================
+    # Formula: new_score = (old_score * old_confidence + signal * strength) / (old_confidence + strength)
+    # This ensures:
+    # - Higher confidence scores resist change more
+    # - Stronger signals have more influence
+    # - No single message can drastically shift the trait
+    # ============================================================
+
+    numerator = (old_score * old_confidence) + (signal * strength)
+    denominator = old_confidence + strength
+    new_score = numerator / denominator if denominator > 0 else old_score
+
+    # Clamp score to [0, 1]
+    new_score = max(0.0, min(1.0, new_score))
+
+    # ============================================================
+    # DIRECTIONAL CONFIDENCE LOGIC
+    # ============================================================
+    # If signal direction aligns with current score:
+    #   → Increase confidence (reinforcing pattern)
+    # If signal direction conflicts with current score:
+    #   → Decrease confidence (uncertain/changing pattern)
+    # ============================================================
+
+    # Check alignment: does signal push in same direction as current score?
+    signal_delta = signal - old_score
+
+    if abs(signal_delta) < 0.05:
+        # Signal very close to current score - slight confidence boost
+        new_confidence = min(MAX_CONFIDENCE, old_confidence + CONFIDENCE_INCREASE_RATE * strength * 0.5)
+    elif (signal > 0.5 and old_score > 0.5) or (signal < 0.5 and old_score < 0.5):
+        # Signal and score on same side of neutral - increase confidence
+        new_confidence = min(MAX_CONFIDENCE, old_confidence + CONFIDENCE_INCREASE_RATE * strength)
+    else:
+        # Signal pulls in opposite direction - decrease confidence
+        new_confidence = max(MIN_CONFIDENCE, old_confidence - CONFIDENCE_DECREASE_RATE * strength)
+
+    return new_score, new_confidence
+
+
+def apply_trait_nudges(states: Dict[str, TraitState], extracted_traits: List[Dict]) -> int:
+    """Apply nudges in order to the in-memory states; repeated traits compound like sequential updates."""
+    traits_updated = 0
+    for trait_data in extracted_traits:
+        trait_name = trait_data["name"]
+        signal = trait_data["signal"]
+        strength = trait_data["strength"]
+
+        state = states.get(trait_name)
+        if state is None:
+            # Not in TRAIT_LIST and never seen for this user
+            logger.warning(f"⚠️ Creating missing trait {trait_name}")
+            state = states[trait_name] = TraitState()
+
+        old_score, old_confidence = state.score, state.confidence
+        state.score, state.confidence = nudge_trait(old_score, old_confidence, signal, strength)
+        state.last_signal = signal
+        state.evidence_count += 1
+        state.changed = True
+
+        traits_updated += 1
+        logger.info(
+            f"✅ Updated {trait_name}: "
+            f"score {old_score:.3f}→{state.score:.3f} "
+            f"(Δ{state.score - old_score:+.3f}), "
+            f"confidence {old_confidence:.3f}→{state.confidence:.3f}"
+        )
+    return traits_updated
+
+
 async def update_traits(
     db: AsyncSession, user_id: UUID, extracted_traits: List[Dict]
 ) -> Dict[str, float]:
@@ -34,6 +124,10 @@ async def update_traits(
     - new_score = (old_score * old_confidence + signal * strength) / (old_confidence + strength)
     - Confidence increases if signal aligns with trend, decreases if conflicting
     - Ensures slow convergence and no abrupt changes
+
+    The user's metrics are read once (locked until commit), nudged in memory,
+    and written back together with any missing TRAIT_LIST rows in a single
+    upsert whose RETURNING rows give the stability index and evidence total.
     
     Args:
         db: Database session
@@ -46,97 +140,48 @@ async def update_traits(
     if not extracted_traits:
         logger.info(f"ℹ️ No traits extracted for user {user_id}")
         return {"stability_index": 0.5, "traits_updated": 0}
-    
-    # Initialize missing traits first
-    await PersonaRepository.initialize_missing_traits(db, user_id)
-    
-    traits_updated = 0
-    
-    for trait_data in extracted_traits:
-        trait_name = trait_data["name"]
-        signal = trait_data["signal"]
-        strength = trait_data["strength"]
-        
-        # Fetch existing metric
-        metric = await PersonaRepository.get_metric(db, user_id, trait_name)
-        
-        if not metric:
-            # Create new metric (shouldn't happen after initialization, but handle it)
-            logger.warning(f"⚠️ Creating missing trait {trait_name} for user {user_id}")
-            metric = await PersonaRepository.create_metric(
-                db, user_id, trait_name
-            )
-        
-        old_score = metric.score
-        old_confidence = metric.confidence
-        
-        # ============================================================
-        # GRADUAL WEIGHTED MOVING AVERAGE ALGORITHM
-        # ============================================================
-        # Formula: new_score = (old_score * old_confidence + signal * strength) / (old_confidence + strength)
-        # This ensures:
-        # - Higher confidence scores resist change more
-        # - Stronger signals have more influence
-        # - No single message can drastically shift the trait
-        # ============================================================
-        
-        numerator = (old_score * old_confidence) + (signal * strength)
-        denominator = old_confidence + strength
-        new_score = numerator / denominator if denominator > 0 else old_score
-        
-        # Clamp score to [0, 1]
-        new_score = max(0.0, min(1.0, new_score))
-        
-        # ============================================================
-        # DIRECTIONAL CONFIDENCE LOGIC
-        # ============================================================
-        # If signal direction aligns with current score:
-        #   → Increase confidence (reinforcing pattern)
-        # If signal direction conflicts with current score:
-        #   → Decrease confidence (uncertain/changing pattern)
-        # ============================================================
-        
-        # Check alignment: does signal push in same direction as current score?
-        signal_delta = signal - old_score
-        
-        if abs(signal_delta) < 0.05:
-            # Signal very close to current score - slight confidence boost
-            new_confidence = min(MAX_CONFIDENCE, old_confidence + CONFIDENCE_INCREASE_RATE * strength * 0.5)
-            logger.debug(f"📊 {trait_name}: Signal aligned (neutral)")
-        elif (signal > 0.5 and old_score > 0.5) or (signal < 0.5 and old_score < 0.5):
-            # Signal and score on same side of neutral - increase confidence
-            new_confidence = min(MAX_CONFIDENCE, old_confidence + CONFIDENCE_INCREASE_RATE * strength)
-            logger.debug(f"📈 {trait_name}: Signal aligned (same direction)")
-        else:
-            # Signal pulls in opposite direction - decrease confidence
-            new_confidence = max(MIN_CONFIDENCE, old_confidence - CONFIDENCE_DECREASE_RATE * strength)
-            logger.debug(f"📉 {trait_name}: Signal conflicting (different direction)")
-        
-        # Update metric
-        await PersonaRepository.update_metric(
-            db, metric, new_score, new_confidence, signal
-        )
-        
-        traits_updated += 1
-        logger.info(
-            f"✅ Updated {trait_name}: "
-            f"score {old_score:.3f}→{new_score:.3f} "
-            f"(Δ{new_score - old_score:+.3f}), "
-            f"confidence {old_confidence:.3f}→{new_confidence:.3f}"
-        )
-    
+
+    rows = await PersonaRepository.get_metric_values(db, user_id, lock=True)
+    states = {
+        row.trait_name: TraitState(score=row.score, confidence=row.confidence, evidence_count=row.evidence_count)
+        for row in rows
+    }
+    # Initialize missing traits in the same write
+    for trait_name in TRAIT_LIST:
+        if trait_name not in states:
+            states[trait_name] = TraitState(changed=True)
+            logger.info(f"Initialized missing trait '{trait_name}' for user {user_id}")
+
+    traits_updated = apply_trait_nudges(states, extracted_traits)
+
+    written = await PersonaRepository.upsert_metrics(
+        db,
+        user_id,
+        [
+            {
+                "trait_name": trait_name,
+                "score": state.score,
+                "confidence": state.confidence,
+                "evidence_count": state.evidence_count,
+                "last_signal": state.last_signal,
+            }
+            for trait_name, state in states.items()
+            if state.changed
+        ],
+    )
+    for row in written:
+        states[row.trait_name].confidence = row.confidence
+        states[row.trait_name].evidence_count = row.evidence_count
+
+    await refresh_trait_aggregates(db, user_id)
     await db.commit()
     
     # Compute stability index
-    all_metrics = await PersonaRepository.get_all_metrics(db, user_id)
-    if all_metrics:
-        avg_confidence = statistics.mean([m.confidence for m in all_metrics])
-        logger.info(f"📊 Stability index: {avg_confidence:.3f}")
-    else:
-        avg_confidence = 0.5
+    avg_confidence = statistics.mean(state.confidence for state in states.values())
+    logger.info(f"📊 Stability index: {avg_confidence:.3f}")
     
     # Check if drift prevention is needed
-    total_evidence = await PersonaRepository.get_total_evidence_count(db, user_id)
+    total_evidence = sum(state.evidence_count for state in states.values())
     if total_evidence > 0 and total_evidence % EVIDENCE_COUNT_FOR_DRIFT_CHECK == 0:
         logger.info(f"🔄 Running drift prevention (evidence count: {total_evidence})")
         await apply_drift_prevention(db, user_id)
@@ -147,6 +192,29 @@ async def update_traits(
     }
 
 
+async def bootstrap_traits(
+    db: AsyncSession, user_id: UUID, target_scores: Dict[str, float], confidence: float
+) -> None:
+    """Force every TRAIT_LIST score to its target at a fixed confidence, in one upsert."""
+    await PersonaRepository.upsert_metrics(
+        db,
+        user_id,
+        [
+            {
+                "trait_name": trait_name,
+                "score": target_scores.get(trait_name, 0.5),
+                "confidence": confidence,
+                "evidence_count": 1,
+                "last_signal": target_scores.get(trait_name, 0.5),
+            }
+            for trait_name in TRAIT_LIST
+        ],
+        increment_evidence=True,
+    )
+    await refresh_trait_aggregates(db, user_id)
+    await db.commit()
+
+
 async def apply_drift_prevention(db: AsyncSession, user_id: UUID) -> None:
     """
     Apply drift prevention measures to prevent extreme trait locking.
@@ -0,0 +1,146 @@
+"""Memoized system-prompt assembly with a stable, cacheable prefix.
+
+The mirror and reflection system prompts are several kilobytes each, but most
+of that text never changes between turns. The compiler assembles a prompt
+from three kinds of parts:
+
+- a constant prefix, byte-identical for every user and turn. It always comes
+  first, so provider-side prompt caching can reuse it across requests and
+  across the anti-repetition candidates of one turn;
+- memoized blocks that depend only on a small key (archetype, tier, emotion,
+  task mode, policy). They are built once per key and served from an LRU;
+- dynamic text for the current turn (sampled traits, message style, signals).
+
+Every compile records how many bytes came from the prefix and from memoized
+blocks. `stats()` reports the per-turn averages, with a rough token estimate.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PROMPT_FRAGMENT_CACHE_SIZE = max(1, int(os.getenv("PROMPT_FRAGMENT_CACHE_SIZE", "512")))
+# Rough English-prose ratio; only used for reporting.
+BYTES_PER_TOKEN_ESTIMATE = 4.0
+
+PromptPart = Union[str, Tuple[Hashable, Callable[[], str]]]
+
+
+def estimate_tokens(byte_count: int) -> int:
+    return int(round(byte_count / BYTES_PER_TOKEN_ESTIMATE))
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    total_bytes: int
+    prefix_bytes: int
+    memoized_bytes: int
+
+    @property
+    def reused_bytes(self) -> int:
+        return self.prefix_bytes + self.memoized_bytes
+
+    def telemetry(self) -> Dict[str, int]:
+        return {
+            "prompt_bytes": self.total_bytes,
+            "prompt_prefix_bytes": self.prefix_bytes,
+            "prompt_memoized_bytes": self.memoized_bytes,
+            "prompt_prefix_tokens_est": estimate_tokens(self.prefix_bytes),
+        }
+
+
+class PromptCompiler:
+    """Joins prompt parts, memoizing keyed blocks in a bounded LRU."""
+
+    def __init__(self, max_fragments: int = PROMPT_FRAGMENT_CACHE_SIZE, separator: str = "\n\n"):
+        self.max_fragments = max_fragments
+        self.separator = separator
+        self._fragments: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def fragment(self, key: Hashable, build: Callable[[], str]) -> Tuple[str, bool]:
+        """The memoized text for key, and whether it came from the cache."""
+        text = self._fragments.get(key)
+        if text is not None:
+            self._fragments.move_to_end(key)
+            self._hits += 1
+            return text, True
+
+        self._misses += 1
+        text = build()
+        self._fragments[key] = text
+        while len(self._fragments) > self.max_fragments:
+            self._fragments.popitem(last=False)
+        return text, False
+
+    def compile(self, name: str, prefix: str, parts: Sequence[PromptPart]) -> CompiledPrompt:
+        """Assemble prefix + parts; a part is dynamic text or a (key, builder) pair."""
+        pieces = [prefix]
+        memoized_bytes = 0
+        for part in parts:
+            if isinstance(part, str):
+                text = part
+            else:
+                key, build = part
+                text, hit = self.fragment((name, key), build)
+                if hit:
+                    memoized_bytes += len(text.encode("utf-8"))
+            if text:
+                pieces.append(text)
+
+        text = self.separator.join(pieces)
+        compiled = CompiledPrompt(
+            text=text,
+            total_bytes=len(text.encode("utf-8")),
+            prefix_bytes=len(prefix.encode("utf-8")),
+            memoized_bytes=memoized_bytes,
+        )
+        self._record(name, compiled)
+        return compiled
+
+    def clear(self) -> None:
+        self._fragments.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        prompts: Dict[str, Dict[str, Any]] = {}
+        for name, totals in self._totals.items():
+            turns = totals["turns"]
+            prompts[name] = {
+                "turns": turns,
+                "avg_prompt_bytes": round(totals["total_bytes"] / turns),
+                "avg_prefix_bytes": round(totals["prefix_bytes"] / turns),
+                "avg_memoized_bytes": round(totals["memoized_bytes"] / turns),
+                "avg_prefix_tokens_est": estimate_tokens(round(totals["prefix_bytes"] / turns)),
+            }
+        return {
+            "fragments": len(self._fragments),
+            "capacity": self.max_fragments,
+            "fragment_hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "prompts": prompts,
+        }
+
+    def _record(self, name: str, compiled: CompiledPrompt) -> None:
+        totals = self._totals.setdefault(
+            name, {"turns": 0, "total_bytes": 0, "prefix_bytes": 0, "memoized_bytes": 0}
+        )
+        totals["turns"] += 1
+        totals["total_bytes"] += compiled.total_bytes
+        totals["prefix_bytes"] += compiled.prefix_bytes
+        totals["memoized_bytes"] += compiled.memoized_bytes
+        logger.debug(
+            f"🧩 Compiled {name} prompt: {compiled.total_bytes} bytes, "
+            f"{compiled.reused_bytes} reused (~{estimate_tokens(compiled.prefix_bytes)} prefix tokens)"
+        )
+
+
+prompt_compiler = PromptCompiler()
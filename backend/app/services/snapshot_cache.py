@@ -0,0 +1,205 @@
+"""Process-wide cache of each user's latest persona snapshot.
+
+The mirror hot path reads the latest snapshot on every turn, but snapshots only
+change when `generate_persona_snapshot` writes a new one or drift
+recalibration rewrites its behavioral traits. Each user has a version that
+those writers bump. A cached snapshot is served without a query while its
+version is current and its TTL has not expired. The TTL bounds staleness when
+another worker process wrote the snapshot.
+
+Versions come from one process-wide counter, so a bumped user never gets an
+earlier version back. Only cached and recently bumped users keep their own
+version (at most twice SNAPSHOT_CACHE_USERS); everyone else shares a floor
+that rises past every version dropped from the table.
+
+Cached snapshots are immutable `CachedSnapshot` objects. They can be shared
+across requests because nothing can mutate them.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repository.persona_repository import PersonaRepository
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_USERS = max(1, int(os.getenv("SNAPSHOT_CACHE_USERS", "4096")))
+SNAPSHOT_CACHE_TTL_SECONDS = float(os.getenv("SNAPSHOT_CACHE_TTL_SECONDS", "300"))
+
+
+class FrozenDict(dict):
+    """Read-only dict, so cached JSONB payloads still pass `isinstance(x, dict)`."""
+
+    def _readonly(self, *_args, **_kwargs):
+        raise TypeError("cached snapshot data is read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __ior__(self, _other):
+        self._readonly()
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class CachedSnapshot:
+    """Immutable copy of a `PersonaSnapshot` row."""
+
+    id: UUID
+    user_id: UUID
+    persona_vector: Dict[str, Any]
+    stability_index: Optional[float]
+    summary_text: Optional[str]
+    behavioral_traits: Dict[str, Any]
+    is_historical_anchor: bool
+    created_at: Optional[datetime]
+    version: int
+
+    @classmethod
+    def from_model(cls, snapshot: Any, version: int) -> "CachedSnapshot":
+        return cls(
+            id=snapshot.id,
+            user_id=snapshot.user_id,
+            persona_vector=_freeze(snapshot.persona_vector or {}),
+            stability_index=snapshot.stability_index,
+            summary_text=snapshot.summary_text,
+            behavioral_traits=_freeze(snapshot.behavioral_traits or {}),
+            is_historical_anchor=bool(snapshot.is_historical_anchor),
+            created_at=snapshot.created_at,
+            version=version,
+        )
+
+
+@dataclass
+class _Entry:
+    snapshot: Optional[CachedSnapshot]
+    version: int
+    loaded_at: float
+
+
+class SnapshotCache:
+    """LRU + TTL cache of latest snapshots keyed by user, invalidated by version."""
+
+    def __init__(
+        self,
+        max_users: int = SNAPSHOT_CACHE_USERS,
+        ttl_seconds: float = SNAPSHOT_CACHE_TTL_SECONDS,
+    ):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._version_floor = 0
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def version(self, user_id: UUID) -> int:
+        return self._versions.get(str(user_id), self._version_floor)
+
+    def bump(self, user_id: UUID) -> int:
+        """Mark the user's snapshot as changed; the next read reloads it."""
+        key = str(user_id)
+        self._clock += 1
+        self._track(key, self._clock)
+        if self._entries.pop(key, None) is not None:
+            self._stats["invalidations"] += 1
+        return self._clock
+
+    async def get(self, db: AsyncSession, user_id: UUID) -> Optional[CachedSnapshot]:
+        """Latest snapshot for the user (None if they have none yet)."""
+        hit, snapshot = self.peek(user_id)
+        if hit:
+            return snapshot
+
+        version = self.version(user_id)
+        row = await PersonaRepository.get_latest_snapshot(db, user_id)
+        return self.store(user_id, row, version)
+
+    def peek(self, user_id: UUID) -> Tuple[bool, Optional[CachedSnapshot]]:
+        """(True, snapshot) when a current entry is cached, else (False, None) and a miss."""
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry.version == self.version(user_id)
+            and (time.monotonic() - entry.loaded_at) <= self.ttl_seconds
+        ):
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry.snapshot
+
+        self._stats["misses"] += 1
+        return False, None
+
+    def store(self, user_id: UUID, row: Any, version: int) -> Optional[CachedSnapshot]:
+        """Cache a freshly loaded snapshot row, read while `version` was current."""
+        snapshot = CachedSnapshot.from_model(row, version) if row is not None else None
+        # After a bump while the query was in flight the row may be stale, so it is not cached.
+        if version == self.version(user_id):
+            self._store(str(user_id), _Entry(snapshot=snapshot, version=version, loaded_at=time.monotonic()))
+        return snapshot
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._versions.clear()
+        self._clock = self._version_floor = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "size": len(self._entries),
+            "capacity": self.max_users,
+            "versions": len(self._versions),
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self._stats,
+        }
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._track(key, entry.version)
+        while len(self._entries) > self.max_users:
+            evicted, _ = self._entries.popitem(last=False)
+            self._forget_version(evicted)
+            self._stats["evictions"] += 1
+
+    def _track(self, key: str, version: int) -> None:
+        self._versions[key] = version
+        self._versions.move_to_end(key)
+        while len(self._versions) > 2 * self.max_users:
+            oldest = next(iter(self._versions))
+            self._entries.pop(oldest, None)
+            self._forget_version(oldest)
+
+    def _forget_version(self, key: str) -> None:
+        # Raising the floor past the dropped version keeps reads that started
+        # before the drop from caching under a version that is current again.
+        version = self._versions.pop(key, None)
+        if version is not None:
+            self._version_floor = max(self._version_floor, version)
+
+
+snapshot_cache = SnapshotCache()
+
+
+def bump_snapshot_version(user_id: UUID) -> int:
+    version = snapshot_cache.bump(user_id)
+    logger.debug(f"🗑️ Snapshot version for user {user_id} is now {version}")
+    return version
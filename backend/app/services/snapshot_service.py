@@ -1,14 +1,25 @@
-"""Snapshot generation service for persona profiles."""
+"""Snapshot generation service for persona profiles.
+
+A new snapshot row is written only when the persona has moved: some trait
+score or confidence changed by more than SNAPSHOT_EPSILON, the stability index
+did, or the latest snapshot is older than SNAPSHOT_MAX_INTERVAL_SECONDS.
+Otherwise the latest snapshot (usually already in the snapshot cache) is
+returned as is. `downsample_snapshots` thins old rows for retention.
+"""
 
 import logging
+import os
 import statistics
-from typing import Dict, List, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
 from uuid import UUID
 
+from sqlalchemy import case, delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repository.persona_repository import PersonaRepository
 from app.db.models import PersonaSnapshot
+from app.services.snapshot_cache import CachedSnapshot, bump_snapshot_version, snapshot_cache
 from app.constants import (
     TRAIT_GROUPS,
     STABILITY_THRESHOLD_UNSTABLE,
@@ -17,19 +28,85 @@ from app.constants import (
 
 logger = logging.getLogger(__name__)
 
+SNAPSHOT_EPSILON = float(os.getenv("SNAPSHOT_EPSILON", "0.02"))
+SNAPSHOT_MAX_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_MAX_INTERVAL_SECONDS", "86400"))
+# Retention: every snapshot for RAW days, then the last one per hour until
+# HOURLY days, then the last one per day. Historical anchors are never removed.
+SNAPSHOT_RAW_RETENTION_DAYS = max(0, int(os.getenv("SNAPSHOT_RAW_RETENTION_DAYS", "7")))
+SNAPSHOT_HOURLY_RETENTION_DAYS = max(0, int(os.getenv("SNAPSHOT_HOURLY_RETENTION_DAYS", "90")))
+
+
+def persona_vector_distance(old: Dict[str, Any], new: Dict[str, Any]) -> float:
+    """Largest score or confidence change between two grouped persona vectors (1.0 if traits differ)."""
+    old_values = _vector_values(old)
+    new_values = _vector_values(new)
+    if old_values.keys() != new_values.keys():
+        return 1.0
+    return max((abs(new_values[key] - old_values[key]) for key in new_values), default=0.0)
+
+
+def _vector_values(persona_vector: Dict[str, Any]) -> Dict[Tuple[str, str, str], float]:
+    values = {}
+    for group_name, group in (persona_vector or {}).items():
+        for trait_name, payload in (group or {}).items():
+            for field in ("score", "confidence"):
+                values[(group_name, trait_name, field)] = float((payload or {}).get(field) or 0.0)
+    return values
+
+
+def should_write_snapshot(
+    latest: Optional[CachedSnapshot],
+    persona_vector: Dict[str, Any],
+    stability_index: float,
+    now: Optional[datetime] = None,
+) -> bool:
+    if latest is None or latest.is_historical_anchor or latest.created_at is None:
+        return True
+    now = now or datetime.now(timezone.utc)
+    created_at = latest.created_at if latest.created_at.tzinfo else latest.created_at.replace(tzinfo=timezone.utc)
+    if (now - created_at).total_seconds() >= SNAPSHOT_MAX_INTERVAL_SECONDS:
+        return True
+    if abs((latest.stability_index or 0.0) - stability_index) > SNAPSHOT_EPSILON:
+        return True
+    return persona_vector_distance(latest.persona_vector, persona_vector) > SNAPSHOT_EPSILON
+
+
+async def _store_snapshot(
+    db: AsyncSession,
+    user_id: UUID,
+    persona_vector: Dict,
+    stability_index: float,
+    summary_text: str,
+) -> Union[PersonaSnapshot, CachedSnapshot]:
+    latest = await snapshot_cache.get(db, user_id)
+    if not should_write_snapshot(latest, persona_vector, stability_index):
+        logger.info(f"⏭️ Persona unchanged within {SNAPSHOT_EPSILON}; keeping snapshot {latest.id}")
+        return latest
+
+    snapshot = await PersonaRepository.create_snapshot(
+        db=db,
+        user_id=user_id,
+        persona_vector=persona_vector,
+        stability_index=stability_index,
+        summary_text=summary_text,
+    )
+    bump_snapshot_version(user_id)
+    return snapshot
+
 
 async def generate_persona_snapshot(
     db: AsyncSession, user_id: UUID
-) -> PersonaSnapshot:
+) -> Union[PersonaSnapshot, CachedSnapshot]:
     """
-    Generate and store a persona snapshot.
+    Generate and store a persona snapshot, unless the persona has not moved.
     
     Args:
         db: Database session
         user_id: User UUID
         
     Returns:
-        PersonaSnapshot object
+        The new PersonaSnapshot, or the latest one (as a CachedSnapshot) when
+        nothing changed past SNAPSHOT_EPSILON
     """
     logger.info(f"📸 Generating persona snapshot for user {user_id}")
     
@@ -38,9 +115,9 @@ async def generate_persona_snapshot(
     
     if not metrics:
         logger.warning(f"⚠️ No metrics found for user {user_id}, creating default snapshot")
-        return await PersonaRepository.create_snapshot(
-            db=db,
-            user_id=user_id,
+        return await _store_snapshot(
+            db,
+            user_id,
             persona_vector={},
             stability_index=0.1,
             summary_text="Insufficient data to generate personality profile.",
@@ -70,18 +147,58 @@ async def generate_persona_snapshot(
     summary_text = generate_summary_text(metrics, stability_index)
     
     # Create snapshot
-    snapshot = await PersonaRepository.create_snapshot(
-        db=db,
-        user_id=user_id,
+    snapshot = await _store_snapshot(
+        db,
+        user_id,
         persona_vector=persona_vector,
         stability_index=round(stability_index, 3),
         summary_text=summary_text,
     )
     
-    logger.info(f"✅ Snapshot created: stability={stability_index:.3f}")
+    logger.info(f"✅ Snapshot ready: stability={stability_index:.3f}")
     return snapshot
 
 
+async def downsample_snapshots(
+    db: AsyncSession,
+    user_id: Optional[UUID] = None,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> int:
+    """Thin old snapshots to the last one per hour, then per day; returns rows removed (or removable)."""
+    now = now or datetime.now(timezone.utc)
+    raw_cutoff = now - timedelta(days=SNAPSHOT_RAW_RETENTION_DAYS)
+    hourly_cutoff = now - timedelta(days=max(SNAPSHOT_HOURLY_RETENTION_DAYS, SNAPSHOT_RAW_RETENTION_DAYS))
+
+    bucket = func.date_trunc(
+        case((PersonaSnapshot.created_at < hourly_cutoff, "day"), else_="hour"),
+        PersonaSnapshot.created_at,
+    )
+    ranked = (
+        select(
+            PersonaSnapshot.id,
+            func.row_number()
+            .over(partition_by=(PersonaSnapshot.user_id, bucket), order_by=PersonaSnapshot.created_at.desc())
+            .label("rank"),
+        )
+        .where(PersonaSnapshot.created_at < raw_cutoff, PersonaSnapshot.is_historical_anchor.is_(False))
+    )
+    if user_id is not None:
+        ranked = ranked.where(PersonaSnapshot.user_id == user_id)
+    ranked = ranked.subquery()
+    superseded = select(ranked.c.id).where(ranked.c.rank > 1)
+
+    if dry_run:
+        return int((await db.execute(select(func.count()).select_from(superseded.subquery()))).scalar_one())
+
+    result = await db.execute(delete(PersonaSnapshot).where(PersonaSnapshot.id.in_(superseded)))
+    await db.commit()
+    removed = result.rowcount or 0
+    if removed:
+        logger.info(f"🗑️ Downsampled {removed} persona snapshots older than {SNAPSHOT_RAW_RETENTION_DAYS} days")
+    return removed
+
+
 def generate_summary_text(metrics: List, stability_index: float) -> str:
     """
     Generate deterministic summary text from metrics.
@@ -6,18 +6,26 @@ import random
 import re
 from dataclasses import dataclass
 import logging
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import ReactionPattern
+from app.services.message_features import MessageFeatures, ensure_features
 
 logger = logging.getLogger(__name__)
 
 EMOJI_CANDIDATES = ["😂", "😅", "😭", "🔥", "💀", "😮", "🤝", "😬"]
 EMOJI_REGEX = re.compile(r"[\U0001F300-\U0001FAFF]")
 
+# Most recently seen, then most confident, then most frequent pattern wins.
+REACTION_PATTERN_ORDER = (
+    desc(ReactionPattern.last_seen_at),
+    desc(ReactionPattern.confidence),
+    desc(ReactionPattern.frequency),
+)
+
 
 @dataclass
 class StyleEnforcementResult:
@@ -26,17 +34,26 @@ class StyleEnforcementResult:
     stimulus_tag: str
 
 
-def detect_stimulus_tag(message: str) -> str:
-    text = (message or "").lower()
+@dataclass(frozen=True)
+class ReactionCandidates:
+    """A user's reaction patterns for one stimulus tag, preloaded in selection order."""
+
+    stimulus_tag: str
+    patterns: Tuple[Tuple[str, float], ...] = ()
+
+    def select(self, threshold: float) -> Optional[Tuple[str, float]]:
+        for template, confidence in self.patterns:
+            if confidence >= threshold:
+                return template, confidence
+        return None
+
+
+def detect_stimulus_tag(message: str, features: Optional[MessageFeatures] = None) -> str:
+    features = ensure_features(message, features)
 
-    if any(token in text for token in ["idk", "not sure", "maybe", "confused", "doubt"]):
-        return "doubt"
-    if any(token in text for token in ["disagree", "wrong", "off", "doesn't make sense", "no way"]):
-        return "disagreement"
-    if any(token in text for token in ["cool", "interesting", "nice", "love this", "excited"]):
-        return "interest"
-    if any(token in text for token in ["deadline", "exam", "urgent", "pressure", "stressed"]):
-        return "pressure"
+    for tag in ("doubt", "disagreement", "interest", "pressure"):
+        if features.has(f"stimulus.{tag}"):
+            return tag
     return "general"
 
 
@@ -45,27 +62,34 @@ async def select_reaction_prefix(
     user_id,
     stimulus_tag: str,
     threshold: float,
+    candidates: Optional[ReactionCandidates] = None,
 ) -> tuple[str, float]:
-    stmt = (
-        select(ReactionPattern)
-        .where(
-            ReactionPattern.user_id == user_id,
-            ReactionPattern.stimulus_tag == stimulus_tag,
-            ReactionPattern.confidence >= threshold,
+    if candidates is not None and candidates.stimulus_tag == stimulus_tag:
+        selected = candidates.select(threshold)
+        if selected:
+            template, confidence = selected
+            return template.strip(), float(confidence or 0.5)
+    else:
+        stmt = (
+            select(ReactionPattern)
+            .where(
+                ReactionPattern.user_id == user_id,
+                ReactionPattern.stimulus_tag == stimulus_tag,
+                ReactionPattern.confidence >= threshold,
+            )
+            .order_by(*REACTION_PATTERN_ORDER)
+            .limit(1)
         )
-        .order_by(desc(ReactionPattern.last_seen_at), desc(ReactionPattern.confidence), desc(ReactionPattern.frequency))
-        .limit(1)
-    )
-    try:
-        result = await db.execute(stmt)
-        pattern = result.scalar_one_or_none()
-    except Exception as exc:
-        logger.warning("Skipping reaction pattern lookup: %s", exc)
-        await db.rollback()
-        pattern = None
+        try:
+            result = await db.execute(stmt)
+            pattern = result.scalar_one_or_none()
+        except Exception as exc:
+            logger.warning("Skipping reaction pattern lookup: %s", exc)
+            await db.rollback()
+            pattern = None
 
-    if pattern:
-        return pattern.response_template.strip(), float(pattern.confidence or 0.5)
+        if pattern:
+            return pattern.response_template.strip(), float(pattern.confidence or 0.5)
 
     fallback = {
         "doubt": "idk man",
@@ -90,17 +114,20 @@ async def enforce_style(
     professional_context: bool,
     allow_slang: bool = True,
     allow_imperfect_grammar: bool = True,
+    message_features: Optional[MessageFeatures] = None,
+    reaction_candidates: Optional[ReactionCandidates] = None,
 ) -> StyleEnforcementResult:
     text = (draft or "").strip()
     if not text:
         text = "I'm not sure what to say."
 
-    stimulus_tag = detect_stimulus_tag(original_message)
+    stimulus_tag = detect_stimulus_tag(original_message, message_features)
     reaction_prefix, reaction_score = await select_reaction_prefix(
         db=db,
         user_id=user_id,
         stimulus_tag=stimulus_tag,
         threshold=reaction_threshold,
+        candidates=reaction_candidates,
     )
 
     # Reduce personality intensity for professional contexts while preserving identity.
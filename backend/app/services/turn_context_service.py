@@ -0,0 +1,206 @@
+"""Per-turn context loader: everything a chat turn reads before generating.
+
+Before its first LLM call, a mirror turn used to run about a dozen sequential
+queries. They read user settings, the latest snapshot, the confidence sources,
+recent behavioral insights, the linguistic fingerprint and the reaction
+patterns for the message's stimulus tag. A reflection turn separately read its
+schedule context. Against a remote database the round trips cost more than
+the queries themselves.
+
+`load_turn_context` gathers all of them in one SELECT rooted at the user row:
+
+- the one-per-user tables (each unique on user_id) are LEFT JOINed;
+- the latest snapshot is a LEFT JOIN LATERAL, skipped on a snapshot cache hit;
+- the two short lists are JSON aggregates in scalar subqueries.
+
+Missing or stale confidence aggregates still cost a rebuild (see
+`confidence_aggregate_service`), but that happens at most once per rebuild
+period per user.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.db.models import (
+    BehavioralInsight,
+    LinguisticFingerprint,
+    PersonaSnapshot,
+    ReactionPattern,
+    ScheduleContext,
+    User,
+    UserConfidenceAggregate,
+    UserSettings,
+)
+from app.services.confidence_aggregate_service import ConfidenceAggregates, aggregates_from_row
+from app.services.message_features import MessageFeatures
+from app.services.snapshot_cache import CachedSnapshot, snapshot_cache
+from app.services.style_enforcement_service import (
+    REACTION_PATTERN_ORDER,
+    ReactionCandidates,
+    detect_stimulus_tag,
+)
+
+logger = logging.getLogger(__name__)
+
+TURN_SIGNAL_LIMIT = 3
+TURN_REACTION_PATTERN_LIMIT = 20
+
+
+@dataclass
+class TurnContext:
+    """Reads for one chat turn, loaded together by `load_turn_context`.
+
+    ORM rows are detached from the session, so a rollback later in the turn
+    cannot expire them.
+    """
+
+    user_id: UUID
+    mode: str
+    settings: Optional[UserSettings] = None
+    snapshot: Optional[CachedSnapshot] = None
+    confidence_aggregates: Optional[ConfidenceAggregates] = None
+    behavioral_signals: Tuple[str, ...] = ()
+    linguistic_fingerprint: Optional[LinguisticFingerprint] = None
+    reaction_candidates: Optional[ReactionCandidates] = None
+    schedule_context: Optional[ScheduleContext] = None
+
+
+def _signals_column(user_id: UUID) -> Any:
+    recent = (
+        select(BehavioralInsight.insight_text, BehavioralInsight.created_at)
+        .where(BehavioralInsight.user_id == user_id)
+        .order_by(BehavioralInsight.created_at.desc())
+        .limit(TURN_SIGNAL_LIMIT)
+        .subquery()
+    )
+    return (
+        select(func.jsonb_agg(aggregate_order_by(recent.c.insight_text, recent.c.created_at.desc())))
+        .scalar_subquery()
+        .label("behavioral_signals")
+    )
+
+
+def _reactions_column(user_id: UUID, stimulus_tag: str) -> Any:
+    ranked = (
+        select(
+            ReactionPattern.response_template,
+            ReactionPattern.confidence,
+            func.row_number().over(order_by=REACTION_PATTERN_ORDER).label("rank"),
+        )
+        .where(ReactionPattern.user_id == user_id, ReactionPattern.stimulus_tag == stimulus_tag)
+        .order_by(*REACTION_PATTERN_ORDER)
+        .limit(TURN_REACTION_PATTERN_LIMIT)
+        .subquery()
+    )
+    pair = func.jsonb_build_array(ranked.c.response_template, ranked.c.confidence)
+    return (
+        select(func.jsonb_agg(aggregate_order_by(pair, ranked.c.rank)))
+        .scalar_subquery()
+        .label("reaction_patterns")
+    )
+
+
+def build_turn_context_query(
+    user_id: UUID,
+    mode: str,
+    stimulus_tag: str = "general",
+    include_snapshot: bool = True,
+):
+    """The single statement behind `load_turn_context` (one row, or none for unknown users)."""
+    stmt = select(User.id).select_from(User).where(User.id == user_id)
+    if mode == "reflection":
+        return stmt.add_columns(ScheduleContext).outerjoin(ScheduleContext, ScheduleContext.user_id == User.id)
+
+    stmt = (
+        stmt.add_columns(
+            UserSettings,
+            LinguisticFingerprint,
+            UserConfidenceAggregate,
+            _signals_column(user_id),
+            _reactions_column(user_id, stimulus_tag),
+        )
+        .outerjoin(UserSettings, UserSettings.user_id == User.id)
+        .outerjoin(LinguisticFingerprint, LinguisticFingerprint.user_id == User.id)
+        .outerjoin(UserConfidenceAggregate, UserConfidenceAggregate.user_id == User.id)
+    )
+    if include_snapshot:
+        latest = (
+            select(PersonaSnapshot)
+            .where(PersonaSnapshot.user_id == user_id)
+            .order_by(PersonaSnapshot.created_at.desc())
+            .limit(1)
+            .subquery()
+            .lateral("latest_snapshot")
+        )
+        stmt = stmt.add_columns(aliased(PersonaSnapshot, latest, name="latest_snapshot")).outerjoin(latest, true())
+    return stmt
+
+
+async def load_turn_context(
+    db: AsyncSession,
+    user_id: UUID,
+    mode: str,
+    message_text: str = "",
+    features: Optional[MessageFeatures] = None,
+) -> Optional[TurnContext]:
+    """Load a turn's reads in one round trip; None if that fails (callers query per source)."""
+    context = TurnContext(user_id=user_id, mode=mode)
+    stimulus_tag = detect_stimulus_tag(message_text, features) if mode == "mirror" else "general"
+
+    snapshot_version = snapshot_cache.version(user_id)
+    snapshot_cached, cached_snapshot = (False, None) if mode == "reflection" else snapshot_cache.peek(user_id)
+
+    try:
+        stmt = build_turn_context_query(user_id, mode, stimulus_tag, include_snapshot=not snapshot_cached)
+        result = await db.execute(stmt.execution_options(populate_existing=True))
+        row = result.one_or_none()
+    except Exception as e:
+        logger.warning(f"⚠️ Turn context load failed for user {user_id}; falling back to per-source reads: {e}")
+        await db.rollback()
+        return None
+
+    if mode == "reflection":
+        context.schedule_context = _detach(db, getattr(row, "ScheduleContext", None))
+        return context
+
+    if row is None:
+        context.confidence_aggregates = ConfidenceAggregates(as_of=datetime.now(timezone.utc))
+        return context
+
+    context.settings = _detach(db, row.UserSettings)
+    context.linguistic_fingerprint = _detach(db, row.LinguisticFingerprint)
+    context.behavioral_signals = tuple(
+        str(text).strip() for text in (row.behavioral_signals or []) if text
+    )
+    context.reaction_candidates = ReactionCandidates(
+        stimulus_tag=stimulus_tag,
+        patterns=tuple((str(template), float(confidence)) for template, confidence in (row.reaction_patterns or [])),
+    )
+    context.snapshot = (
+        cached_snapshot if snapshot_cached else snapshot_cache.store(user_id, row.latest_snapshot, snapshot_version)
+    )
+
+    try:
+        context.confidence_aggregates = await aggregates_from_row(db, user_id, row.UserConfidenceAggregate)
+    except Exception as e:
+        logger.warning(f"⚠️ Confidence aggregates unavailable, using conservative scores: {e}")
+        await db.rollback()
+        context.confidence_aggregates = ConfidenceAggregates(as_of=datetime.now(timezone.utc))
+
+    return context
+
+
+def _detach(db: AsyncSession, instance: Any) -> Any:
+    if instance is not None:
+        db.expunge(instance)
+    return instance
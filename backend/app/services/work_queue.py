@@ -0,0 +1,426 @@
+"""In-process background work queue for post-reply persona learning.
+
+Jobs are named handlers with JSON payloads. A pool of asyncio workers drains
+the queue with bounded retries and exponential backoff. Every job is appended
+to a small JSONL journal before it is queued and marked done afterwards, so
+work that was accepted but not finished is replayed when the process starts
+again. If the journal cannot be written the queue keeps working in memory.
+
+- Handlers can register a `journal_payload` reducer. Only its output (ids and
+  small fields) is written to disk, and the handler rebuilds the rest on
+  replay. Chat turns journal message ids, never the texts.
+- Each process claims its own journal slot (`work_queue.jsonl`,
+  `work_queue.1.jsonl`, ...) under an flock, so uvicorn workers never replay
+  or truncate each other's journals. A restarted process takes over a free
+  slot and replays it.
+- The journal is rewritten with only the unfinished entries every
+  WORK_QUEUE_JOURNAL_COMPACT_EVERY appends and whenever an owner's jobs are
+  purged (`purge_owner`, called when a user's data is deleted).
+- File I/O runs in a thread, serialized by one lock, so it never blocks the
+  event loop and entries stay in order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, IO, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: one process per journal is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+JournalReducer = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+WORK_QUEUE_WORKERS = max(1, int(os.getenv("WORK_QUEUE_WORKERS", "4")))
+WORK_QUEUE_MAX_ATTEMPTS = max(1, int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3")))
+WORK_QUEUE_RETRY_BASE_SECONDS = float(os.getenv("WORK_QUEUE_RETRY_BASE_SECONDS", "0.5"))
+WORK_QUEUE_JOURNAL_PATH = os.getenv(
+    "WORK_QUEUE_JOURNAL_PATH",
+    str(Path(__file__).resolve().parents[2] / "data" / "work_queue.jsonl"),
+)
+WORK_QUEUE_JOURNAL_SLOTS = max(1, int(os.getenv("WORK_QUEUE_JOURNAL_SLOTS", "16")))
+WORK_QUEUE_JOURNAL_COMPACT_EVERY = max(1, int(os.getenv("WORK_QUEUE_JOURNAL_COMPACT_EVERY", "256")))
+# Queued jobs of a purged owner are skipped for this long after the purge.
+PURGE_MEMORY_SECONDS = 3600.0
+
+
+@dataclass
+class Job:
+    name: str
+    payload: Dict[str, Any]
+    key: Optional[str] = None
+    owner: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class WorkQueue:
+    """asyncio worker pool with retries, a replay journal and queue-depth stats."""
+
+    def __init__(
+        self,
+        workers: int = WORK_QUEUE_WORKERS,
+        max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS,
+        retry_base_seconds: float = WORK_QUEUE_RETRY_BASE_SECONDS,
+        journal_path: Optional[str] = WORK_QUEUE_JOURNAL_PATH,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.journal_path = Path(journal_path) if journal_path else None
+        self._handlers: Dict[str, JobHandler] = {}
+        self._journal_reducers: Dict[str, JournalReducer] = {}
+        self._journal_lock = asyncio.Lock()
+        self._journaled: Dict[str, Dict[str, Any]] = {}
+        self._appends_since_compact = 0
+        self._slot_lock: Optional[IO[str]] = None
+        self._purged: Dict[str, float] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending_retries: set = set()
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        self._key_users: Dict[str, int] = {}
+        self._in_flight = 0
+        self._stats: Dict[str, int] = {
+            "enqueued": 0,
+            "completed": 0,
+            "retried": 0,
+            "failed": 0,
+            "replayed": 0,
+            "purged": 0,
+            "compactions": 0,
+        }
+        self._last_latency_ms = 0
+
+    def register(self, name: str, handler: JobHandler, journal_payload: Optional[JournalReducer] = None) -> None:
+        """Register a handler; `journal_payload` picks what of a payload is written to disk.
+
+        Replayed jobs receive the reduced payload, so the handler must accept both.
+        """
+        self._handlers[name] = handler
+        if journal_payload is not None:
+            self._journal_reducers[name] = journal_payload
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and self._loop is asyncio.get_running_loop()
+
+    async def start(self) -> None:
+        """Start workers on the running loop and replay unfinished journal entries."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._journal_lock = asyncio.Lock()
+        self._journaled = {}
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"work-queue-{index}")
+            for index in range(self.workers)
+        ]
+        if self.journal_path is not None:
+            self.journal_path = await asyncio.to_thread(self._claim_slot, self.journal_path)
+        unfinished = await asyncio.to_thread(self._load_unfinished)
+        for job in unfinished:
+            self._journaled[job.id] = self._put_entry(job)
+            self._stats["replayed"] += 1
+            self._queue.put_nowait(job)
+        logger.info("✅ Work queue started with %s workers", self.workers)
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Let queued work finish for up to drain_timeout, then cancel workers.
+
+        Anything still unfinished stays in the journal and is replayed on next start.
+        """
+        if not self._tasks or self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Work queue stopped with %s jobs pending", self._queue.qsize())
+        for task in [*self._tasks, *self._pending_retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._pending_retries, return_exceptions=True)
+        self._tasks = []
+        self._pending_retries = set()
+        self._queue = None
+        self._loop = None
+        self._release_slot()
+
+    async def enqueue(
+        self,
+        name: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> str:
+        """Queue a job for background execution and return its id.
+
+        Jobs sharing a key (e.g. a user id) never run concurrently. `owner`
+        (e.g. a user id) lets `purge_owner` drop the job.
+        """
+        if name not in self._handlers:
+            raise KeyError(f"No handler registered for job '{name}'")
+        if not self.running:
+            await self.start()
+        job = Job(name=name, payload=payload, key=key, owner=owner)
+        await self._journal_put(job)
+        self._stats["enqueued"] += 1
+        assert self._queue is not None
+        self._queue.put_nowait(job)
+        return job.id
+
+    async def purge_owner(self, owner: str) -> int:
+        """Drop an owner's unfinished jobs from this process's journal and skip any still queued."""
+        self._purged[owner] = time.time()
+        cutoff = time.time() - PURGE_MEMORY_SECONDS
+        self._purged = {key: at for key, at in self._purged.items() if at >= cutoff}
+        async with self._journal_lock:
+            dropped = [job_id for job_id, entry in self._journaled.items() if entry.get("owner") == owner]
+            for job_id in dropped:
+                del self._journaled[job_id]
+            if dropped:
+                await self._compact()
+        return len(dropped)
+
+    async def join(self) -> None:
+        """Wait until every queued job (including scheduled retries) has settled."""
+        while self._queue is not None:
+            await self._queue.join()
+            if not self._pending_retries:
+                return
+            await asyncio.gather(*list(self._pending_retries), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._tasks),
+            "workers": self.workers,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            "scheduled_retries": len(self._pending_retries),
+            "last_job_latency_ms": self._last_latency_ms,
+            "journal": str(self.journal_path) if self.journal_path else None,
+            "journaled": len(self._journaled),
+            **self._stats,
+        }
+
+    async def _worker(self, index: int) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            self._in_flight += 1
+            try:
+                await self._run(job)
+            finally:
+                self._in_flight -= 1
+                queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        handler = self._handlers.get(job.name)
+        if handler is None:
+            logger.error("❌ Dropping job %s: no handler for '%s'", job.id, job.name)
+            self._stats["failed"] += 1
+            await self._journal_done(job)
+            return
+        purged_at = self._purged.get(job.owner) if job.owner is not None else None
+        if purged_at is not None and job.enqueued_at <= purged_at:
+            self._stats["purged"] += 1
+            await self._journal_done(job)
+            return
+
+        job.attempts += 1
+        try:
+            if job.key is None:
+                await handler(job.payload)
+            else:
+                lock = self._key_locks.setdefault(job.key, asyncio.Lock())
+                self._key_users[job.key] = self._key_users.get(job.key, 0) + 1
+                try:
+                    async with lock:
+                        await handler(job.payload)
+                finally:
+                    remaining = self._key_users[job.key] - 1
+                    if remaining:
+                        self._key_users[job.key] = remaining
+                    else:
+                        self._key_users.pop(job.key, None)
+                        self._key_locks.pop(job.key, None)
+        except Exception as e:
+            if job.attempts < self.max_attempts:
+                self._stats["retried"] += 1
+                delay = self.retry_base_seconds * (2 ** (job.attempts - 1))
+                logger.warning(
+                    "⚠️ Job %s (%s) failed on attempt %s, retrying in %.1fs: %s",
+                    job.id, job.name, job.attempts, delay, e,
+                )
+                self._schedule_retry(job, delay)
+                return
+            self._stats["failed"] += 1
+            logger.error("❌ Job %s (%s) failed after %s attempts: %s", job.id, job.name, job.attempts, e)
+        else:
+            self._stats["completed"] += 1
+            self._last_latency_ms = int((time.time() - job.enqueued_at) * 1000)
+        await self._journal_done(job)
+
+    def _schedule_retry(self, job: Job, delay: float) -> None:
+        async def _requeue() -> None:
+            await asyncio.sleep(delay)
+            if self._queue is not None:
+                self._queue.put_nowait(job)
+
+        task = asyncio.create_task(_requeue())
+        self._pending_retries.add(task)
+        task.add_done_callback(self._pending_retries.discard)
+
+    def _put_entry(self, job: Job) -> Dict[str, Any]:
+        reducer = self._journal_reducers.get(job.name)
+        return {
+            "op": "put",
+            "id": job.id,
+            "name": job.name,
+            "key": job.key,
+            "owner": job.owner,
+            "payload": reducer(job.payload) if reducer is not None else job.payload,
+        }
+
+    async def _journal_put(self, job: Job) -> None:
+        if self.journal_path is None:
+            return
+        entry = self._put_entry(job)
+        async with self._journal_lock:
+            self._journaled[job.id] = entry
+            await self._append(entry)
+
+    async def _journal_done(self, job: Job) -> None:
+        if self.journal_path is None:
+            return
+        async with self._journal_lock:
+            if self._journaled.pop(job.id, None) is None:
+                return  # purged, or never journaled
+            await self._append({"op": "done", "id": job.id})
+            if self._appends_since_compact >= WORK_QUEUE_JOURNAL_COMPACT_EVERY:
+                await self._compact()
+
+    async def _append(self, entry: Dict[str, Any]) -> None:
+        path = self.journal_path
+        if path is None:
+            return
+        self._appends_since_compact += 1
+        try:
+            await asyncio.to_thread(_append_line, path, json.dumps(entry, default=str))
+        except OSError as e:
+            self._disable_journal(e)
+
+    async def _compact(self) -> None:
+        """Rewrite the journal with only the unfinished entries (caller holds the journal lock)."""
+        path = self.journal_path
+        if path is None:
+            return
+        self._appends_since_compact = 0
+        lines = [json.dumps(entry, default=str) for entry in self._journaled.values()]
+        try:
+            await asyncio.to_thread(_rewrite_lines, path, lines)
+            self._stats["compactions"] += 1
+        except OSError as e:
+            self._disable_journal(e)
+
+    def _disable_journal(self, error: Exception) -> None:
+        logger.warning("⚠️ Work queue journal unavailable, continuing in memory: %s", error)
+        self.journal_path = None
+        self._journaled.clear()
+
+    def _claim_slot(self, base: Path) -> Optional[Path]:
+        """First journal slot no other live process holds, locked until `stop`."""
+        if fcntl is None:
+            return base
+        try:
+            base.parent.mkdir(parents=True, exist_ok=True)
+            for index in range(WORK_QUEUE_JOURNAL_SLOTS):
+                path = base if index == 0 else base.with_name(f"{base.stem}.{index}{base.suffix}")
+                handle = open(path.with_name(path.name + ".lock"), "a", encoding="utf-8")
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    continue
+                self._slot_lock = handle
+                return path
+        except OSError as e:
+            logger.warning("⚠️ Could not claim a work queue journal, continuing in memory: %s", e)
+            return None
+        logger.warning("⚠️ All %s work queue journal slots are in use, continuing in memory", WORK_QUEUE_JOURNAL_SLOTS)
+        return None
+
+    def _release_slot(self) -> None:
+        if self._slot_lock is not None:
+            self._slot_lock.close()  # closing the descriptor releases the flock
+            self._slot_lock = None
+
+    def _load_unfinished(self) -> List[Job]:
+        """Read the journal, keep jobs without a matching done marker and compact the file."""
+        if self.journal_path is None or not self.journal_path.exists():
+            return []
+        pending: Dict[str, Job] = {}
+        try:
+            with self.journal_path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("op") == "put":
+                        pending[entry["id"]] = Job(
+                            name=entry["name"],
+                            payload=entry.get("payload") or {},
+                            key=entry.get("key"),
+                            owner=entry.get("owner"),
+                            id=entry["id"],
+                        )
+                    elif entry.get("op") == "done":
+                        pending.pop(entry.get("id"), None)
+            # Replayed payloads are already reduced, so they are written back as-is.
+            _rewrite_lines(
+                self.journal_path,
+                [json.dumps({**self._put_entry(job), "payload": job.payload}, default=str) for job in pending.values()],
+            )
+        except OSError as e:
+            logger.warning("⚠️ Could not replay work queue journal: %s", e)
+            return []
+        if pending:
+            logger.info("🔁 Replaying %s unfinished background jobs", len(pending))
+        return list(pending.values())
+
+
+def _append_line(path: Path, line: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+def _rewrite_lines(path: Path, lines: List[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as handle:
+        handle.writelines(line + "\n" for line in lines)
+    os.replace(tmp, path)
+
+
+# Process-wide queue used by the API layer.
+work_queue = WorkQueue()
+
+
+def get_queue_stats() -> Dict[str, Any]:
+    return work_queue.stats()
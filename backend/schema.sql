@@ -29,7 +29,7 @@ create table if not exists messages (
     user_id uuid not null references users(id) on delete cascade,
     role text not null,
     content text not null,
-    embedding vector(1536),
+    embedding halfvec(1024),
     token_count integer,
     emotional_intensity double precision,
     reflection_depth double precision,
@@ -41,9 +41,32 @@ create index if not exists idx_messages_conversation_created on messages(convers
 create index if not exists idx_messages_user_id on messages(user_id);
 create index if not exists idx_messages_role on messages(role);
 
--- For embedding similarity search. Requires ANALYZE after data load.
-create index if not exists idx_messages_embedding_ivfflat
-    on messages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+-- For embedding similarity search. Tune recall per query with hnsw.ef_search.
+create index if not exists idx_messages_embedding_hnsw
+    on messages using hnsw (embedding halfvec_cosine_ops) with (m = 16, ef_construction = 64);
+
+-- Lexical memory retrieval (full-text search over message content).
+create index if not exists idx_messages_content_fts
+    on messages using gin (to_tsvector('english', content));
+
+create or replace function match_messages(
+    query_embedding halfvec(1024),
+    match_threshold double precision,
+    match_count integer,
+    p_user_id uuid
+)
+returns table (id uuid, content text, similarity double precision)
+language sql stable
+as $$
+    select m.id, m.content, 1 - (m.embedding <=> query_embedding) as similarity
+    from messages m
+    where m.user_id = p_user_id
+      and m.role = 'user'
+      and m.embedding is not null
+      and 1 - (m.embedding <=> query_embedding) > match_threshold
+    order by m.embedding <=> query_embedding
+    limit match_count
+$$;
 
 create table if not exists personality_profile (
     id uuid primary key default gen_random_uuid(),
@@ -30,6 +30,7 @@ export interface BehavioralInsight {
 
 export interface HeatmapResponse {
   range_days: number;
+  timezone: string;
   heatmap: number[][]; // 7 days (0=Sunday), 24 hours
 }
 
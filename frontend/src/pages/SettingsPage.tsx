@@ -154,6 +154,7 @@ export function SettingsPage() {
           persona_mirroring: next.personaMirroring,
           pattern_tracking: next.patternTracking,
           daily_reflections: next.dailyReflections,
+          timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
         }),
       });
 
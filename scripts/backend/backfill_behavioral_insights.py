@@ -15,6 +15,7 @@ from sqlalchemy import select
 
 from app.db.database import AsyncSessionLocal
 from app.db.models import BehavioralInsight, Conversation, Message
+from app.services.confidence_aggregate_service import reset_confidence_aggregates
 
 
 def extract_words(text: str) -> List[str]:
@@ -237,6 +238,9 @@ async def backfill(dry_run: bool = False, limit: int = 0) -> None:
             print(f"Dry run complete. Would insert {inserts} insights.")
             return
 
+        # Backfilled insights bypass the incremental hooks; rebuild on next read.
+        for user_id in {row.user_id for row in candidates}:
+            await reset_confidence_aggregates(session, user_id)
         await session.commit()
         print(f"Inserted {inserts} behavioral insights.")
 
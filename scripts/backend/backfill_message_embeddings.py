@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Backfill Message.embedding for existing conversation history.
+
+Only messages without a vector are read, so an interrupted run resumes where
+it stopped when started again. Vectors are only written to rows that are
+still empty, which makes it safe to run while the app's embedding worker is
+active. Messages that failed EMBEDDING_MAX_ROW_ATTEMPTS times are skipped.
+
+Usage:
+  python backfill_message_embeddings.py
+  python backfill_message_embeddings.py --dry-run
+  python backfill_message_embeddings.py --limit 5000 --page-size 256
+  python backfill_message_embeddings.py --user-id <uuid>
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+from uuid import UUID
+
+from app.db.database import AsyncSessionLocal
+from app.services.embedding_worker import EMBEDDING_PAGE_SIZE, embed_pending_messages
+
+
+async def backfill(
+    dry_run: bool = False,
+    limit: int = 0,
+    page_size: int = EMBEDDING_PAGE_SIZE,
+    user_id: Optional[UUID] = None,
+) -> None:
+    started = time.perf_counter()
+    cursor = None
+    seen = embedded = skipped = failed = calls = 0
+
+    while not limit or seen < limit:
+        page = min(page_size, limit - seen) if limit else page_size
+        async with AsyncSessionLocal() as session:
+            outcome = await embed_pending_messages(
+                session, limit=page, after=cursor, user_id=user_id, dry_run=dry_run
+            )
+        seen += outcome.selected
+        embedded += outcome.embedded
+        skipped += outcome.skipped
+        failed += outcome.failed
+        calls += outcome.calls
+        if outcome.error:
+            print(f"Stopped on provider error after {embedded} messages: {outcome.error}")
+            print("Re-run the command to resume.")
+            break
+        if outcome.selected:
+            print(f"  {seen} messages processed, {embedded} embedded ({calls} provider calls)")
+        if outcome.selected < page or outcome.cursor == cursor:
+            break
+        cursor = outcome.cursor
+
+    elapsed = time.perf_counter() - started
+    if dry_run:
+        print(f"Dry run complete. Would embed {seen} messages.")
+        return
+    print(f"Embedded {embedded} messages in {elapsed:.1f}s ({skipped} returned no vector, {failed} rejected).")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill message embeddings for existing history")
+    parser.add_argument("--dry-run", action="store_true", help="Count pending messages without calling the provider")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many messages (0 = all)")
+    parser.add_argument("--page-size", type=int, default=EMBEDDING_PAGE_SIZE, help="Messages read per page")
+    parser.add_argument("--user-id", type=UUID, default=None, help="Only backfill one user's messages")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(
+        backfill(dry_run=args.dry_run, limit=args.limit, page_size=max(1, args.page_size), user_id=args.user_id)
+    )
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Microbenchmark: compiled KeywordMatcher vs per-marker substring loops.
+
+Usage:
+    python scripts/backend/bench_keyword_matcher.py [--rounds 2000]
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.message_features import MARKER_MATCHER, MARKER_SETS
+
+MESSAGES = [
+    "yeah tbh this is wild... what should i do?",
+    "I'm SO stressed!!! deadline tomorrow and I can't handle this pressure",
+    "help me write this in my tone, make it shorter",
+    "idk, not sure. maybe I disagree? that doesn't make sense",
+    "lol nah bro that's perfect... great, just great",
+    "I keep thinking about my career and whether I'm driven enough to change anything",
+    "Could you summarize the meeting notes and list the action items for the team by Friday?",
+    "honestly I feel like I'm losing control of my schedule and my routine is gone " * 4,
+]
+
+REPLIES = [
+    "yeah same, that deadline is brutal. just knock out the first section tonight",
+    "It sounds like you're carrying a lot right now. Have you considered taking a break?",
+    "nah you're fine. send it and move on",
+    "What I'm hearing is that work and family both want more than you've got",
+]
+
+BANNED = [
+    "you tend to", "this suggests", "it seems that", "you seem", "it looks like",
+    "what this indicates", "observed pattern", "what it might indicate", "reflective challenge",
+    "it sounds like you're", "what i'm hearing", "that must be", "that must feel", "i can see how",
+    "it makes sense that", "have you considered", "you might want to", "let me ask you",
+    "what if you tried", "the thing is",
+]
+
+
+def loop_scan(text: str):
+    lower = text.lower()
+    hits = {}
+    for category, markers in MARKER_SETS.items():
+        found = frozenset(marker for marker in markers if marker in lower)
+        if found:
+            hits[category] = found
+    return hits
+
+
+def loop_banned(text: str) -> bool:
+    lowered = text.lower()
+    return any(phrase in lowered for phrase in BANNED)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    banned_matcher = KeywordMatcher({"banned": BANNED})
+    for text in MESSAGES:
+        assert loop_scan(text) == MARKER_MATCHER.scan(text), text
+    for text in REPLIES:
+        assert loop_banned(text) == banned_matcher.search(text), text
+
+    marker_count = sum(len(markers) for markers in MARKER_SETS.values())
+    cases = [
+        (f"message markers ({len(MARKER_SETS)} sets, {marker_count} markers)", MESSAGES, loop_scan, MARKER_MATCHER.scan),
+        (f"banned phrases ({len(BANNED)})", REPLIES, loop_banned, banned_matcher.search),
+    ]
+    print(f"rounds={args.rounds}")
+    for label, texts, loop_fn, matcher_fn in cases:
+        loop_s = timeit.timeit(lambda: [loop_fn(t) for t in texts], number=args.rounds)
+        matcher_s = timeit.timeit(lambda: [matcher_fn(t) for t in texts], number=args.rounds)
+        per_text = args.rounds * len(texts)
+        print(
+            f"{label:<44} loops {loop_s / per_text * 1e6:8.2f} µs/text | "
+            f"matcher {matcher_s / per_text * 1e6:8.2f} µs/text | "
+            f"speedup {loop_s / matcher_s:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
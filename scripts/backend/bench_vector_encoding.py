@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Microbenchmark: encoding a query embedding as a text literal vs binary halfvec.
+
+Usage:
+    python scripts/backend/bench_vector_encoding.py [--dims 1024] [--rounds 5000]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).resolve().parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from pgvector import HalfVector
+
+from app.db.vector_type import to_halfvec
+
+
+def legacy_literal(embedding):
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    as_list = [rng.uniform(-0.08, 0.08) for _ in range(args.dims)]
+    as_array = np.asarray(as_list, dtype=np.float32)
+    literal = legacy_literal(as_list)
+    binary = to_halfvec(as_list).to_binary()
+    assert HalfVector.from_binary(binary).dimensions() == args.dims
+
+    cases = [
+        ("text literal from list (old)", lambda: legacy_literal(as_list), len(literal)),
+        ("binary halfvec from list", lambda: to_halfvec(as_list).to_binary(), len(binary)),
+        ("binary halfvec from ndarray", lambda: to_halfvec(as_array).to_binary(), len(binary)),
+    ]
+    print(f"dims={args.dims} rounds={args.rounds}")
+    baseline = None
+    for label, fn, size in cases:
+        seconds = timeit.timeit(fn, number=args.rounds)
+        per_call_us = seconds / args.rounds * 1e6
+        baseline = baseline or per_call_us
+        print(f"{label:<30} {per_call_us:9.2f} us/call  {size:7d} bytes  {baseline / per_call_us:6.1f}x")
+
+    # Server side: what Postgres has to parse back into a vector.
+    parse_text = timeit.timeit(lambda: HalfVector.from_text(literal), number=args.rounds)
+    parse_binary = timeit.timeit(lambda: HalfVector.from_binary(binary), number=args.rounds)
+    print(
+        f"decode (client-side proxy): text {parse_text / args.rounds * 1e6:.2f} us, "
+        f"binary {parse_binary / args.rounds * 1e6:.2f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
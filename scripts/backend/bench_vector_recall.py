@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Benchmark: recall@k and latency of approximate memory search vs exact search.
+
+Builds a synthetic multi-user corpus (clustered unit vectors, as message
+embeddings are) and answers per-user top-k queries the way retrieve_memories
+does. Exact results come from a NumPy scan of the user's own vectors.
+
+Compared locally:
+  - the in-process memory index (per-user brute force; exact by construction)
+  - one shared HNSW graph filtered to the user afterwards, at several
+    ef_search values, which is how a single pgvector index behaves
+    (needs the optional hnswlib package)
+
+Also compared locally: exact search over float16-rounded vectors, which is
+what halfvec storage does to the stored embeddings.
+
+With --dsn, the same queries also run against a scratch pgvector table with
+an HNSW or ivfflat index, sweeping hnsw.ef_search or ivfflat.probes. The
+table is built as vector, halfvec or both (--storage), and table and index
+sizes are reported for each.
+
+Usage:
+    python scripts/backend/bench_vector_recall.py
+    python scripts/backend/bench_vector_recall.py --users 50 --per-user 2000 --k 5
+    python scripts/backend/bench_vector_recall.py --dsn postgresql://localhost/reflectra --index hnsw
+    python scripts/backend/bench_vector_recall.py --dsn postgresql://localhost/reflectra --storage both
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).resolve().parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.services.memory_index import UserVectorIndex, hnswlib
+
+
+def make_corpus(users: int, per_user: int, dims: int, topics: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(users * topics, dims)).astype(np.float32)
+    owner = np.repeat(np.arange(users), per_user)
+    topic = owner * topics + rng.integers(0, topics, size=owner.size)
+    vectors = centers[topic] + 0.6 * rng.normal(size=(owner.size, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, owner
+
+
+def make_queries(vectors, owner, count: int, seed: int):
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(vectors), size=count)
+    noisy = vectors[picks] + 0.3 * rng.normal(size=(count, vectors.shape[1])).astype(np.float32)
+    noisy /= np.linalg.norm(noisy, axis=1, keepdims=True)
+    return noisy, owner[picks]
+
+
+def exact_top_k(vectors, owner, query, user, k):
+    ids = np.flatnonzero(owner == user)
+    sims = vectors[ids] @ query
+    return set(ids[np.argsort(-sims)[:k]].tolist())
+
+
+def summarize(label, hits, k, latencies=None):
+    recall = sum(hits) / (k * len(hits))
+    if not latencies:
+        print(f"{label:<34} recall@{k}={recall:6.3f}")
+        return
+    ms = sorted(t * 1000 for t in latencies)
+    p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+    print(f"{label:<34} recall@{k}={recall:6.3f}  p50={statistics.median(ms):8.3f}ms  p95={p95:8.3f}ms")
+
+
+def bench_local(vectors, owner, queries, query_users, truth, k, ef_values):
+    indexes = {}
+    for user in np.unique(owner):
+        ids = np.flatnonzero(owner == user)
+        indexes[user] = (ids, UserVectorIndex.build([(int(i), str(int(i)), vectors[i]) for i in ids]))
+
+    hits, latencies = [], []
+    for query, user, expected in zip(queries, query_users, truth):
+        _, index = indexes[user]
+        started = time.perf_counter()
+        found = index.search(query, k, -1.0)
+        latencies.append(time.perf_counter() - started)
+        hits.append(len({int(content) for content, _ in found} & expected))
+    summarize("memory index (per-user exact)", hits, k, latencies)
+
+    half = vectors.astype(np.float16).astype(np.float32)
+    hits = [
+        len(exact_top_k(half, owner, query.astype(np.float16).astype(np.float32), user, k) & expected)
+        for query, user, expected in zip(queries, query_users, truth)
+    ]
+    summarize("float16 storage (halfvec), exact", hits, k)
+
+    if hnswlib is None:
+        print("shared hnsw: skipped (pip install hnswlib)")
+        return
+    graph = hnswlib.Index(space="ip", dim=vectors.shape[1])
+    graph.init_index(max_elements=len(vectors), ef_construction=64, M=16)
+    graph.add_items(vectors, np.arange(len(vectors)))
+    for ef in ef_values:
+        graph.set_ef(ef)
+        hits, latencies = [], []
+        for query, user, expected in zip(queries, query_users, truth):
+            started = time.perf_counter()
+            labels, _ = graph.knn_query(query, k=min(ef, len(vectors)))
+            found = [label for label in labels[0] if owner[label] == user][:k]
+            latencies.append(time.perf_counter() - started)
+            hits.append(len(set(int(label) for label in found) & expected))
+        summarize(f"shared hnsw, post-filter ef={ef}", hits, k, latencies)
+
+
+def bench_pgvector(dsn, index, storage, vectors, owner, queries, query_users, truth, k, sweep):
+    import psycopg
+    from pgvector.psycopg import register_vector
+
+    dims = vectors.shape[1]
+    column_type = f"{storage}({dims})"
+    opclass = "halfvec_cosine_ops" if storage == "halfvec" else "vector_cosine_ops"
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("create extension if not exists vector")
+        register_vector(conn)
+        conn.execute("drop table if exists bench_vector_recall")
+        conn.execute(f"create table bench_vector_recall (id integer primary key, user_id integer, embedding {column_type})")
+        with conn.cursor().copy("copy bench_vector_recall (id, user_id, embedding) from stdin with (format binary)") as copy:
+            copy.set_types(["int4", "int4", storage])
+            for i, (vector, user) in enumerate(zip(vectors, owner)):
+                copy.write_row((i, int(user), vector))
+        conn.execute("create index on bench_vector_recall (user_id)")
+        started = time.perf_counter()
+        if index == "hnsw":
+            conn.execute(
+                f"create index bench_vector_recall_ann on bench_vector_recall using hnsw (embedding {opclass}) "
+                "with (m = 16, ef_construction = 64)"
+            )
+            setting = "hnsw.ef_search"
+        else:
+            conn.execute(
+                f"create index bench_vector_recall_ann on bench_vector_recall "
+                f"using ivfflat (embedding {opclass}) with (lists = 100)"
+            )
+            setting = "ivfflat.probes"
+        conn.execute("analyze bench_vector_recall")
+        table_bytes, index_bytes = conn.execute(
+            "select pg_table_size('bench_vector_recall'), pg_relation_size('bench_vector_recall_ann')"
+        ).fetchone()
+        print(
+            f"pgvector {index}/{storage}: build {time.perf_counter() - started:.1f}s, "
+            f"table {table_bytes / 2**20:.1f} MiB, ann index {index_bytes / 2**20:.1f} MiB"
+        )
+
+        sql = (
+            "select id from bench_vector_recall where user_id = %s "
+            f"order by embedding <=> %s::{column_type} limit %s"
+        )
+        try:
+            for value in sweep:
+                hits, latencies = [], []
+                with conn.transaction():
+                    conn.execute("select set_config(%s, %s, true)", (setting, str(value)))
+                    for query, user, expected in zip(queries, query_users, truth):
+                        started = time.perf_counter()
+                        rows = conn.execute(sql, (int(user), query, k)).fetchall()
+                        latencies.append(time.perf_counter() - started)
+                        hits.append(len({row[0] for row in rows} & expected))
+                summarize(f"pgvector {index}/{storage} {setting}={value}", hits, k, latencies)
+        finally:
+            conn.execute("drop table if exists bench_vector_recall")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--per-user", type=int, default=1000)
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=8, help="clusters per user")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 40, 80, 200])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--dsn", help="run against pgvector at this libpq DSN (uses a scratch table)")
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--storage", choices=["vector", "halfvec", "both"], default="halfvec")
+    args = parser.parse_args()
+
+    vectors, owner = make_corpus(args.users, args.per_user, args.dims, args.topics, args.seed)
+    queries, query_users = make_queries(vectors, owner, args.queries, args.seed)
+    truth = [exact_top_k(vectors, owner, q, u, args.k) for q, u in zip(queries, query_users)]
+    print(f"corpus: {len(vectors)} vectors x {args.dims} dims, {args.users} users, {args.queries} queries")
+
+    bench_local(vectors, owner, queries, query_users, truth, args.k, args.ef)
+    if args.dsn:
+        sweep = args.ef if args.index == "hnsw" else args.probes
+        storages = ["vector", "halfvec"] if args.storage == "both" else [args.storage]
+        for storage in storages:
+            bench_pgvector(args.dsn, args.index, storage, vectors, owner, queries, query_users, truth, args.k, sweep)
+
+
+if __name__ == "__main__":
+    main()
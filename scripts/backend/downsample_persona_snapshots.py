@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Downsample old persona snapshots (hourly, then daily; anchors are kept).
+
+Intended for a nightly cron. Every snapshot from the last
+SNAPSHOT_RAW_RETENTION_DAYS is kept. Older ones are thinned to the last one
+per hour until SNAPSHOT_HOURLY_RETENTION_DAYS and to the last one per day
+after that.
+
+Usage:
+  python downsample_persona_snapshots.py
+  python downsample_persona_snapshots.py --dry-run
+  python downsample_persona_snapshots.py --user-id <uuid>
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+from uuid import UUID
+
+from app.db.database import AsyncSessionLocal
+from app.services.snapshot_service import (
+    SNAPSHOT_HOURLY_RETENTION_DAYS,
+    SNAPSHOT_RAW_RETENTION_DAYS,
+    downsample_snapshots,
+)
+
+
+async def run(dry_run: bool = False, user_id: Optional[UUID] = None) -> None:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        removed = await downsample_snapshots(session, user_id=user_id, dry_run=dry_run)
+
+    policy = f"raw {SNAPSHOT_RAW_RETENTION_DAYS}d, hourly {SNAPSHOT_HOURLY_RETENTION_DAYS}d, daily after"
+    if dry_run:
+        print(f"Dry run complete. Would remove {removed} snapshots ({policy}).")
+        return
+    print(f"Removed {removed} snapshots in {time.perf_counter() - started:.1f}s ({policy}).")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Downsample old persona snapshots")
+    parser.add_argument("--dry-run", action="store_true", help="Count removable snapshots without deleting")
+    parser.add_argument("--user-id", type=UUID, default=None, help="Only downsample one user's snapshots")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(run(dry_run=args.dry_run, user_id=args.user_id))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Rebuild the hourly analytics rollups (user_activity_hourly) from messages.
+
+The app keeps the rollups current as messages are created. Run this after
+bulk deletes or backfills, or after message feature columns
+(emotional_intensity, reflection_depth, response_delay_ms) are filled in
+later, to recompute them from the raw table. Heatmap counters
+(user_activity_heatmap) are dropped at the same time and rebuilt from
+messages on the next heatmap read.
+
+Usage:
+  python rebuild_activity_rollups.py
+  python rebuild_activity_rollups.py --user-id <uuid>
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+from uuid import UUID
+
+from app.db.database import AsyncSessionLocal
+from app.services.activity_heatmap_service import reset_activity_heatmaps
+from app.services.activity_rollup_service import rebuild_activity_rollups
+
+
+async def rebuild(user_id: Optional[UUID] = None) -> None:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        await reset_activity_heatmaps(session, user_id=user_id)
+        written = await rebuild_activity_rollups(session, user_id=user_id)
+    scope = f"user {user_id}" if user_id else "all users"
+    print(f"Rebuilt {written} rollup hours for {scope} in {time.perf_counter() - started:.1f}s.")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild hourly analytics rollups from messages")
+    parser.add_argument("--user-id", type=UUID, default=None, help="Only rebuild one user's rollups")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(rebuild(user_id=args.user_id))
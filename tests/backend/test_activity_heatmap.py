@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Tests for the per-user, timezone-aware activity heatmap counters."""
+
+import sys
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import activity_heatmap_service as heatmaps
+from app.services.activity_heatmap_service import HeatmapRing
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+SUNDAY = date(2026, 4, 5)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class _Nested:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Result:
+    def __init__(self, row=None, rows=()):
+        self.row = row
+        self.rows = list(rows)
+
+    def one_or_none(self):
+        return self.row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+    def all(self):
+        return self.rows
+
+
+class _ScriptedDB:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commit = AsyncMock()
+
+    def begin_nested(self):
+        return _Nested()
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self.results.pop(0) if self.results else _Result()
+
+
+def _stored(ring, tz="UTC"):
+    return SimpleNamespace(timezone=tz, last_day=ring.last_day, counts=ring.to_blob())
+
+
+class HeatmapRingTests(unittest.TestCase):
+    def test_window_folds_days_into_weekday_rows(self):
+        ring = HeatmapRing.empty(ring_days=14)
+        ring.add(SUNDAY, 9)
+        ring.add(SUNDAY - timedelta(days=7), 9, count=2)
+        ring.add(SUNDAY - timedelta(days=1), 23)
+
+        grid = ring.window(7, SUNDAY)
+        self.assertEqual(grid[0][9], 1)
+        self.assertEqual(grid[6][23], 1)
+        self.assertEqual(ring.window(14, SUNDAY)[0][9], 3)
+        self.assertEqual(int(ring.window(30, SUNDAY).sum()), 4)
+
+    def test_ring_reuses_slots_once_days_expire(self):
+        ring = HeatmapRing.empty(ring_days=7)
+        ring.add(SUNDAY, 8)
+        ring.add(SUNDAY + timedelta(days=7), 10)
+
+        grid = ring.window(7, SUNDAY + timedelta(days=7))
+        self.assertEqual(grid[0][8], 0)
+        self.assertEqual(grid[0][10], 1)
+        self.assertFalse(ring.add(SUNDAY, 8))
+
+    def test_days_after_the_newest_count_as_empty(self):
+        ring = HeatmapRing.empty(ring_days=7)
+        ring.add(SUNDAY, 8)
+
+        self.assertEqual(int(ring.window(7, SUNDAY + timedelta(days=3)).sum()), 1)
+        self.assertEqual(int(ring.window(7, SUNDAY + timedelta(days=7)).sum()), 0)
+
+    def test_blob_round_trip_and_size_check(self):
+        ring = HeatmapRing.empty()
+        ring.add(SUNDAY, 5, count=3)
+
+        restored = HeatmapRing.from_blob(ring.to_blob(), ring.last_day)
+        self.assertEqual(restored.counts.tolist(), ring.counts.tolist())
+        self.assertIsNone(HeatmapRing.from_blob(ring.to_blob()[:-4], ring.last_day))
+
+    def test_timezone_validation(self):
+        self.assertEqual(heatmaps.validate_timezone(" Asia/Kolkata "), "Asia/Kolkata")
+        self.assertEqual(heatmaps.validate_timezone(None), "UTC")
+        with self.assertRaises(ValueError):
+            heatmaps.validate_timezone("Mars/Olympus")
+
+
+class HeatmapStoreTests(unittest.IsolatedAsyncioTestCase):
+    async def test_message_is_counted_in_the_rings_timezone(self):
+        ring = HeatmapRing.empty()
+        ring.add(SUNDAY, 0)
+        db = _ScriptedDB(_Result(_stored(ring, tz="America/Los_Angeles")))
+
+        # 03:30 UTC on Monday is 20:30 on Sunday in Los Angeles.
+        await heatmaps.record_heatmap_message(db, USER, at=datetime(2026, 4, 6, 3, 30, tzinfo=timezone.utc))
+
+        lock, write = db.statements
+        self.assertIn("FOR UPDATE", _sql(lock))
+        params = write.compile(dialect=postgresql.dialect()).params
+        updated = HeatmapRing.from_blob(params["counts"], params["last_day"])
+        self.assertEqual(params["last_day"], SUNDAY)
+        self.assertEqual(updated.window(1, SUNDAY)[0][20], 1)
+
+    async def test_users_without_a_ring_get_a_placeholder_for_the_first_read(self):
+        db = _ScriptedDB(_Result(None), _Result(USER))
+
+        await heatmaps.record_heatmap_message(db, USER)
+
+        lock, claim = db.statements
+        self.assertIn("ON CONFLICT (user_id) DO NOTHING", _sql(claim))
+        self.assertIsNone(HeatmapRing.from_blob(claim.compile(dialect=postgresql.dialect()).params["counts"], None))
+
+    async def test_message_racing_a_rebuild_is_added_to_the_rebuilt_ring(self):
+        ring = HeatmapRing.empty()
+        ring.add(SUNDAY, 0)
+        # No row yet, then the claim conflicts with the rebuild's insert and the rebuilt ring is locked.
+        db = _ScriptedDB(_Result(None), _Result(None), _Result(_stored(ring)))
+
+        await heatmaps.record_heatmap_message(db, USER, at=datetime(2026, 4, 5, 9, tzinfo=timezone.utc))
+
+        write = db.statements[-1]
+        self.assertEqual(len(db.statements), 4)
+        params = write.compile(dialect=postgresql.dialect()).params
+        self.assertEqual(HeatmapRing.from_blob(params["counts"], params["last_day"]).window(1, SUNDAY)[0][9], 1)
+        self.assertIn("updated_at=now()", _sql(write))
+
+    async def test_counter_failure_does_not_raise(self):
+        db = _ScriptedDB()
+        db.execute = AsyncMock(side_effect=RuntimeError("no table"))
+
+        await heatmaps.record_heatmap_message(db, USER)
+
+    async def test_read_sums_the_stored_ring_without_scanning_messages(self):
+        today = datetime.now(timezone.utc).date()
+        ring = HeatmapRing.empty()
+        ring.add(today, 7, count=4)
+        db = _ScriptedDB(_Result("UTC"), _Result(_stored(ring)))
+
+        tz, grid = await heatmaps.load_activity_heatmap(db, USER, 30)
+
+        self.assertEqual(tz, "UTC")
+        self.assertEqual(grid[today.toordinal() % 7][7], 4)
+        self.assertEqual(len(db.statements), 2)
+        db.commit.assert_not_awaited()
+
+    async def test_timezone_change_rebuilds_from_messages(self):
+        today = datetime.now(timezone.utc).date()
+        ring = HeatmapRing.empty()
+        ring.add(today, 7)
+        db = _ScriptedDB(
+            _Result("Europe/Berlin"), _Result(_stored(ring, tz="UTC")), _Result(None), _Result(None), _Result(rows=[])
+        )
+
+        tz, grid = await heatmaps.load_activity_heatmap(db, USER, 7)
+
+        self.assertEqual(tz, "Europe/Berlin")
+        claim, lock, scan, write = (_sql(stmt) for stmt in db.statements[2:])
+        self.assertIn("ON CONFLICT (user_id) DO NOTHING", claim)
+        self.assertIn("FOR UPDATE", lock)
+        self.assertIn("::VARCHAR, messages.created_at) AS DATE)", scan)
+        self.assertIn("updated_at=now()", write)
+        db.commit.assert_awaited_once()
+
+    async def test_windows_longer_than_the_ring_use_rollups(self):
+        db = _ScriptedDB(_Result("Asia/Tokyo"), _Result(rows=[SimpleNamespace(day_of_week=1, hour_of_day=9, message_count=5)]))
+
+        with patch.object(heatmaps, "HEATMAP_RING_DAYS", 30):
+            tz, grid = await heatmaps.load_activity_heatmap(db, USER, 365)
+
+        self.assertEqual(grid[1][9], 5)
+        self.assertIn("user_activity_hourly", _sql(db.statements[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Tests for the hourly message activity rollups behind analytics."""
+
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import activity_rollup_service as rollups
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+START = datetime(2026, 4, 1, tzinfo=timezone.utc)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class _Nested:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _RecordingDB:
+    def __init__(self, error=None):
+        self.statements = []
+        self.error = error
+        self.commit = AsyncMock()
+
+    def begin_nested(self):
+        return _Nested()
+
+    async def execute(self, stmt):
+        if self.error:
+            raise self.error
+        self.statements.append(stmt)
+        return SimpleNamespace(rowcount=2)
+
+
+class ActivityRollupTests(unittest.IsolatedAsyncioTestCase):
+    async def test_message_insert_increments_its_hour(self):
+        db = _RecordingDB()
+
+        await rollups.record_message_activity(db, USER, token_count=12, reflection_depth=0.4)
+
+        stmt = db.statements[0]
+        sql = _sql(stmt)
+        self.assertIn("date_trunc(%(date_trunc_1)s::VARCHAR, now(), %(date_trunc_2)s::VARCHAR)", sql)
+        self.assertIn("ON CONFLICT (user_id, hour) DO UPDATE SET message_count = ", sql)
+        self.assertIn("token_sum = (user_activity_hourly.token_sum + excluded.token_sum)", sql)
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        self.assertEqual(params["token_sum"], 12)
+        self.assertEqual(params["reflection_depth_count"], 1)
+        self.assertEqual(params["emotional_intensity_count"], 0)
+
+    async def test_rollup_failure_does_not_raise(self):
+        await rollups.record_message_activity(_RecordingDB(error=RuntimeError("no table")), USER)
+
+    async def test_rebuild_replaces_one_users_rows_from_messages(self):
+        db = _RecordingDB()
+
+        written = await rollups.rebuild_activity_rollups(db, USER)
+
+        clear, fill = (_sql(stmt) for stmt in db.statements)
+        self.assertEqual(written, 2)
+        self.assertIn("DELETE FROM user_activity_hourly WHERE user_activity_hourly.user_id = ", clear)
+        self.assertIn("INSERT INTO user_activity_hourly (user_id, hour, message_count, token_sum", fill)
+        self.assertIn("count(messages.reflection_depth)", fill)
+        self.assertIn("messages.role = ", fill)
+        db.commit.assert_awaited_once()
+
+    def test_series_merges_hours_with_weighted_averages(self):
+        sql = _sql(rollups.activity_series_query(USER, "day", START))
+
+        self.assertIn("FROM user_activity_hourly", sql)
+        self.assertNotIn("messages", sql)
+        self.assertIn(
+            "sum(user_activity_hourly.reflection_depth_sum) / "
+            "nullif(sum(user_activity_hourly.reflection_depth_count), %(nullif_2)s::INTEGER)",
+            sql,
+        )
+        self.assertIn("GROUP BY date_trunc(", sql)
+
+    def test_heatmap_reads_rollups(self):
+        sql = _sql(rollups.activity_heatmap_query(USER, START))
+
+        self.assertIn("EXTRACT(dow FROM timezone(", sql)
+        self.assertIn("sum(user_activity_hourly.message_count)", sql)
+        self.assertNotIn("messages", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Tests for the server-sent-events /chat/stream endpoint."""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.api import chat as chat_api
+from app.api.chat import ChatRequest, ChatTurn
+
+
+class _DummySession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_args):
+        return False
+
+    async def commit(self):
+        return None
+
+    async def rollback(self):
+        return None
+
+
+def _parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = block.split("\n")
+        name = lines[0].removeprefix("event: ")
+        data = json.loads(lines[1].removeprefix("data: "))
+        events.append((name, data))
+    return events
+
+
+class ChatStreamTests(unittest.IsolatedAsyncioTestCase):
+    def _turn(self, mode: str) -> ChatTurn:
+        request = ChatRequest(user_id="00000000-0000-0000-0000-000000000001", message="I keep stalling", mode=mode)
+        return ChatTurn(
+            request=request,
+            effective_mode=mode,
+            user_id=UUID(request.user_id),
+            conversation_id=UUID("00000000-0000-0000-0000-0000000000aa"),
+            conversation_title="Stalling",
+            message_text=request.message,
+            history=[{"role": "user", "content": request.message}],
+            personality_profile=chat_api.get_personality_profile(request.user_id),
+            mirror_runtime_active=(mode == "mirror"),
+        )
+
+    async def _collect(self, response) -> str:
+        parts = []
+        async for chunk in response.body_iterator:
+            parts.append(chunk if isinstance(chunk, str) else chunk.decode())
+        return "".join(parts)
+
+    async def test_reflection_streams_tokens_then_done(self):
+        turn = self._turn("reflection")
+
+        async def fake_stream(*_args, **_kwargs):
+            for delta in ["You keep ", "stalling. ", "What is it protecting?"]:
+                yield delta
+
+        with patch.object(chat_api, "start_chat_turn", new=AsyncMock(return_value=turn)), \
+             patch.object(chat_api, "build_reflection_turn_prompt", new=AsyncMock(return_value="sys")), \
+             patch.object(chat_api, "AsyncSessionLocal", new=_DummySession), \
+             patch.object(chat_api.llm_gateway, "is_available", return_value=True), \
+             patch.object(chat_api.llm_gateway, "chat_stream", new=fake_stream), \
+             patch.object(chat_api, "finalize_reflection_reply", side_effect=lambda t, r: setattr(t, "reply", r) or r):
+            response = await chat_api.chat_stream(turn.request, db=_DummySession())
+            events = _parse_events(await self._collect(response))
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "start")
+        self.assertEqual(names.count("token"), 3)
+        self.assertNotIn("replace", names)
+        self.assertEqual(names[-1], "done")
+        done = events[-1][1]
+        self.assertEqual(done["reply"], "You keep stalling. What is it protecting?")
+        self.assertEqual(done["conversation_id"], str(turn.conversation_id))
+        self.assertIsNotNone(response.background)
+
+    async def test_mirror_done_event_carries_chat_response_metadata(self):
+        turn = self._turn("mirror")
+
+        async def fake_mirror(t, _db):
+            t.reply = "yeah same, still stalling"
+            t.confidence_tier = "partial"
+            t.confidence_interval = {"lower": 0.4, "upper": 0.6}
+            t.style_strength = 0.5
+            t.reaction_source = "general"
+            return t.reply
+
+        with patch.object(chat_api, "start_chat_turn", new=AsyncMock(return_value=turn)), \
+             patch.object(chat_api, "AsyncSessionLocal", new=_DummySession), \
+             patch.object(chat_api, "generate_mirror_reply", new=fake_mirror):
+            response = await chat_api.chat_stream(turn.request, db=_DummySession())
+            events = _parse_events(await self._collect(response))
+
+        self.assertEqual([name for name, _ in events], ["start", "token", "done"])
+        done = events[-1][1]
+        self.assertEqual(done["confidence_level"], "partial")
+        self.assertEqual(done["confidence_interval"], {"lower": 0.4, "upper": 0.6})
+        self.assertEqual(done["style_strength"], 0.5)
+        self.assertEqual(done["reaction_source"], "general")
+
+
+class _RowsSession(_DummySession):
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, _stmt):
+        rows = self.rows
+        return type("Result", (), {"all": lambda self: rows})()
+
+
+class ChatJobJournalTests(unittest.IsolatedAsyncioTestCase):
+    USER = "00000000-0000-0000-0000-000000000001"
+    ASKED = UUID("00000000-0000-0000-0000-0000000000b1")
+    ANSWERED = UUID("00000000-0000-0000-0000-0000000000b2")
+
+    def _payload(self):
+        request = ChatRequest(user_id=self.USER, message="I keep stalling", mode="mirror", external_input_text="pasted")
+        turn = ChatTurn(
+            request=request,
+            effective_mode="mirror",
+            user_id=UUID(self.USER),
+            conversation_id=UUID("00000000-0000-0000-0000-0000000000aa"),
+            conversation_title="Stalling",
+            message_text=request.message,
+            history=[],
+            personality_profile={},
+            reply="same here",
+            user_message_id=self.ASKED,
+            assistant_message_id=self.ANSWERED,
+        )
+        return turn.to_job_payload()
+
+    def test_journal_payload_keeps_ids_but_no_text(self):
+        journaled = ChatTurn.journal_payload(self._payload())
+
+        self.assertEqual(journaled["user_message_id"], str(self.ASKED))
+        self.assertEqual(journaled["assistant_message_id"], str(self.ANSWERED))
+        self.assertNotIn("stalling", json.dumps(journaled).lower())
+        self.assertNotIn("same here", json.dumps(journaled))
+        self.assertEqual(ChatTurn.journal_payload(journaled), journaled)
+
+    async def test_replayed_payload_reloads_texts_by_message_id(self):
+        journaled = ChatTurn.journal_payload(self._payload())
+        rows = [
+            type("Row", (), {"id": self.ASKED, "content": "I keep stalling"}),
+            type("Row", (), {"id": self.ANSWERED, "content": "same here"}),
+        ]
+
+        payload = await chat_api.load_replayed_turn_payload(journaled, _RowsSession(rows))
+        turn = ChatTurn.from_job_payload(payload)
+
+        self.assertEqual(turn.message_text, "I keep stalling")
+        self.assertEqual(turn.reply, "same here")
+        self.assertEqual(turn.request.mode, "mirror")
+        self.assertIsNone(turn.request.external_input_text)
+
+    async def test_replayed_job_is_skipped_once_messages_are_deleted(self):
+        journaled = ChatTurn.journal_payload(self._payload())
+
+        self.assertIsNone(await chat_api.load_replayed_turn_payload(journaled, _RowsSession([])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tests for data-version ETags and conditional GETs on polled read endpoints."""
+
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi import Response
+
+from app.services import data_version_service as versions
+from app.services.data_version_service import conditional_get_stats, etag_matches, make_etag
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+
+
+class _VersionDB:
+    def __init__(self, version=None, error=None):
+        self.version = version
+        self.error = error
+        self.executed = 0
+        self.rollback = AsyncMock()
+
+    async def execute(self, stmt):
+        self.executed += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(scalar_one_or_none=lambda: self.version)
+
+
+def _request(if_none_match=None):
+    return SimpleNamespace(headers={"if-none-match": if_none_match} if if_none_match else {})
+
+
+class EtagTests(unittest.TestCase):
+    def test_etag_changes_with_version_scope_and_parameters(self):
+        base = make_etag("analytics.timeline", USER, 3, "7d")
+
+        self.assertTrue(base.startswith('W/"3-'))
+        self.assertEqual(base, make_etag("analytics.timeline", USER, 3, "7d"))
+        self.assertNotEqual(base, make_etag("analytics.timeline", USER, 4, "7d"))
+        self.assertNotEqual(base, make_etag("analytics.timeline", USER, 3, "30d"))
+        self.assertNotEqual(base, make_etag("persona.metrics", USER, 3, "7d"))
+
+    def test_if_none_match_uses_weak_comparison_over_lists(self):
+        etag = make_etag("persona.metrics", USER, 2)
+        opaque = etag[2:]
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(opaque, etag))
+        self.assertTrue(etag_matches(f'W/"0-stale", {etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches(make_etag("persona.metrics", USER, 1), etag))
+
+    def test_time_bucket_advances_with_the_configured_interval(self):
+        width = versions.DATA_VERSION_TIME_BUCKET_SECONDS
+
+        self.assertEqual(versions.time_bucket(width * 10), versions.time_bucket(width * 10 + width - 1))
+        self.assertEqual(versions.time_bucket(width * 11), versions.time_bucket(width * 10) + 1)
+
+
+class NotModifiedTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        conditional_get_stats.clear()
+
+    async def test_first_request_gets_an_etag_to_revalidate_with(self):
+        response = Response()
+
+        result = await versions.not_modified_response(_request(), response, _VersionDB(5), USER, "persona.profile")
+
+        self.assertIsNone(result)
+        self.assertEqual(response.headers["etag"], make_etag("persona.profile", USER, 5))
+        self.assertEqual(response.headers["cache-control"], "private, no-cache")
+
+    async def test_current_etag_gets_304_after_one_lookup(self):
+        db = _VersionDB(5)
+        etag = make_etag("persona.profile", USER, 5)
+
+        result = await versions.not_modified_response(_request(etag), Response(), db, USER, "persona.profile")
+
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(result.headers["etag"], etag)
+        self.assertEqual(db.executed, 1)
+
+    async def test_write_since_the_etag_serves_a_full_response(self):
+        stale = make_etag("persona.profile", USER, 5)
+        response = Response()
+
+        result = await versions.not_modified_response(_request(stale), response, _VersionDB(6), USER, "persona.profile")
+
+        self.assertIsNone(result)
+        self.assertEqual(response.headers["etag"], make_etag("persona.profile", USER, 6))
+
+    async def test_users_without_writes_are_at_version_zero(self):
+        response = Response()
+
+        await versions.not_modified_response(_request(), response, _VersionDB(None), USER, "persona.metrics")
+
+        self.assertEqual(response.headers["etag"], make_etag("persona.metrics", USER, 0))
+
+    async def test_lookup_failure_serves_without_etag(self):
+        db = _VersionDB(error=RuntimeError("relation does not exist"))
+        response = Response()
+
+        result = await versions.not_modified_response(_request('W/"1-x"'), response, db, USER, "persona.metrics")
+
+        self.assertIsNone(result)
+        self.assertNotIn("etag", response.headers)
+        db.rollback.assert_awaited_once()
+        self.assertEqual(conditional_get_stats.stats()["endpoints"]["persona.metrics"]["errors"], 1)
+
+    async def test_hit_rate_is_reported_per_endpoint(self):
+        etag = make_etag("user.system_state", USER, 1)
+        for header in (None, etag, etag, 'W/"0-old"'):
+            await versions.not_modified_response(_request(header), Response(), _VersionDB(1), USER, "user.system_state")
+
+        stats = conditional_get_stats.stats()
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(stats["endpoints"]["user.system_state"]["revalidations"], 3)
+        self.assertEqual(stats["endpoints"]["user.system_state"]["not_modified"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests for confidence-interval scoring from incrementally maintained aggregates."""
+
+import asyncio
+import math
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import confidence_interval_service as cis
+from app.services.confidence_aggregate_service import (
+    CONVERSATION_TAU_DAYS,
+    ConfidenceAggregates,
+    external_tokens,
+    has_conversation_slang,
+)
+
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+class ConfidenceAggregatesTests(unittest.TestCase):
+    def test_from_values_decays_to_now(self):
+        decayed_at = NOW - timedelta(days=CONVERSATION_TAU_DAYS)
+        aggregates = ConfidenceAggregates.from_values(
+            {"message_weight": 10.0, "trait_count": 4, "trait_confidence_sum": 2.0},
+            decayed_at,
+            NOW,
+        )
+
+        self.assertAlmostEqual(aggregates.message_weight, 10.0 * math.exp(-1.0))
+        # Trait totals are recomputed on write, not decayed.
+        self.assertEqual(aggregates.trait_count, 4)
+        self.assertEqual(aggregates.trait_confidence_sum, 2.0)
+
+    def test_message_helpers_match_old_scan(self):
+        self.assertTrue(has_conversation_slang("ok TBH that was rough"))
+        self.assertFalse(has_conversation_slang("that was rough"))
+        self.assertEqual(external_tokens("b a B"), ["a", "b"])
+
+    def test_empty_aggregates_score_conservatively(self):
+        empty = ConfidenceAggregates(as_of=NOW)
+
+        self.assertEqual(cis._score_conversations(empty), 0.05)
+        self.assertEqual(cis._score_traits(empty), 0.05)
+        self.assertEqual(cis._score_timeline_with_details(empty)[0], 0.05)
+        self.assertEqual(cis._score_reflections(empty), 0.05)
+        self.assertEqual(cis._score_external_inputs(empty, "hello"), 0.05)
+
+    def test_scores_match_windowed_formulas(self):
+        lengths = [4, 6, 8]
+        aggregates = ConfidenceAggregates(
+            as_of=NOW,
+            message_weight=3.0,
+            message_slang_weight=1.0,
+            message_length_sum=float(sum(lengths)),
+            message_length_sq_sum=float(sum(n * n for n in lengths)),
+            trait_count=2,
+            trait_confidence_sum=1.2,
+            trait_recency_sum=2.0,
+            external_weight=2.0,
+            external_confidence_weight_sum=0.2,
+            external_recent_tokens=[["hello", "world"], []],
+        )
+
+        mean_len = sum(lengths) / 3
+        variance = sum((n - mean_len) ** 2 for n in lengths) / 3
+        stability = 1.0 - math.sqrt(variance) / mean_len
+        expected = (0.50 * 3 / 120) + (0.30 * 1 / 3) + (0.20 * stability)
+        self.assertAlmostEqual(cis._score_conversations(aggregates), expected)
+        self.assertAlmostEqual(cis._score_traits(aggregates), (0.75 * 0.6) + (0.25 * 1.0))
+        self.assertAlmostEqual(
+            cis._score_external_inputs(aggregates, "Hello there"),
+            (0.45 * 2 / 40) + (0.30 * 0.1) + (0.25 * 0.5),
+        )
+
+    def test_timeline_override_compares_recent_and_older_insights(self):
+        aggregates = ConfidenceAggregates(
+            as_of=NOW,
+            insight_weight=10.0,
+            insight_confidence_sum=6.0,
+            insight_recent_weight=4.0,
+            insight_recent_confidence_sum=3.6,
+        )
+
+        _, details = cis._score_timeline_with_details(aggregates)
+
+        self.assertTrue(details["applied"])
+        self.assertAlmostEqual(details["recent_avg"], 0.9)
+        self.assertAlmostEqual(details["older_avg"], 0.4)
+
+    def test_compute_reads_aggregates_once(self):
+        loader = AsyncMock(return_value=ConfidenceAggregates(as_of=NOW))
+        with patch.object(cis, "load_confidence_aggregates", loader):
+            result = asyncio.run(cis.compute_confidence_interval(AsyncMock(), uuid4(), "hey"))
+
+        loader.assert_awaited_once()
+        self.assertEqual(result.tier, "very_low")
+        self.assertEqual(set(result.source_scores), {
+            "conversations",
+            "traits",
+            "timeline_reflections",
+            "reflection_summaries",
+            "external_inputs",
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
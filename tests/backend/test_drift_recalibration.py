@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Tests for version-gated drift recalibration with a cached anchor."""
+
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.memory_service import check_and_recalibrate_drift, drift_monitor, trait_drift
+from app.services.snapshot_cache import bump_snapshot_version, snapshot_cache
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+
+
+def _snapshot(traits, anchor=False):
+    return SimpleNamespace(
+        id=UUID(int=2 if anchor else 3),
+        user_id=USER,
+        persona_vector={},
+        stability_index=0.5,
+        summary_text="",
+        behavioral_traits=traits,
+        is_historical_anchor=anchor,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _db(anchor):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = anchor
+    return SimpleNamespace(execute=AsyncMock(return_value=result), commit=AsyncMock())
+
+
+class DriftRecalibrationTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        snapshot_cache.clear()
+        drift_monitor.clear()
+
+    def _latest(self, *rows):
+        return patch(
+            "app.repository.persona_repository.PersonaRepository.get_latest_snapshot",
+            new=AsyncMock(side_effect=list(rows)),
+        )
+
+    async def test_checks_only_when_the_snapshot_version_changes(self):
+        db = _db(_snapshot({"directness": 0.5}, anchor=True))
+        active = _snapshot({"directness": 0.6, "label": "x"})
+
+        with self._latest(active, active) as latest:
+            await check_and_recalibrate_drift(db, USER)
+            await check_and_recalibrate_drift(db, USER)
+            self.assertEqual(latest.await_count, 1)
+            self.assertEqual(db.execute.await_count, 1)  # the anchor
+
+            bump_snapshot_version(USER)
+            await check_and_recalibrate_drift(db, USER)
+
+        self.assertEqual(latest.await_count, 2)
+        self.assertEqual(db.execute.await_count, 1)  # anchor served from cache
+        db.commit.assert_not_awaited()
+        self.assertEqual(drift_monitor.stats()["skipped"], 1)
+
+    async def test_recalibrates_toward_anchor_once(self):
+        db = _db(_snapshot({"directness": 0.2, "warmth": 0.8}, anchor=True))
+        active = _snapshot({"directness": 0.9, "warmth": 0.2, "note": "keep"})
+
+        with self._latest(active):
+            await check_and_recalibrate_drift(db, USER)
+            await check_and_recalibrate_drift(db, USER)
+
+        db.commit.assert_awaited_once()
+        update_stmt = db.execute.await_args_list[-1].args[0]
+        values = update_stmt.compile().params["behavioral_traits"]
+        self.assertAlmostEqual(values["directness"], 0.55)
+        self.assertAlmostEqual(values["warmth"], 0.5)
+        self.assertEqual(values["note"], "keep")
+        self.assertEqual(snapshot_cache.version(USER), 1)
+        self.assertEqual(drift_monitor.stats()["recalibrations"], 1)
+
+    async def test_missing_anchor_is_cached_too(self):
+        db = _db(None)
+        with self._latest(_snapshot({"directness": 0.9}), _snapshot({"directness": 0.1})):
+            await check_and_recalibrate_drift(db, USER)
+            bump_snapshot_version(USER)
+            await check_and_recalibrate_drift(db, USER)
+
+        self.assertEqual(db.execute.await_count, 1)
+        drift_monitor.forget(USER)
+        self.assertEqual(drift_monitor.stats()["anchors"], 0)
+
+    def test_trait_drift_aligns_numeric_shared_traits(self):
+        keys, active, anchor = trait_drift({"a": 1, "b": "x", "c": 0.5}, {"a": 0.5, "b": 0.1, "d": 1.0})
+
+        self.assertEqual(keys, ["a"])
+        self.assertEqual(active.tolist(), [1.0])
+        self.assertEqual(anchor.tolist(), [0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Tests for the content-addressed embedding cache."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import embedding_service
+from app.services.embedding_cache import DiskEmbeddingStore, EmbeddingCache
+
+
+DIMS = 4
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "cache.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _cache(self, **kwargs):
+        cache = EmbeddingCache(disk_path=self.path, disk_max_bytes=64 * 1024, dimensions=DIMS, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_normalized_text_shares_an_entry(self):
+        cache = self._cache()
+        cache.put("  OK ", [0.5, 0.25, 0.0, 1.0])
+
+        self.assertEqual(cache.get("ok"), [0.5, 0.25, 0.0, 1.0])
+        self.assertIsNone(cache.get("okay"))
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_disk_tier_survives_restart_and_is_shared(self):
+        writer = self._cache()
+        writer.put("thanks", [1.0, 2.0, 3.0, 4.0])
+
+        reader = self._cache()
+        self.assertEqual(reader.get("Thanks"), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(reader.stats()["disk_hits"], 1)
+        reader.get("thanks")
+        self.assertEqual(reader.stats()["memory_hits"], 1)
+
+    def test_memory_tier_is_bounded(self):
+        cache = self._cache(max_entries=2)
+        for word in ("a", "b", "c"):
+            cache.put(word, [0.0] * DIMS)
+
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNotNone(cache.get("a"))  # still on disk
+
+    def test_torn_slot_reads_as_a_miss(self):
+        store = DiskEmbeddingStore(self.path, DIMS, 64 * 1024)
+        self.addCleanup(store.close)
+        digest = bytes(range(32))
+        store.put(digest, [1.0] * DIMS)
+
+        offset = next(store._offsets(digest))
+        store._map[offset + store.slot_size - 1] ^= 0xFF
+        self.assertIsNone(store.get(digest))
+
+    def test_wrong_dimensions_are_not_cached(self):
+        cache = self._cache()
+        cache.put("idk", [1.0, 2.0])
+        self.assertIsNone(cache.get("idk"))
+
+
+class EmbedTextsCachedTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_unique_misses_reach_the_provider(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(disk_path=str(Path(tmp) / "c.bin"), disk_max_bytes=64 * 1024, dimensions=DIMS)
+            cache.put("ok", [1.0] * DIMS)
+            provider = AsyncMock(return_value=[[2.0] * DIMS])
+
+            with patch.object(embedding_service, "embedding_cache", cache), patch.object(
+                embedding_service, "embed_batch", new=provider
+            ):
+                vectors = await embedding_service.embed_texts_cached(["ok", "idk", "IDK ", "ok"])
+                again = await embedding_service.embed_texts_cached(["idk"])
+            cache.close()
+
+        provider.assert_awaited_once_with(["idk"])
+        self.assertEqual(vectors, [[1.0] * DIMS, [2.0] * DIMS, [2.0] * DIMS, [1.0] * DIMS])
+        self.assertEqual(again, [[2.0] * DIMS])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Tests for batched background message embedding."""
+
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy.dialects import postgresql
+
+from app.constants import EMBEDDING_DIMENSIONS
+from app.db.models import Message
+from app.services import embedding_service
+from app.services import embedding_worker as ew
+
+
+START = datetime(2026, 5, 1, tzinfo=timezone.utc)
+USER_ID = uuid4()
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        headers = {"retry-after": retry_after} if retry_after is not None else {}
+        self.raw_response = SimpleNamespace(status_code=429, headers=headers)
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _DummyDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.updates = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.events = []
+
+    async def execute(self, stmt, params=None):
+        if params is not None:
+            self.updates.extend(params)
+            self.events.append("update")
+            return _Result([])
+        self.statements.append(stmt)
+        self.events.append("execute")
+        return _Result(self.rows)
+
+    async def commit(self):
+        self.commits += 1
+        self.events.append("commit")
+
+    async def rollback(self):
+        self.rollbacks += 1
+        self.events.append("rollback")
+
+
+def _rows(*contents):
+    return [
+        SimpleNamespace(id=uuid4(), user_id=USER_ID, role="user", created_at=START + timedelta(seconds=i), content=content)
+        for i, content in enumerate(contents)
+    ]
+
+
+def _vectors(texts):
+    return [[float(len(text))] for text in texts]
+
+
+class SplitBatchesTests(unittest.TestCase):
+    def test_respects_item_and_character_budgets(self):
+        texts = ["a" * 10] * 5 + ["b" * 50, "c"]
+
+        batches = ew.split_batches(texts, max_items=3, max_chars=40)
+
+        self.assertEqual([list(b) for b in batches], [[0, 1, 2], [3, 4], [5], [6]])
+
+    def test_pending_query_reads_unlocked_keyset_pages(self):
+        sql = str(
+            ew.pending_messages_query(10, after=(START, uuid4())).compile(dialect=postgresql.dialect())
+        )
+
+        self.assertIn("messages.embedding IS NULL", sql)
+        self.assertIn("messages.embedding_attempts < ", sql)
+        self.assertIn("(messages.created_at, messages.id) >", sql)
+        self.assertNotIn("FOR UPDATE", sql)
+
+    def test_vectors_only_fill_rows_that_are_still_empty(self):
+        sql = str(ew.store_embedding_stmt.compile(dialect=postgresql.dialect()))
+
+        self.assertIn("WHERE messages.id = %(message_id)s::UUID AND messages.embedding IS NULL", sql)
+
+    def test_embeddings_are_stored_as_halfvec_of_the_model_width(self):
+        column_type = Message.__table__.c.embedding.type
+        self.assertIsInstance(column_type, HALFVEC)
+        self.assertEqual(column_type.dim, EMBEDDING_DIMENSIONS)
+
+
+class EmbedPendingMessagesTests(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_calls_and_writes_one_bulk_update(self):
+        rows = _rows("first  message", "", "third")
+        db = _DummyDB(rows)
+        calls = []
+
+        async def fake_embed(texts):
+            calls.append(list(texts))
+            self.assertEqual(db.events, ["execute", "rollback"])  # no open transaction
+            return [None if text == "" else [float(len(text))] for text in texts]
+
+        with patch.object(ew, "embed_texts_cached", new=fake_embed), patch.object(ew, "EMBEDDING_BATCH_SIZE", 2):
+            outcome = await ew.embed_pending_messages(db, limit=3)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0], ["first message", ""])
+        self.assertEqual(db.updates, [
+            {"message_id": rows[0].id, "vector": [13.0]},
+            {"message_id": rows[2].id, "vector": [5.0]},
+        ])
+        failed_sql = str(db.statements[-1].compile(dialect=postgresql.dialect()))
+        self.assertIn("SET embedding_attempts=(messages.embedding_attempts + ", failed_sql)
+        self.assertEqual(db.statements[-1].compile().params["id_1"], [rows[1].id])
+        self.assertEqual(db.commits, 1)
+        self.assertEqual((outcome.embedded, outcome.skipped, outcome.calls), (2, 1, 2))
+        self.assertEqual(outcome.cursor, (rows[2].created_at, rows[2].id))
+
+    async def test_provider_failure_keeps_earlier_batches(self):
+        rows = _rows("one", "two", "three")
+        db = _DummyDB(rows)
+        embed = AsyncMock(side_effect=[[[1.0]], _RateLimited()])
+
+        with patch.object(ew, "embed_texts_cached", new=embed), patch.object(ew, "EMBEDDING_BATCH_SIZE", 1):
+            outcome = await ew.embed_pending_messages(db, limit=3)
+
+        self.assertEqual(db.updates, [{"message_id": rows[0].id, "vector": [1.0]}])
+        self.assertEqual(outcome.cursor, (rows[0].created_at, rows[0].id))
+        self.assertEqual(outcome.error, "rate limited")
+        self.assertEqual(outcome.failed, 0)
+
+    async def test_rejected_batches_count_an_attempt_and_move_on(self):
+        rows = _rows("one", "two")
+        db = _DummyDB(rows)
+        rejected = _RateLimited()
+        rejected.status_code = 400
+        embed = AsyncMock(side_effect=[rejected, [[2.0]]])
+
+        with patch.object(ew, "embed_texts_cached", new=embed), patch.object(ew, "EMBEDDING_BATCH_SIZE", 1):
+            outcome = await ew.embed_pending_messages(db, limit=2)
+
+        self.assertIsNone(outcome.error)
+        self.assertEqual((outcome.embedded, outcome.failed), (1, 1))
+        self.assertEqual(db.updates, [{"message_id": rows[1].id, "vector": [2.0]}])
+        self.assertEqual(db.statements[-1].compile().params["id_1"], [rows[0].id])
+        self.assertEqual(outcome.cursor, (rows[1].created_at, rows[1].id))
+
+    async def test_dry_run_never_calls_provider(self):
+        db = _DummyDB(_rows("one"))
+        with patch.object(ew, "embed_texts_cached", new=AsyncMock(side_effect=AssertionError)):
+            outcome = await ew.embed_pending_messages(db, dry_run=True)
+
+        self.assertEqual(outcome.selected, 1)
+        self.assertEqual((db.updates, db.commits, db.rollbacks), ([], 0, 1))
+
+
+class EmbedBatchBackoffTests(unittest.IsolatedAsyncioTestCase):
+    async def test_retries_rate_limits_honoring_retry_after(self):
+        gateway = AsyncMock(side_effect=[_RateLimited("2"), _RateLimited(), [[0.5]]])
+        sleep = AsyncMock()
+
+        with patch.object(embedding_service.llm_gateway, "embed_texts", new=gateway), patch.object(
+            embedding_service.asyncio, "sleep", new=sleep
+        ):
+            vectors = await embedding_service.embed_batch(["hello"], max_attempts=3)
+
+        self.assertEqual(vectors, [[0.5]])
+        self.assertEqual(gateway.await_count, 3)
+        self.assertEqual(sleep.await_args_list[0].args, (2.0,))
+        self.assertLessEqual(sleep.await_args_list[1].args[0], embedding_service.EMBEDDING_BACKOFF_BASE_SECONDS * 2)
+
+    async def test_gives_up_on_non_retryable_errors(self):
+        error = _RateLimited()
+        error.status_code = 400
+        gateway = AsyncMock(side_effect=error)
+
+        with patch.object(embedding_service.llm_gateway, "embed_texts", new=gateway):
+            with self.assertRaises(_RateLimited):
+                await embedding_service.embed_batch(["hello"], max_attempts=5)
+        self.assertEqual(gateway.await_count, 1)
+
+
+class EmbeddingWorkerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_drain_pages_until_short_page(self):
+        pages = [
+            ew.EmbeddingPass(selected=2, embedded=2, calls=1, cursor=(START, uuid4())),
+            ew.EmbeddingPass(selected=1, embedded=1, calls=1, cursor=(START, uuid4())),
+        ]
+        embed = AsyncMock(side_effect=pages)
+
+        class _Session:
+            async def __aenter__(self):
+                return object()
+
+            async def __aexit__(self, *_exc):
+                return False
+
+        worker = ew.EmbeddingWorker(page_size=2, session_factory=_Session)
+        with patch.object(ew, "embed_pending_messages", new=embed):
+            self.assertEqual(await worker.drain(), 3)
+
+        self.assertIsNone(embed.await_args_list[0].kwargs["after"])
+        self.assertEqual(embed.await_args_list[1].kwargs["after"], pages[0].cursor)
+        self.assertEqual(worker.stats()["provider_calls"], 2)
+
+    def test_notify_is_a_no_op_when_stopped(self):
+        ew.EmbeddingWorker().notify()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for the conversation-scoped history window cache."""
+
+import sys
+import unittest
+from pathlib import Path
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.history_service import ConversationHistoryCache
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _DummyDB:
+    """Returns stored (role, content) rows newest first, like the window query."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, *_args, **_kwargs):
+        self.queries += 1
+        return _Rows(list(reversed(self.rows)))
+
+
+class ConversationHistoryCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_miss_loads_from_db_then_hits_cache(self):
+        db = _DummyDB([("user", "hi"), ("assistant", "hey")])
+        cache = ConversationHistoryCache(max_conversations=4, window=10)
+        conversation_id = uuid4()
+
+        first = await cache.get(db, conversation_id, uuid4())
+        second = await cache.get(db, conversation_id, uuid4())
+
+        self.assertEqual(first, [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hey"}])
+        self.assertEqual(second, first)
+        self.assertEqual(db.queries, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    async def test_returned_list_is_a_copy(self):
+        cache = ConversationHistoryCache(max_conversations=4, window=10)
+        conversation_id = uuid4()
+        cache.prime(conversation_id, [])
+
+        history = await cache.get(_DummyDB([]), conversation_id, uuid4())
+        history.append({"role": "user", "content": "not stored yet"})
+
+        self.assertEqual(await cache.get(_DummyDB([]), conversation_id, uuid4()), [])
+
+    async def test_write_through_append_respects_window(self):
+        cache = ConversationHistoryCache(max_conversations=4, window=3)
+        conversation_id = uuid4()
+        cache.prime(conversation_id, [])
+        for index in range(5):
+            cache.append(conversation_id, "user", f"m{index}")
+
+        history = await cache.get(_DummyDB([]), conversation_id, uuid4())
+        self.assertEqual([turn["content"] for turn in history], ["m2", "m3", "m4"])
+
+    async def test_lru_evicts_least_recent_conversation(self):
+        cache = ConversationHistoryCache(max_conversations=2, window=5)
+        first, second, third = uuid4(), uuid4(), uuid4()
+        cache.prime(first, [])
+        cache.prime(second, [])
+        await cache.get(_DummyDB([]), first, uuid4())
+        cache.prime(third, [])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        db = _DummyDB([])
+        await cache.get(db, first, uuid4())
+        await cache.get(db, second, uuid4())
+        self.assertEqual(db.queries, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Tests for the compiled multi-pattern keyword matcher."""
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.message_features import MARKER_MATCHER, MARKER_SETS
+
+
+def _loop_scan(categories, text):
+    lower = text.lower()
+    hits = {}
+    for category, markers in categories.items():
+        found = frozenset(marker.lower() for marker in markers if marker.lower() in lower)
+        if found:
+            hits[category] = found
+    return hits
+
+
+class KeywordMatcherTests(unittest.TestCase):
+    def test_overlapping_and_nested_markers_are_all_reported(self):
+        categories = {
+            "short": ["yeah", "sure", "fr"],
+            "long": ["yeah right", "not sure", "friend"],
+            "inner": ["ah r", "end"],
+        }
+        matcher = KeywordMatcher(categories)
+        text = "Yeah right, not sure my friend"
+
+        self.assertEqual(matcher.scan(text), _loop_scan(categories, text))
+        self.assertEqual(matcher.categories(text), {"short", "long", "inner"})
+        self.assertTrue(matcher.search(text))
+        self.assertFalse(matcher.search("nothing here"))
+        self.assertEqual(matcher.scan(""), {})
+
+    def test_matches_substring_loops_on_random_text(self):
+        rng = random.Random(7)
+        vocabulary = [marker for markers in MARKER_SETS.values() for marker in markers]
+        vocabulary += ["the", "a", "really", "friendly", "selfish", "?!", "...", "😂"]
+        for _ in range(300):
+            words = rng.choices(vocabulary, k=rng.randint(0, 12))
+            text = rng.choice([" ", "", "-"]).join(words)
+            self.assertEqual(MARKER_MATCHER.scan(text.lower()), _loop_scan(MARKER_SETS, text), text)
+
+    def test_special_characters_are_escaped(self):
+        matcher = KeywordMatcher({"odd": ["self-reliant", "a.b", "(x)", "💀"]})
+
+        self.assertEqual(matcher.scan("so SELF-RELIANT 💀"), {"odd": frozenset({"self-reliant", "💀"})})
+        self.assertEqual(matcher.scan("axb"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests for the shared async LLM gateway."""
+
+import asyncio
+import os
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import llm_gateway
+
+
+class _FakeChat:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    async def complete_async(self, **kwargs):
+        self.calls.append(kwargs)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        n = kwargs.get("n") or 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f" reply {i} ")) for i in range(n)]
+        )
+
+
+class _FakeEmbeddings:
+    async def create_async(self, **kwargs):
+        inputs = kwargs["inputs"]
+        # Provider may return items out of order; index is authoritative.
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(i)]) for i in reversed(range(len(inputs)))]
+        )
+
+
+class LLMGatewayTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.chat = _FakeChat()
+        self.client = SimpleNamespace(chat=self.chat, embeddings=_FakeEmbeddings())
+        self.env = patch.dict(os.environ, {"MISTRAL_API_KEY": "test-key"})
+        self.env.start()
+        self.build = patch.object(llm_gateway, "_build_client", return_value=self.client)
+        self.build.start()
+        llm_gateway._client = None
+        llm_gateway._client_loop = None
+
+    async def asyncTearDown(self):
+        self.build.stop()
+        self.env.stop()
+        llm_gateway._client = None
+        llm_gateway._http_client = None
+        llm_gateway._client_loop = None
+        llm_gateway._semaphore = None
+
+    async def test_concurrency_is_bounded(self):
+        with patch.object(llm_gateway, "LLM_MAX_CONCURRENCY", 2):
+            results = await asyncio.gather(*[
+                llm_gateway.chat_complete(
+                    [{"role": "user", "content": "hi"}],
+                    max_tokens=10,
+                    temperature=0.1,
+                )
+                for _ in range(6)
+            ])
+
+        self.assertEqual(results, ["reply 0"] * 6)
+        self.assertEqual(len(self.chat.calls), 6)
+        self.assertLessEqual(self.chat.peak, 2)
+        self.assertGreater(self.chat.calls[0]["timeout_ms"], 0)
+
+    async def test_multi_choice_returns_all_texts(self):
+        texts = await llm_gateway.chat_complete_many(
+            [{"role": "user", "content": "hi"}],
+            max_tokens=10,
+            temperature=0.5,
+            n=3,
+        )
+        self.assertEqual(texts, ["reply 0", "reply 1", "reply 2"])
+
+    async def test_embeddings_keep_input_order(self):
+        vectors = await llm_gateway.embed_texts(["a", "b", "c"])
+        self.assertEqual(vectors, [[0.0], [1.0], [2.0]])
+
+    async def test_client_of_a_previous_loop_is_closed(self):
+        old_loop = asyncio.new_event_loop()
+        old_loop.close()
+        stale = SimpleNamespace(aclose=AsyncMock())
+        llm_gateway._client = object()
+        llm_gateway._http_client = stale
+        llm_gateway._client_loop = old_loop
+
+        await llm_gateway.embed_texts(["a"])
+        await llm_gateway.close_gateway()
+
+        stale.aclose.assert_awaited_once()
+        self.assertIsNone(llm_gateway._http_client)
+
+    async def test_unavailable_without_api_key(self):
+        with patch.dict(os.environ, {"MISTRAL_API_KEY": ""}):
+            self.assertFalse(llm_gateway.is_available())
+            with self.assertRaises(llm_gateway.LLMUnavailableError):
+                await llm_gateway.chat_complete([], max_tokens=1, temperature=0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
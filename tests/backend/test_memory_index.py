@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Tests for the in-process per-user memory index."""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pgvector import HalfVector
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg
+
+from app.db.vector_type import BinaryHalfVec
+from app.services import memory_index as mi
+from app.services import memory_service
+
+
+def _vec(*values):
+    return list(values) + [0.0] * (4 - len(values))
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class _DummyDB:
+    def __init__(self, rows=(), error=None):
+        self.rows = list(rows)
+        self.error = error
+        self.executed = 0
+        self.rollbacks = 0
+        self.params = []
+
+    async def execute(self, _stmt, params=None, **_kwargs):
+        self.executed += 1
+        self.params.append(params)
+        if self.error:
+            raise self.error
+        return _Result(self.rows)
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class UserVectorIndexTests(unittest.TestCase):
+    def test_brute_force_ranks_by_cosine_and_applies_threshold(self):
+        index = mi.UserVectorIndex.build([
+            (1, "exam stress", _vec(1.0, 0.1)),
+            (2, "weekend plans", _vec(0.0, 1.0)),
+            (3, "exam prep", _vec(2.0, 0.0)),  # norm does not matter
+        ])
+
+        results = index.search(_vec(1.0), limit=3, min_similarity=0.75)
+
+        self.assertEqual([content for content, _ in results], ["exam prep", "exam stress"])
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+
+    def test_append_skips_known_ids(self):
+        index = mi.UserVectorIndex.build([(1, "a", _vec(1.0))])
+        self.assertEqual(index.add([(1, "a", _vec(1.0)), (2, "b", _vec(0.0, 1.0))]), 1)
+        self.assertEqual(index.search(_vec(0.0, 1.0), 1, 0.5), [("b", 1.0)])
+
+    @unittest.skipIf(mi.hnswlib is None, "hnswlib not installed")
+    def test_switches_to_hnsw_above_threshold(self):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(64, 4)).astype(np.float32)
+        with patch.object(mi, "MEMORY_INDEX_HNSW_THRESHOLD", 32):
+            index = mi.UserVectorIndex.build([(i, str(i), v) for i, v in enumerate(vectors)])
+        self.assertIsNotNone(index.hnsw)
+        self.assertEqual(index.search(vectors[5], 1, 0.0)[0][0], "5")
+
+
+class MemoryIndexTests(unittest.IsolatedAsyncioTestCase):
+    async def test_loads_lazily_once_and_appends_new_embeddings(self):
+        registry = mi.MemoryIndex(enabled=True)
+        user_id = uuid4()
+        db = _DummyDB([(1, "old note", _vec(1.0))])
+
+        self.assertEqual(await registry.search(db, user_id, _vec(1.0), 5, 0.5), [("old note", 1.0)])
+        registry.add(user_id, [(2, "new note", _vec(0.0, 1.0))])
+        results = await registry.search(db, user_id, _vec(0.0, 1.0), 5, 0.5)
+
+        self.assertEqual(results, [("new note", 1.0)])
+        self.assertEqual(db.executed, 1)
+        self.assertEqual(registry.stats()["appended"], 1)
+
+    async def test_add_ignores_users_without_a_loaded_index(self):
+        registry = mi.MemoryIndex(enabled=True)
+        registry.add(uuid4(), [(1, "x", _vec(1.0))])
+        self.assertEqual(registry.stats()["users"], 0)
+
+    async def test_oversized_and_failed_loads_fall_back(self):
+        registry = mi.MemoryIndex(enabled=True, max_user_vectors=1)
+        too_many = _DummyDB([(1, "a", _vec(1.0)), (2, "b", _vec(1.0))])
+        self.assertIsNone(await registry.search(too_many, uuid4(), _vec(1.0), 5, 0.5))
+
+        broken = _DummyDB(error=RuntimeError("connection reset"))
+        self.assertIsNone(await registry.search(broken, uuid4(), _vec(1.0), 5, 0.5))
+        self.assertEqual(broken.rollbacks, 1)
+        self.assertEqual(registry.stats()["fallbacks"], 2)
+
+    async def test_evicts_least_recently_used_users(self):
+        registry = mi.MemoryIndex(enabled=True, max_vectors=2)
+        first, second = uuid4(), uuid4()
+        await registry.search(_DummyDB([(1, "a", _vec(1.0)), (2, "b", _vec(1.0))]), first, _vec(1.0), 1, 0.0)
+        await registry.search(_DummyDB([(3, "c", _vec(1.0))]), second, _vec(1.0), 1, 0.0)
+
+        self.assertEqual(registry.stats()["users"], 1)
+        self.assertEqual(registry.stats()["evictions"], 1)
+
+
+class BinaryHalfVecTests(unittest.TestCase):
+    def test_asyncpg_binds_halfvec_objects_from_lists_and_arrays(self):
+        bind = BinaryHalfVec(3).bind_processor(asyncpg.dialect())
+
+        self.assertEqual(bind([0.5, -1.0, 2.0]), HalfVector([0.5, -1.0, 2.0]))
+        self.assertEqual(bind(np.array([0.5, -1.0, 2.0], dtype=np.float32)), HalfVector([0.5, -1.0, 2.0]))
+        self.assertIsNone(bind(None))
+        self.assertEqual(len(bind([0.0] * 1024).to_binary()), 4 + 2 * 1024)
+
+    def test_asyncpg_results_decode_to_lists(self):
+        result = BinaryHalfVec(2).result_processor(asyncpg.dialect(), None)
+        self.assertEqual(result(HalfVector([1.0, 0.25])), [1.0, 0.25])
+
+    def test_other_drivers_keep_text_binding(self):
+        self.assertEqual(BinaryHalfVec(2).bind_processor(psycopg.dialect())([1.0, 2.0]), "[1.0,2.0]")
+
+
+class RetrieveMemoriesTests(unittest.IsolatedAsyncioTestCase):
+    async def test_uses_local_index_before_sql(self):
+        local = AsyncMock(return_value=[("same", 0.9), ("same", 0.8), ("other", 0.77)])
+        db = _DummyDB()
+        with patch.object(memory_service.memory_index, "search", new=local):
+            memories = await memory_service.retrieve_memories(db, uuid4(), _vec(1.0))
+
+        self.assertEqual(memories, ["same", "other"])
+        self.assertEqual(db.executed, 0)
+
+    async def test_falls_back_to_sql(self):
+        db = _DummyDB([("from sql", 0.8)])
+        query = np.asarray(_vec(1.0), dtype=np.float32)
+        with patch.object(memory_service.memory_index, "search", new=AsyncMock(return_value=None)):
+            memories = await memory_service.retrieve_memories(db, uuid4(), query)
+
+        self.assertEqual(memories, ["from sql"])
+        self.assertEqual(db.executed, 2)  # search settings, then match_messages
+        self.assertIs(db.params[-1]["query_embedding"], query)  # bound by the column type, not a string
+
+    def test_search_settings_are_transaction_local_and_cover_the_limit(self):
+        stmt, params = memory_service.vector_search_settings(limit=200, probes=4)
+
+        self.assertEqual(str(stmt).count("set_config("), len(params) // 2)
+        self.assertIn(", true)", str(stmt))
+        settings = {params[f"name_{i}"]: params[f"value_{i}"] for i in range(len(params) // 2)}
+        self.assertEqual(settings["hnsw.ef_search"], "200")
+        self.assertEqual(settings["ivfflat.probes"], "4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Tests for hybrid lexical + vector memory retrieval in reflection turns."""
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.api import chat as chat_api
+from app.services import memory_retrieval_service as mrs
+
+
+def _returns(value, delay=0.0):
+    async def _branch(*_args, **_kwargs):
+        if delay:
+            await asyncio.sleep(delay)
+        return value
+
+    return _branch
+
+
+def _fails(error):
+    async def _branch(*_args, **_kwargs):
+        raise error
+
+    return _branch
+
+
+class FusionTests(unittest.TestCase):
+    def test_rrf_rewards_agreement_between_rankings(self):
+        fused = mrs.reciprocal_rank_fusion(
+            [["exam panic", "gym streak", "Deadline dread"], ["deadline dread", "exam panic", "new job"]],
+            limit=3,
+        )
+        self.assertEqual(fused, ["exam panic", "Deadline dread", "gym streak"])
+
+    def test_query_terms_are_safe_for_to_tsquery(self):
+        self.assertEqual(mrs.lexical_query_terms("I can't sleep!! exams & deadlines"), "can | sleep | exams | deadlines")
+        self.assertIsNone(mrs.lexical_query_terms("ok :)"))
+
+    def test_lexical_query_uses_the_indexed_expression(self):
+        sql = str(mrs.build_lexical_query(uuid4(), "exam", 5).compile(dialect=postgresql.dialect()))
+        self.assertIn("to_tsvector('english'::regconfig, messages.content) @@ to_tsquery('english'::regconfig, ", sql)
+        self.assertIn("ts_rank_cd(", sql)
+        self.assertIn("messages.role = ", sql)
+
+
+class RetrieveTurnMemoriesTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        mrs.turn_memory_cache.clear()
+
+    async def test_fuses_both_branches_and_caches_the_turn(self):
+        conversation_id = uuid4()
+        with patch.object(mrs, "lexical_candidates", _returns(["exam stress again", "in history"])), patch.object(
+            mrs, "vector_candidates", _returns(["I am stressed about exams", "exam stress again"])
+        ):
+            first = await mrs.retrieve_turn_memories(uuid4(), conversation_id, "exams", exclude=["In history"])
+
+        with patch.object(mrs, "lexical_candidates", _fails(AssertionError("cached"))):
+            again = await mrs.retrieve_turn_memories(uuid4(), conversation_id, "  Exams ")
+
+        self.assertEqual(first.memories, ("exam stress again", "I am stressed about exams"))
+        self.assertEqual(first.sources, ("lexical", "vector"))
+        self.assertIn("emotional_state → stress", first.patterns)
+        self.assertIs(again, first)
+        self.assertIn("- exam stress again", first.prompt_block())
+
+    async def test_slow_branch_is_dropped_at_the_budget(self):
+        with patch.object(mrs, "lexical_candidates", _returns(["deadline talk"])), patch.object(
+            mrs, "vector_candidates", _returns(["too late"], delay=5)
+        ):
+            result = await mrs.retrieve_turn_memories(uuid4(), uuid4(), "deadline", budget_ms=50)
+
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.memories, ("deadline talk",))
+        self.assertLess(result.elapsed_ms, 1000)
+
+    async def test_timed_out_results_are_not_cached(self):
+        conversation_id = uuid4()
+        with patch.object(mrs, "lexical_candidates", _returns([])), patch.object(
+            mrs, "vector_candidates", _returns(["too late"], delay=5)
+        ):
+            await mrs.retrieve_turn_memories(uuid4(), conversation_id, "deadline", budget_ms=20)
+        with patch.object(mrs, "lexical_candidates", _returns([])), patch.object(
+            mrs, "vector_candidates", _returns(["in time"])
+        ):
+            retried = await mrs.retrieve_turn_memories(uuid4(), conversation_id, "deadline")
+
+        self.assertEqual(retried.memories, ("in time",))
+        self.assertEqual(mrs.turn_memory_cache.stats()["entries"], 1)
+
+    async def test_late_embedding_still_completes_after_the_budget(self):
+        finished = []
+
+        async def slow_embed(texts):
+            await asyncio.sleep(0.1)
+            finished.extend(texts)
+            return [[0.1, 0.2]]
+
+        with patch("app.services.embedding_service.embed_texts_cached", slow_embed), patch.object(
+            mrs, "lexical_candidates", _returns([])
+        ):
+            result = await mrs.retrieve_turn_memories(uuid4(), uuid4(), "deadline dread", budget_ms=20)
+            self.assertTrue(result.timed_out)
+            await asyncio.sleep(0.2)
+
+        self.assertEqual(finished, ["deadline dread"])
+        self.assertNotIn("deadline dread", mrs._query_embeddings)
+
+    async def test_cleared_conversations_are_forgotten(self):
+        kept, cleared = uuid4(), uuid4()
+        for conversation_id in (kept, cleared):
+            with patch.object(mrs, "lexical_candidates", _returns(["exam stress again"])), patch.object(
+                mrs, "vector_candidates", _returns([])
+            ):
+                await mrs.retrieve_turn_memories(uuid4(), conversation_id, "exams")
+
+        mrs.turn_memory_cache.forget_conversations([cleared])
+
+        self.assertIsNotNone(mrs.turn_memory_cache.get(mrs.turn_memory_cache.key(kept, "exams")))
+        self.assertIsNone(mrs.turn_memory_cache.get(mrs.turn_memory_cache.key(cleared, "exams")))
+
+    async def test_failures_mean_no_memories(self):
+        with patch.object(mrs, "lexical_candidates", _fails(RuntimeError("db down"))), patch.object(
+            mrs, "vector_candidates", _fails(RuntimeError("rate limited"))
+        ):
+            result = await mrs.retrieve_turn_memories(uuid4(), uuid4(), "hello there")
+
+        self.assertEqual(result.memories, ())
+        self.assertEqual(result.prompt_block(), "")
+
+
+class ReflectionPromptTests(unittest.TestCase):
+    def test_memory_block_is_appended_after_profile(self):
+        profile = chat_api.get_personality_profile("memory-retrieval-test")
+        block = mrs.RetrievedMemories(memories=("exam stress again",)).prompt_block()
+
+        prompt = chat_api.build_reflection_system_prompt(profile, None, block)
+
+        self.assertTrue(prompt.startswith(chat_api.REFLECTION_SYSTEM_PROMPT_BASE))
+        self.assertTrue(prompt.endswith(block))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tests for the shared single-pass MessageFeatures extractor."""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.api import chat as chat_api
+from app.services import message_features as mf
+from app.services.context_policy_service import classify_response_context
+from app.services.message_features import ensure_features, extract_message_features
+from app.services.mirror_engine import analyze_message_style
+from app.services.style_enforcement_service import detect_stimulus_tag
+
+
+class MessageFeaturesTests(unittest.TestCase):
+    def test_counts_and_tokens(self):
+        features = extract_message_features("Yeah tbh this is WILD... what should i do?? Really!")
+
+        self.assertEqual(features.words[:3], ("yeah", "tbh", "this"))
+        self.assertEqual(features.sentence_count, 3)
+        self.assertEqual(features.question_count, 2)
+        self.assertEqual(features.exclamation_count, 1)
+        self.assertEqual(features.ellipsis_count, 1)
+        self.assertTrue(features.has_caps_run)
+        self.assertTrue(features.has_multi_punct)
+        self.assertEqual(features.count_words({"really", "very"}), 1)
+        self.assertIn("tbh", features.hits("context.casual"))
+
+    def test_consumers_agree_on_shared_features(self):
+        text = "idk, not sure. maybe I'm wrong? lol"
+        features = extract_message_features(text)
+
+        self.assertEqual(detect_stimulus_tag(text, features), detect_stimulus_tag(text))
+        self.assertEqual(detect_stimulus_tag(text), "doubt")
+        self.assertEqual(classify_response_context(text, features=features), classify_response_context(text))
+        self.assertEqual(analyze_message_style(text, features), analyze_message_style(text))
+        self.assertEqual(
+            chat_api.detect_emotional_tone(text, {}, features),
+            chat_api.detect_emotional_tone(text, {}),
+        )
+        self.assertEqual(
+            chat_api.derive_fallback_traits(text, features),
+            chat_api.derive_fallback_traits(text),
+        )
+
+    def test_precomputed_features_are_reused_once_per_turn(self):
+        text = "help me write this in my tone"
+        features = extract_message_features(text)
+
+        with patch.object(mf, "extract_message_features", wraps=mf.extract_message_features) as extractor:
+            self.assertIs(ensure_features(text, features), features)
+            self.assertEqual(chat_api.resolve_mirror_task_type(text, [], features), "rewrite")
+            self.assertEqual(extractor.call_count, 0)
+
+            # A stale object for a different message is ignored.
+            self.assertEqual(ensure_features("other text", features).text, "other text")
+            self.assertEqual(extractor.call_count, 1)
+
+    def test_marker_hits_are_memoized(self):
+        features = extract_message_features("so stressed about this deadline")
+
+        first = features.hits("stimulus.pressure")
+        self.assertIs(features.hits("stimulus.pressure"), first)
+        self.assertEqual(first, frozenset({"stressed", "deadline"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Tests for parallel and sequential mirror candidate search."""
+
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.mirror_engine import search_mirror_candidates
+
+
+def _fake_generator(delays, texts, started):
+    async def generate(attempt):
+        started.append(attempt)
+        await asyncio.sleep(delays[attempt])
+        return texts[attempt]
+
+    return generate
+
+
+def _fake_evaluator(scores):
+    async def evaluate(candidate):
+        return scores.get(candidate)
+
+    return evaluate
+
+
+class MirrorCandidateSearchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_parallel_overlaps_requests_and_keeps_best(self):
+        started = []
+        generate = _fake_generator([0.05, 0.05, 0.05], ["a", "b", "c"], started)
+        evaluate = _fake_evaluator({"a": 0.5, "b": 0.7, "c": None})
+
+        t0 = time.perf_counter()
+        result = await search_mirror_candidates(3, generate, evaluate, mode="parallel", budget_s=1.0)
+        elapsed = time.perf_counter() - t0
+
+        self.assertLess(elapsed, 0.12)
+        self.assertEqual(sorted(started), [0, 1, 2])
+        self.assertEqual(result.candidate, "b")
+        self.assertEqual(result.requested, 3)
+        self.assertEqual(result.received, 3)
+        self.assertEqual(result.wasted(used=True), 2)
+        self.assertEqual(result.wasted(used=False), 3)
+
+    async def test_parallel_stops_early_and_cancels_slow_candidates(self):
+        started = []
+        generate = _fake_generator([0.01, 1.0, 1.0], ["good", "slow1", "slow2"], started)
+        evaluate = _fake_evaluator({"good": 0.9})
+
+        t0 = time.perf_counter()
+        result = await search_mirror_candidates(3, generate, evaluate, mode="parallel", budget_s=5.0)
+
+        self.assertLess(time.perf_counter() - t0, 0.5)
+        self.assertEqual(result.candidate, "good")
+        self.assertEqual(result.received, 1)
+        self.assertEqual(result.wasted(used=True), 2)
+
+    async def test_parallel_returns_usable_candidate_once_budget_is_spent(self):
+        generate = _fake_generator([0.01, 1.0], ["ok", "late"], [])
+        evaluate = _fake_evaluator({"ok": 0.6, "late": 0.95})
+
+        t0 = time.perf_counter()
+        result = await search_mirror_candidates(2, generate, evaluate, mode="parallel", budget_s=0.05)
+
+        self.assertLess(time.perf_counter() - t0, 0.5)
+        self.assertEqual(result.candidate, "ok")
+
+    async def test_parallel_tolerates_failed_requests(self):
+        async def generate(attempt):
+            if attempt == 0:
+                raise RuntimeError("upstream 503")
+            return "fine"
+
+        result = await search_mirror_candidates(2, generate, _fake_evaluator({"fine": 0.5}), mode="parallel")
+
+        self.assertEqual(result.candidate, "fine")
+        self.assertEqual(result.received, 1)
+
+    async def test_sequential_mode_requests_one_at_a_time(self):
+        started = []
+        generate = _fake_generator([0.0, 0.0, 0.0], ["a", "b", "c"], started)
+        evaluate = _fake_evaluator({"a": 0.5, "b": 0.85, "c": 0.99})
+
+        result = await search_mirror_candidates(3, generate, evaluate, mode="sequential")
+
+        self.assertEqual(started, [0, 1])
+        self.assertEqual(result.candidate, "b")
+        self.assertEqual(result.requested, 2)
+        self.assertEqual(result.retries_used, 1)
+
+    async def test_choices_mode_scores_every_choice_from_one_request(self):
+        calls = []
+
+        async def generate_many(count):
+            calls.append(count)
+            return ["x", "y", "z"][:count]
+
+        async def generate(_attempt):
+            raise AssertionError("single-candidate path should not be used")
+
+        result = await search_mirror_candidates(
+            3,
+            generate,
+            _fake_evaluator({"x": 0.4, "y": 0.6, "z": 0.5}),
+            mode="choices",
+            generate_many=generate_many,
+        )
+
+        self.assertEqual(calls, [3])
+        self.assertEqual(result.candidate, "y")
+        self.assertEqual(result.wasted(used=True), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -43,7 +43,7 @@ class MirrorConfidenceUpdateTests(unittest.IsolatedAsyncioTestCase):
              patch("app.api.mirror.extract_traits", new=AsyncMock(return_value=[{"name": "communication_style", "signal": 0.7, "strength": 0.1}])), \
              patch("app.api.mirror.update_traits", new=AsyncMock()) as update_traits_mock, \
              patch("app.api.mirror.generate_persona_snapshot", new=AsyncMock()) as snapshot_mock, \
-             patch("app.api.mirror.invalidate_snapshot_cache", new=MagicMock()) as invalidate_mock, \
+             patch("app.services.snapshot_cache.snapshot_cache.bump", new=MagicMock()) as bump_mock, \
              patch("app.repository.persona_repository.PersonaRepository.get_latest_snapshot", new=AsyncMock(return_value=object())):
             response = await mirror_chat(request, db)
 
@@ -51,7 +51,8 @@ class MirrorConfidenceUpdateTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(response.response, "reply")
         update_traits_mock.assert_awaited_once()
         snapshot_mock.assert_awaited_once()
-        invalidate_mock.assert_called_once()
+        # The snapshot version only moves when generate_persona_snapshot writes a new snapshot.
+        bump_mock.assert_not_called()
         self.assertEqual(db.commits, 1)
         self.assertEqual(db.rollbacks, 0)
 
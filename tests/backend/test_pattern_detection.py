@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests for batch pattern detection over memories."""
+
+import asyncio
+import random
+import sys
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import pattern_detection_service as pds
+
+
+def _loop_patterns(memories):
+    """The original per-memory, per-keyword-list implementation."""
+    emotions, triggers = Counter(), Counter()
+    for memory in memories:
+        text = memory.lower()
+        for emotion, keywords in pds.EMOTION_KEYWORDS.items():
+            if any(keyword in text for keyword in keywords):
+                emotions[emotion] += 1
+        for trigger, keywords in pds.TRIGGER_KEYWORDS.items():
+            if any(keyword in text for keyword in keywords):
+                triggers[trigger] += 1
+    patterns = [f"emotional_state → {e}" for e, count in emotions.items() if count >= 2]
+    patterns += [f"stress_trigger → {t}" for t, count in triggers.items() if count >= 2]
+    if emotions and sum(emotions.values()) >= 3:
+        patterns.append("behavior_loop → repeated emotional stress")
+    return patterns
+
+
+def _random_memories(rng, count):
+    vocabulary = [k for keywords in (*pds.EMOTION_KEYWORDS.values(), *pds.TRIGGER_KEYWORDS.values()) for k in keywords]
+    vocabulary += ["today", "I", "feel", "fine", "the", "Office", "PANIC"]
+    return [" ".join(rng.choices(vocabulary, k=rng.randint(0, 6))) for _ in range(count)]
+
+
+class PatternDetectionTests(unittest.TestCase):
+    def test_batch_matches_the_loop_for_many_users(self):
+        rng = random.Random(11)
+        memories = {f"user-{i}": _random_memories(rng, rng.randint(0, 12)) for i in range(40)}
+
+        batch = pds.detect_patterns_batch(memories)
+
+        for owner, texts in memories.items():
+            self.assertEqual(sorted(batch[owner]), sorted(_loop_patterns(texts)), owner)
+
+    def test_single_turn_wrapper_keeps_its_contract(self):
+        memories = ["So stressed about the exam", "exam pressure again", "worried and stressed"]
+
+        patterns = asyncio.run(pds.detect_patterns(memories))
+
+        self.assertEqual(
+            patterns,
+            ["emotional_state → stress", "stress_trigger → exams", "behavior_loop → repeated emotional stress"],
+        )
+        self.assertEqual(asyncio.run(pds.detect_patterns([])), [])
+
+    def test_old_memories_decay_below_the_threshold(self):
+        now = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        memories = {"u": ["stressed", "stressed", "stressed"]}
+        recent = {"u": [now - timedelta(days=1)] * 3}
+        stale = {"u": [now - timedelta(days=60), now - timedelta(days=60), None]}
+
+        counts = pds.pattern_counts(memories, stale, half_life_days=14, now=now)
+
+        self.assertIn("emotional_state → stress", pds.detect_patterns_batch(memories, recent, 14, now)["u"])
+        self.assertAlmostEqual(counts.for_owner("u")["emotion.stress"], 1 + 2 * 0.5 ** (60 / 14))
+        self.assertEqual(counts.patterns()["u"], [])
+
+    def test_hit_matrix_marks_each_category_once(self):
+        matrix = pds.keyword_hit_matrix(["panic and nervous at work", "", "panic and nervous at work"])
+
+        self.assertEqual(matrix.shape, (3, len(pds.PATTERN_CATEGORIES)))
+        hit = {pds.PATTERN_CATEGORIES[c] for c in matrix[0].nonzero()[0]}
+        self.assertEqual(hit, {"emotion.anxiety", "trigger.work"})
+        self.assertEqual(matrix[1].sum(), 0)
+        self.assertEqual(matrix[0].tolist(), matrix[2].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Tests for set-based persona trait updates."""
+
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.constants import TRAIT_LIST
+from app.repository.persona_repository import PersonaRepository
+from app.services import persona_update_service as pus
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+
+
+def _row(trait_name, score=0.5, confidence=0.1, evidence_count=0):
+    return SimpleNamespace(trait_name=trait_name, score=score, confidence=confidence, evidence_count=evidence_count)
+
+
+def _echo_upsert(db, user_id, values, increment_evidence=False):
+    return [_row(v["trait_name"], v["score"], v["confidence"], v["evidence_count"]) for v in values]
+
+
+class PersonaUpdateTests(unittest.IsolatedAsyncioTestCase):
+    def _patches(self, rows):
+        db = SimpleNamespace(commit=AsyncMock(), execute=AsyncMock())
+        load = patch.object(PersonaRepository, "get_metric_values", new=AsyncMock(return_value=rows))
+        upsert = patch.object(PersonaRepository, "upsert_metrics", new=AsyncMock(side_effect=_echo_upsert))
+        aggregates = patch.object(pus, "refresh_trait_aggregates", new=AsyncMock())
+        return db, load, upsert, aggregates
+
+    async def test_one_read_and_one_upsert_per_update(self):
+        rows = [_row(name, 0.5, 0.3, 2) for name in TRAIT_LIST]
+        db, load, upsert, aggregates = self._patches(rows)
+        nudges = [
+            {"name": TRAIT_LIST[0], "signal": 0.9, "strength": 0.5},
+            {"name": TRAIT_LIST[0], "signal": 0.9, "strength": 0.5},
+            {"name": TRAIT_LIST[1], "signal": 0.1, "strength": 0.2},
+        ]
+
+        with load as load_mock, upsert as upsert_mock, aggregates:
+            result = await pus.update_traits(db, USER, nudges)
+
+        load_mock.assert_awaited_once_with(db, USER, lock=True)
+        upsert_mock.assert_awaited_once()
+        written = {v["trait_name"]: v for v in upsert_mock.await_args.args[2]}
+        self.assertEqual(set(written), {TRAIT_LIST[0], TRAIT_LIST[1]})
+        self.assertEqual(written[TRAIT_LIST[0]]["evidence_count"], 4)
+        self.assertEqual(result["traits_updated"], 3)
+        db.commit.assert_awaited_once()
+
+        # Repeated traits compound exactly like the old sequential per-row updates.
+        score, confidence = pus.nudge_trait(0.5, 0.3, 0.9, 0.5)
+        score, confidence = pus.nudge_trait(score, confidence, 0.9, 0.5)
+        self.assertAlmostEqual(written[TRAIT_LIST[0]]["score"], score)
+        self.assertAlmostEqual(written[TRAIT_LIST[0]]["confidence"], confidence)
+
+    async def test_missing_traits_are_initialized_in_the_same_write(self):
+        db, load, upsert, aggregates = self._patches([_row(TRAIT_LIST[0], 0.7, 0.6, 5)])
+
+        with load, upsert as upsert_mock, aggregates:
+            result = await pus.update_traits(db, USER, [{"name": "novel_trait", "signal": 0.8, "strength": 0.4}])
+
+        written = {v["trait_name"]: v for v in upsert_mock.await_args.args[2]}
+        self.assertEqual(set(written), set(TRAIT_LIST[1:]) | {"novel_trait"})
+        self.assertEqual(written[TRAIT_LIST[1]]["evidence_count"], 0)
+        states = [0.6] + [0.1] * (len(TRAIT_LIST) - 1) + [written["novel_trait"]["confidence"]]
+        self.assertAlmostEqual(result["stability_index"], sum(states) / len(states))
+
+    async def test_upsert_is_one_statement_with_returning(self):
+        captured = []
+
+        async def _execute(stmt):
+            captured.append(stmt)
+            return SimpleNamespace(all=lambda: [])
+
+        db = SimpleNamespace(execute=_execute)
+        values = [{"trait_name": name, "score": 0.5, "confidence": 0.45, "evidence_count": 1, "last_signal": 0.5}
+                  for name in TRAIT_LIST]
+
+        await PersonaRepository.upsert_metrics(db, USER, values, increment_evidence=True)
+
+        sql = str(captured[0].compile(dialect=postgresql.dialect()))
+        self.assertEqual(len(captured), 1)
+        self.assertIn("ON CONFLICT ON CONSTRAINT uq_user_trait DO UPDATE", sql)
+        self.assertIn("evidence_count = (user_persona_metrics.evidence_count + ", sql)
+        self.assertIn("RETURNING user_persona_metrics.trait_name, user_persona_metrics.confidence", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests for memoized system-prompt compilation."""
+
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.api import chat as chat_api
+from app.services.mirror_engine import MIRROR_PROMPT_PREFIX, compile_mirror_system_prompt
+from app.services.prompt_compiler import PromptCompiler, prompt_compiler
+
+
+MESSAGE_STYLE = {
+    "avg_sentence_length": 11.0,
+    "punctuation_intensity": 1,
+    "has_slang": False,
+    "emotional_markers": 1,
+    "caps_intensity": 0.0,
+    "has_questions": False,
+}
+
+
+def _mirror_prompt(traits, **kwargs):
+    return compile_mirror_system_prompt(
+        sampled_profile=traits,
+        stability_index=0.66,
+        message_style=MESSAGE_STYLE,
+        task_type="generic",
+        confidence_tier="moderate",
+        detected_emotion="neutral",
+        active_mirror_style="calm",
+        **kwargs,
+    )
+
+
+class PromptCompilerTests(unittest.TestCase):
+    def test_memoized_blocks_build_once_per_key(self):
+        compiler = PromptCompiler(max_fragments=2)
+        builds = []
+
+        def block(name):
+            return (name, lambda: builds.append(name) or f"[{name}]")
+
+        first = compiler.compile("p", "PREFIX", [block("a"), "dynamic one"])
+        second = compiler.compile("p", "PREFIX", [block("a"), "dynamic two"])
+
+        self.assertEqual(builds, ["a"])
+        self.assertEqual(first.text, "PREFIX\n\n[a]\n\ndynamic one")
+        self.assertEqual(first.memoized_bytes, 0)
+        self.assertEqual(second.memoized_bytes, len("[a]"))
+        self.assertEqual(second.prefix_bytes, len("PREFIX"))
+
+        compiler.compile("p", "PREFIX", [block("b"), block("c")])
+        compiler.compile("p", "PREFIX", [block("a")])
+        self.assertEqual(builds, ["a", "b", "c", "a"])  # "a" was evicted by the LRU bound
+
+        stats = compiler.stats()
+        self.assertEqual(stats["prompts"]["p"]["turns"], 4)
+        self.assertEqual(stats["fragments"], 2)
+
+    def test_mirror_prompt_starts_with_constant_prefix(self):
+        calm = _mirror_prompt({"communication_style": 0.2, "decision_framing": 0.9})
+        drafting = _mirror_prompt(
+            {"communication_style": 0.8, "reflection_depth": 0.1},
+            task_execution_mode=True,
+            twin_policy={"twin_autonomy_mode": "suggest", "twin_mirror_intensity": 0.3},
+        )
+
+        for compiled in (calm, drafting):
+            self.assertTrue(compiled.text.startswith(MIRROR_PROMPT_PREFIX))
+            self.assertEqual(compiled.prefix_bytes, len(MIRROR_PROMPT_PREFIX.encode("utf-8")))
+        self.assertIn("Keep response compact and direct", calm.text)
+        self.assertIn("TASK EXECUTION MODE ACTIVE", drafting.text)
+        self.assertIn("Prefer recommendation language", drafting.text)
+
+    def test_repeat_turn_reuses_runtime_block(self):
+        prompt_compiler.clear()
+        first = _mirror_prompt({"communication_style": 0.4})
+        second = _mirror_prompt({"communication_style": 0.9})
+
+        self.assertEqual(first.memoized_bytes, 0)
+        self.assertGreater(second.memoized_bytes, 0)
+        self.assertIn("Communication Style (Concise ↔ Verbose): Very High (0.90)", second.text)
+        self.assertEqual(
+            set(second.telemetry()),
+            {"prompt_bytes", "prompt_prefix_bytes", "prompt_memoized_bytes", "prompt_prefix_tokens_est"},
+        )
+
+    def test_reflection_prompt_text_is_unchanged(self):
+        profile = chat_api.get_personality_profile("prompt-compiler-test")
+        schedule = SimpleNamespace(workload_level="high", stress_level=0.2, is_exam_period=True, has_deadlines=False)
+
+        prompt = chat_api.build_reflection_system_prompt(profile, schedule)
+
+        summary = chat_api.summarize_personality_profile(profile)
+        self.assertTrue(prompt.startswith(
+            f"{chat_api.REFLECTION_SYSTEM_PROMPT_BASE}\n\n"
+            f"Personality profile (use as context, do not label sections):\n{summary}\n\n"
+            "User's Current Life Context (Soft Factors):\n- Subtly acknowledge their exam period"
+        ))
+        self.assertTrue(prompt.endswith("- Just blend this context naturally into the conversation."))
+        self.assertEqual(
+            chat_api.build_reflection_system_prompt(profile),
+            f"{chat_api.REFLECTION_SYSTEM_PROMPT_BASE}\n\n"
+            f"Personality profile (use as context, do not label sections):\n{summary}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
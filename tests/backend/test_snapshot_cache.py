@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Tests for the versioned persona snapshot cache."""
+
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.snapshot_cache import SnapshotCache
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+OTHER = UUID("00000000-0000-0000-0000-000000000002")
+
+
+def _row(stability=0.6):
+    return SimpleNamespace(
+        id=UUID("00000000-0000-0000-0000-0000000000ff"),
+        user_id=USER,
+        persona_vector={"communication": {"directness": {"score": 0.7, "confidence": 0.8}}},
+        stability_index=stability,
+        summary_text="summary",
+        behavioral_traits={"directness": 0.7},
+        is_historical_anchor=False,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+class SnapshotCacheTests(unittest.IsolatedAsyncioTestCase):
+    def _patch_repo(self, *rows):
+        return patch(
+            "app.repository.persona_repository.PersonaRepository.get_latest_snapshot",
+            new=AsyncMock(side_effect=list(rows)),
+        )
+
+    async def test_unchanged_snapshot_is_served_without_a_query(self):
+        cache = SnapshotCache()
+        with self._patch_repo(_row()) as repo:
+            first = await cache.get(None, USER)
+            second = await cache.get(None, USER)
+
+        self.assertIs(first, second)
+        self.assertEqual(repo.await_count, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    async def test_version_bump_forces_reload(self):
+        cache = SnapshotCache()
+        with self._patch_repo(_row(0.6), _row(0.9)) as repo:
+            first = await cache.get(None, USER)
+            cache.bump(USER)
+            second = await cache.get(None, USER)
+
+        self.assertEqual(repo.await_count, 2)
+        self.assertEqual((first.stability_index, first.version), (0.6, 0))
+        self.assertEqual((second.stability_index, second.version), (0.9, 1))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    async def test_missing_snapshot_is_cached_until_one_is_written(self):
+        cache = SnapshotCache()
+        with self._patch_repo(None, _row()) as repo:
+            self.assertIsNone(await cache.get(None, USER))
+            self.assertIsNone(await cache.get(None, USER))
+            cache.bump(USER)
+            self.assertIsNotNone(await cache.get(None, USER))
+
+        self.assertEqual(repo.await_count, 2)
+
+    async def test_ttl_and_lru_bound_the_cache(self):
+        expired = SnapshotCache(ttl_seconds=0.0)
+        with self._patch_repo(_row(), _row()) as repo:
+            await expired.get(None, USER)
+            with patch("app.services.snapshot_cache.time.monotonic", return_value=1e12):
+                await expired.get(None, USER)
+        self.assertEqual(repo.await_count, 2)
+
+        small = SnapshotCache(max_users=1)
+        with self._patch_repo(_row(), _row()):
+            await small.get(None, USER)
+            await small.get(None, OTHER)
+        self.assertEqual(small.stats()["size"], 1)
+        self.assertEqual(small.stats()["evictions"], 1)
+
+    async def test_versions_are_bounded_with_the_cache(self):
+        cache = SnapshotCache(max_users=2)
+        users = [UUID(int=n) for n in range(1, 11)]
+        with self._patch_repo(*[_row() for _ in users]):
+            for user in users:
+                cache.bump(user)
+                await cache.get(None, user)
+
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertLessEqual(cache.stats()["versions"], 4)
+        # A forgotten user falls back to the floor, which is past every version it had.
+        self.assertGreaterEqual(cache.version(users[0]), 1)
+        self.assertGreater(cache.bump(users[0]), max(cache.version(user) for user in users[1:]))
+
+    async def test_read_racing_a_bump_is_not_cached(self):
+        cache = SnapshotCache()
+        version = cache.version(USER)
+        cache.bump(USER)
+
+        cache.store(USER, _row(0.6), version)
+
+        self.assertEqual(cache.peek(USER), (False, None))
+
+    async def test_cached_snapshot_is_immutable(self):
+        cache = SnapshotCache()
+        with self._patch_repo(_row()):
+            snapshot = await cache.get(None, USER)
+
+        self.assertIsInstance(snapshot.persona_vector, dict)
+        with self.assertRaises(TypeError):
+            snapshot.persona_vector["communication"]["directness"] = {}
+        with self.assertRaises(TypeError):
+            snapshot.behavioral_traits.update({"directness": 0.1})
+        with self.assertRaises(AttributeError):
+            snapshot.stability_index = 0.1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Tests for change-threshold snapshot writes and snapshot downsampling."""
+
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.repository.persona_repository import PersonaRepository
+from app.services import snapshot_service
+from app.services.snapshot_cache import CachedSnapshot, snapshot_cache
+
+USER = UUID("00000000-0000-0000-0000-000000000001")
+NOW = datetime(2026, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def _vector(score=0.6, confidence=0.4):
+    return {"behavioral_profile": {"directness": {"score": score, "confidence": confidence}}}
+
+
+def _latest(vector=None, stability=0.4, age=timedelta(minutes=5), anchor=False):
+    return CachedSnapshot(
+        id=UUID(int=9),
+        user_id=USER,
+        persona_vector=vector or _vector(),
+        stability_index=stability,
+        summary_text="",
+        behavioral_traits={},
+        is_historical_anchor=anchor,
+        created_at=NOW - age,
+        version=0,
+    )
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class SnapshotWriteGateTests(unittest.TestCase):
+    def test_small_moves_reuse_the_latest_snapshot(self):
+        latest = _latest()
+
+        self.assertFalse(snapshot_service.should_write_snapshot(latest, _vector(0.61, 0.405), 0.41, NOW))
+        self.assertTrue(snapshot_service.should_write_snapshot(latest, _vector(0.65), 0.4, NOW))
+        self.assertTrue(snapshot_service.should_write_snapshot(latest, _vector(), 0.45, NOW))
+
+    def test_interval_anchor_and_shape_changes_force_a_write(self):
+        self.assertTrue(snapshot_service.should_write_snapshot(None, _vector(), 0.4, NOW))
+        self.assertTrue(snapshot_service.should_write_snapshot(_latest(age=timedelta(days=2)), _vector(), 0.4, NOW))
+        self.assertTrue(snapshot_service.should_write_snapshot(_latest(anchor=True), _vector(), 0.4, NOW))
+        grown = {"behavioral_profile": {**_vector()["behavioral_profile"], "warmth": {"score": 0.5, "confidence": 0.1}}}
+        self.assertEqual(snapshot_service.persona_vector_distance(_vector(), grown), 1.0)
+
+
+class SnapshotWriteTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        snapshot_cache.clear()
+
+    async def test_unchanged_persona_writes_nothing(self):
+        metrics = [SimpleNamespace(trait_name="reflection_depth", score=0.6, confidence=0.4)]
+        stored = SimpleNamespace(
+            id=UUID(int=9), user_id=USER, persona_vector={"behavioral_profile": {"reflection_depth": {"score": 0.6, "confidence": 0.4}}},
+            stability_index=0.4, summary_text="", behavioral_traits={}, is_historical_anchor=False,
+            created_at=datetime.now(timezone.utc),
+        )
+        with patch.object(PersonaRepository, "get_all_metrics", new=AsyncMock(return_value=metrics)), \
+             patch.object(PersonaRepository, "get_latest_snapshot", new=AsyncMock(return_value=stored)), \
+             patch.object(PersonaRepository, "create_snapshot", new=AsyncMock()) as create:
+            snapshot = await snapshot_service.generate_persona_snapshot(object(), USER)
+
+        create.assert_not_awaited()
+        self.assertEqual(snapshot.id, stored.id)
+        self.assertEqual(snapshot_cache.version(USER), 0)
+
+    async def test_learning_pass_without_a_snapshot_change_keeps_the_version(self):
+        from app.api import chat as chat_api
+        from app.api.chat import ChatRequest, ChatTurn
+
+        metrics = [SimpleNamespace(trait_name="reflection_depth", score=0.6, confidence=0.4)]
+        stored = SimpleNamespace(
+            id=UUID(int=9), user_id=USER, persona_vector={"behavioral_profile": {"reflection_depth": {"score": 0.6, "confidence": 0.4}}},
+            stability_index=0.4, summary_text="", behavioral_traits={}, is_historical_anchor=False,
+            created_at=datetime.now(timezone.utc),
+        )
+        request = ChatRequest(user_id=str(USER), message="same as always", mode="mirror")
+        turn = ChatTurn(
+            request=request, effective_mode="mirror", user_id=USER, conversation_id=UUID(int=7),
+            conversation_title=None, message_text=request.message, history=[], personality_profile={},
+        )
+        snapshot_cache.bump(USER)
+        version = snapshot_cache.version(USER)
+        with patch.object(PersonaRepository, "get_all_metrics", new=AsyncMock(return_value=metrics)), \
+             patch.object(PersonaRepository, "get_latest_snapshot", new=AsyncMock(return_value=stored)), \
+             patch.object(PersonaRepository, "create_snapshot", new=AsyncMock()) as create, \
+             patch("app.services.memory_service.check_and_recalibrate_drift", new=AsyncMock()), \
+             patch("app.services.trait_extraction_service.extract_traits", new=AsyncMock(return_value=[{"trait": "x"}])), \
+             patch("app.services.persona_update_service.update_traits", new=AsyncMock()):
+            await chat_api.learn_from_turn(turn, SimpleNamespace(rollback=AsyncMock(), commit=AsyncMock()))
+
+        create.assert_not_awaited()
+        self.assertEqual(snapshot_cache.version(USER), version)
+
+
+class SnapshotRetentionTests(unittest.IsolatedAsyncioTestCase):
+    async def test_downsampling_keeps_anchors_and_the_last_row_per_bucket(self):
+        statements = []
+
+        async def _execute(stmt):
+            statements.append(stmt)
+            return SimpleNamespace(rowcount=3)
+
+        db = SimpleNamespace(execute=_execute, commit=AsyncMock())
+        removed = await snapshot_service.downsample_snapshots(db, user_id=USER, now=NOW)
+
+        sql = _sql(statements[0])
+        self.assertEqual(removed, 3)
+        self.assertIn("DELETE FROM persona_snapshots WHERE persona_snapshots.id IN", sql)
+        self.assertIn("PARTITION BY persona_snapshots.user_id, date_trunc(CASE WHEN", sql)
+        self.assertIn("ORDER BY persona_snapshots.created_at DESC", sql)
+        self.assertIn("is_historical_anchor IS false", sql)
+        self.assertIn("rank > ", sql)
+        db.commit.assert_awaited_once()
+
+    async def test_series_reads_one_snapshot_per_bucket(self):
+        captured = []
+
+        async def _execute(stmt):
+            captured.append(stmt)
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: ["newest", "older"]))
+
+        series = await PersonaRepository.get_snapshot_series(SimpleNamespace(execute=_execute), USER, limit=6)
+
+        self.assertEqual(series, ["older", "newest"])
+        sql = _sql(captured[0])
+        self.assertIn("row_number() OVER (PARTITION BY date_trunc(", sql)
+        self.assertIn("WHERE anon_1.rank = ", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Tests for the single-round-trip per-turn context loader."""
+
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import turn_context_service as tcs
+from app.services.confidence_aggregate_service import ConfidenceAggregates
+from app.services.snapshot_cache import snapshot_cache
+from app.services.style_enforcement_service import ReactionCandidates, select_reaction_prefix
+
+
+class _Result:
+    def __init__(self, row):
+        self._row = row
+
+    def one_or_none(self):
+        return self._row
+
+
+class _DummyDB:
+    def __init__(self, row=None, error=None):
+        self.row = row
+        self.error = error
+        self.statements = []
+        self.expunged = []
+        self.rollbacks = 0
+
+    async def execute(self, stmt, *_args, **_kwargs):
+        self.statements.append(stmt)
+        if self.error:
+            raise self.error
+        return _Result(self.row)
+
+    def expunge(self, instance):
+        self.expunged.append(instance)
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def _snapshot_row(user_id):
+    return SimpleNamespace(
+        id=uuid4(),
+        user_id=user_id,
+        persona_vector={"behavioral_profile": {}},
+        stability_index=0.5,
+        summary_text="steady",
+        behavioral_traits={},
+        is_historical_anchor=False,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _compile(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class TurnContextQueryTests(unittest.TestCase):
+    def test_mirror_query_is_one_statement(self):
+        sql = _compile(tcs.build_turn_context_query(uuid4(), "mirror", "doubt"))
+
+        self.assertEqual(sql.count("FROM users"), 1)
+        for table in ("user_settings", "linguistic_fingerprints", "user_confidence_aggregates"):
+            self.assertIn(f"LEFT OUTER JOIN {table}", sql)
+        self.assertIn("LEFT OUTER JOIN LATERAL", sql)
+        self.assertIn("AS behavioral_signals", sql)
+        self.assertIn("AS reaction_patterns", sql)
+
+    def test_cached_snapshot_skips_lateral_join(self):
+        sql = _compile(tcs.build_turn_context_query(uuid4(), "mirror", include_snapshot=False))
+        self.assertNotIn("persona_snapshots", sql)
+
+    def test_reflection_query_only_reads_schedule(self):
+        sql = _compile(tcs.build_turn_context_query(uuid4(), "reflection"))
+        self.assertIn("schedule_context", sql)
+        self.assertNotIn("user_settings", sql)
+
+
+class LoadTurnContextTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        snapshot_cache.clear()
+
+    async def test_loads_every_source_in_one_round_trip(self):
+        user_id = uuid4()
+        settings, fingerprint, aggregate_row = object(), object(), object()
+        row = SimpleNamespace(
+            UserSettings=settings,
+            LinguisticFingerprint=fingerprint,
+            UserConfidenceAggregate=aggregate_row,
+            behavioral_signals=[" newest ", None, "older"],
+            reaction_patterns=[["idk man", 0.9], ["hmm", 0.4]],
+            latest_snapshot=_snapshot_row(user_id),
+        )
+        db = _DummyDB(row)
+        aggregates = ConfidenceAggregates(as_of=datetime.now(timezone.utc))
+
+        with patch.object(tcs, "aggregates_from_row", new=AsyncMock(return_value=aggregates)) as resolver:
+            context = await tcs.load_turn_context(db, user_id, "mirror", "idk, not sure")
+
+        self.assertEqual(len(db.statements), 1)
+        resolver.assert_awaited_once_with(db, user_id, aggregate_row)
+        self.assertIs(context.settings, settings)
+        self.assertEqual(db.expunged, [settings, fingerprint])
+        self.assertEqual(context.behavioral_signals, ("newest", "older"))
+        self.assertEqual(context.reaction_candidates.stimulus_tag, "doubt")
+        self.assertEqual(context.reaction_candidates.select(0.5), ("idk man", 0.9))
+        self.assertEqual(context.snapshot.summary_text, "steady")
+        self.assertIs(context.confidence_aggregates, aggregates)
+
+        # The snapshot is now cached, so the next turn leaves it out of the query.
+        with patch.object(tcs, "aggregates_from_row", new=AsyncMock(return_value=aggregates)):
+            again = await tcs.load_turn_context(db, user_id, "mirror", "idk")
+        self.assertNotIn("persona_snapshots", _compile(db.statements[-1]))
+        self.assertEqual(again.snapshot, context.snapshot)
+
+    async def test_failure_returns_none_for_per_source_fallback(self):
+        db = _DummyDB(error=RuntimeError("connection reset"))
+
+        self.assertIsNone(await tcs.load_turn_context(db, uuid4(), "mirror", "hi"))
+        self.assertEqual(db.rollbacks, 1)
+
+    async def test_preloaded_reaction_candidates_skip_the_query(self):
+        db = _DummyDB(error=AssertionError("should not query"))
+        candidates = ReactionCandidates("pressure", (("ugh ", 0.3), ("nah this is a lot", 0.8)))
+
+        self.assertEqual(
+            await select_reaction_prefix(db, uuid4(), "pressure", 0.5, candidates),
+            ("nah this is a lot", 0.8),
+        )
+        # No candidate clears the threshold: the canned fallback, still without a query.
+        self.assertEqual(
+            await select_reaction_prefix(db, uuid4(), "pressure", 0.95, candidates),
+            ("nah this is a lot tbh", 0.35),
+        )
+        self.assertEqual(db.statements, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
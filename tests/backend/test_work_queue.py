@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Tests for the in-process background work queue."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import work_queue as work_queue_module
+from app.services.work_queue import WorkQueue
+
+
+def _journal_entries(path):
+    return [json.loads(line) for line in Path(path).read_text(encoding="utf-8").splitlines()]
+
+
+class WorkQueueTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = str(Path(self.tmp.name) / "queue.jsonl")
+
+    async def asyncTearDown(self):
+        self.tmp.cleanup()
+
+    async def test_failed_job_is_retried_until_success(self):
+        queue = WorkQueue(workers=2, max_attempts=3, retry_base_seconds=0.0, journal_path=self.journal)
+        attempts = []
+
+        async def flaky(payload):
+            attempts.append(payload["n"])
+            if len(attempts) < 2:
+                raise RuntimeError("transient")
+
+        queue.register("flaky", flaky)
+        await queue.enqueue("flaky", {"n": 1})
+        await queue.join()
+        stats = queue.stats()
+        await queue.stop()
+
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["retried"], 1)
+        self.assertEqual(stats["failed"], 0)
+        self.assertEqual(stats["depth"], 0)
+
+    async def test_jobs_sharing_a_key_run_serially(self):
+        queue = WorkQueue(workers=4, journal_path=None)
+        active = {"now": 0, "peak": 0}
+
+        async def tracked(_payload):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+
+        queue.register("tracked", tracked)
+        for _ in range(5):
+            await queue.enqueue("tracked", {}, key="user-1")
+        await queue.join()
+        await queue.stop()
+
+        self.assertEqual(active["peak"], 1)
+
+    async def test_unfinished_jobs_are_replayed_from_journal(self):
+        Path(self.journal).write_text(
+            '{"op": "put", "id": "a", "name": "echo", "key": null, "payload": {"v": 1}}\n'
+            '{"op": "put", "id": "b", "name": "echo", "key": null, "payload": {"v": 2}}\n'
+            '{"op": "done", "id": "a"}\n',
+            encoding="utf-8",
+        )
+        seen = []
+
+        async def echo(payload):
+            seen.append(payload["v"])
+
+        queue = WorkQueue(workers=1, journal_path=self.journal)
+        queue.register("echo", echo)
+        await queue.start()
+        await queue.join()
+        stats = queue.stats()
+        await queue.stop()
+
+        self.assertEqual(seen, [2])
+        self.assertEqual(stats["replayed"], 1)
+        # Replaying again finds nothing left to do.
+        restarted = WorkQueue(workers=1, journal_path=self.journal)
+        restarted.register("echo", echo)
+        self.assertEqual(restarted._load_unfinished(), [])
+
+    async def test_journal_holds_only_the_reduced_payload(self):
+        release = asyncio.Event()
+
+        async def slow(_payload):
+            await release.wait()
+
+        queue = WorkQueue(workers=1, journal_path=self.journal)
+        queue.register("slow", slow, journal_payload=lambda payload: {"message_id": payload["message_id"]})
+        await queue.enqueue("slow", {"message_id": "m1", "text": "something private"}, owner="user-1")
+
+        (put,) = _journal_entries(self.journal)
+        self.assertEqual(put["payload"], {"message_id": "m1"})
+        self.assertEqual(put["owner"], "user-1")
+        release.set()
+        await queue.join()
+        await queue.stop()
+
+    async def test_journal_is_compacted_periodically(self):
+        async def noop(_payload):
+            return None
+
+        queue = WorkQueue(workers=1, journal_path=self.journal)
+        queue.register("noop", noop)
+        with patch.object(work_queue_module, "WORK_QUEUE_JOURNAL_COMPACT_EVERY", 4):
+            for n in range(10):
+                await queue.enqueue("noop", {"n": n})
+                await queue.join()
+        stats = queue.stats()
+        await queue.stop()
+
+        self.assertGreaterEqual(stats["compactions"], 4)
+        self.assertLess(len(_journal_entries(self.journal)), 4)
+        self.assertEqual(queue._load_unfinished(), [])
+
+    async def test_purged_owner_is_dropped_from_journal_and_queue(self):
+        release = asyncio.Event()
+        seen = []
+
+        async def record(payload):
+            await release.wait()
+            seen.append(payload["v"])
+
+        queue = WorkQueue(workers=1, journal_path=self.journal)
+        queue.register("record", record)
+        await queue.enqueue("record", {"v": 0}, owner="user-2")
+        await queue.enqueue("record", {"v": 1}, owner="user-1")
+        await queue.enqueue("record", {"v": 2}, owner="user-2")
+        await asyncio.sleep(0)
+
+        dropped = await queue.purge_owner("user-1")
+        self.assertEqual(dropped, 1)
+        self.assertEqual({entry["owner"] for entry in _journal_entries(self.journal)}, {"user-2"})
+        release.set()
+        await queue.join()
+        stats = queue.stats()
+        await queue.stop()
+
+        self.assertEqual(seen, [0, 2])
+        self.assertEqual(stats["purged"], 1)
+
+    async def test_each_process_gets_its_own_journal_slot(self):
+        async def noop(_payload):
+            return None
+
+        first = WorkQueue(workers=1, journal_path=self.journal)
+        second = WorkQueue(workers=1, journal_path=self.journal)
+        for queue in (first, second):
+            queue.register("noop", noop)
+            await queue.start()
+
+        self.assertEqual(first.stats()["journal"], self.journal)
+        self.assertEqual(second.stats()["journal"], str(Path(self.tmp.name) / "queue.1.jsonl"))
+        await first.stop()
+        await second.stop()
+
+    async def test_journal_writes_run_off_the_event_loop(self):
+        async def noop(_payload):
+            return None
+
+        queue = WorkQueue(workers=1, journal_path=self.journal)
+        queue.register("noop", noop)
+        await queue.start()
+        with patch.object(work_queue_module.asyncio, "to_thread", wraps=asyncio.to_thread) as to_thread:
+            await queue.enqueue("noop", {})
+            await queue.join()
+        await queue.stop()
+
+        self.assertEqual(
+            [call.args[0] for call in to_thread.call_args_list],
+            [work_queue_module._append_line, work_queue_module._append_line],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()